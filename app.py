@@ -1,15 +1,47 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response
 import sqlite3
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, date
+from decimal import Decimal, ROUND_HALF_UP
 import os
+import re
 from functools import wraps
+import click
+from turron_system.cache_sqlite import AlmacenCache
+from turron_system.cola import ColaTrabajos, Trabajador, ejecutar_pool
+from turron_system.eventos import BusEventos
+from turron_system.migraciones import Migracion, crear_indices, migrar, pendientes, version_esquema
 
 app = Flask(__name__)
 app.secret_key = 'tu_clave_secreta_muy_segura_2024'
 
-# Configuración de la base de datos
-DATABASE = 'instance/sistema_ventas.db'
+# Configuración de la base de datos. Las rutas salen de la carpeta instance junto
+# a este archivo (la misma que usa Django), no del directorio de trabajo
+DATABASE = os.path.join(app.instance_path, 'sistema_ventas.db')
+
+# Caché compartida con la aplicación Django (mismo archivo, claves con prefijo propio)
+cache = AlmacenCache(os.path.join(app.instance_path, 'cache.sqlite3'))
+CLAVE_VERSION_VENTAS = 'flask:version:ventas'
+
+# Cola de trabajos en segundo plano compartida con Django (tareas con prefijo propio)
+cola = ColaTrabajos(os.path.join(app.instance_path, 'trabajos.sqlite3'), os.path.join(app.instance_path, 'trabajos'))
+
+# Bus de eventos del proceso para el feed en vivo (SSE)
+bus = BusEventos()
+STOCK_BAJO = 10
+
+# Columnas de dinero, guardadas como enteros de centavos
+COLUMNAS_DINERO = {
+    'productos': ['precio'],
+    'ventas': ['precio_unitario', 'total'],
+}
+
+# Tablas que se eliminan en segundo plano y su clave (la misma columna las referencia desde ventas)
+TABLAS_ELIMINACION = {
+    'clientes': 'id_cliente',
+    'productos': 'id_producto',
+}
+LOTE_ELIMINACION = 500
 
 def get_db_connection():
     """Obtiene una conexión a la base de datos"""
@@ -18,9 +50,19 @@ def get_db_connection():
     return conn
 
 def init_db():
-    """Inicializa la base de datos con todas las tablas necesarias"""
+    """Lleva la base de datos a la última versión del esquema (ver MIGRACIONES)"""
     conn = get_db_connection()
+    try:
+        return migrar(conn, MIGRACIONES)
+    finally:
+        conn.close()
+
+def esquema_inicial(conn):
+    """Versión 1: tablas, columnas añadidas después y datos de ejemplo (el antiguo init_db).
     
+    Gestiona sus propias transacciones y se puede repetir: las bases creadas
+    antes de versionar el esquema pasan por aquí sin perder nada.
+    """
     # Crear tablas
     conn.executescript('''
         CREATE TABLE IF NOT EXISTS usuarios (
@@ -40,10 +82,11 @@ def init_db():
             id_producto INTEGER PRIMARY KEY AUTOINCREMENT,
             nombre TEXT NOT NULL,
             descripcion TEXT,
-            precio REAL NOT NULL,
+            precio INTEGER NOT NULL, -- centavos
             stock INTEGER NOT NULL DEFAULT 0,
             id_categoria INTEGER,
             fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+            eliminado INTEGER NOT NULL DEFAULT 0,
             FOREIGN KEY (id_categoria) REFERENCES categorias (id_categoria)
         );
 
@@ -53,7 +96,8 @@ def init_db():
             apellido TEXT NOT NULL,
             telefono TEXT,
             direccion TEXT,
-            fecha_registro DATETIME DEFAULT CURRENT_TIMESTAMP
+            fecha_registro DATETIME DEFAULT CURRENT_TIMESTAMP,
+            eliminado INTEGER NOT NULL DEFAULT 0
         );
 
         CREATE TABLE IF NOT EXISTS tiendas (
@@ -74,17 +118,72 @@ def init_db():
             id_venta INTEGER PRIMARY KEY AUTOINCREMENT,
             fecha DATETIME DEFAULT CURRENT_TIMESTAMP,
             cantidad INTEGER NOT NULL,
-            precio_unitario REAL NOT NULL,
-            total REAL NOT NULL,
+            precio_unitario INTEGER NOT NULL, -- centavos
+            total INTEGER NOT NULL, -- centavos
             id_cliente INTEGER,
             id_producto INTEGER,
             id_tienda INTEGER,
             id_lugar INTEGER,
+            cliente_nombre TEXT,
+            cliente_apellido TEXT,
+            producto_nombre TEXT,
+            nombre_categoria TEXT,
+            nombre_tienda TEXT,
+            nombre_lugar TEXT,
             FOREIGN KEY (id_cliente) REFERENCES clientes (id_cliente),
             FOREIGN KEY (id_producto) REFERENCES productos (id_producto),
             FOREIGN KEY (id_tienda) REFERENCES tiendas (id_tienda),
             FOREIGN KEY (id_lugar) REFERENCES lugares_entrega (id_lugar)
         );
+
+        CREATE TABLE IF NOT EXISTS eliminaciones (
+            id_eliminacion INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabla TEXT NOT NULL,
+            id_objeto INTEGER NOT NULL,
+            estado TEXT NOT NULL DEFAULT 'pendiente',
+            total INTEGER NOT NULL DEFAULT 0,
+            borradas INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            fecha_inicio DATETIME DEFAULT CURRENT_TIMESTAMP,
+            fecha_fin DATETIME
+        );
+
+        -- Historial de precios: una fila por cada cambio de precio de un producto
+        CREATE TABLE IF NOT EXISTS precios_historicos (
+            id_precio INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_producto INTEGER NOT NULL,
+            precio INTEGER NOT NULL, -- centavos
+            vigente_desde DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (id_producto) REFERENCES productos (id_producto)
+        );
+        -- Precio vigente en un momento: búsqueda por índice del último cambio anterior
+        CREATE INDEX IF NOT EXISTS idx_precios_producto_vigencia
+            ON precios_historicos (id_producto, vigente_desde);
+    ''')
+    
+    # Snapshots de nombres en ventas (bases de datos creadas antes de tenerlos)
+    agregar_columnas_faltantes(conn, 'ventas', [
+        ('cliente_nombre', 'TEXT'),
+        ('cliente_apellido', 'TEXT'),
+        ('producto_nombre', 'TEXT'),
+        ('nombre_categoria', 'TEXT'),
+        ('nombre_tienda', 'TEXT'),
+        ('nombre_lugar', 'TEXT'),
+    ])
+    backfill_snapshots_ventas(conn)
+    
+    # Marca de borrado pendiente (bases de datos creadas antes de tenerla)
+    for tabla in TABLAS_ELIMINACION:
+        agregar_columnas_faltantes(conn, tabla, [('eliminado', 'INTEGER NOT NULL DEFAULT 0')])
+    
+    # Importes como enteros de centavos (bases de datos creadas con columnas REAL)
+    convertir_dinero_a_centavos(conn)
+    
+    # Productos sin historial (creados antes de tenerlo): su precio actual rige desde su creación
+    conn.execute('''
+        INSERT INTO precios_historicos (id_producto, precio, vigente_desde)
+        SELECT p.id_producto, p.precio, COALESCE(p.fecha_creacion, CURRENT_TIMESTAMP) FROM productos p
+        WHERE NOT EXISTS (SELECT 1 FROM precios_historicos h WHERE h.id_producto = p.id_producto)
     ''')
     
     # Insertar datos de ejemplo
@@ -99,7 +198,253 @@ def init_db():
     conn.execute("INSERT OR IGNORE INTO lugares_entrega (nombre_lugar, direccion) VALUES ('Punto de Recogida', 'Recoger en tienda')")
     
     conn.commit()
+
+def agregar_columnas_faltantes(conn, tabla, columnas):
+    """Agrega a una tabla existente las columnas que todavía no tiene"""
+    existentes = {fila['name'] for fila in conn.execute(f'PRAGMA table_info({tabla})')}
+    for nombre, definicion in columnas:
+        if nombre not in existentes:
+            conn.execute(f'ALTER TABLE {tabla} ADD COLUMN {nombre} {definicion}')
+
+def backfill_snapshots_ventas(conn, lote=1000):
+    """Rellena en lotes los snapshots de nombres de las ventas que no los tienen"""
+    actualizadas = 0
+    while True:
+        # COALESCE deja '' en ventas huérfanas para que no vuelvan a seleccionarse
+        cursor = conn.execute('''
+            UPDATE ventas SET
+                cliente_nombre = COALESCE((SELECT nombre FROM clientes c WHERE c.id_cliente = ventas.id_cliente), ''),
+                cliente_apellido = COALESCE((SELECT apellido FROM clientes c WHERE c.id_cliente = ventas.id_cliente), ''),
+                producto_nombre = COALESCE((SELECT nombre FROM productos p WHERE p.id_producto = ventas.id_producto), ''),
+                nombre_categoria = COALESCE((SELECT cat.nombre_categoria FROM productos p
+                                             JOIN categorias cat ON p.id_categoria = cat.id_categoria
+                                             WHERE p.id_producto = ventas.id_producto), ''),
+                nombre_tienda = COALESCE((SELECT nombre_tienda FROM tiendas t WHERE t.id_tienda = ventas.id_tienda), ''),
+                nombre_lugar = COALESCE((SELECT nombre_lugar FROM lugares_entrega l WHERE l.id_lugar = ventas.id_lugar), '')
+            WHERE id_venta IN (
+                SELECT id_venta FROM ventas WHERE producto_nombre IS NULL ORDER BY id_venta LIMIT ?
+            )
+        ''', (lote,))
+        conn.commit()
+        if cursor.rowcount <= 0:
+            return actualizadas
+        actualizadas += cursor.rowcount
+
+def convertir_dinero_a_centavos(conn):
+    """Reconstruye las tablas con importes REAL para guardarlos como enteros de centavos"""
+    for tabla, columnas in COLUMNAS_DINERO.items():
+        tipos = {fila['name']: fila['type'] for fila in conn.execute(f'PRAGMA table_info({tabla})')}
+        if all(tipos.get(columna) == 'INTEGER' for columna in columnas):
+            continue
+        
+        # SQLite no permite cambiar el tipo de una columna: se copia a una tabla nueva
+        sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                           (tabla,)).fetchone()['sql']
+        for columna in columnas:
+            sql = re.sub(rf'\b{columna} REAL\b', f'{columna} INTEGER', sql)
+        sql = re.sub(rf'^CREATE TABLE "?{tabla}"?', f'CREATE TABLE {tabla}_centavos', sql)
+        
+        nombres = list(tipos)
+        seleccion = [
+            f'CAST(ROUND({nombre} * 100) AS INTEGER)' if nombre in columnas else nombre
+            for nombre in nombres
+        ]
+        conn.execute(sql)
+        conn.execute(f'INSERT INTO {tabla}_centavos ({", ".join(nombres)}) '
+                     f'SELECT {", ".join(seleccion)} FROM {tabla}')
+        conn.execute(f'DROP TABLE {tabla}')
+        conn.execute(f'ALTER TABLE {tabla}_centavos RENAME TO {tabla}')
+        conn.commit()
+
+# Tablas que sigue la réplica hacia la base de Django, con su clave (ver ventas.replicacion)
+TABLAS_REPLICADAS = {
+    'categorias': 'id_categoria',
+    'tiendas': 'id_tienda',
+    'lugares_entrega': 'id_lugar',
+    'clientes': 'id_cliente',
+    'productos': 'id_producto',
+    'precios_historicos': 'id_precio',
+    'ventas': 'id_venta',
+}
+
+def registro_replicacion(conn):
+    """Versión 3: registro de cambios que lee la réplica hacia Django.
+    
+    Los triggers anotan el id de cada fila insertada, modificada o borrada con
+    una secuencia creciente, sin que las rutas tengan que hacer nada.
+    """
+    conn.execute('''
+        CREATE TABLE replicacion (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabla TEXT NOT NULL,
+            id_fila INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_replicacion_tabla_seq ON replicacion (tabla, seq)')
+    for tabla, clave in TABLAS_REPLICADAS.items():
+        for evento, fila in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            conn.execute(f'''
+                CREATE TRIGGER replicacion_{tabla}_{evento.lower()} AFTER {evento} ON {tabla}
+                BEGIN
+                    INSERT INTO replicacion (tabla, id_fila) VALUES ('{tabla}', {fila}.{clave});
+                END
+            ''')
+
+# Esquema de la base de datos: la migración i deja la versión i + 1 (PRAGMA user_version).
+# Para cambiar el esquema se agrega una migración al final; nunca se editan las aplicadas
+MIGRACIONES = [
+    Migracion('Esquema inicial', esquema_inicial, atomica=False),
+    # Eliminaciones por cliente o producto, listados por fecha y reportes (un índice por transacción)
+    Migracion('Índices de ventas', crear_indices([
+        ('idx_ventas_fecha', 'ventas (fecha)'),
+        ('idx_ventas_cliente', 'ventas (id_cliente)'),
+        ('idx_ventas_producto', 'ventas (id_producto)'),
+    ]), por_lotes=True),
+    Migracion('Registro de cambios para la réplica', registro_replicacion),
+]
+
+def a_centavos(valor):
+    """Convierte un importe escrito en unidades (p. ej. '12.50') a centavos"""
+    return int((Decimal(str(valor)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+@app.template_filter('moneda')
+def moneda(centavos):
+    """Formatea un importe en centavos con dos decimales (AVG puede devolver float)"""
+    unidades = Decimal(str(centavos or 0)).scaleb(-2)
+    return str(unidades.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+
+@app.cli.command('backfill-snapshots')
+def backfill_snapshots_command():
+    """Rellena los snapshots de nombres de las ventas históricas"""
+    conn = get_db_connection()
+    actualizadas = backfill_snapshots_ventas(conn)
+    conn.close()
+    print(f'{actualizadas} ventas actualizadas')
+
+@app.cli.command('migrar')
+@click.option('--estado', is_flag=True, help='Solo mostrar la versión y las migraciones pendientes')
+def migrar_command(estado):
+    """Aplica las migraciones pendientes del esquema de la base de datos"""
+    conn = get_db_connection()
+    try:
+        faltan = pendientes(conn, MIGRACIONES)
+        print(f'Versión del esquema: {version_esquema(conn)} de {len(MIGRACIONES)}')
+        for numero, migracion in faltan:
+            print(f'  pendiente {numero}: {migracion.nombre}')
+        if not estado:
+            migrar(conn, MIGRACIONES, progreso=lambda numero, nombre, segundos:
+                   print(f'Aplicada {numero}: {nombre} ({segundos:.2f} s)'))
+    finally:
+        conn.close()
+
+def version_ventas():
+    """Versión actual de los datos de ventas; forma parte de las claves de caché de reportes"""
+    version = cache.get(CLAVE_VERSION_VENTAS)
+    if version is None:
+        version = cache.incr(CLAVE_VERSION_VENTAS, 0, inicial=1)
+    return version
+
+def invalidar_reportes():
+    """Invalida los reportes cacheados en todos los workers incrementando la versión"""
+    cache.incr(CLAVE_VERSION_VENTAS, inicial=1)
+
+def publicar_stock(producto, stock_anterior):
+    """Difunde el stock de un producto y avisa si acaba de cruzar el umbral de stock bajo"""
+    datos = {'producto': producto['id_producto'], 'nombre': producto['nombre'], 'stock': producto['stock']}
+    bus.publicar('stock', datos)
+    if stock_anterior >= STOCK_BAJO > producto['stock']:
+        bus.publicar('stock_bajo', datos)
+
+def iniciar_eliminacion(tabla, id_objeto, usuario=None):
+    """Oculta el registro al instante y encola el borrado por lotes de sus ventas"""
+    columna = TABLAS_ELIMINACION[tabla]
+    conn = get_db_connection()
+    conn.execute(f'UPDATE {tabla} SET eliminado = 1 WHERE {columna} = ?', (id_objeto,))
+    cursor = conn.execute('INSERT INTO eliminaciones (tabla, id_objeto) VALUES (?, ?)', (tabla, id_objeto))
+    conn.commit()
     conn.close()
+    
+    cola.encolar('flask:eliminar', {'id_eliminacion': cursor.lastrowid},
+                 prioridad=1, max_intentos=5, propietario=usuario)
+    return cursor.lastrowid
+
+def ejecutar_eliminacion(id_eliminacion, lote=LOTE_ELIMINACION):
+    """Borra las ventas del registro en transacciones cortas y después el registro.
+    
+    Si se interrumpe, volver a ejecutarla continúa con las ventas que queden.
+    """
+    conn = get_db_connection()
+    try:
+        eliminacion = conn.execute('SELECT * FROM eliminaciones WHERE id_eliminacion = ?',
+                                   (id_eliminacion,)).fetchone()
+        if not eliminacion or eliminacion['estado'] == 'completada':
+            return
+        tabla, id_objeto = eliminacion['tabla'], eliminacion['id_objeto']
+        columna = TABLAS_ELIMINACION[tabla]
+        
+        restantes = conn.execute(f'SELECT COUNT(*) FROM ventas WHERE {columna} = ?', (id_objeto,)).fetchone()[0]
+        conn.execute("UPDATE eliminaciones SET estado = 'en_curso', total = borradas + ?, error = NULL "
+                     "WHERE id_eliminacion = ?", (restantes, id_eliminacion))
+        conn.commit()
+        
+        while True:
+            cursor = conn.execute(f'''
+                DELETE FROM ventas WHERE id_venta IN (
+                    SELECT id_venta FROM ventas WHERE {columna} = ? LIMIT ?
+                )
+            ''', (id_objeto, lote))
+            if cursor.rowcount <= 0:
+                break
+            conn.execute('UPDATE eliminaciones SET borradas = borradas + ? WHERE id_eliminacion = ?',
+                         (cursor.rowcount, id_eliminacion))
+            conn.commit()
+            invalidar_reportes()
+        
+        conn.execute(f'DELETE FROM {tabla} WHERE {columna} = ?', (id_objeto,))
+        conn.execute("UPDATE eliminaciones SET estado = 'completada', fecha_fin = CURRENT_TIMESTAMP "
+                     "WHERE id_eliminacion = ?", (id_eliminacion,))
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        conn.execute("UPDATE eliminaciones SET estado = 'fallida', error = ? WHERE id_eliminacion = ?",
+                     (str(e), id_eliminacion))
+        conn.commit()
+        raise
+    finally:
+        conn.close()
+
+@app.cli.command('procesar-eliminaciones')
+def procesar_eliminaciones_command():
+    """Termina las eliminaciones de clientes y productos que quedaron a medias"""
+    conn = get_db_connection()
+    filas = conn.execute("SELECT id_eliminacion FROM eliminaciones "
+                         "WHERE estado IN ('pendiente', 'en_curso') ORDER BY id_eliminacion").fetchall()
+    conn.close()
+    for fila in filas:
+        ejecutar_eliminacion(fila['id_eliminacion'])
+    print(f'{len(filas)} eliminaciones procesadas')
+
+def tarea_eliminar(trabajo, id_eliminacion):
+    ejecutar_eliminacion(id_eliminacion)
+
+# Tareas que ejecutan los trabajadores de Flask (flask trabajador)
+TAREAS = {
+    'flask:eliminar': tarea_eliminar,
+}
+
+def _proceso_trabajador():
+    """Punto de entrada de cada proceso del pool de trabajadores"""
+    try:
+        Trabajador(cola, TAREAS).bucle()
+    except KeyboardInterrupt:
+        pass
+
+@app.cli.command('trabajador')
+@click.option('--procesos', default=1, help='Procesos trabajadores en paralelo')
+def trabajador_command(procesos):
+    """Ejecuta la cola de trabajos en segundo plano (Ctrl+C para detener)"""
+    print(f'Iniciando {procesos} trabajadores')
+    ejecutar_pool(procesos, _proceso_trabajador)
 
 def login_required(f):
     """Decorador para requerir login en las rutas"""
@@ -124,7 +469,9 @@ def login():
         password = request.form['password']
         
         conn = get_db_connection()
-        user = conn.execute('SELECT * FROM usuarios WHERE email = ?', (email,)).fetchone()
+        user = conn.execute(
+            'SELECT id_usuario, nombre, password FROM usuarios WHERE email = ?', (email,)
+        ).fetchone()
         conn.close()
         
         if user and check_password_hash(user['password'], password):
@@ -179,23 +526,16 @@ def dashboard():
     
     # Estadísticas para el dashboard
     stats = {}
-    stats['total_productos'] = conn.execute('SELECT COUNT(*) as count FROM productos').fetchone()['count']
-    stats['total_clientes'] = conn.execute('SELECT COUNT(*) as count FROM clientes').fetchone()['count']
+    stats['total_productos'] = conn.execute('SELECT COUNT(*) as count FROM productos WHERE eliminado = 0').fetchone()['count']
+    stats['total_clientes'] = conn.execute('SELECT COUNT(*) as count FROM clientes WHERE eliminado = 0').fetchone()['count']
     stats['total_ventas'] = conn.execute('SELECT COUNT(*) as count FROM ventas').fetchone()['count']
     stats['ingresos_totales'] = conn.execute('SELECT SUM(total) as total FROM ventas').fetchone()['total'] or 0
     
     # Productos con stock bajo
-    productos_stock_bajo = conn.execute('SELECT * FROM productos WHERE stock < 10 ORDER BY stock ASC LIMIT 5').fetchall()
+    productos_stock_bajo = conn.execute('SELECT * FROM productos WHERE stock < 10 AND eliminado = 0 ORDER BY stock ASC LIMIT 5').fetchall()
     
-    # Ventas recientes
-    ventas_recientes = conn.execute('''
-        SELECT v.*, c.nombre as cliente_nombre, c.apellido as cliente_apellido, 
-               p.nombre as producto_nombre
-        FROM ventas v
-        JOIN clientes c ON v.id_cliente = c.id_cliente
-        JOIN productos p ON v.id_producto = p.id_producto
-        ORDER BY v.fecha DESC LIMIT 5
-    ''').fetchall()
+    # Ventas recientes (los nombres vienen de los snapshots, sin joins)
+    ventas_recientes = conn.execute('SELECT * FROM ventas ORDER BY fecha DESC LIMIT 5').fetchall()
     
     conn.close()
     
@@ -208,7 +548,7 @@ def dashboard():
 @login_required
 def clientes():
     conn = get_db_connection()
-    clientes = conn.execute('SELECT * FROM clientes ORDER BY nombre, apellido').fetchall()
+    clientes = conn.execute('SELECT * FROM clientes WHERE eliminado = 0 ORDER BY nombre, apellido').fetchall()
     conn.close()
     return render_template('clientes.html', clientes=clientes)
 
@@ -251,7 +591,7 @@ def editar_cliente(id):
         flash('Cliente actualizado exitosamente', 'success')
         return redirect(url_for('clientes'))
     
-    cliente = conn.execute('SELECT * FROM clientes WHERE id_cliente = ?', (id,)).fetchone()
+    cliente = conn.execute('SELECT * FROM clientes WHERE id_cliente = ? AND eliminado = 0', (id,)).fetchone()
     conn.close()
     
     if not cliente:
@@ -263,12 +603,10 @@ def editar_cliente(id):
 @app.route('/eliminar_cliente/<int:id>')
 @login_required
 def eliminar_cliente(id):
-    conn = get_db_connection()
-    conn.execute('DELETE FROM clientes WHERE id_cliente = ?', (id,))
-    conn.commit()
-    conn.close()
+    # Se oculta al instante; sus ventas se borran por lotes en segundo plano
+    iniciar_eliminacion('clientes', id, session['user_id'])
     
-    flash('Cliente eliminado exitosamente', 'success')
+    flash('Cliente eliminado exitosamente. Sus ventas se borrarán en segundo plano', 'success')
     return redirect(url_for('clientes'))
 
 # Rutas de Productos
@@ -280,6 +618,7 @@ def productos():
         SELECT p.*, c.nombre_categoria 
         FROM productos p 
         LEFT JOIN categorias c ON p.id_categoria = c.id_categoria 
+        WHERE p.eliminado = 0
         ORDER BY p.nombre
     ''').fetchall()
     conn.close()
@@ -293,12 +632,13 @@ def nuevo_producto():
     if request.method == 'POST':
         nombre = request.form['nombre']
         descripcion = request.form['descripcion']
-        precio = float(request.form['precio'])
+        precio = a_centavos(request.form['precio'])
         stock = int(request.form['stock'])
         id_categoria = request.form['id_categoria'] if request.form['id_categoria'] else None
         
-        conn.execute('INSERT INTO productos (nombre, descripcion, precio, stock, id_categoria) VALUES (?, ?, ?, ?, ?)',
+        cursor = conn.execute('INSERT INTO productos (nombre, descripcion, precio, stock, id_categoria) VALUES (?, ?, ?, ?, ?)',
                     (nombre, descripcion, precio, stock, id_categoria))
+        conn.execute('INSERT INTO precios_historicos (id_producto, precio) VALUES (?, ?)', (cursor.lastrowid, precio))
         conn.commit()
         conn.close()
         
@@ -317,19 +657,25 @@ def editar_producto(id):
     if request.method == 'POST':
         nombre = request.form['nombre']
         descripcion = request.form['descripcion']
-        precio = float(request.form['precio'])
+        precio = a_centavos(request.form['precio'])
         stock = int(request.form['stock'])
         id_categoria = request.form['id_categoria'] if request.form['id_categoria'] else None
         
+        anterior = conn.execute('SELECT stock, precio FROM productos WHERE id_producto = ?', (id,)).fetchone()
         conn.execute('UPDATE productos SET nombre = ?, descripcion = ?, precio = ?, stock = ?, id_categoria = ? WHERE id_producto = ?',
                     (nombre, descripcion, precio, stock, id_categoria, id))
+        if anterior and anterior['precio'] != precio:
+            conn.execute('INSERT INTO precios_historicos (id_producto, precio) VALUES (?, ?)', (id, precio))
         conn.commit()
         conn.close()
         
+        if anterior and anterior['stock'] != stock:
+            publicar_stock({'id_producto': id, 'nombre': nombre, 'stock': stock}, anterior['stock'])
+        
         flash('Producto actualizado exitosamente', 'success')
         return redirect(url_for('productos'))
     
-    producto = conn.execute('SELECT * FROM productos WHERE id_producto = ?', (id,)).fetchone()
+    producto = conn.execute('SELECT * FROM productos WHERE id_producto = ? AND eliminado = 0', (id,)).fetchone()
     categorias = conn.execute('SELECT * FROM categorias ORDER BY nombre_categoria').fetchall()
     conn.close()
     
@@ -342,12 +688,10 @@ def editar_producto(id):
 @app.route('/eliminar_producto/<int:id>')
 @login_required
 def eliminar_producto(id):
-    conn = get_db_connection()
-    conn.execute('DELETE FROM productos WHERE id_producto = ?', (id,))
-    conn.commit()
-    conn.close()
+    # Se oculta al instante; sus ventas se borran por lotes en segundo plano
+    iniciar_eliminacion('productos', id, session['user_id'])
     
-    flash('Producto eliminado exitosamente', 'success')
+    flash('Producto eliminado exitosamente. Sus ventas se borrarán en segundo plano', 'success')
     return redirect(url_for('productos'))
 
 # Rutas de Categorías
@@ -504,16 +848,8 @@ def editar_lugar_entrega(id):
 @login_required
 def ventas():
     conn = get_db_connection()
-    ventas = conn.execute('''
-        SELECT v.*, c.nombre as cliente_nombre, c.apellido as cliente_apellido,
-               p.nombre as producto_nombre, t.nombre_tienda, l.nombre_lugar
-        FROM ventas v
-        JOIN clientes c ON v.id_cliente = c.id_cliente
-        JOIN productos p ON v.id_producto = p.id_producto
-        JOIN tiendas t ON v.id_tienda = t.id_tienda
-        JOIN lugares_entrega l ON v.id_lugar = l.id_lugar
-        ORDER BY v.fecha DESC
-    ''').fetchall()
+    # Los snapshots de nombres evitan los joins con clientes, productos, tiendas y lugares
+    ventas = conn.execute('SELECT * FROM ventas ORDER BY fecha DESC').fetchall()
     conn.close()
     return render_template('ventas.html', ventas=ventas)
 
@@ -530,7 +866,8 @@ def nueva_venta():
         id_lugar = int(request.form['id_lugar'])
         
         # Obtener el producto para verificar stock y precio
-        producto = conn.execute('SELECT * FROM productos WHERE id_producto = ?', (id_producto,)).fetchone()
+        producto = conn.execute('SELECT * FROM productos WHERE id_producto = ? AND eliminado = 0',
+                                (id_producto,)).fetchone()
         
         if not producto:
             flash('Producto no encontrado', 'error')
@@ -545,25 +882,47 @@ def nueva_venta():
         precio_unitario = producto['precio']
         total = precio_unitario * cantidad
         
-        # Registrar la venta
-        conn.execute('''
-            INSERT INTO ventas (id_cliente, id_producto, cantidad, precio_unitario, total, id_tienda, id_lugar)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (id_cliente, id_producto, cantidad, precio_unitario, total, id_tienda, id_lugar))
+        # Registrar la venta con los snapshots de nombres del momento
+        cursor = conn.execute('''
+            INSERT INTO ventas (id_cliente, id_producto, cantidad, precio_unitario, total, id_tienda, id_lugar,
+                                cliente_nombre, cliente_apellido, producto_nombre, nombre_categoria,
+                                nombre_tienda, nombre_lugar)
+            VALUES (?, ?, ?, ?, ?, ?, ?,
+                    (SELECT nombre FROM clientes WHERE id_cliente = ?),
+                    (SELECT apellido FROM clientes WHERE id_cliente = ?),
+                    ?,
+                    COALESCE((SELECT nombre_categoria FROM categorias WHERE id_categoria = ?), ''),
+                    (SELECT nombre_tienda FROM tiendas WHERE id_tienda = ?),
+                    (SELECT nombre_lugar FROM lugares_entrega WHERE id_lugar = ?))
+        ''', (id_cliente, id_producto, cantidad, precio_unitario, total, id_tienda, id_lugar,
+              id_cliente, id_cliente, producto['nombre'], producto['id_categoria'], id_tienda, id_lugar))
         
         # Actualizar stock del producto
         nuevo_stock = producto['stock'] - cantidad
         conn.execute('UPDATE productos SET stock = ? WHERE id_producto = ?', (nuevo_stock, id_producto))
         
         conn.commit()
+        venta = conn.execute('SELECT * FROM ventas WHERE id_venta = ?', (cursor.lastrowid,)).fetchone()
         conn.close()
+        invalidar_reportes()
+        
+        # Feed en vivo: la venta y el stock resultante
+        bus.publicar('venta', {
+            'id': venta['id_venta'],
+            'cliente': f"{venta['cliente_nombre']} {venta['cliente_apellido']}",
+            'producto': venta['producto_nombre'],
+            'cantidad': venta['cantidad'],
+            'total': moneda(venta['total']),
+            'fecha': venta['fecha'],
+        })
+        publicar_stock({**dict(producto), 'stock': nuevo_stock}, producto['stock'])
         
         flash('Venta registrada exitosamente', 'success')
         return redirect(url_for('ventas'))
     
     # Obtener datos para el formulario
-    clientes = conn.execute('SELECT * FROM clientes ORDER BY nombre, apellido').fetchall()
-    productos = conn.execute('SELECT * FROM productos WHERE stock > 0 ORDER BY nombre').fetchall()
+    clientes = conn.execute('SELECT * FROM clientes WHERE eliminado = 0 ORDER BY nombre, apellido').fetchall()
+    productos = conn.execute('SELECT * FROM productos WHERE stock > 0 AND eliminado = 0 ORDER BY nombre').fetchall()
     tiendas = conn.execute('SELECT * FROM tiendas ORDER BY nombre_tienda').fetchall()
     lugares = conn.execute('SELECT * FROM lugares_entrega ORDER BY nombre_lugar').fetchall()
     conn.close()
@@ -576,20 +935,53 @@ def nueva_venta():
 @login_required
 def api_producto(id):
     conn = get_db_connection()
-    producto = conn.execute('SELECT * FROM productos WHERE id_producto = ?', (id,)).fetchone()
+    producto = conn.execute('SELECT * FROM productos WHERE id_producto = ? AND eliminado = 0', (id,)).fetchone()
     conn.close()
     
     if producto:
         return jsonify({
-            'precio': producto['precio'],
+            'precio': producto['precio'] / 100,
             'stock': producto['stock']
         })
     return jsonify({'error': 'Producto no encontrado'}), 404
 
+# Progreso del borrado en segundo plano de un cliente o producto
+@app.route('/api/eliminacion/<int:id>')
+@login_required
+def api_eliminacion(id):
+    conn = get_db_connection()
+    eliminacion = conn.execute('SELECT * FROM eliminaciones WHERE id_eliminacion = ?', (id,)).fetchone()
+    conn.close()
+    
+    if not eliminacion:
+        return jsonify({'error': 'Eliminación no encontrada'}), 404
+    return jsonify(dict(eliminacion))
+
+# Feed en vivo (Server-Sent Events) de ventas y cambios de stock
+@app.route('/eventos')
+@login_required
+def eventos():
+    ultimo_id = request.headers.get('Last-Event-ID', '')
+    return Response(
+        bus.suscribir(int(ultimo_id) if ultimo_id.isdigit() else None),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 # Rutas de Reportes
 @app.route('/ganancias')
 @login_required
 def ganancias():
+    clave = f'flask:ganancias:{version_ventas()}'
+    reporte = cache.get(clave)
+    if reporte is None:
+        reporte = calcular_ganancias()
+        cache.set(clave, reporte, timeout=600)
+    
+    return render_template('ganancias.html', **reporte)
+
+def calcular_ganancias():
+    """Consulta los datos del reporte de ganancias (como diccionarios, para poder cachearlos)"""
     conn = get_db_connection()
     
     # Ganancias por mes
@@ -604,32 +996,41 @@ def ganancias():
     # Ganancias totales
     total_ganancias = conn.execute('SELECT SUM(total) as total FROM ventas').fetchone()['total'] or 0
     
-    # Productos más vendidos
+    # Productos más vendidos (el nombre sale del snapshot, sin join con productos)
     productos_vendidos = conn.execute('''
-        SELECT p.nombre, SUM(v.cantidad) as total_vendido, SUM(v.total) as ingresos
-        FROM ventas v
-        JOIN productos p ON v.id_producto = p.id_producto
-        GROUP BY p.id_producto, p.nombre
+        SELECT MAX(producto_nombre) as nombre, SUM(cantidad) as total_vendido, SUM(total) as ingresos
+        FROM ventas
+        GROUP BY id_producto
         ORDER BY total_vendido DESC
         LIMIT 10
     ''').fetchall()
     
     conn.close()
     
-    return render_template('ganancias.html', ganancias_mes=ganancias_mes,
-                         total_ganancias=total_ganancias, productos_vendidos=productos_vendidos)
+    return {
+        'ganancias_mes': [dict(fila) for fila in ganancias_mes],
+        'total_ganancias': total_ganancias,
+        'productos_vendidos': [dict(fila) for fila in productos_vendidos],
+    }
 
 @app.route('/ganancias_producto')
 @login_required
 def ganancias_producto():
     conn = get_db_connection()
     
+    # Precio de lista vigente en cada venta: una búsqueda en idx_precios_producto_vigencia por venta
     ganancias_producto = conn.execute('''
         SELECT p.nombre, p.precio, SUM(v.cantidad) as total_vendido, 
                SUM(v.total) as ingresos_totales,
-               AVG(v.precio_unitario) as precio_promedio
+               AVG(v.precio_unitario) as precio_promedio,
+               SUM(v.cantidad * COALESCE((
+                   SELECT h.precio FROM precios_historicos h
+                   WHERE h.id_producto = v.id_producto AND h.vigente_desde <= v.fecha
+                   ORDER BY h.vigente_desde DESC LIMIT 1
+               ), v.precio_unitario)) as ingresos_lista
         FROM ventas v
         JOIN productos p ON v.id_producto = p.id_producto
+        WHERE p.eliminado = 0
         GROUP BY p.id_producto, p.nombre, p.precio
         ORDER BY ingresos_totales DESC
     ''').fetchall()
@@ -640,7 +1041,7 @@ def ganancias_producto():
 
 if __name__ == '__main__':
     # Crear el directorio instance si no existe
-    os.makedirs('instance', exist_ok=True)
+    os.makedirs(app.instance_path, exist_ok=True)
     
     # Inicializar la base de datos
     init_db()
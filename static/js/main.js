@@ -6,6 +6,10 @@ document.addEventListener('DOMContentLoaded', function() {
     initializeProductCalculator();
     initializeDataTables();
     initializeAlerts();
+    initializeLiveFeed();
+    initializeCatalog();
+    initializeJobs();
+    initializeCharts();
     
     // Animaciones de entrada
     animateElements();
@@ -44,7 +48,7 @@ function validateForm(form) {
 // Calculadora de productos en ventas
 function initializeProductCalculator() {
     const productoSelect = document.getElementById('id_producto');
-    const cantidadInput = document.getElementById('cantidad');
+    const cantidadInput = getCantidadInput();
     const precioDisplay = document.getElementById('precio-display');
     const totalDisplay = document.getElementById('total-display');
     const stockDisplay = document.getElementById('stock-display');
@@ -53,6 +57,91 @@ function initializeProductCalculator() {
         productoSelect.addEventListener('change', updateProductInfo);
         cantidadInput.addEventListener('input', calculateTotal);
     }
+    
+    // El stock disponible depende de la tienda que vende
+    const tiendaSelect = document.getElementById('id_tienda');
+    if (productoSelect && tiendaSelect) {
+        tiendaSelect.addEventListener('change', updateProductInfo);
+    }
+    
+    // Reservar las unidades mientras se arma la venta (solo si el formulario lo admite)
+    if (document.getElementById('id_reserva')) {
+        const reservar = debounce(reserveStock, 400);
+        [productoSelect, tiendaSelect, getCantidadInput()].forEach(element => {
+            if (element) {
+                element.addEventListener('change', reservar);
+                element.addEventListener('input', reservar);
+            }
+        });
+        window.addEventListener('pagehide', releaseReservation);
+    }
+}
+
+function getCantidadInput() {
+    return document.getElementById('cantidad') || document.getElementById('id_cantidad');
+}
+
+function getCookie(name) {
+    const match = document.cookie.match(new RegExp('(^|;\\s*)' + name + '=([^;]*)'));
+    return match ? decodeURIComponent(match[2]) : null;
+}
+
+// Reservas de stock
+function reserveStock() {
+    const reservaInput = document.getElementById('id_reserva');
+    const productoSelect = document.getElementById('id_producto');
+    const tiendaSelect = document.getElementById('id_tienda');
+    const cantidadInput = getCantidadInput();
+    
+    if (!reservaInput || !productoSelect || !tiendaSelect || !cantidadInput) return;
+    
+    const cantidad = parseInt(cantidadInput.value) || 0;
+    if (!productoSelect.value || !tiendaSelect.value || cantidad < 1) {
+        releaseReservation();
+        return;
+    }
+    
+    const body = new URLSearchParams({
+        producto: productoSelect.value,
+        tienda: tiendaSelect.value,
+        cantidad: cantidad,
+        reserva: reservaInput.value
+    });
+    
+    fetch('/api/reservas/', {
+        method: 'POST',
+        headers: { 'X-CSRFToken': getCookie('csrftoken') },
+        body: body
+    })
+        .then(response => response.json())
+        .then(data => {
+            if (data.error) {
+                showAlert(data.error, 'warning');
+                return;
+            }
+            
+            reservaInput.value = data.reserva;
+            updateProductDisplay({ precio: getPrecioActual(), stock: data.stock });
+        })
+        .catch(error => console.error('Error:', error));
+}
+
+function releaseReservation() {
+    const reservaInput = document.getElementById('id_reserva');
+    if (!reservaInput || !reservaInput.value) return;
+    
+    // keepalive permite que la petición termine aunque se abandone la página
+    fetch(`/api/reservas/${reservaInput.value}/liberar/`, {
+        method: 'POST',
+        headers: { 'X-CSRFToken': getCookie('csrftoken') },
+        keepalive: true
+    }).catch(error => console.error('Error:', error));
+    reservaInput.value = '';
+}
+
+function getPrecioActual() {
+    const precioDisplay = document.getElementById('precio-display');
+    return precioDisplay ? parseFloat(precioDisplay.textContent.replace('$', '')) || 0 : 0;
 }
 
 function updateProductInfo() {
@@ -64,8 +153,23 @@ function updateProductInfo() {
         return;
     }
     
+    // Con el catálogo local el precio se muestra al instante; el stock de la tienda llega por AJAX
+    const local = getCatalogProduct(productoId);
+    if (local) {
+        updateProductDisplay(local);
+        calculateTotal();
+    }
+    
     // Realizar petición AJAX para obtener información del producto
-    fetch(`/api/producto/${productoId}`)
+    const tiendaSelect = document.getElementById('id_tienda');
+    const tiendaId = tiendaSelect ? tiendaSelect.value : '';
+    const reservaInput = document.getElementById('id_reserva');
+    const params = new URLSearchParams();
+    if (tiendaId) params.set('tienda', tiendaId);
+    if (reservaInput && reservaInput.value) params.set('reserva', reservaInput.value);
+    const query = params.toString() ? `?${params.toString()}` : '';
+    
+    fetch(`/api/producto/${productoId}${query}`)
         .then(response => response.json())
         .then(data => {
             if (data.error) {
@@ -96,14 +200,14 @@ function updateProductDisplay(data) {
     }
     
     // Actualizar el máximo de cantidad
-    const cantidadInput = document.getElementById('cantidad');
+    const cantidadInput = getCantidadInput();
     if (cantidadInput) {
         cantidadInput.max = data.stock;
     }
 }
 
 function calculateTotal() {
-    const cantidadInput = document.getElementById('cantidad');
+    const cantidadInput = getCantidadInput();
     const precioDisplay = document.getElementById('precio-display');
     const totalDisplay = document.getElementById('total-display');
     
@@ -332,10 +436,319 @@ function updateStockDisplay() {
     });
 }
 
-// Función para generar gráficos (placeholder para futuras mejoras)
+// Catálogo local de la terminal de venta
+const CATALOG_CACHE = 'turron-catalogo';
+let catalogo = null;
+
+function initializeCatalog(intento = 0) {
+    const container = document.querySelector('[data-catalogo-url]');
+    if (!container) return;
+    
+    loadCatalog(container.dataset.catalogoUrl)
+        .then(data => {
+            catalogo = data;
+            const searchInput = document.getElementById('catalogo-busqueda');
+            if (searchInput) {
+                searchInput.addEventListener('input', debounce(() => {
+                    renderCatalogResults(searchCatalog(searchInput.value));
+                }, 100));
+                if (searchInput.value) {
+                    renderCatalogResults(searchCatalog(searchInput.value));
+                }
+            }
+        })
+        .catch(error => {
+            console.error('Error al cargar el catálogo:', error);
+            // El primer catálogo se genera en segundo plano (503 mientras tanto)
+            if (intento < 5) {
+                setTimeout(() => initializeCatalog(intento + 1), 3000);
+            }
+        });
+}
+
+// Descarga el catálogo solo si cambió (ETag) y lo guarda en la Cache API del navegador
+async function loadCatalog(url) {
+    const cache = window.caches ? await caches.open(CATALOG_CACHE) : null;
+    const cached = cache ? await cache.match(url) : undefined;
+    const headers = {};
+    if (cached && cached.headers.get('ETag')) {
+        headers['If-None-Match'] = cached.headers.get('ETag');
+    }
+    
+    let response;
+    try {
+        response = await fetch(url, { headers: headers, cache: 'no-store' });
+    } catch (error) {
+        // Sin conexión: se trabaja con la última copia
+        if (!cached) throw error;
+        response = cached;
+    }
+    
+    if (response.status === 304 && cached) {
+        response = cached;
+    } else if (!response.ok) {
+        if (!cached) throw new Error(`Catálogo no disponible (${response.status})`);
+        response = cached;
+    } else if (cache && response !== cached) {
+        await cache.put(url, response.clone());
+    }
+    
+    return decodeCatalog(await response.arrayBuffer());
+}
+
+async function decodeCatalog(buffer) {
+    const stream = new Blob([buffer]).stream().pipeThrough(new DecompressionStream('gzip'));
+    const data = JSON.parse(await new Response(stream).text());
+    
+    // Índices en memoria: por id y por nombre normalizado para la búsqueda
+    const productos = data.productos;
+    data.indice = new Map(productos.id.map((id, i) => [id, i]));
+    data.busqueda = productos.nombre.map(normalizeText);
+    return data;
+}
+
+function normalizeText(text) {
+    return text.normalize('NFD').replace(/[\u0300-\u036f]/g, '').toLowerCase();
+}
+
+function catalogProduct(index) {
+    const productos = catalogo.productos;
+    return {
+        id: productos.id[index],
+        nombre: productos.nombre[index],
+        precio: productos.precio[index] / 100,
+        stock: productos.stock[index],
+        categoria: productos.categoria[index]
+    };
+}
+
+function getCatalogProduct(id) {
+    if (!catalogo) return null;
+    const index = catalogo.indice.get(parseInt(id));
+    return index === undefined ? null : catalogProduct(index);
+}
+
+function searchCatalog(text, limit = 20) {
+    const query = normalizeText(text.trim());
+    if (!catalogo || !query) return [];
+    
+    const results = [];
+    for (let i = 0; i < catalogo.busqueda.length && results.length < limit; i++) {
+        if (catalogo.busqueda[i].includes(query)) {
+            results.push(catalogProduct(i));
+        }
+    }
+    return results;
+}
+
+function renderCatalogResults(results) {
+    const list = document.getElementById('catalogo-resultados');
+    if (!list) return;
+    
+    list.innerHTML = '';
+    results.forEach(producto => {
+        const item = document.createElement('button');
+        item.type = 'button';
+        item.className = 'list-group-item list-group-item-action';
+        item.textContent = `${producto.nombre} - $${producto.precio.toFixed(2)}`;
+        item.addEventListener('click', () => {
+            const productoSelect = document.getElementById('id_producto');
+            if (productoSelect) {
+                productoSelect.value = producto.id;
+                productoSelect.dispatchEvent(new Event('change'));
+            }
+            const searchInput = document.getElementById('catalogo-busqueda');
+            if (searchInput) {
+                searchInput.value = producto.nombre;
+            }
+            list.innerHTML = '';
+        });
+        list.appendChild(item);
+    });
+}
+
+// Feed en vivo (Server-Sent Events): ventas nuevas y cambios de stock
+function initializeLiveFeed() {
+    const panel = document.querySelector('[data-eventos-url]');
+    if (!panel || !window.EventSource) return;
+    
+    // EventSource reconecta solo y reenvía Last-Event-ID para recuperar lo perdido
+    const source = new EventSource(panel.dataset.eventosUrl);
+    source.addEventListener('venta', e => handleSaleEvent(JSON.parse(e.data)));
+    source.addEventListener('stock', e => handleStockEvent(JSON.parse(e.data)));
+    source.addEventListener('stock_bajo', e => {
+        const data = JSON.parse(e.data);
+        showAlert(`Stock bajo: ${data.nombre} (${data.stock})`, 'warning');
+    });
+    window.addEventListener('pagehide', () => source.close());
+}
+
+function handleSaleEvent(data) {
+    const totalVentas = document.querySelector('[data-stat="total_ventas"]');
+    if (totalVentas) {
+        totalVentas.textContent = (parseInt(totalVentas.textContent) || 0) + 1;
+    }
+    
+    const ingresos = document.querySelector('[data-stat="ingresos"]');
+    if (ingresos) {
+        const valor = (parseFloat(ingresos.dataset.valor) || 0) + parseFloat(data.total);
+        ingresos.dataset.valor = valor.toFixed(2);
+        ingresos.textContent = `$${valor.toFixed(2)}`;
+    }
+    
+    const tbody = document.getElementById('ventas-recientes');
+    if (tbody) {
+        const row = document.createElement('tr');
+        const fecha = new Date(data.fecha);
+        [data.cliente, data.producto, `$${data.total}`, isNaN(fecha) ? data.fecha : fecha.toLocaleDateString()]
+            .forEach(text => {
+                const cell = document.createElement('td');
+                cell.textContent = text;
+                row.appendChild(cell);
+            });
+        row.classList.add('fade-in');
+        tbody.insertBefore(row, tbody.firstChild);
+        while (tbody.rows.length > 5) {
+            tbody.deleteRow(-1);
+        }
+    }
+}
+
+function handleStockEvent(data) {
+    document.querySelectorAll(`[data-producto="${data.producto}"][data-stock]`).forEach(element => {
+        element.dataset.stock = data.stock;
+        element.textContent = data.stock;
+    });
+    updateStockDisplay();
+}
+
+// Trabajos en segundo plano: el botón encola el trabajo y se consulta su estado hasta que termina
+function initializeJobs() {
+    document.querySelectorAll('[data-trabajo-url]').forEach(button => {
+        button.addEventListener('click', () => startJob(button));
+    });
+}
+
+function startJob(button) {
+    button.disabled = true;
+    fetch(button.dataset.trabajoUrl, {
+        method: 'POST',
+        headers: { 'X-CSRFToken': getCookie('csrftoken') }
+    })
+        .then(response => response.json())
+        .then(trabajo => {
+            showAlert('Trabajo en cola. Te avisaremos cuando termine.', 'info');
+            pollJob(trabajo.estado_url, button);
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            button.disabled = false;
+        });
+}
+
+function pollJob(url, button, interval = 1000) {
+    fetch(url)
+        .then(response => response.json())
+        .then(trabajo => {
+            if (trabajo.estado === 'completado') {
+                button.disabled = false;
+                if (trabajo.descarga_url) {
+                    window.location = trabajo.descarga_url;
+                } else {
+                    showAlert('Trabajo completado', 'success');
+                }
+            } else if (trabajo.estado === 'fallido') {
+                button.disabled = false;
+                showAlert('El trabajo falló. Inténtalo de nuevo más tarde.', 'danger');
+            } else {
+                button.title = trabajo.mensaje || `${trabajo.progreso}%`;
+                setTimeout(() => pollJob(url, button, Math.min(interval * 1.5, 5000)), interval);
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            button.disabled = false;
+        });
+}
+
+// Gráficos del cubo de ventas: clic en una barra para desglosar (mes → tienda → categoría → producto)
+const CUBE_DIMENSIONS = ['mes', 'tienda', 'categoria', 'producto'];
+
 function initializeCharts() {
-    // Aquí se pueden agregar librerías como Chart.js para gráficos
-    console.log('Charts initialization placeholder');
+    document.querySelectorAll('[data-cubo-url]').forEach(container => {
+        if (typeof Chart === 'undefined') {
+            console.warn('Chart.js no está disponible');
+            return;
+        }
+        const state = { por: 'mes', filters: [] };
+        const select = container.querySelector('[data-cubo-dimension]');
+        const back = container.querySelector('[data-cubo-volver]');
+        const chart = new Chart(container.querySelector('[data-cubo-grafica]'), {
+            type: 'bar',
+            data: { labels: [], datasets: [{ label: 'Ventas', data: [], backgroundColor: '#198754' }] },
+            options: {
+                plugins: {
+                    legend: { display: false },
+                    tooltip: { callbacks: { label: item => formatCurrency(item.raw) } }
+                },
+                onClick: (event, elements) => {
+                    if (elements.length) {
+                        drillDownCube(container, chart, state, elements[0].index);
+                    }
+                }
+            }
+        });
+
+        select.addEventListener('change', () => {
+            state.por = select.value;
+            loadCube(container, chart, state);
+        });
+        back.addEventListener('click', () => {
+            const filter = state.filters.pop();
+            if (filter) {
+                state.por = filter.dimension;
+                loadCube(container, chart, state);
+            }
+        });
+        loadCube(container, chart, state);
+    });
+}
+
+function drillDownCube(container, chart, state, index) {
+    const row = chart.cubeRows[index];
+    const next = CUBE_DIMENSIONS.find(dimension =>
+        dimension !== state.por && !state.filters.some(filter => filter.dimension === dimension)
+    );
+    if (!row || !next) {
+        return;
+    }
+    state.filters.push({ dimension: state.por, value: row[state.por], name: row[`${state.por}_nombre`] });
+    state.por = next;
+    loadCube(container, chart, state);
+}
+
+function loadCube(container, chart, state) {
+    const params = new URLSearchParams({ por: state.por });
+    if (state.por !== 'mes') {
+        params.set('limite', 20);
+    }
+    state.filters.forEach(filter => params.set(filter.dimension, filter.value));
+
+    fetch(`${container.dataset.cuboUrl}?${params}`)
+        .then(response => response.json())
+        .then(data => {
+            chart.cubeRows = data.filas;
+            chart.data.labels = data.filas.map(row => row[`${state.por}_nombre`]);
+            chart.data.datasets[0].data = data.filas.map(row => parseFloat(row.total));
+            chart.update();
+
+            container.querySelector('[data-cubo-dimension]').value = state.por;
+            container.querySelector('[data-cubo-volver]').disabled = !state.filters.length;
+            container.querySelector('[data-cubo-ruta]').textContent = state.filters.length
+                ? state.filters.map(filter => filter.name).join(' › ')
+                : 'Todas las ventas';
+        })
+        .catch(error => console.error('Error:', error));
 }
 
 // Función para backup de datos
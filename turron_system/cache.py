@@ -0,0 +1,88 @@
+"""
+Backend de caché de Django sobre ``AlmacenCache``.
+
+A diferencia de LocMemCache, el contenido se comparte entre todos los
+workers de la máquina y sobrevive a los reinicios. Configuración::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'turron_system.cache.SQLiteCache',
+            'LOCATION': BASE_DIR / 'instance' / 'cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 10000, 'CULL_FREQUENCY': 3},
+        }
+    }
+"""
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .cache_sqlite import AlmacenCache
+
+
+class SQLiteCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._almacen = AlmacenCache(
+            location,
+            max_entradas=self._max_entries,
+            fraccion_purga=self._cull_frequency,
+        )
+
+    def _timeout(self, timeout):
+        """Segundos desde ahora, como los espera AlmacenCache.
+
+        ``get_backend_timeout`` de BaseCache devuelve un instante absoluto.
+        """
+        if timeout is DEFAULT_TIMEOUT:
+            return self.default_timeout
+        return timeout
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._almacen.add(key, value, self._timeout(timeout))
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._almacen.get(key, default)
+
+    def get_many(self, keys, version=None):
+        claves = {self.make_and_validate_key(key, version=version): key for key in keys}
+        return {
+            claves[clave]: valor
+            for clave, valor in self._almacen.get_many(claves).items()
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        timeout = self._timeout(timeout)
+        if timeout is not None and timeout <= 0:
+            # Como en los demás backends: caducar de inmediato es borrar
+            self._almacen.delete(key)
+            return
+        self._almacen.set(key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        timeout = self._timeout(timeout)
+        if timeout is not None and timeout <= 0:
+            return self._almacen.delete(key)
+        return self._almacen.touch(key, timeout)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._almacen.delete(key)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._almacen.incr(key, delta)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._almacen.has_key(key)
+
+    def clear(self):
+        self._almacen.clear()
+
+    def close(self, **kwargs):
+        # La conexión es por hilo y se reutiliza entre peticiones
+        pass
@@ -0,0 +1,246 @@
+"""
+Almacén de caché compartido entre procesos sobre SQLite en modo WAL.
+
+No depende de Django para que la aplicación Flask pueda usar el mismo
+archivo. Cada proceso (y cada hilo) abre su propia conexión; WAL permite
+lecturas concurrentes con un único escritor, suficiente para varios workers
+en una misma máquina.
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+
+class AlmacenCache:
+    """Caché clave/valor con caducidad, límite de entradas e incrementos atómicos"""
+
+    def __init__(self, ruta, max_entradas=10000, fraccion_purga=3, timeout_bloqueo=5.0, purga_cada=100):
+        self.ruta = str(ruta)
+        self.max_entradas = max_entradas
+        # Al superar el límite se borra 1/fraccion_purga de las entradas (como CULL_FREQUENCY)
+        self.fraccion_purga = max(fraccion_purga, 1)
+        # El límite se comprueba una vez cada purga_cada escrituras: contar no es gratis
+        self.purga_cada = max(purga_cada, 1)
+        self._escrituras = 0
+        self.timeout_bloqueo = timeout_bloqueo
+        self._local = threading.local()
+        self._inicializado = False
+        self._lock = threading.Lock()
+
+    # Conexión
+
+    def _conexion(self):
+        conn = getattr(self._local, 'conn', None)
+        # Tras un fork el hijo no debe reutilizar la conexión del padre
+        if conn is None or self._local.pid != os.getpid():
+            directorio = os.path.dirname(self.ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            conn = sqlite3.connect(self.ruta, timeout=self.timeout_bloqueo, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._crear_tabla(conn)
+        return conn
+
+    def _crear_tabla(self, conn):
+        with self._lock:
+            if self._inicializado:
+                return
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS cache (
+                    clave TEXT PRIMARY KEY,
+                    valor BLOB NOT NULL,
+                    expira REAL,
+                    accedido REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS cache_expira ON cache (expira);
+                CREATE INDEX IF NOT EXISTS cache_accedido ON cache (accedido);
+            ''')
+            self._inicializado = True
+
+    def cerrar(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # Serialización
+
+    @staticmethod
+    def _serializar(valor):
+        # Los enteros se guardan tal cual para que incr() pueda operar en SQL
+        if isinstance(valor, int) and not isinstance(valor, bool) and -2**63 <= valor < 2**63:
+            return valor
+        return pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _deserializar(dato):
+        if isinstance(dato, int):
+            return dato
+        return pickle.loads(dato)
+
+    @staticmethod
+    def _expiracion(timeout):
+        """``None`` no caduca nunca; 0 o negativo caduca de inmediato"""
+        if timeout is None:
+            return None
+        return time.time() + timeout
+
+    # Operaciones
+
+    def get(self, clave, default=None):
+        conn = self._conexion()
+        ahora = time.time()
+        fila = conn.execute(
+            'SELECT valor FROM cache WHERE clave = ? AND (expira IS NULL OR expira > ?)',
+            (clave, ahora)
+        ).fetchone()
+        if fila is None:
+            return default
+        # La marca de acceso solo sirve para elegir qué purgar; no hace falta en cada lectura
+        if getattr(self._local, 'lecturas', 0) % 10 == 0:
+            conn.execute('UPDATE cache SET accedido = ? WHERE clave = ?', (ahora, clave))
+        self._local.lecturas = getattr(self._local, 'lecturas', 0) + 1
+        return self._deserializar(fila[0])
+
+    def get_many(self, claves):
+        claves = list(claves)
+        if not claves:
+            return {}
+        conn = self._conexion()
+        marcadores = ', '.join('?' * len(claves))
+        filas = conn.execute(
+            f'SELECT clave, valor FROM cache WHERE clave IN ({marcadores}) '
+            'AND (expira IS NULL OR expira > ?)',
+            (*claves, time.time())
+        ).fetchall()
+        return {clave: self._deserializar(valor) for clave, valor in filas}
+
+    def set(self, clave, valor, timeout=None):
+        self._guardar(clave, valor, timeout, reemplazar=True)
+
+    def add(self, clave, valor, timeout=None):
+        """Guarda solo si la clave no existe (o está vencida); devuelve si se guardó"""
+        return self._guardar(clave, valor, timeout, reemplazar=False)
+
+    def _guardar(self, clave, valor, timeout, reemplazar):
+        conn = self._conexion()
+        ahora = time.time()
+        dato = self._serializar(valor)
+        expira = self._expiracion(timeout)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if reemplazar:
+                cursor = conn.execute(
+                    'INSERT OR REPLACE INTO cache (clave, valor, expira, accedido) VALUES (?, ?, ?, ?)',
+                    (clave, dato, expira, ahora)
+                )
+            else:
+                # Una entrada vencida cuenta como inexistente
+                conn.execute(
+                    'DELETE FROM cache WHERE clave = ? AND expira IS NOT NULL AND expira <= ?',
+                    (clave, ahora)
+                )
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO cache (clave, valor, expira, accedido) VALUES (?, ?, ?, ?)',
+                    (clave, dato, expira, ahora)
+                )
+            guardado = cursor.rowcount > 0
+            if guardado:
+                self._purgar(conn, ahora)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return guardado
+
+    def _purgar(self, conn, ahora):
+        """Mantiene la tabla cerca de max_entradas: primero vencidas, luego las menos usadas.
+
+        Las entradas sin caducidad (contadores de versión, marcas de los
+        procesos de fondo) no se purgan: perder un contador de versión haría
+        volver a servir reportes viejos guardados con el mismo número.
+        """
+        if not self.max_entradas:
+            return
+        self._escrituras += 1
+        if self._escrituras % self.purga_cada:
+            return
+        total = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if total <= self.max_entradas:
+            return
+        conn.execute('DELETE FROM cache WHERE expira IS NOT NULL AND expira <= ?', (ahora,))
+        total = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if total <= self.max_entradas:
+            return
+        conn.execute(
+            'DELETE FROM cache WHERE clave IN '
+            '(SELECT clave FROM cache WHERE expira IS NOT NULL ORDER BY accedido LIMIT ?)',
+            (max(total // self.fraccion_purga, total - self.max_entradas),)
+        )
+
+    def touch(self, clave, timeout=None):
+        conn = self._conexion()
+        ahora = time.time()
+        cursor = conn.execute(
+            'UPDATE cache SET expira = ?, accedido = ? '
+            'WHERE clave = ? AND (expira IS NULL OR expira > ?)',
+            (self._expiracion(timeout), ahora, clave, ahora)
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, clave):
+        cursor = self._conexion().execute('DELETE FROM cache WHERE clave = ?', (clave,))
+        return cursor.rowcount > 0
+
+    def incr(self, clave, delta=1, inicial=None, timeout=None):
+        """Incremento atómico en una sola sentencia.
+
+        Si la clave no existe se lanza ``ValueError``, salvo que se indique
+        ``inicial``: entonces se crea con ``inicial + delta`` (útil para
+        contadores de versión).
+        """
+        conn = self._conexion()
+        ahora = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            fila = conn.execute(
+                'UPDATE cache SET valor = valor + ?, accedido = ? '
+                'WHERE clave = ? AND (expira IS NULL OR expira > ?) AND typeof(valor) = \'integer\' '
+                'RETURNING valor',
+                (delta, ahora, clave, ahora)
+            ).fetchone()
+            if fila is None:
+                if inicial is None:
+                    raise ValueError(f"La clave '{clave}' no existe o no es un entero")
+                fila = (inicial + delta,)
+                conn.execute(
+                    'INSERT OR REPLACE INTO cache (clave, valor, expira, accedido) VALUES (?, ?, ?, ?)',
+                    (clave, fila[0], self._expiracion(timeout), ahora)
+                )
+                self._purgar(conn, ahora)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return fila[0]
+
+    def has_key(self, clave):
+        return self._conexion().execute(
+            'SELECT 1 FROM cache WHERE clave = ? AND (expira IS NULL OR expira > ?)',
+            (clave, time.time())
+        ).fetchone() is not None
+
+    def clear(self):
+        self._conexion().execute('DELETE FROM cache')
+
+    def limpiar_vencidas(self):
+        """Borra las entradas vencidas; devuelve cuántas se eliminaron"""
+        return self._conexion().execute(
+            'DELETE FROM cache WHERE expira IS NOT NULL AND expira <= ?', (time.time(),)
+        ).rowcount
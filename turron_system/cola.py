@@ -0,0 +1,357 @@
+"""
+Cola de trabajos en segundo plano sobre SQLite, sin broker externo.
+
+Los trabajos se guardan en una tabla de un archivo SQLite en modo WAL y los
+ejecuta un grupo de procesos trabajadores en la misma máquina. Cada
+trabajador reclama el siguiente trabajo pendiente (mayor prioridad primero)
+con una sola sentencia UPDATE, así que dos procesos nunca toman el mismo.
+Mientras lo ejecuta renueva un plazo de arrendamiento; si el proceso muere,
+al vencer el plazo el trabajo vuelve a la cola. El plazo lo renueva un hilo
+de latido durante toda la tarea, informe ésta de su progreso o no. Los fallos se reintentan con
+espera exponencial hasta ``max_intentos``.
+
+No depende de Django para que la aplicación Flask pueda usar la misma cola.
+"""
+
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from pathlib import Path
+
+
+PENDIENTE = 'pendiente'
+EN_CURSO = 'en_curso'
+COMPLETADO = 'completado'
+FALLIDO = 'fallido'
+
+
+class ColaTrabajos:
+    """Tabla de trabajos con prioridades, reintentos, progreso y archivos de resultado"""
+
+    def __init__(self, ruta, directorio_resultados=None, arriendo=300, espera_reintento=10,
+                 timeout_bloqueo=5.0):
+        self.ruta = str(ruta)
+        self.directorio_resultados = Path(
+            directorio_resultados or Path(self.ruta).with_suffix('')
+        )
+        # Segundos sin noticias de un trabajador antes de devolver su trabajo a la cola
+        self.arriendo = arriendo
+        self.espera_reintento = espera_reintento
+        self.timeout_bloqueo = timeout_bloqueo
+        self._local = threading.local()
+        self._inicializado = False
+        self._lock = threading.Lock()
+
+    # Conexión
+
+    def _conexion(self):
+        conn = getattr(self._local, 'conn', None)
+        # Tras un fork el hijo no debe reutilizar la conexión del padre
+        if conn is None or self._local.pid != os.getpid():
+            directorio = os.path.dirname(self.ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            conn = sqlite3.connect(self.ruta, timeout=self.timeout_bloqueo, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._crear_tabla(conn)
+        return conn
+
+    def _crear_tabla(self, conn):
+        with self._lock:
+            if self._inicializado:
+                return
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS trabajos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tarea TEXT NOT NULL,
+                    parametros TEXT NOT NULL,
+                    prioridad INTEGER NOT NULL DEFAULT 0,
+                    estado TEXT NOT NULL,
+                    intentos INTEGER NOT NULL DEFAULT 0,
+                    max_intentos INTEGER NOT NULL,
+                    disponible REAL NOT NULL,
+                    progreso INTEGER NOT NULL DEFAULT 0,
+                    mensaje TEXT,
+                    resultado TEXT,
+                    archivo TEXT,
+                    error TEXT,
+                    propietario TEXT,
+                    trabajador TEXT,
+                    vence REAL,
+                    creado REAL NOT NULL,
+                    iniciado REAL,
+                    terminado REAL
+                );
+                CREATE INDEX IF NOT EXISTS trabajos_siguiente ON trabajos (estado, prioridad DESC, id);
+            ''')
+            self._inicializado = True
+
+    def cerrar(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @staticmethod
+    def _fila(fila):
+        if fila is None:
+            return None
+        trabajo = dict(fila)
+        trabajo['parametros'] = json.loads(trabajo['parametros'])
+        trabajo['resultado'] = json.loads(trabajo['resultado']) if trabajo['resultado'] else None
+        return trabajo
+
+    # Productor
+
+    def encolar(self, tarea, parametros=None, prioridad=0, max_intentos=3, unico=False,
+                propietario=None):
+        """Añade un trabajo y devuelve su id.
+
+        Con ``unico`` no se duplica un trabajo igual (misma tarea y mismos
+        parámetros) que siga pendiente o en curso: se devuelve el existente.
+        """
+        datos = json.dumps(parametros or {}, sort_keys=True, default=str)
+        conn = self._conexion()
+        ahora = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            existente = conn.execute(
+                'SELECT id FROM trabajos WHERE tarea = ? AND parametros = ? AND estado IN (?, ?)',
+                (tarea, datos, PENDIENTE, EN_CURSO)
+            ).fetchone() if unico else None
+            if existente:
+                id_trabajo = existente['id']
+            else:
+                id_trabajo = conn.execute(
+                    'INSERT INTO trabajos (tarea, parametros, prioridad, estado, max_intentos, '
+                    'disponible, propietario, creado) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (tarea, datos, prioridad, PENDIENTE, max(max_intentos, 1), ahora,
+                     None if propietario is None else str(propietario), ahora)
+                ).lastrowid
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return id_trabajo
+
+    def obtener(self, id_trabajo):
+        return self._fila(self._conexion().execute(
+            'SELECT * FROM trabajos WHERE id = ?', (id_trabajo,)
+        ).fetchone())
+
+    # Trabajadores
+
+    def reclamar(self, trabajador, tareas):
+        """Marca como en curso el siguiente trabajo pendiente de ``tareas`` y lo devuelve"""
+        tareas = list(tareas)
+        if not tareas:
+            return None
+        ahora = time.time()
+        marcadores = ', '.join('?' * len(tareas))
+        return self._fila(self._conexion().execute(
+            f'''
+            UPDATE trabajos SET estado = ?, trabajador = ?, intentos = intentos + 1,
+                iniciado = ?, vence = ?, error = NULL
+            WHERE id = (
+                SELECT id FROM trabajos
+                WHERE estado = ? AND disponible <= ? AND tarea IN ({marcadores})
+                ORDER BY prioridad DESC, id LIMIT 1
+            )
+            RETURNING *
+            ''',
+            (EN_CURSO, trabajador, ahora, ahora + self.arriendo, PENDIENTE, ahora, *tareas)
+        ).fetchone())
+
+    def progreso(self, id_trabajo, porcentaje, mensaje=None):
+        """Actualiza el avance (0-100) y renueva el arrendamiento del trabajador"""
+        self._conexion().execute(
+            'UPDATE trabajos SET progreso = ?, mensaje = COALESCE(?, mensaje), vence = ? '
+            'WHERE id = ? AND estado = ?',
+            (max(0, min(int(porcentaje), 100)), mensaje, time.time() + self.arriendo,
+             id_trabajo, EN_CURSO)
+        )
+
+    def completar(self, id_trabajo, trabajador, resultado=None, archivo=None):
+        """Da el trabajo por completado si ``trabajador`` aún lo tiene arrendado; devuelve si lo tenía"""
+        return self._conexion().execute(
+            'UPDATE trabajos SET estado = ?, progreso = 100, resultado = ?, archivo = ?, '
+            'trabajador = NULL, vence = NULL, terminado = ? WHERE id = ? AND trabajador = ? AND estado = ?',
+            (COMPLETADO, json.dumps(resultado, default=str), None if archivo is None else str(archivo),
+             time.time(), id_trabajo, trabajador, EN_CURSO)
+        ).rowcount > 0
+
+    def fallar(self, id_trabajo, trabajador, error):
+        """Devuelve el trabajo a la cola con espera exponencial, o lo da por fallido.
+
+        Como ``completar``, solo si ``trabajador`` aún lo tiene arrendado: si
+        el plazo venció y otro trabajador lo reclamó (o el trabajo ya no
+        existe) no se toca y se devuelve False.
+        """
+        ahora = time.time()
+        return self._conexion().execute(
+            '''
+            UPDATE trabajos SET
+                estado = CASE WHEN intentos >= max_intentos THEN ? ELSE ? END,
+                terminado = CASE WHEN intentos >= max_intentos THEN ? END,
+                disponible = CASE WHEN intentos >= max_intentos THEN disponible
+                                  ELSE ? + ? * (1 << (intentos - 1)) END,
+                error = ?, trabajador = NULL, vence = NULL
+            WHERE id = ? AND trabajador = ? AND estado = ?
+            ''',
+            (FALLIDO, PENDIENTE, ahora, ahora, self.espera_reintento, error, id_trabajo, trabajador, EN_CURSO)
+        ).rowcount > 0
+
+    def renovar(self, id_trabajo, trabajador):
+        """Renueva el arrendamiento si ``trabajador`` aún tiene el trabajo; devuelve si lo tenía"""
+        return self._conexion().execute(
+            'UPDATE trabajos SET vence = ? WHERE id = ? AND trabajador = ? AND estado = ?',
+            (time.time() + self.arriendo, id_trabajo, trabajador, EN_CURSO)
+        ).rowcount > 0
+
+    def recuperar_vencidos(self):
+        """Devuelve a la cola los trabajos de trabajadores que dejaron de responder"""
+        ahora = time.time()
+        return self._conexion().execute(
+            '''
+            UPDATE trabajos SET
+                estado = CASE WHEN intentos >= max_intentos THEN ? ELSE ? END,
+                terminado = CASE WHEN intentos >= max_intentos THEN ? END,
+                error = 'El trabajador dejó de responder', trabajador = NULL, vence = NULL
+            WHERE estado = ? AND vence < ?
+            ''',
+            (FALLIDO, PENDIENTE, ahora, EN_CURSO, ahora)
+        ).rowcount
+
+    def ruta_resultado(self, id_trabajo, nombre):
+        """Ruta donde un trabajo guarda su archivo de resultado"""
+        self.directorio_resultados.mkdir(parents=True, exist_ok=True)
+        return self.directorio_resultados / f'{id_trabajo}-{nombre}'
+
+    def limpiar(self, dias=7):
+        """Borra los trabajos terminados hace más de ``dias`` días y sus archivos"""
+        conn = self._conexion()
+        limite = time.time() - dias * 86400
+        viejos = conn.execute(
+            'SELECT id, archivo FROM trabajos WHERE estado IN (?, ?) AND terminado < ?',
+            (COMPLETADO, FALLIDO, limite)
+        ).fetchall()
+        for trabajo in viejos:
+            if trabajo['archivo']:
+                Path(trabajo['archivo']).unlink(missing_ok=True)
+        conn.executemany('DELETE FROM trabajos WHERE id = ?', [(trabajo['id'],) for trabajo in viejos])
+        return len(viejos)
+
+
+class Trabajo:
+    """Trabajo en ejecución, tal como lo recibe la función de la tarea"""
+
+    def __init__(self, cola, fila):
+        self.cola = cola
+        self.id = fila['id']
+        self.tarea = fila['tarea']
+        self.parametros = fila['parametros']
+        self.intentos = fila['intentos']
+        self.archivo = None
+
+    def progreso(self, porcentaje, mensaje=None):
+        self.cola.progreso(self.id, porcentaje, mensaje)
+
+    def ruta_resultado(self, nombre):
+        """Ruta del archivo de resultado; queda asociada al trabajo al completarse"""
+        self.archivo = self.cola.ruta_resultado(self.id, nombre)
+        return self.archivo
+
+
+class Trabajador:
+    """Bucle que reclama y ejecuta trabajos de las tareas registradas en ``tareas``"""
+
+    def __init__(self, cola, tareas, nombre=None, espera=1.0, latido=None):
+        self.cola = cola
+        self.tareas = tareas
+        self.nombre = nombre or f'{socket.gethostname()}:{os.getpid()}'
+        self.espera = espera
+        # Segundos entre renovaciones del arrendamiento: varias dentro de cada plazo
+        self.latido = latido if latido is not None else cola.arriendo / 3
+
+    def _latir(self, id_trabajo, detener):
+        """Renueva el arrendamiento hasta que termine la tarea o se pierda el trabajo"""
+        try:
+            while not detener.wait(self.latido):
+                if not self.cola.renovar(id_trabajo, self.nombre):
+                    break
+        finally:
+            # La conexión es de este hilo
+            self.cola.cerrar()
+
+    def ejecutar_siguiente(self):
+        """Ejecuta un trabajo si hay alguno disponible; devuelve si ejecutó alguno"""
+        self.cola.recuperar_vencidos()
+        fila = self.cola.reclamar(self.nombre, self.tareas)
+        if fila is None:
+            return False
+        trabajo = Trabajo(self.cola, fila)
+        detener = threading.Event()
+        latido = threading.Thread(
+            target=self._latir, args=(trabajo.id, detener), name=f'latido-{trabajo.id}', daemon=True
+        )
+        latido.start()
+        try:
+            try:
+                resultado = self.tareas[trabajo.tarea](trabajo, **trabajo.parametros)
+            finally:
+                detener.set()
+                latido.join()
+        except Exception:
+            self.cola.fallar(trabajo.id, self.nombre, traceback.format_exc(limit=10))
+        else:
+            self.cola.completar(trabajo.id, self.nombre, resultado, trabajo.archivo)
+        return True
+
+    def bucle(self, detener=None, max_trabajos=None):
+        """Ejecuta trabajos hasta que ``detener`` (un Event) se active o se llegue a ``max_trabajos``"""
+        detener = detener or threading.Event()
+        ejecutados = 0
+        while not detener.is_set():
+            if self.ejecutar_siguiente():
+                ejecutados += 1
+                if max_trabajos and ejecutados >= max_trabajos:
+                    break
+            else:
+                detener.wait(self.espera)
+        return ejecutados
+
+
+def ejecutar_pool(procesos, objetivo, *args, revision=1.0):
+    """Mantiene ``procesos`` procesos hijos ejecutando ``objetivo(*args)``.
+
+    Los hijos se crean con ``spawn`` (no heredan conexiones abiertas del
+    padre) y se relanzan si terminan. Ctrl+C detiene el grupo completo.
+    """
+    contexto = multiprocessing.get_context('spawn')
+    hijos = {}
+    try:
+        while True:
+            for indice in range(procesos):
+                hijo = hijos.get(indice)
+                if hijo is None or not hijo.is_alive():
+                    # No daemon: un trabajador puede abrir su propio pool de procesos (ver ventas.reportes)
+                    hijo = contexto.Process(target=objetivo, args=args, name=f'trabajador-{indice}')
+                    hijo.start()
+                    hijos[indice] = hijo
+            time.sleep(revision)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for hijo in hijos.values():
+            hijo.terminate()
+        for hijo in hijos.values():
+            hijo.join()
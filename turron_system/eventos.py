@@ -0,0 +1,69 @@
+"""
+Bus de eventos en memoria para los feeds en vivo (Server-Sent Events).
+
+Cada evento se serializa una sola vez al publicarse y se guarda en un
+historial circular; todas las conexiones SSE abiertas leen ese mismo
+historial, de modo que atender a muchos dashboards no cuesta ninguna
+consulta a la base de datos por cliente. El bus vive en el proceso: con
+varios workers cada uno difunde los cambios que él mismo registra.
+
+No depende de Django para que la aplicación Flask pueda usarlo.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+
+
+class BusEventos:
+    """Difusión de eventos a todos los suscriptores del proceso"""
+
+    def __init__(self, historial=256):
+        self._condicion = threading.Condition()
+        self._eventos = deque(maxlen=historial)
+        self._ultimo_id = 0
+
+    @property
+    def ultimo_id(self):
+        return self._ultimo_id
+
+    def publicar(self, tipo, datos):
+        """Publica un evento; devuelve su id (creciente dentro del proceso)"""
+        carga = json.dumps(datos, default=str, separators=(',', ':'))
+        with self._condicion:
+            self._ultimo_id += 1
+            mensaje = f"id: {self._ultimo_id}\nevent: {tipo}\ndata: {carga}\n\n".encode()
+            self._eventos.append((self._ultimo_id, mensaje))
+            self._condicion.notify_all()
+            return self._ultimo_id
+
+    def _esperar(self, desde, timeout):
+        """Mensajes posteriores a ``desde``, esperando hasta ``timeout`` segundos si no hay"""
+        with self._condicion:
+            self._condicion.wait_for(lambda: self._ultimo_id > desde, timeout)
+            return [(id_, mensaje) for id_, mensaje in self._eventos if id_ > desde]
+
+    def suscribir(self, ultimo_id=None, keepalive=15, duracion=300):
+        """Generador de bytes en formato SSE.
+
+        ``ultimo_id`` es la cabecera ``Last-Event-ID`` del navegador al
+        reconectar: se reenvían los eventos perdidos que sigan en el
+        historial. La conexión se cierra tras ``duracion`` segundos para no
+        retener un hilo indefinidamente; EventSource reconecta solo.
+        """
+        desde = self._ultimo_id if ultimo_id is None else ultimo_id
+        if desde > self._ultimo_id:
+            # El id viene de un proceso anterior (reinicio): se empieza de cero
+            desde = self._ultimo_id
+
+        yield b'retry: 3000\n\n'
+        fin = time.monotonic() + duracion
+        while time.monotonic() < fin:
+            pendientes = self._esperar(desde, keepalive)
+            if pendientes:
+                desde = pendientes[-1][0]
+                yield b''.join(mensaje for _, mensaje in pendientes)
+            else:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield b': keepalive\n\n'
@@ -0,0 +1,113 @@
+"""
+HyperLogLog: conteo aproximado de elementos distintos en memoria fija.
+
+Un sketch de precisión ``p`` tiene ``2**p`` registros de un byte y estima la
+cardinalidad con un error estándar relativo de ``1.04 / sqrt(2**p)`` (1.6 %
+con la precisión por omisión). Dos sketches de la misma precisión se fusionan
+tomando el máximo de cada registro, y el resultado es exactamente el sketch
+de la unión: por eso los resúmenes de distintos días o tiendas se combinan
+sin volver a leer los datos.
+
+Se serializa en forma dispersa (pares registro/valor) mientras tiene pocos
+registros ocupados y en forma densa cuando crece. No depende de Django.
+"""
+
+import hashlib
+import math
+from array import array
+from collections import Counter
+
+
+PRECISION = 12
+
+_MASCARA_64 = (1 << 64) - 1
+
+# Primer byte de la serialización
+_DENSO = 1
+_DISPERSO = 2
+
+
+def hash64(valor):
+    """Hash de 64 bits estable entre procesos (splitmix64 para enteros, blake2b para el resto)"""
+    if not isinstance(valor, int):
+        return int.from_bytes(hashlib.blake2b(str(valor).encode(), digest_size=8).digest(), 'big')
+    z = (valor + 0x9E3779B97F4A7C15) & _MASCARA_64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASCARA_64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASCARA_64
+    return z ^ (z >> 31)
+
+
+def error_estandar(precision=PRECISION):
+    """Error estándar relativo de la estimación (p. ej. 0.016 = 1.6 %)"""
+    return 1.04 / math.sqrt(1 << precision)
+
+
+class HyperLogLog:
+    """Sketch de cardinalidad fusionable"""
+
+    def __init__(self, precision=PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError('La precisión debe estar entre 4 y 16')
+        self.precision = precision
+        self.registros = bytearray(1 << precision)
+
+    def agregar(self, valor):
+        h = hash64(valor)
+        bits = 64 - self.precision
+        indice = h >> bits
+        # Posición del primer 1 en los bits restantes (bits + 1 si todos son 0)
+        rango = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rango > self.registros[indice]:
+            self.registros[indice] = rango
+
+    def fusionar(self, otro):
+        """Incorpora ``otro`` (sketch o su serialización) a este sketch"""
+        if isinstance(otro, HyperLogLog):
+            self._comprobar_precision(otro.precision)
+            self.registros = bytearray(map(max, self.registros, otro.registros))
+            return
+        datos = bytes(otro)
+        if not datos:
+            return
+        self._comprobar_precision(datos[1])
+        if datos[0] == _DISPERSO:
+            # Solo se tocan los registros ocupados: fusionar días con pocos clientes es barato
+            registros = self.registros
+            for par in array('I', datos[2:]):
+                indice, rango = par >> 6, par & 0x3F
+                if rango > registros[indice]:
+                    registros[indice] = rango
+        else:
+            self.registros = bytearray(map(max, self.registros, datos[2:]))
+
+    def _comprobar_precision(self, precision):
+        if precision != self.precision:
+            raise ValueError('Solo se pueden fusionar sketches de la misma precisión')
+
+    def estimar(self):
+        """Número estimado de elementos distintos"""
+        m = len(self.registros)
+        alfa = 0.7213 / (1 + 1.079 / m)
+        frecuencias = Counter(self.registros)
+        suma = sum(veces * 2.0 ** -rango for rango, veces in frecuencias.items())
+        estimacion = alfa * m * m / suma
+        ceros = frecuencias.get(0, 0)
+        if estimacion <= 2.5 * m and ceros:
+            # Rango bajo: el conteo lineal es más exacto
+            estimacion = m * math.log(m / ceros)
+        return round(estimacion)
+
+    def a_bytes(self):
+        """Serialización compacta (dispersa si ocupa menos que la densa)"""
+        ocupados = [(indice, rango) for indice, rango in enumerate(self.registros) if rango]
+        if len(ocupados) * 4 < len(self.registros):
+            pares = array('I', (indice << 6 | rango for indice, rango in ocupados))
+            return bytes([_DISPERSO, self.precision]) + pares.tobytes()
+        return bytes([_DENSO, self.precision]) + bytes(self.registros)
+
+    @classmethod
+    def desde_bytes(cls, datos):
+        datos = bytes(datos)
+        sketch = cls(datos[1] if datos else PRECISION)
+        sketch.fusionar(datos)
+        return sketch
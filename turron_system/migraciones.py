@@ -0,0 +1,123 @@
+"""
+Migraciones versionadas de una base SQLite, con la versión en ``PRAGMA user_version``.
+
+Las migraciones son una lista ordenada: la migración en la posición ``i``
+lleva la base a la versión ``i + 1``. Al arrancar basta leer la cabecera del
+archivo; si la versión está al día no se ejecuta nada más.
+
+Cada migración es una función ``(conn)`` que se ejecuta de una de tres formas:
+
+- atómica (por defecto): toda la función y el cambio de versión en una
+  transacción; si falla no queda nada a medias. La función no debe hacer
+  commit.
+- ``por_lotes``: la función se llama repetidamente, cada vez en su propia
+  transacción corta, hasta que devuelve un valor falso (nada más que hacer).
+  Entre lotes las demás conexiones pueden escribir: sirve para rellenar
+  columnas o crear índices de uno en uno en tablas grandes. Cada lote debe
+  retomar donde quedó el anterior.
+- ``atomica=False``: la función gestiona sus propias transacciones (migraciones
+  heredadas). Debe poder repetirse si se interrumpe.
+
+No depende de Django para que la aplicación Flask pueda usarlo.
+"""
+
+import time
+
+
+class Migracion:
+    """Paso del esquema: nombre descriptivo y función que recibe la conexión"""
+
+    def __init__(self, nombre, funcion, por_lotes=False, atomica=True):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.por_lotes = por_lotes
+        self.atomica = atomica
+
+
+def version_esquema(conn):
+    """Versión del esquema guardada en la cabecera de la base"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def pendientes(conn, migraciones):
+    """Migraciones que faltan por aplicar, con el número de versión que dejan"""
+    actual = version_esquema(conn)
+    return [(numero, migracion) for numero, migracion in enumerate(migraciones, start=1) if numero > actual]
+
+
+def _en_transaccion(conn, numero, funcion=None, marcar=False):
+    """Ejecuta ``funcion`` (y marca la versión ``numero``) en una transacción de escritura.
+
+    Devuelve ``(True, resultado)``, o ``(False, None)`` si otro proceso ya
+    llevó la base a la versión ``numero``.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Otro worker pudo aplicar la migración mientras se esperaba el bloqueo
+        if version_esquema(conn) >= numero:
+            conn.execute('ROLLBACK')
+            return False, None
+        resultado = funcion(conn) if funcion else None
+        if marcar:
+            conn.execute(f'PRAGMA user_version = {numero}')
+        conn.execute('COMMIT')
+        return True, resultado
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def crear_indices(indices):
+    """Función por lotes que crea cada índice ``(nombre, 'tabla (columnas)')`` en su propia transacción.
+
+    SQLite construye un índice de una sola pasada y no se puede partir; entre
+    un índice y el siguiente se liberan los bloqueos. Los que ya existen se saltan.
+    """
+    def crear_siguiente(conn):
+        existentes = {fila[0] for fila in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        for nombre, definicion in indices:
+            if nombre not in existentes:
+                conn.execute(f'CREATE INDEX {nombre} ON {definicion}')
+                return True
+        return False
+    return crear_siguiente
+
+
+def migrar(conn, migraciones, progreso=None, pausa=0.05):
+    """Aplica en orden las migraciones pendientes; devuelve cuántas se aplicaron.
+
+    ``progreso(numero, nombre, segundos)`` se llama al terminar cada una.
+    ``pausa`` son los segundos entre lotes para que entren las escrituras en espera.
+    """
+    if version_esquema(conn) >= len(migraciones):
+        return 0
+
+    aislamiento = conn.isolation_level
+    aplicadas = 0
+    try:
+        for numero, migracion in pendientes(conn, migraciones):
+            inicio = time.perf_counter()
+            if not migracion.atomica:
+                conn.isolation_level = aislamiento
+                migracion.funcion(conn)
+                conn.commit()
+            # Transacciones explícitas: el módulo sqlite3 no abre ninguna por su cuenta
+            conn.isolation_level = None
+            if migracion.por_lotes:
+                while True:
+                    aplicada, queda = _en_transaccion(conn, numero, migracion.funcion)
+                    if not (aplicada and queda):
+                        break
+                    # El manejador de espera de SQLite reintenta a intervalos: sin pausa
+                    # el siguiente lote retoma el bloqueo antes que nadie
+                    time.sleep(pausa)
+            funcion = migracion.funcion if migracion.atomica and not migracion.por_lotes else None
+            aplicada, _ = _en_transaccion(conn, numero, funcion, marcar=True)
+            if not aplicada:
+                continue
+            aplicadas += 1
+            if progreso:
+                progreso(numero, migracion.nombre, time.perf_counter() - inicio)
+    finally:
+        conn.isolation_level = aislamiento
+    return aplicadas
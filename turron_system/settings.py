@@ -37,7 +37,6 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'rest_framework',
     'ventas',
 ]
 
@@ -78,9 +77,40 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    # Ventas antiguas (comando archivar_ventas); migrar con: migrate --database archivo
+    'archivo': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'instance' / 'archivo.sqlite3',
+    },
+}
+
+DATABASE_ROUTERS = ['ventas.routers.ArchivoRouter']
+
+# Días que una venta permanece en la tabla principal antes de archivarse
+RETENCION_VENTAS_DIAS = 730
+
+
+# Cache
+# Compartida entre workers y con la aplicación Flask; no necesita ningún servicio externo
+
+CACHES = {
+    'default': {
+        'BACKEND': 'turron_system.cache.SQLiteCache',
+        'LOCATION': BASE_DIR / 'instance' / 'cache.sqlite3',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'CULL_FREQUENCY': 3,
+        },
     }
 }
 
+# Sesiones: se leen de la caché y solo se escriben en la base al cambiar.
+# Con 'django.contrib.sessions.backends.signed_cookies' no tocan el servidor,
+# a cambio de no poder cerrarlas desde el servidor (ver benchmark login)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -125,15 +155,24 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-# Django REST Framework
-REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.SessionAuthentication',
-    ],
-    'DEFAULT_PERMISSION_CLASSES': [
-        'rest_framework.permissions.IsAuthenticated',
-    ],
-}
+# Catálogo precompilado para las terminales (comando generar_catalogo)
+CATALOGO_DIR = BASE_DIR / 'instance' / 'catalogo'
+
+# Cola de trabajos en segundo plano (comando ejecutar_trabajos) y sus archivos de resultado
+TRABAJOS_DB = BASE_DIR / 'instance' / 'trabajos.sqlite3'
+TRABAJOS_DIR = BASE_DIR / 'instance' / 'trabajos'
+
+# Historial de tiempos de arranque de los workers (comando tiempo_arranque)
+ARRANQUE_HISTORIAL = BASE_DIR / 'instance' / 'arranque.jsonl'
+
+# Base de la aplicación Flask que se replica en esta (comando replicar_flask) y
+# usuario al que se atribuyen sus ventas, que en Flask no tienen usuario
+FLASK_DATABASE = BASE_DIR / 'instance' / 'sistema_ventas.db'
+REPLICACION_USUARIO = 'flask'
+
+# Procesos con que la tarea resumen_ventas agrega los reportes por tienda y mes
+# (None: uno por núcleo); las vistas sirven el último resumen de la tarea
+REPORTES_PROCESOS = None
 
 # Login URLs
 LOGIN_URL = '/login/'
@@ -7,10 +7,17 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
+import gc
 import os
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'turron_system.settings')
 
+# La carga crea decenas de miles de objetos que viven lo que el proceso: el
+# recolector no libera nada mientras tanto. Después se congelan para que las
+# recolecciones de cada petición no vuelvan a recorrerlos
+gc.disable()
 application = get_wsgi_application()
+gc.freeze()
+gc.enable()
@@ -0,0 +1,81 @@
+"""
+Registro de ``User.last_login`` por lotes.
+
+Django escribe ``last_login`` con un UPDATE en cada inicio de sesión. Cuando
+todo el turno entra a la vez, esas escrituras compiten con las ventas por el
+bloqueo de SQLite. Aquí cada acceso se anota en memoria y el proceso los
+escribe juntos en un solo UPDATE: al llegar a LOTE_ACCESOS, al terminar la
+primera petición tras INTERVALO_ACCESOS segundos y al salir del proceso.
+
+Si el proceso muere sin volcar se pierde a lo sumo el último lote: esos
+usuarios conservan su ``last_login`` anterior.
+"""
+
+import atexit
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError
+from django.utils import timezone
+
+
+# Accesos pendientes que fuerzan la escritura del lote
+LOTE_ACCESOS = 100
+# Segundos como máximo que un acceso espera en memoria (si hay peticiones)
+INTERVALO_ACCESOS = 30
+
+_pendientes = {}
+_lock = threading.Lock()
+# Instante (monotónico) del acceso pendiente más antiguo
+_desde = None
+
+
+def registrar_acceso(usuario):
+    """Anota el acceso de ``usuario`` ahora; vuelca el lote si está lleno"""
+    global _desde
+    usuario.last_login = timezone.now()
+    with _lock:
+        _pendientes[usuario.pk] = usuario.last_login
+        if _desde is None:
+            _desde = time.monotonic()
+        lleno = len(_pendientes) >= LOTE_ACCESOS
+    if lleno:
+        volcar_accesos()
+
+
+def volcar_si_vence():
+    """Vuelca los accesos pendientes si el más antiguo ya esperó INTERVALO_ACCESOS"""
+    if _desde is not None and time.monotonic() - _desde >= INTERVALO_ACCESOS:
+        volcar_accesos()
+
+
+def volcar_accesos():
+    """Escribe los accesos pendientes en un solo UPDATE; devuelve cuántos usuarios"""
+    global _desde
+    with _lock:
+        pendientes = dict(_pendientes)
+        _pendientes.clear()
+        _desde = None
+    if not pendientes:
+        return 0
+
+    User = get_user_model()
+    try:
+        User.objects.bulk_update(
+            [User(pk=pk, last_login=momento) for pk, momento in pendientes.items()],
+            ['last_login'],
+        )
+    except DatabaseError:
+        # Base bloqueada u ocupada: se reintenta en el siguiente volcado sin
+        # pisar accesos más recientes del mismo usuario
+        with _lock:
+            for pk, momento in pendientes.items():
+                _pendientes.setdefault(pk, momento)
+            if _desde is None:
+                _desde = time.monotonic()
+        return 0
+    return len(pendientes)
+
+
+atexit.register(volcar_accesos)
@@ -1,7 +1,25 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import Categoria, Cliente, Producto, Tienda, LugarEntrega, Venta, PerfilUsuario
+from django.template.response import TemplateResponse
+from .models import Categoria, Cliente, Producto, Tienda, LugarEntrega, Venta, VentaArchivada, PerfilUsuario, Inventario, ReservaStock, Eliminacion, SugerenciaReposicion, SegmentoCliente, PrecioHistorico
+from .inventario import repartir_inventario
+from .eliminacion import iniciar_eliminacion
+from .ajustes import ajustar_productos
+from .forms import AjusteProductosForm
+from .paginacion import PaginadorEstimado
+
+
+class EliminacionEnSegundoPlanoMixin:
+    """Elimina desde el admin igual que desde la aplicación: se oculta y se borra por lotes"""
+    
+    def delete_model(self, request, obj):
+        iniciar_eliminacion(obj, request.user)
+    
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            iniciar_eliminacion(obj, request.user)
 
 
 @admin.register(Categoria)
@@ -13,9 +31,10 @@ class CategoriaAdmin(admin.ModelAdmin):
 
 
 @admin.register(Cliente)
-class ClienteAdmin(admin.ModelAdmin):
+class ClienteAdmin(EliminacionEnSegundoPlanoMixin, admin.ModelAdmin):
     list_display = ['nombre', 'apellido', 'telefono', 'fecha_registro']
-    search_fields = ['nombre', 'apellido', 'telefono']
+    # Por prefijo: usa los índices NOCASE (también en el autocompletar de ventas)
+    search_fields = ['^nombre', '^apellido', '^telefono']
     list_filter = ['fecha_registro']
     ordering = ['nombre', 'apellido']
     
@@ -39,13 +58,38 @@ class LugarEntregaAdmin(admin.ModelAdmin):
     ordering = ['nombre_lugar']
 
 
+class InventarioInline(admin.TabularInline):
+    model = Inventario
+    extra = 0
+    fields = ['tienda', 'shard', 'cantidad']
+
+
+class PrecioHistoricoInline(admin.TabularInline):
+    """Historial de precios (se escribe solo al cambiar el precio del producto)"""
+    model = PrecioHistorico
+    extra = 0
+    fields = ['precio', 'vigente_desde']
+    readonly_fields = ['precio', 'vigente_desde']
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Producto)
-class ProductoAdmin(admin.ModelAdmin):
-    list_display = ['nombre', 'categoria', 'precio', 'stock', 'stock_bajo', 'fecha_creacion']
-    search_fields = ['nombre', 'descripcion']
+class ProductoAdmin(EliminacionEnSegundoPlanoMixin, admin.ModelAdmin):
+    list_display = ['nombre', 'categoria', 'precio', 'stock', 'stock_total', 'stock_bajo', 'fecha_creacion']
+    search_fields = ['^nombre']
     list_filter = ['categoria', 'fecha_creacion']
     ordering = ['nombre']
     list_editable = ['precio', 'stock']
+    inlines = [InventarioInline, PrecioHistoricoInline]
+    actions = ['ajustar_precio_stock']
+    
+    def stock_total(self, obj):
+        return obj.stock_total
+    stock_total.short_description = 'Stock Total'
+    stock_total.admin_order_field = 'stock_total'
     
     def stock_bajo(self, obj):
         return obj.stock_bajo
@@ -53,22 +97,84 @@ class ProductoAdmin(admin.ModelAdmin):
     stock_bajo.short_description = 'Stock Bajo'
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('categoria')
+        return super().get_queryset(request).select_related('categoria').con_stock_total()
+    
+    @admin.action(description='Ajustar precio o stock (porcentaje o valor) en bloque', permissions=['change'])
+    def ajustar_precio_stock(self, request, queryset):
+        # Sin save() por fila: un UPDATE para todo el conjunto, aunque sea "seleccionar todos"
+        form = AjusteProductosForm(request.POST if 'aplicar' in request.POST else None)
+        if form.is_valid():
+            try:
+                actualizados = ajustar_productos(queryset, **form.ajustes())
+            except ValueError as e:
+                self.message_user(request, str(e), messages.ERROR)
+            else:
+                self.message_user(request, f'{actualizados} productos ajustados.')
+            return None
+        
+        return TemplateResponse(request, 'admin/ventas/producto/ajustar_productos.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Ajustar precio o stock',
+            'opts': self.model._meta,
+            'form': form,
+            'total': queryset.count(),
+            'seleccionados': request.POST.getlist(ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+            'action_checkbox_name': ACTION_CHECKBOX_NAME,
+        })
+
+
+@admin.register(Inventario)
+class InventarioAdmin(admin.ModelAdmin):
+    list_display = ['producto', 'tienda', 'shard', 'cantidad']
+    search_fields = ['producto__nombre', 'tienda__nombre_tienda']
+    list_filter = ['tienda']
+    ordering = ['producto', 'tienda', 'shard']
+    actions = ['repartir_en_cuatro']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('producto', 'tienda')
+    
+    @admin.action(description='Repartir el stock en 4 sub-contadores (productos muy vendidos)')
+    def repartir_en_cuatro(self, request, queryset):
+        pares = set(queryset.values_list('producto_id', 'tienda_id'))
+        for producto_id, tienda_id in pares:
+            repartir_inventario(
+                Producto(pk=producto_id), Tienda(pk=tienda_id), 4
+            )
+        self.message_user(request, f'{len(pares)} inventarios repartidos en 4 sub-contadores.')
+
+
+@admin.register(ReservaStock)
+class ReservaStockAdmin(admin.ModelAdmin):
+    list_display = ['producto', 'tienda', 'cantidad', 'usuario', 'expira_en']
+    list_filter = ['tienda']
+    ordering = ['expira_en']
+    readonly_fields = ['token']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('producto', 'tienda', 'usuario')
 
 
 @admin.register(Venta)
 class VentaAdmin(admin.ModelAdmin):
-    list_display = ['id', 'fecha', 'cliente', 'producto', 'cantidad', 'precio_unitario', 'total', 'tienda', 'usuario']
-    search_fields = ['cliente__nombre', 'cliente__apellido', 'producto__nombre']
+    """Listado de ventas para tablas de millones de filas.
+
+    Cada filtro tiene un índice compuesto con la fecha, el total es estimado
+    (ventas.paginacion), los años, meses y días de la jerarquía de fechas
+    salen de los resúmenes diarios (plantilla change_list) y cliente y
+    producto se eligen con autocompletar en lugar de un <select> completo.
+    """
+    list_display = ['id', 'fecha', 'cliente_nombre', 'producto_nombre', 'cantidad', 'precio_unitario', 'total', 'tienda_nombre', 'usuario_nombre']
+    search_fields = ['cliente_nombre', 'producto_nombre']
     list_filter = ['fecha', 'tienda', 'lugar_entrega', 'usuario']
     ordering = ['-fecha']
-    readonly_fields = ['total']
+    readonly_fields = ['total'] + Venta.CAMPOS_SNAPSHOT
     date_hierarchy = 'fecha'
-    
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related(
-            'cliente', 'producto', 'tienda', 'lugar_entrega', 'usuario'
-        )
+    autocomplete_fields = ['cliente', 'producto']
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
     
     def save_model(self, request, obj, form, change):
         if not change:  # Si es una nueva venta
@@ -76,6 +182,65 @@ class VentaAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+@admin.register(VentaArchivada)
+class VentaArchivadaAdmin(admin.ModelAdmin):
+    """Consulta de ventas archivadas (solo lectura)"""
+    list_display = ['id', 'fecha', 'cliente_nombre', 'producto_nombre', 'cantidad', 'total', 'tienda_nombre']
+    search_fields = ['cliente_nombre', 'producto_nombre']
+    ordering = ['-fecha']
+    date_hierarchy = 'fecha'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Eliminacion)
+class EliminacionAdmin(admin.ModelAdmin):
+    """Progreso de los borrados en segundo plano (solo lectura)"""
+    list_display = ['modelo', 'descripcion', 'estado', 'borradas', 'total', 'usuario', 'fecha_inicio', 'fecha_fin']
+    list_filter = ['estado', 'modelo']
+    ordering = ['-fecha_inicio']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SugerenciaReposicion)
+class SugerenciaReposicionAdmin(admin.ModelAdmin):
+    """Resultado del último cálculo de reposición (solo lectura; comando calcular_reposicion)"""
+    list_display = ['producto', 'tienda', 'stock', 'demanda_diaria', 'dias_cobertura', 'punto_reorden', 'cantidad_sugerida']
+    list_filter = ['tienda']
+    search_fields = ['producto__nombre']
+    list_select_related = ['producto', 'tienda']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SegmentoCliente)
+class SegmentoClienteAdmin(admin.ModelAdmin):
+    """Segmentos RFM del último cálculo (solo lectura; comando calcular_segmentos)"""
+    list_display = ['cliente', 'segmento', 'rfm', 'compras', 'monto', 'ultima_compra']
+    list_filter = ['segmento']
+    search_fields = ['cliente__nombre', 'cliente__apellido']
+    list_select_related = ['cliente']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 # Inline para PerfilUsuario en el admin de User
 class PerfilUsuarioInline(admin.StackedInline):
     model = PerfilUsuario
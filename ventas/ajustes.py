@@ -0,0 +1,114 @@
+"""
+Ajustes masivos de precio y stock sobre un conjunto de productos.
+
+Cada ajuste es un par ``(modo, valor)``:
+
+- ``porcentaje``: suma ese porcentaje (``-10`` rebaja un 10 %), redondeando
+  al centavo o a la unidad más cercana
+- ``suma``: suma el valor (un importe al precio, unidades al stock; negativo resta)
+- ``fijar``: pone el mismo valor a todos
+
+Todo el conjunto se actualiza con un solo UPDATE, sin cargar instancias ni
+llamar a save(). Como las señales no se disparan, el historial de precios y
+el feed de cambios del catálogo se escriben aquí con un INSERT ... SELECT
+cada uno, solo para los productos que cambian; el bus de eventos en vivo no
+recibe estos cambios.
+"""
+
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .cache import invalidar_reportes
+from .cambios import registrar_cambios
+from .fields import decimal_a_centavos
+from .models import PrecioHistorico, Producto
+
+
+PORCENTAJE = 'porcentaje'
+SUMA = 'suma'
+FIJAR = 'fijar'
+MODOS = [
+    (PORCENTAJE, 'Porcentaje'),
+    (SUMA, 'Sumar o restar'),
+    (FIJAR, 'Fijar valor'),
+]
+
+PRECIO_MINIMO = Decimal('0.01')
+
+
+def _expresion(campo, modo, valor):
+    """Expresión SQL del nuevo valor de ``campo`` (el precio se guarda en centavos)"""
+    if modo == PORCENTAJE:
+        if valor <= -100:
+            raise ValueError('El porcentaje debe ser mayor que -100')
+        # Aritmética entera en centésimas de punto: el redondeo es exacto, sin flotantes
+        factor = int((100 + Decimal(valor)) * 100)
+        nuevo = (F(campo) * factor + 5000) / 10000
+        # Una rebaja no deja un precio en 0 por redondeo
+        return Greatest(nuevo, 1) if campo == 'precio' else nuevo
+    cantidad = decimal_a_centavos(valor) if campo == 'precio' else int(valor)
+    if modo == SUMA:
+        # El stock no baja de 0; el precio mínimo se comprueba antes de actualizar
+        return F(campo) + cantidad if campo == 'precio' else Greatest(F(campo) + cantidad, 0)
+    if modo == FIJAR:
+        if valor < (PRECIO_MINIMO if campo == 'precio' else 0):
+            raise ValueError(f'Valor no válido para {campo}: {valor}')
+        return Value(cantidad)
+    raise ValueError(f'Modo de ajuste desconocido: {modo}')
+
+
+def _registrar_precios(productos, expresion, momento):
+    """Agrega al historial los precios de ``productos`` que cambian con ``expresion``"""
+    nuevos = productos.annotate(nuevo=expresion).exclude(nuevo=F('precio')).values_list('pk', 'nuevo').order_by()
+    sql, params = nuevos.query.sql_with_params()
+    citar = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {citar(PrecioHistorico._meta.db_table)} "
+            f"({citar('producto_id')}, {citar('precio')}, {citar('vigente_desde')}) "
+            f"SELECT nuevos.*, %s FROM ({sql}) nuevos",
+            [connection.ops.adapt_datetimefield_value(momento), *params],
+        )
+
+
+def ajustar_productos(productos, precio=None, stock=None):
+    """Aplica los ajustes ``precio`` y ``stock`` (pares modo, valor) a ``productos``.
+
+    ``productos`` es cualquier queryset de Producto. Todo ocurre en una
+    transacción; devuelve cuántos productos se actualizaron. ValueError si
+    el ajuste no es válido.
+    """
+    cambios = {}
+    if precio is not None:
+        cambios['precio'] = _expresion('precio', *precio)
+    if stock is not None:
+        cambios['stock'] = _expresion('stock', *stock)
+    if not cambios:
+        return 0
+
+    # Todas las sentencias van antes del UPDATE: un filtro por precio o stock
+    # selecciona el mismo conjunto en cada una
+    conjunto = Producto.objects.filter(pk__in=productos.order_by().values('pk'))
+    with transaction.atomic():
+        if precio is not None:
+            modo, valor = precio
+            if modo == SUMA and valor < 0 and conjunto.filter(precio__lt=PRECIO_MINIMO - valor).exists():
+                raise ValueError('El ajuste dejaría algún precio por debajo de $0.01')
+            _registrar_precios(conjunto, cambios['precio'], timezone.now())
+        # Al feed solo van los productos cuyo valor cambia de verdad
+        distintos = Q()
+        for campo in cambios:
+            distintos |= ~Q(**{f'nuevo_{campo}': F(campo)})
+        cambiados = conjunto.annotate(
+            **{f'nuevo_{campo}': expresion for campo, expresion in cambios.items()}
+        ).filter(distintos)
+        registrar_cambios(cambiados, solo_stock=precio is None)
+        actualizados = conjunto.update(**cambios)
+    if precio is not None:
+        # Los reportes de margen comparan contra el precio de lista vigente
+        invalidar_reportes()
+    return actualizados
@@ -7,4 +7,5 @@ class VentasConfig(AppConfig):
     verbose_name = 'Sistema de Ventas'
     
     def ready(self):
-        import ventas.signals
\ No newline at end of file
+        import ventas.signals
+        import ventas.tareas
\ No newline at end of file
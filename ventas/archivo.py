@@ -0,0 +1,147 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from .cache import invalidar_reportes
+from .models import Venta, VentaArchivada
+
+
+# Campos copiados de Venta a VentaArchivada
+CAMPOS_ARCHIVO = [field.attname for field in VentaArchivada._meta.concrete_fields]
+
+# Resumen del archivo (conteo y total); solo cambia al archivar
+CLAVE_RESUMEN_ARCHIVO = 'archivo:resumen'
+
+
+def fecha_corte(dias=None):
+    """Las ventas anteriores a esta fecha se consideran frías"""
+    if dias is None:
+        dias = settings.RETENCION_VENTAS_DIAS
+    return timezone.now() - timedelta(days=dias)
+
+
+def archivar_ventas(antes_de, lote=1000, pausa=0, progreso=None):
+    """Mueve a la base de archivo las ventas anteriores a ``antes_de`` en lotes.
+
+    Cada lote se copia primero al archivo y después se borra de la tabla
+    principal, cada paso en su propia transacción corta. Si el proceso se
+    interrumpe entre ambos pasos, la siguiente ejecución vuelve a copiar el
+    lote (los ids repetidos se ignoran) y lo borra, así que es seguro
+    reintentar. Devuelve el número de ventas archivadas.
+    """
+    db_principal = router.db_for_write(Venta)
+    db_archivo = router.db_for_write(VentaArchivada)
+    tabla = Venta._meta.db_table
+    archivadas = 0
+    while True:
+        filas = list(
+            Venta.objects.filter(fecha__lt=antes_de)
+            .order_by('fecha', 'pk')
+            .values(*CAMPOS_ARCHIVO)[:lote]
+        )
+        if not filas:
+            break
+
+        with transaction.atomic(using=db_archivo):
+            VentaArchivada.objects.bulk_create(
+                [VentaArchivada(**fila) for fila in filas], ignore_conflicts=True
+            )
+
+        # Borrado directo: mover una venta al archivo no debe disparar señales
+        # (no cambia stock ni totales) ni cargar los objetos en memoria
+        ids = [fila['id'] for fila in filas]
+        with transaction.atomic(using=db_principal):
+            with connections[db_principal].cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {tabla} WHERE id IN ({", ".join(["%s"] * len(ids))})', ids
+                )
+
+        archivadas += len(filas)
+        cache.delete(CLAVE_RESUMEN_ARCHIVO)
+        if progreso:
+            progreso(archivadas)
+        if pausa:
+            # Deja pasar a las escrituras de la tienda entre lotes
+            time.sleep(pausa)
+    if archivadas:
+        # Los totales no cambian, pero quien lee ventas por id (el cubo) debe recargarlas
+        invalidar_reportes(modificadas=True)
+    return archivadas
+
+
+def ultima_fecha_archivada():
+    """Fecha de la venta más reciente del archivo (usa el índice sobre fecha)"""
+    return VentaArchivada.objects.aggregate(ultima=Max('fecha'))['ultima']
+
+
+def incluye_archivo(desde=None):
+    """Indica si un rango que empieza en ``desde`` necesita leer el archivo"""
+    ultima = ultima_fecha_archivada()
+    return ultima is not None and (desde is None or desde <= ultima)
+
+
+def querysets_ventas(desde=None, hasta=None):
+    """QuerySets de ventas del rango: la tabla principal y, si hace falta, el archivo"""
+    querysets = [Venta.objects.all()]
+    if incluye_archivo(desde):
+        querysets.append(VentaArchivada.objects.all())
+    filtros = {}
+    if desde is not None:
+        filtros['fecha__gte'] = desde
+    if hasta is not None:
+        filtros['fecha__lt'] = hasta
+    return [queryset.filter(**filtros) for queryset in querysets]
+
+
+def _combinar(agregado, a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if isinstance(agregado, (Sum, Count)):
+        return a + b
+    if isinstance(agregado, Max):
+        return max(a, b)
+    if isinstance(agregado, Min):
+        return min(a, b)
+    raise ValueError(f"El agregado {agregado!r} no se puede combinar entre bases de datos")
+
+
+def agregar_ventas(agrupar=(), anotaciones=None, desde=None, hasta=None, **agregados):
+    """Agregados sobre las ventas activas y archivadas, como si fueran una sola tabla.
+
+    Solo admite agregados que se pueden combinar por partes (Sum, Count, Max,
+    Min). Sin ``agrupar`` devuelve un diccionario; con ``agrupar`` una lista
+    de diccionarios, uno por grupo.
+    """
+    grupos = {}
+    for queryset in querysets_ventas(desde, hasta):
+        if anotaciones:
+            queryset = queryset.annotate(**anotaciones)
+        if agrupar:
+            filas = queryset.values(*agrupar).annotate(**agregados).order_by()
+        else:
+            filas = [queryset.aggregate(**agregados)]
+        for fila in filas:
+            clave = tuple(fila.get(campo) for campo in agrupar)
+            grupo = grupos.setdefault(clave, dict(zip(agrupar, clave)))
+            for nombre, agregado in agregados.items():
+                grupo[nombre] = _combinar(agregado, grupo.get(nombre), fila[nombre])
+
+    if not agrupar:
+        return grupos.get((), {nombre: None for nombre in agregados})
+    return list(grupos.values())
+
+
+def resumen_archivo():
+    """Conteo e importe total del archivo, cacheados hasta el próximo archivado"""
+    resumen = cache.get(CLAVE_RESUMEN_ARCHIVO)
+    if resumen is None:
+        resumen = VentaArchivada.objects.aggregate(ventas=Count('pk'), total=Sum('total'))
+        cache.set(CLAVE_RESUMEN_ARCHIVO, resumen, timeout=None)
+    return resumen
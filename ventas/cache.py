@@ -0,0 +1,77 @@
+from django.core.cache import cache
+
+
+# Contador de versión de los datos de ventas, compartido por todos los workers
+CLAVE_VERSION_VENTAS = 'version:ventas'
+
+# Contador de ediciones y borrados de ventas: lo que no se resuelve anexando ventas nuevas
+CLAVE_VENTAS_MODIFICADAS = 'version:ventas:modificadas'
+
+# Tiempo máximo que se sirve un reporte cacheado aunque no cambie la versión
+DURACION_REPORTES = 600
+
+
+def version_ventas():
+    """Versión actual de las ventas; se incluye en las claves de los reportes cacheados"""
+    version = cache.get(CLAVE_VERSION_VENTAS)
+    if version is None:
+        # Solo la primera vez: add() toma el bloqueo de escritura
+        cache.add(CLAVE_VERSION_VENTAS, 1, timeout=None)
+        version = cache.get(CLAVE_VERSION_VENTAS, 1)
+    return version
+
+
+def ventas_modificadas():
+    """Valor actual del contador de ediciones y borrados de ventas"""
+    return cache.get(CLAVE_VENTAS_MODIFICADAS, 0)
+
+
+def invalidar_reportes(modificadas=False):
+    """Invalida de golpe todos los reportes cacheados incrementando la versión.
+
+    Con ``modificadas`` (se editaron o borraron ventas) también incrementa
+    el contador de modificaciones, antes que la versión.
+    """
+    if modificadas:
+        cache.add(CLAVE_VENTAS_MODIFICADAS, 0, timeout=None)
+        try:
+            cache.incr(CLAVE_VENTAS_MODIFICADAS)
+        except ValueError:
+            cache.set(CLAVE_VENTAS_MODIFICADAS, 1, timeout=None)
+    cache.add(CLAVE_VERSION_VENTAS, 1, timeout=None)
+    try:
+        return cache.incr(CLAVE_VERSION_VENTAS)
+    except ValueError:
+        # La entrada pudo purgarse entre add() e incr()
+        cache.set(CLAVE_VERSION_VENTAS, 2, timeout=None)
+        return 2
+
+
+def guardar_reporte(nombre, reporte, version):
+    """Guarda un reporte calculado fuera de la petición con la versión leída antes de calcularlo.
+
+    Queda también como el último de ``nombre``, que se sirve mientras se recalcula.
+    """
+    cache.set_many(
+        {f'reporte:{nombre}:{version}': reporte, f'reporte:{nombre}:ultimo': reporte},
+        DURACION_REPORTES,
+    )
+
+
+def reporte_guardado(nombre, version):
+    """``(reporte, al_dia)``: el de ``version`` o, si no está, el último guardado (o None)"""
+    clave = f'reporte:{nombre}:{version}'
+    encontrados = cache.get_many([clave, f'reporte:{nombre}:ultimo'])
+    if clave in encontrados:
+        return encontrados[clave], True
+    return encontrados.get(f'reporte:{nombre}:ultimo'), False
+
+
+def reporte_cacheado(nombre, calcular):
+    """Devuelve el reporte ``nombre`` de la caché o lo calcula con ``calcular()``"""
+    clave = f'reporte:{nombre}:{version_ventas()}'
+    reporte = cache.get(clave)
+    if reporte is None:
+        reporte = calcular()
+        cache.set(clave, reporte, DURACION_REPORTES)
+    return reporte
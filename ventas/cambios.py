@@ -0,0 +1,114 @@
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import CambioCatalogo, Categoria, Cliente, LugarEntrega, Producto, Tienda
+
+
+# Tamaño de página por defecto y máximo del feed de cambios
+LIMITE_CAMBIOS = 500
+LIMITE_CAMBIOS_MAXIMO = 2000
+
+
+def _productos(ids):
+    return Producto.objects.con_stock_total().filter(pk__in=ids).values(
+        'id', 'nombre', 'descripcion', 'precio', 'stock_total', 'categoria_id'
+    )
+
+
+# Nombre público de cada modelo del catálogo y cómo leer sus filas en bloque
+MODELOS_CATALOGO = {
+    'producto': (Producto, _productos),
+    'cliente': (Cliente, lambda ids: Cliente.objects.filter(pk__in=ids).values(
+        'id', 'nombre', 'apellido', 'telefono', 'direccion'
+    )),
+    'categoria': (Categoria, lambda ids: Categoria.objects.filter(pk__in=ids).values(
+        'id', 'nombre_categoria'
+    )),
+    'tienda': (Tienda, lambda ids: Tienda.objects.filter(pk__in=ids).values(
+        'id', 'nombre_tienda', 'ubicacion'
+    )),
+    'lugar_entrega': (LugarEntrega, lambda ids: LugarEntrega.objects.filter(pk__in=ids).values(
+        'id', 'nombre_lugar', 'direccion'
+    )),
+}
+
+NOMBRE_MODELO = {modelo: nombre for nombre, (modelo, _) in MODELOS_CATALOGO.items()}
+
+
+def registrar_cambio(modelo, objeto_id, operacion=CambioCatalogo.GUARDAR, solo_stock=False):
+    """Mueve el objeto al final del feed con una secuencia nueva.
+
+    ``solo_stock`` marca los cambios que no regeneran el catálogo precompilado
+    (ver ventas.catalogo.version_actual).
+    """
+    nombre = modelo if isinstance(modelo, str) else NOMBRE_MODELO[modelo]
+    with transaction.atomic():
+        CambioCatalogo.objects.filter(modelo=nombre, objeto_id=objeto_id).delete()
+        return CambioCatalogo.objects.create(
+            modelo=nombre, objeto_id=objeto_id, operacion=operacion, solo_stock=solo_stock
+        )
+
+
+def registrar_cambios(objetos, operacion=CambioCatalogo.GUARDAR, solo_stock=False):
+    """Versión en bloque de registrar_cambio para un queryset (escrituras que no pasan por save()).
+
+    Un DELETE y un INSERT ... SELECT, sin cargar los objetos en Python.
+    """
+    nombre = NOMBRE_MODELO[objetos.model]
+    ids = objetos.order_by('pk').values_list('pk')
+    sql, params = ids.query.sql_with_params()
+    citar = connection.ops.quote_name
+    with transaction.atomic():
+        CambioCatalogo.objects.filter(modelo=nombre, objeto_id__in=ids).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {citar(CambioCatalogo._meta.db_table)} "
+                f"({citar('modelo')}, {citar('objeto_id')}, {citar('operacion')}, "
+                f"{citar('solo_stock')}, {citar('fecha')}) "
+                f"SELECT %s, ids.*, %s, %s, %s FROM ({sql}) ids",
+                [nombre, operacion, solo_stock, connection.ops.adapt_datetimefield_value(timezone.now()), *params],
+            )
+
+
+def cambios_desde(seq=0, limite=LIMITE_CAMBIOS):
+    """Página del feed posterior a ``seq``.
+
+    Devuelve ``(cambios, cursor, hay_mas)``. Los datos se leen en el momento
+    (una consulta por modelo presente en la página), así que siempre reflejan
+    el estado actual del objeto.
+    """
+    limite = max(1, min(limite, LIMITE_CAMBIOS_MAXIMO))
+    pagina = list(
+        CambioCatalogo.objects.filter(seq__gt=seq).order_by('seq')
+        .values('seq', 'modelo', 'objeto_id', 'operacion')[:limite + 1]
+    )
+    hay_mas = len(pagina) > limite
+    pagina = pagina[:limite]
+
+    ids_por_modelo = {}
+    for cambio in pagina:
+        if cambio['operacion'] == CambioCatalogo.GUARDAR:
+            ids_por_modelo.setdefault(cambio['modelo'], []).append(cambio['objeto_id'])
+    filas = {
+        (nombre, fila['id']): fila
+        for nombre, ids in ids_por_modelo.items()
+        for fila in MODELOS_CATALOGO[nombre][1](ids)
+    }
+
+    cambios = []
+    for cambio in pagina:
+        datos = filas.get((cambio['modelo'], cambio['objeto_id']))
+        operacion = cambio['operacion']
+        if operacion == CambioCatalogo.GUARDAR and datos is None:
+            # Borrado entre la escritura del feed y esta lectura: su lápida llegará después
+            continue
+        cambios.append({
+            'seq': cambio['seq'],
+            'modelo': cambio['modelo'],
+            'id': cambio['objeto_id'],
+            'operacion': operacion,
+            'datos': datos,
+        })
+
+    cursor = pagina[-1]['seq'] if pagina else seq
+    return cambios, cursor, hay_mas
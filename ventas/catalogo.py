@@ -0,0 +1,166 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .fields import decimal_a_centavos
+from .models import CambioCatalogo, Categoria, LugarEntrega, Producto, Tienda
+
+
+PATRON_ARTEFACTO = re.compile(r'^catalogo-(\d+)\.json\.gz$')
+
+
+def directorio_catalogo():
+    return Path(getattr(settings, 'CATALOGO_DIR', settings.BASE_DIR / 'instance' / 'catalogo'))
+
+
+def version_actual():
+    """La versión del catálogo es la última secuencia del feed que no sea solo de stock.
+
+    Las ventas mueven el stock a cada momento; las terminales lo reciben por
+    el feed (``/api/cambios/?since=<version>``) sin que haga falta regenerar
+    el catálogo ni cambiar su ETag.
+    """
+    return CambioCatalogo.objects.filter(solo_stock=False).aggregate(seq=Max('seq'))['seq'] or 0
+
+
+def _columnas(filas, campos):
+    """Convierte una lista de filas en un diccionario de columnas (JSON más compacto)"""
+    return {campo: [fila[i] for fila in filas] for i, campo in enumerate(campos)}
+
+
+def construir_catalogo(version):
+    """Catálogo de venta en formato columnar: productos, categorías, tiendas y lugares"""
+    productos = Producto.objects.con_stock_total().order_by('nombre').values_list(
+        'id', 'nombre', 'precio', 'stock_total', 'categoria_id'
+    )
+    return {
+        'version': version,
+        'generado': timezone.now().isoformat(),
+        # Los precios van en centavos: enteros exactos y más cortos que decimales
+        'productos': _columnas(
+            [(pk, nombre, decimal_a_centavos(precio), stock, categoria)
+             for pk, nombre, precio, stock, categoria in productos],
+            ['id', 'nombre', 'precio', 'stock', 'categoria']
+        ),
+        'categorias': _columnas(
+            list(Categoria.objects.values_list('id', 'nombre_categoria')),
+            ['id', 'nombre']
+        ),
+        'tiendas': _columnas(
+            list(Tienda.objects.values_list('id', 'nombre_tienda')),
+            ['id', 'nombre']
+        ),
+        'lugares': _columnas(
+            list(LugarEntrega.objects.values_list('id', 'nombre_lugar')),
+            ['id', 'nombre']
+        ),
+    }
+
+
+def ruta_artefacto(version):
+    return directorio_catalogo() / f'catalogo-{version}.json.gz'
+
+
+def version_artefacto(ruta):
+    return int(PATRON_ARTEFACTO.match(ruta.name).group(1))
+
+
+def generar_catalogo(forzar=False, conservar=3):
+    """Genera el artefacto de la versión actual si no existe; devuelve su ruta.
+
+    El archivo se escribe en un temporal y se renombra, de modo que nunca se
+    sirve un artefacto a medio escribir. Se conservan las ``conservar``
+    versiones más recientes.
+    """
+    version = version_actual()
+    ruta = ruta_artefacto(version)
+    if not forzar:
+        # Si una venta reemplazó la última entrada de catálogo la versión puede
+        # bajar: el artefacto más nuevo sigue sirviendo
+        vigentes = [v for v in versiones_disponibles() if v >= version]
+        if vigentes:
+            return ruta_artefacto(max(vigentes))
+
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    datos = json.dumps(construir_catalogo(version), separators=(',', ':'), ensure_ascii=False)
+    descriptor, temporal = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as archivo:
+        # mtime=0: el mismo catálogo produce siempre los mismos bytes (y el mismo ETag)
+        with gzip.GzipFile(fileobj=archivo, mode='wb', compresslevel=9, mtime=0) as comprimido:
+            comprimido.write(datos.encode())
+    os.replace(temporal, ruta)
+
+    for antigua in sorted(versiones_disponibles(), reverse=True)[conservar:]:
+        ruta_artefacto(antigua).unlink(missing_ok=True)
+    return ruta
+
+
+def versiones_disponibles():
+    directorio = directorio_catalogo()
+    if not directorio.exists():
+        return []
+    return [
+        int(coincidencia.group(1))
+        for coincidencia in map(PATRON_ARTEFACTO.match, os.listdir(directorio))
+        if coincidencia
+    ]
+
+
+# ETag por (ruta, mtime, tamaño): evita releer el archivo en cada petición
+_etags = {}
+
+
+def ultimo_artefacto():
+    """Ruta y ETag fuerte del artefacto más reciente, o (None, None) si no hay ninguno"""
+    versiones = versiones_disponibles()
+    if not versiones:
+        return None, None
+    version = max(versiones)
+    ruta = ruta_artefacto(version)
+    try:
+        estado = ruta.stat()
+    except FileNotFoundError:
+        # Borrado por una generación concurrente
+        return None, None
+    clave = (str(ruta), estado.st_mtime_ns, estado.st_size)
+    if clave not in _etags:
+        _etags.clear()
+        _etags[clave] = '"{}-{}"'.format(version, hashlib.sha256(ruta.read_bytes()).hexdigest()[:16])
+    return ruta, _etags[clave]
+
+
+def parsear_rango(cabecera, tamano):
+    """Interpreta una cabecera ``Range: bytes=...`` de un solo rango.
+
+    Devuelve ``(inicio, fin)`` inclusivos, ``None`` si el rango no es
+    satisfacible o ``False`` si la cabecera se ignora (otra unidad, varios
+    rangos o mal formada), en cuyo caso se sirve el archivo completo.
+    """
+    unidad, _, rangos = cabecera.partition('=')
+    if unidad.strip() != 'bytes' or ',' in rangos:
+        return False
+    inicio, guion, fin = (parte.strip() for parte in rangos.strip().partition('-'))
+    # Cada extremo vacío o solo dígitos ASCII ('²'.isdigit() es cierto), y al menos uno presente
+    if not guion or not (inicio or fin):
+        return False
+    if any(parte and not (parte.isascii() and parte.isdigit()) for parte in (inicio, fin)):
+        return False
+    if not inicio:
+        # bytes=-N: los últimos N bytes
+        sufijo = int(fin)
+        if sufijo == 0:
+            return None
+        return max(tamano - sufijo, 0), tamano - 1
+    inicio = int(inicio)
+    fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio >= tamano or inicio > fin:
+        return None
+    return inicio, fin
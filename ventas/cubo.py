@@ -0,0 +1,275 @@
+"""
+Cubo OLAP en memoria de las ventas (activas y archivadas).
+
+Cada venta es una fila con cuatro dimensiones (mes, tienda, categoría y
+producto) codificadas como enteros densos y dos medidas (cantidad y total en
+centavos), guardadas por columnas. Con NumPy las agregaciones son
+vectorizadas; sin NumPy las columnas son ``array`` y se recorren en Python.
+
+El cubo se carga una vez por proceso y después solo lee las ventas con id
+mayor al último cargado, cuando cambia la versión de las ventas (ver
+ventas.cache). Si se editaron, borraron o archivaron ventas (contador de
+modificaciones), se reconstruye.
+"""
+
+import threading
+from array import array
+
+from django.db.models import BigIntegerField
+from django.db.models.functions import Cast, TruncMonth
+
+from .cache import ventas_modificadas, version_ventas
+from .models import Venta, VentaArchivada
+
+# NumPy tarda más en importarse que el resto de la aplicación: se carga al
+# crear el cubo y no al arrancar cada worker
+np = None
+_numpy_cargado = False
+
+
+def _cargar_numpy():
+    global np, _numpy_cargado
+    if not _numpy_cargado:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        np = numpy
+        _numpy_cargado = True
+
+
+DIMENSIONES = ['mes', 'tienda', 'categoria', 'producto']
+MEDIDAS = ['cantidad', 'total']
+
+# Ventas leídas de la base de datos por consulta al cargar el cubo
+LOTE_CARGA = 5000
+
+
+class Dimension:
+    """Codifica los valores de una dimensión como enteros 0..n-1"""
+
+    def __init__(self):
+        self.codigos = {}
+        self.valores = []
+        self.nombres = []
+
+    def __len__(self):
+        return len(self.valores)
+
+    def codificar(self, valor, nombre):
+        codigo = self.codigos.get(valor)
+        if codigo is None:
+            codigo = self.codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+            self.nombres.append(nombre)
+        else:
+            # Las ventas llegan en orden: se queda el nombre más reciente
+            self.nombres[codigo] = nombre
+        return codigo
+
+
+class CuboVentas:
+    """Columnas de ventas con agregación por cualquier combinación de dimensiones"""
+
+    def __init__(self):
+        _cargar_numpy()
+        self._lock = threading.Lock()
+        self._vaciar()
+
+    @property
+    def motor(self):
+        return 'numpy' if np is not None else 'array'
+
+    def _vaciar(self):
+        self.dimensiones = {nombre: Dimension() for nombre in DIMENSIONES}
+        self.filas = 0
+        self.ultimo_id = 0
+        self.version = None
+        self.modificadas = None
+        self._capacidad = 0
+        if np is not None:
+            self._columnas = {nombre: np.zeros(0, dtype=np.int64) for nombre in DIMENSIONES + MEDIDAS}
+        else:
+            self._columnas = {nombre: array('q') for nombre in DIMENSIONES + MEDIDAS}
+
+    def _columna(self, nombre):
+        return self._columnas[nombre][:self.filas] if np is not None else self._columnas[nombre]
+
+    def _anexar(self, nuevas):
+        """Agrega las columnas ``nuevas`` (listas de enteros del mismo largo)"""
+        n = len(nuevas['mes'])
+        if not n:
+            return
+        if np is not None:
+            fin = self.filas + n
+            if fin > self._capacidad:
+                # Capacidad que se duplica: anexar lotes pequeños no copia todo el cubo
+                self._capacidad = max(fin, self._capacidad * 2, LOTE_CARGA)
+                for nombre, columna in self._columnas.items():
+                    ampliada = np.zeros(self._capacidad, dtype=np.int64)
+                    ampliada[:self.filas] = columna[:self.filas]
+                    self._columnas[nombre] = ampliada
+            for nombre, valores in nuevas.items():
+                self._columnas[nombre][self.filas:fin] = valores
+        else:
+            for nombre, valores in nuevas.items():
+                self._columnas[nombre].extend(valores)
+        self.filas += n
+
+    def _cargar(self, queryset):
+        """Lee ``queryset`` por lotes ordenados por id y anexa sus ventas"""
+        filas = queryset.annotate(
+            mes=TruncMonth('fecha'),
+            centavos=Cast('total', BigIntegerField()),
+        ).order_by('id').values_list(
+            'id', 'mes', 'tienda_id', 'tienda_nombre', 'categoria_nombre',
+            'producto_id', 'producto_nombre', 'cantidad', 'centavos',
+        )
+        mes, tienda, categoria, producto = (self.dimensiones[nombre] for nombre in DIMENSIONES)
+        ultimo = 0
+        while True:
+            lote = list(filas.filter(id__gt=ultimo)[:LOTE_CARGA])
+            if not lote:
+                break
+            nuevas = {nombre: [] for nombre in DIMENSIONES + MEDIDAS}
+            for id_, fecha_mes, tienda_id, tienda_nombre, categoria_nombre, producto_id, producto_nombre, cantidad, centavos in lote:
+                clave_mes = fecha_mes.strftime('%Y-%m')
+                nuevas['mes'].append(mes.codificar(clave_mes, clave_mes))
+                nuevas['tienda'].append(tienda.codificar(tienda_id, tienda_nombre))
+                nuevas['categoria'].append(categoria.codificar(categoria_nombre, categoria_nombre or 'Sin categoría'))
+                nuevas['producto'].append(producto.codificar(producto_id, producto_nombre))
+                nuevas['cantidad'].append(cantidad)
+                nuevas['total'].append(centavos)
+            self._anexar(nuevas)
+            ultimo = lote[-1][0]
+        return ultimo
+
+    def _reconstruir(self):
+        self._vaciar()
+        # Primero las archivadas (más antiguas) para que los nombres recientes prevalezcan
+        self._cargar(VentaArchivada.objects.all())
+        self.ultimo_id = max(self.ultimo_id, self._cargar(Venta.objects.all()))
+
+    def refrescar(self):
+        """Pone el cubo al día con la base de datos si cambió la versión de las ventas"""
+        version = version_ventas()
+        if version == self.version:
+            return
+        with self._lock:
+            if version == self.version:
+                return
+            # Se lee antes de cargar: una edición posterior se verá en la próxima versión
+            modificadas = ventas_modificadas()
+            if self.version is None or modificadas != self.modificadas:
+                self._reconstruir()
+            else:
+                # Solo se anexaron ventas: basta leer las de id mayor al último cargado
+                self.ultimo_id = max(
+                    self.ultimo_id, self._cargar(Venta.objects.filter(id__gt=self.ultimo_id))
+                )
+            self.version = version
+            self.modificadas = modificadas
+
+    def consultar(self, por=(), filtros=None):
+        """Agrega cantidad, total y número de ventas agrupando por las dimensiones ``por``.
+
+        ``filtros`` va de dimensión a la colección de valores admitidos. Se
+        devuelve una lista de ``(valores, cantidad, total, ventas)``, donde
+        ``valores`` tiene un par ``(valor, nombre)`` por dimensión de ``por``
+        y ``total`` está en centavos.
+        """
+        filtros = filtros or {}
+        with self._lock:
+            codigos = {
+                dimension: {
+                    self.dimensiones[dimension].codigos[valor]
+                    for valor in valores if valor in self.dimensiones[dimension].codigos
+                }
+                for dimension, valores in filtros.items()
+            }
+            if np is not None:
+                grupos = self._agregar_numpy(por, codigos)
+            else:
+                grupos = self._agregar_array(por, codigos)
+            return [
+                (
+                    tuple(
+                        (self.dimensiones[dimension].valores[codigo], self.dimensiones[dimension].nombres[codigo])
+                        for dimension, codigo in zip(por, clave)
+                    ),
+                    cantidad, total, ventas,
+                )
+                for clave, cantidad, total, ventas in grupos
+            ]
+
+    def _agregar_numpy(self, por, codigos):
+        mascara = None
+        for dimension, admitidos in codigos.items():
+            coincide = np.isin(self._columna(dimension), np.fromiter(admitidos, dtype=np.int64))
+            mascara = coincide if mascara is None else mascara & coincide
+
+        # Clave de grupo en base mixta: un entero por combinación de códigos
+        clave = np.zeros(self.filas, dtype=np.int64)
+        for dimension in por:
+            clave = clave * len(self.dimensiones[dimension]) + self._columna(dimension)
+        cantidad = self._columna('cantidad')
+        total = self._columna('total')
+        if mascara is not None:
+            clave, cantidad, total = clave[mascara], cantidad[mascara], total[mascara]
+        if not len(clave):
+            return []
+
+        orden = np.argsort(clave, kind='stable')
+        clave = clave[orden]
+        inicios = np.flatnonzero(np.r_[True, clave[1:] != clave[:-1]])
+        # reduceat suma en int64: los centavos quedan exactos
+        cantidades = np.add.reduceat(cantidad[orden], inicios)
+        totales = np.add.reduceat(total[orden], inicios)
+        ventas = np.diff(np.r_[inicios, len(clave)])
+
+        grupos = []
+        for combinada, suma_cantidad, suma_total, num_ventas in zip(
+            clave[inicios].tolist(), cantidades.tolist(), totales.tolist(), ventas.tolist()
+        ):
+            partes = []
+            for dimension in reversed(por):
+                combinada, codigo = divmod(combinada, len(self.dimensiones[dimension]))
+                partes.append(codigo)
+            grupos.append((tuple(reversed(partes)), suma_cantidad, suma_total, num_ventas))
+        return grupos
+
+    def _agregar_array(self, por, codigos):
+        columnas_por = [self._columna(dimension) for dimension in por]
+        columnas_filtro = [(self._columna(dimension), admitidos) for dimension, admitidos in codigos.items()]
+        cantidad = self._columna('cantidad')
+        total = self._columna('total')
+
+        acumulado = {}
+        for i in range(self.filas):
+            if any(columna[i] not in admitidos for columna, admitidos in columnas_filtro):
+                continue
+            clave = tuple(columna[i] for columna in columnas_por)
+            grupo = acumulado.get(clave)
+            if grupo is None:
+                acumulado[clave] = [cantidad[i], total[i], 1]
+            else:
+                grupo[0] += cantidad[i]
+                grupo[1] += total[i]
+                grupo[2] += 1
+        return [(clave, *grupo) for clave, grupo in sorted(acumulado.items())]
+
+
+# Cubo del proceso; cada worker web crea el suyo en la primera consulta
+cubo = None
+_lock_cubo = threading.Lock()
+
+
+def obtener_cubo():
+    """Cubo del proceso, al día con las ventas"""
+    global cubo
+    if cubo is None:
+        with _lock_cubo:
+            if cubo is None:
+                cubo = CuboVentas()
+    cubo.refrescar()
+    return cubo
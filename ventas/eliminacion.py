@@ -0,0 +1,130 @@
+import time
+
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .archivo import CLAVE_RESUMEN_ARCHIVO
+from .cache import invalidar_reportes
+from .cambios import registrar_cambio
+from .models import CambioCatalogo, Cliente, Eliminacion, Producto, Venta, VentaArchivada
+from .resumenes import descontar_ventas
+from .trabajos import encolar
+
+
+# Modelos con borrado en segundo plano y campo por el que los referencian las ventas
+MODELOS_ELIMINACION = {
+    'cliente': (Cliente, 'cliente_id'),
+    'producto': (Producto, 'producto_id'),
+}
+
+NOMBRE_MODELO = {modelo: nombre for nombre, (modelo, _) in MODELOS_ELIMINACION.items()}
+
+# Ventas borradas por transacción
+LOTE_ELIMINACION = 500
+
+
+def iniciar_eliminacion(objeto, usuario=None):
+    """Oculta el objeto al instante y programa el borrado de sus ventas.
+
+    Solo se hacen dos escrituras pequeñas, así que la petición vuelve en
+    milisegundos. Al confirmarse la transacción el borrado se encola como
+    trabajo ``eliminar`` (ver ventas.tareas); el comando
+    ``procesar_eliminaciones`` también puede terminarlo a mano.
+    """
+    nombre = NOMBRE_MODELO[type(objeto)]
+    modelo, _ = MODELOS_ELIMINACION[nombre]
+    with transaction.atomic():
+        modelo.todos.filter(pk=objeto.pk).update(eliminado=True)
+        # Las terminales lo dan de baja ya, sin esperar al borrado real
+        registrar_cambio(modelo, objeto.pk, CambioCatalogo.ELIMINAR)
+        eliminacion = Eliminacion.objects.create(
+            modelo=nombre,
+            objeto_id=objeto.pk,
+            descripcion=str(objeto)[:201],
+            usuario=usuario,
+        )
+        transaction.on_commit(lambda: encolar(
+            'eliminar', usuario=usuario, prioridad=1, max_intentos=5, eliminacion_id=eliminacion.pk
+        ))
+    return eliminacion
+
+
+def _borrar_lote(modelo_venta, ids):
+    """Borra un lote de ventas por id; devuelve cuántas se borraron"""
+    if modelo_venta is VentaArchivada:
+        return VentaArchivada.objects.filter(pk__in=ids).delete()[0]
+    # Borrado directo, como al archivar: sin cargar objetos ni disparar una señal por venta
+    db = router.db_for_write(Venta)
+    with transaction.atomic(using=db):
+        with connections[db].cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {Venta._meta.db_table} WHERE id IN ({", ".join(["%s"] * len(ids))})', ids
+            )
+            return cursor.rowcount
+
+
+def ejecutar_eliminacion(eliminacion_id, lote=LOTE_ELIMINACION, pausa=0, progreso=None):
+    """Borra por lotes las ventas activas y archivadas del objeto y después el objeto.
+
+    Cada lote es una transacción corta, de modo que la base de datos nunca
+    queda bloqueada mucho tiempo, y se descuenta de los resúmenes y del mapa
+    de calor en esa misma transacción. Al terminar se encola un cálculo
+    completo de segmentos. Es seguro ejecutarla de nuevo sobre una
+    eliminación interrumpida: continúa con las ventas que queden.
+    ``progreso(borradas, total)`` se llama tras cada lote.
+    """
+    eliminacion = Eliminacion.objects.get(pk=eliminacion_id)
+    if eliminacion.estado == Eliminacion.COMPLETADA:
+        return eliminacion
+    modelo, campo = MODELOS_ELIMINACION[eliminacion.modelo]
+    filtro = {campo: eliminacion.objeto_id}
+    registro = Eliminacion.objects.filter(pk=eliminacion_id)
+
+    pendientes = Venta.objects.filter(**filtro).count() + VentaArchivada.objects.filter(**filtro).count()
+    hechas = eliminacion.borradas
+    registro.update(estado=Eliminacion.EN_CURSO, total=hechas + pendientes, error='')
+    try:
+        for modelo_venta in (Venta, VentaArchivada):
+            while True:
+                ids = list(modelo_venta.objects.filter(**filtro).values_list('pk', flat=True)[:lote])
+                if not ids:
+                    break
+                with transaction.atomic():
+                    ventas = list(modelo_venta.objects.filter(pk__in=ids).only(
+                        'tienda_id', 'fecha', 'cliente_id', 'cantidad', 'total'
+                    ))
+                    borradas = _borrar_lote(modelo_venta, ids)
+                    descontar_ventas(ventas)
+                registro.update(borradas=F('borradas') + borradas)
+                hechas += borradas
+                if progreso:
+                    progreso(hechas, eliminacion.borradas + pendientes)
+                invalidar_reportes(modificadas=True)
+                if modelo_venta is VentaArchivada:
+                    cache.delete(CLAVE_RESUMEN_ARCHIVO)
+                if pausa:
+                    # Deja pasar a las escrituras de la tienda entre lotes
+                    time.sleep(pausa)
+
+        with transaction.atomic():
+            # Ya sin ventas: el inventario y las reservas del producto caen en cascada
+            modelo.todos.filter(pk=eliminacion.objeto_id).delete()
+            registro.update(estado=Eliminacion.COMPLETADA, fecha_fin=timezone.now())
+            # Los agregados RFM de los demás clientes también cambian (p. ej. al borrar un producto)
+            transaction.on_commit(lambda: encolar('calcular_segmentos', unico=True, completo=True))
+    except Exception as e:
+        registro.update(estado=Eliminacion.FALLIDA, error=str(e))
+        raise
+
+    eliminacion.refresh_from_db()
+    return eliminacion
+
+
+def eliminaciones_pendientes(reintentar=False):
+    """Eliminaciones sin terminar (las fallidas solo si se piden)"""
+    estados = [Eliminacion.PENDIENTE, Eliminacion.EN_CURSO]
+    if reintentar:
+        estados.append(Eliminacion.FALLIDA)
+    return Eliminacion.objects.filter(estado__in=estados).order_by('fecha_inicio')
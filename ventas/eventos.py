@@ -0,0 +1,53 @@
+from turron_system.eventos import BusEventos
+
+from .models import STOCK_BAJO, Producto
+
+
+# Bus del proceso; lo alimentan las señales de Venta y Producto
+bus = BusEventos()
+
+
+def _datos_venta(venta):
+    return {
+        'id': venta.pk,
+        'cliente': venta.cliente_nombre,
+        'producto': venta.producto_nombre,
+        'cantidad': venta.cantidad,
+        'total': str(venta.total),
+        'fecha': venta.fecha.isoformat(),
+    }
+
+
+def publicar_venta(venta):
+    """Difunde una venta nueva y el stock resultante del producto"""
+    bus.publicar('venta', _datos_venta(venta))
+    publicar_stock(venta.producto_id, -venta.cantidad)
+
+
+def publicar_lote(ventas):
+    """Difunde un lote de ventas; el stock se publica una sola vez por producto"""
+    vendido = {}
+    for venta in ventas:
+        bus.publicar('venta', _datos_venta(venta))
+        vendido[venta.producto_id] = vendido.get(venta.producto_id, 0) + venta.cantidad
+    for producto_id, cantidad in vendido.items():
+        publicar_stock(producto_id, -cantidad)
+
+
+def publicar_stock(producto_id, cambio):
+    """Difunde el stock total del producto y avisa si acaba de cruzar el umbral de stock bajo"""
+    producto = Producto.objects.con_stock_total().filter(pk=producto_id).values(
+        'id', 'nombre', 'stock_total'
+    ).first()
+    if producto is None:
+        return
+    datos = {
+        'producto': producto['id'],
+        'nombre': producto['nombre'],
+        'stock': producto['stock_total'],
+    }
+    bus.publicar('stock', datos)
+
+    anterior = producto['stock_total'] - cambio
+    if anterior >= STOCK_BAJO > producto['stock_total']:
+        bus.publicar('stock_bajo', datos)
@@ -0,0 +1,68 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django import forms
+from django.core import exceptions
+from django.db import models
+
+
+CENTAVO = Decimal('0.01')
+
+
+def decimal_a_centavos(valor):
+    """Convierte un importe (Decimal, str, int o float) a entero de centavos"""
+    if not isinstance(valor, Decimal):
+        valor = Decimal(str(valor))
+    return int((valor * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def centavos_a_decimal(centavos):
+    """Convierte un entero de centavos en Decimal con dos decimales"""
+    if not isinstance(centavos, int):
+        # AVG y similares devuelven float: se redondea al centavo más cercano
+        centavos = int(Decimal(str(centavos)).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+    return Decimal(centavos).scaleb(-2).quantize(CENTAVO)
+
+
+class MonedaField(models.BigIntegerField):
+    """Importe monetario guardado como entero de centavos.
+
+    En la base de datos la columna es un entero, de modo que ``SUM`` se hace
+    en aritmética entera exacta; en Python el valor es un ``Decimal`` con dos
+    decimales, igual que con ``DecimalField``.
+    """
+    description = "Importe en centavos"
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return centavos_a_decimal(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal):
+            return value
+        try:
+            return Decimal(str(value)).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+        except InvalidOperation:
+            raise exceptions.ValidationError(
+                self.error_messages['invalid'],
+                code='invalid',
+                params={'value': value},
+            )
+
+    def get_prep_value(self, value):
+        value = models.Field.get_prep_value(self, value)
+        if value is None:
+            return None
+        try:
+            return decimal_a_centavos(value)
+        except (InvalidOperation, ValueError) as e:
+            raise e.__class__(
+                f"El campo '{self.name}' esperaba un importe pero recibió {value!r}."
+            ) from e
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{
+            'form_class': forms.DecimalField,
+            'decimal_places': 2,
+            **kwargs,
+        })
@@ -2,6 +2,8 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from .models import Cliente, Producto, Categoria, Tienda, LugarEntrega, Venta, PerfilUsuario
+from .inventario import stock_disponible
+from .ajustes import FIJAR, MODOS, SUMA
 
 
 class CustomUserCreationForm(UserCreationForm):
@@ -138,6 +140,9 @@ class LugarEntregaForm(forms.ModelForm):
 
 class VentaForm(forms.ModelForm):
     """Formulario para ventas"""
+    # Reserva de stock creada por el formulario mientras se arma la venta
+    reserva = forms.UUIDField(required=False, widget=forms.HiddenInput(attrs={'id': 'id_reserva'}))
+    
     class Meta:
         model = Venta
         fields = ['cliente', 'producto', 'cantidad', 'tienda', 'lugar_entrega']
@@ -146,8 +151,8 @@ class VentaForm(forms.ModelForm):
                 'class': 'form-control',
                 'id': 'id_cliente'
             }),
-            'producto': forms.Select(attrs={
-                'class': 'form-control',
+            # Se elige con la búsqueda sobre el catálogo local: sin una opción por producto
+            'producto': forms.HiddenInput(attrs={
                 'id': 'id_producto'
             }),
             'cantidad': forms.NumberInput(attrs={
@@ -167,7 +172,7 @@ class VentaForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['cliente'].queryset = Cliente.objects.all()
-        self.fields['producto'].queryset = Producto.objects.filter(stock__gt=0)
+        self.fields['producto'].queryset = Producto.objects.con_stock_total().filter(stock_total__gt=0)
         self.fields['tienda'].queryset = Tienda.objects.all()
         self.fields['lugar_entrega'].queryset = LugarEntrega.objects.all()
         
@@ -177,17 +182,24 @@ class VentaForm(forms.ModelForm):
         self.fields['tienda'].empty_label = "Seleccione una tienda"
         self.fields['lugar_entrega'].empty_label = "Seleccione un lugar de entrega"
     
-    def clean_cantidad(self):
-        cantidad = self.cleaned_data.get('cantidad')
-        producto = self.cleaned_data.get('producto')
+    def clean(self):
+        cleaned_data = super().clean()
+        cantidad = cleaned_data.get('cantidad')
+        producto = cleaned_data.get('producto')
+        tienda = cleaned_data.get('tienda')
         
-        if producto and cantidad:
-            if cantidad > producto.stock:
-                raise forms.ValidationError(
-                    f'Stock insuficiente. Stock disponible: {producto.stock}'
+        # El stock se valida contra la tienda que vende
+        if producto and cantidad and tienda:
+            disponible = stock_disponible(
+                producto, tienda, excluir_reserva=cleaned_data.get('reserva')
+            )
+            if cantidad > disponible:
+                self.add_error(
+                    'cantidad',
+                    f'Stock insuficiente. Stock disponible: {disponible}'
                 )
         
-        return cantidad
+        return cleaned_data
 
 
 class PerfilUsuarioForm(forms.ModelForm):
@@ -210,6 +222,45 @@ class PerfilUsuarioForm(forms.ModelForm):
         }
 
 
+class AjusteProductosForm(forms.Form):
+    """Formulario para ajustar en bloque el precio y el stock de varios productos"""
+    modo_precio = forms.ChoiceField(
+        choices=[('', 'Sin cambios')] + MODOS, required=False, label="Ajuste de precio"
+    )
+    valor_precio = forms.DecimalField(
+        max_digits=12, decimal_places=2, required=False, label="Valor del precio",
+        help_text="Porcentaje (10 = +10 %, -10 = -10 %) o importe"
+    )
+    modo_stock = forms.ChoiceField(
+        choices=[('', 'Sin cambios')] + MODOS, required=False, label="Ajuste de stock"
+    )
+    valor_stock = forms.DecimalField(
+        max_digits=12, decimal_places=2, required=False, label="Valor del stock",
+        help_text="Porcentaje o unidades (el stock no baja de 0)"
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        for campo in ('precio', 'stock'):
+            modo = cleaned_data.get(f'modo_{campo}')
+            valor = cleaned_data.get(f'valor_{campo}')
+            if modo and valor is None:
+                self.add_error(f'valor_{campo}', 'Indique el valor del ajuste')
+            elif campo == 'stock' and modo in (SUMA, FIJAR) and valor is not None and valor != valor.to_integral_value():
+                self.add_error('valor_stock', 'El stock se ajusta en unidades enteras')
+        if not cleaned_data.get('modo_precio') and not cleaned_data.get('modo_stock'):
+            raise forms.ValidationError('Indique al menos un ajuste de precio o de stock')
+        return cleaned_data
+    
+    def ajustes(self):
+        """Argumentos ``precio`` y ``stock`` para ventas.ajustes.ajustar_productos"""
+        return {
+            campo: (self.cleaned_data[f'modo_{campo}'], self.cleaned_data[f'valor_{campo}'])
+            if self.cleaned_data.get(f'modo_{campo}') else None
+            for campo in ('precio', 'stock')
+        }
+
+
 class BusquedaForm(forms.Form):
     """Formulario para búsquedas"""
     search = forms.CharField(
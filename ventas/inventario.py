@@ -0,0 +1,216 @@
+import random
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Inventario, Producto, ReservaStock
+from .cambios import registrar_cambio
+
+
+# Tiempo que quedan apartadas las unidades de una venta en curso
+DURACION_RESERVA = timedelta(minutes=5)
+
+
+class StockInsuficiente(ValueError):
+    """Error lanzado cuando no hay stock suficiente para una venta"""
+
+    def __init__(self, disponible):
+        self.disponible = disponible
+        super().__init__(f"Stock insuficiente. Stock disponible: {disponible}")
+
+
+def gestiona_inventario(producto, tienda):
+    """Indica si la tienda lleva inventario propio del producto"""
+    return Inventario.objects.filter(producto=producto, tienda=tienda).exists()
+
+
+def stock_tienda(producto, tienda):
+    """Suma de los sub-contadores del producto en la tienda"""
+    return Inventario.objects.filter(
+        producto=producto, tienda=tienda
+    ).aggregate(total=Sum('cantidad'))['total'] or 0
+
+
+def stock_fisico(producto, tienda=None):
+    """Stock en existencia, sin descontar reservas.
+
+    Si la tienda lleva inventario propio del producto se usa el de la tienda;
+    en caso contrario se vende del stock central (``Producto.stock``). Sin
+    tienda se devuelve el stock total de todas las tiendas más el central.
+    """
+    if tienda is None:
+        return producto.stock + (
+            Inventario.objects.filter(producto=producto).aggregate(total=Sum('cantidad'))['total'] or 0
+        )
+    filas = Inventario.objects.filter(producto=producto, tienda=tienda)
+    if filas.exists():
+        return filas.aggregate(total=Sum('cantidad'))['total'] or 0
+    return Producto.objects.filter(pk=producto.pk).values_list('stock', flat=True).first() or 0
+
+
+def stock_reservado(producto, tienda=None, excluir_reserva=None):
+    """Unidades apartadas por reservas activas (usa el índice producto/tienda/expira_en)"""
+    reservas = ReservaStock.objects.filter(producto=producto, expira_en__gt=timezone.now())
+    if tienda is not None:
+        reservas = reservas.filter(tienda=tienda)
+    if excluir_reserva:
+        reservas = reservas.exclude(token=excluir_reserva)
+    return reservas.aggregate(total=Sum('cantidad'))['total'] or 0
+
+
+def stock_disponible(producto, tienda=None, excluir_reserva=None):
+    """Stock vendible del producto: existencia menos las reservas activas de otros"""
+    disponible = stock_fisico(producto, tienda) - stock_reservado(producto, tienda, excluir_reserva)
+    return max(disponible, 0)
+
+
+def descontar_stock(producto, tienda, cantidad):
+    """Descuenta stock de la tienda que vende, o del central si no lleva inventario.
+
+    Cada descuento es un UPDATE condicional (``cantidad >= n``) sobre un solo
+    sub-contador elegido al azar, de modo que las ventas concurrentes se
+    reparten entre filas distintas. Solo si ningún sub-contador alcanza por sí
+    mismo se descuenta de varios dentro de la misma transacción.
+    """
+    with transaction.atomic():
+        shards = list(
+            Inventario.objects.filter(producto=producto, tienda=tienda)
+            .values_list('shard', flat=True)
+        )
+
+        if not shards:
+            actualizado = Producto.objects.filter(
+                pk=producto.pk, stock__gte=cantidad
+            ).update(stock=F('stock') - cantidad)
+            if not actualizado:
+                raise StockInsuficiente(stock_fisico(producto, tienda))
+            producto.stock -= cantidad
+            return
+
+        inicio = random.randrange(len(shards))
+        for shard in shards[inicio:] + shards[:inicio]:
+            actualizado = Inventario.objects.filter(
+                producto=producto, tienda=tienda, shard=shard, cantidad__gte=cantidad
+            ).update(cantidad=F('cantidad') - cantidad)
+            if actualizado:
+                return
+
+        # Ningún sub-contador alcanza solo: se drena de varios
+        filas = list(
+            Inventario.objects.select_for_update()
+            .filter(producto=producto, tienda=tienda, cantidad__gt=0)
+            .order_by('-cantidad')
+        )
+        disponible = sum(fila.cantidad for fila in filas)
+        if disponible < cantidad:
+            raise StockInsuficiente(disponible)
+
+        pendiente = cantidad
+        for fila in filas:
+            tomar = min(fila.cantidad, pendiente)
+            Inventario.objects.filter(pk=fila.pk).update(cantidad=F('cantidad') - tomar)
+            pendiente -= tomar
+            if not pendiente:
+                break
+
+
+def agregar_stock(producto, tienda, cantidad):
+    """Suma unidades al inventario de la tienda en un sub-contador al azar"""
+    with transaction.atomic():
+        shards = list(
+            Inventario.objects.filter(producto=producto, tienda=tienda)
+            .values_list('shard', flat=True)
+        )
+        if shards:
+            Inventario.objects.filter(
+                producto=producto, tienda=tienda, shard=random.choice(shards)
+            ).update(cantidad=F('cantidad') + cantidad)
+        else:
+            Inventario.objects.create(producto=producto, tienda=tienda, shard=0, cantidad=cantidad)
+        registrar_cambio(Producto, producto.pk, solo_stock=True)
+
+
+def repartir_inventario(producto, tienda, shards):
+    """Reparte el stock de la tienda en ``shards`` sub-contadores equilibrados"""
+    if shards < 1:
+        raise ValueError("Debe haber al menos un sub-contador")
+
+    with transaction.atomic():
+        filas = Inventario.objects.select_for_update().filter(producto=producto, tienda=tienda)
+        total = sum(fila.cantidad for fila in filas)
+        filas.delete()
+        base, resto = divmod(total, shards)
+        Inventario.objects.bulk_create([
+            Inventario(
+                producto=producto,
+                tienda=tienda,
+                shard=shard,
+                cantidad=base + (1 if shard < resto else 0)
+            )
+            for shard in range(shards)
+        ])
+
+
+def reservar_stock(producto, tienda, cantidad, usuario, token=None):
+    """Crea o renueva la reserva de una venta en curso.
+
+    Si se pasa el ``token`` de una reserva existente del usuario se actualiza
+    su cantidad y su vencimiento. Lanza ``StockInsuficiente`` si las unidades
+    no están libres.
+    """
+    with transaction.atomic():
+        # Un UPDATE sin cambios toma el bloqueo de escritura antes de leer el stock:
+        # otra reserva concurrente espera y cuenta esta al comprobar
+        Producto.todos.filter(pk=producto.pk).update(stock=F('stock'))
+
+        reserva = None
+        if token:
+            reserva = ReservaStock.objects.filter(token=token, usuario=usuario).first()
+
+        # Solo la reserva propia que se renueva deja de contar
+        disponible = stock_disponible(producto, tienda, excluir_reserva=reserva.token if reserva else None)
+        if cantidad > disponible:
+            raise StockInsuficiente(disponible)
+
+        expira_en = timezone.now() + DURACION_RESERVA
+        if reserva is None:
+            return ReservaStock.objects.create(
+                producto=producto,
+                tienda=tienda,
+                cantidad=cantidad,
+                usuario=usuario,
+                expira_en=expira_en
+            )
+
+        reserva.producto = producto
+        reserva.tienda = tienda
+        reserva.cantidad = cantidad
+        reserva.expira_en = expira_en
+        reserva.save(update_fields=['producto', 'tienda', 'cantidad', 'expira_en'])
+        return reserva
+
+
+def liberar_reserva(token, usuario=None):
+    """Libera una reserva antes de que venza (venta registrada o cancelada)"""
+    if not token:
+        return 0
+    reservas = ReservaStock.objects.filter(token=token)
+    if usuario is not None:
+        reservas = reservas.filter(usuario=usuario)
+    return reservas.delete()[0]
+
+
+def liberar_reservas_vencidas(lote=500):
+    """Borra las reservas vencidas en lotes cortos para no bloquear la base de datos"""
+    liberadas = 0
+    while True:
+        ids = list(
+            ReservaStock.objects.filter(expira_en__lte=timezone.now())
+            .order_by('expira_en')
+            .values_list('pk', flat=True)[:lote]
+        )
+        if not ids:
+            return liberadas
+        liberadas += ReservaStock.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,193 @@
+import uuid
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import invalidar_reportes
+from .cambios import registrar_cambio
+from .eventos import publicar_lote
+from .inventario import descontar_stock
+from .models import Cliente, Inventario, LugarEntrega, Producto, ReservaStock, Tienda, Venta, VentaArchivada
+from .resumenes import registrar_ventas
+
+
+# Máximo de ventas aceptadas en una sola subida
+MAX_VENTAS_LOTE = 500
+
+# Estados por venta devueltos a la terminal
+CREADA = 'creada'
+DUPLICADA = 'duplicada'
+SIN_STOCK = 'sin_stock'
+INVALIDA = 'invalida'
+
+
+class LoteDuplicado(Exception):
+    """Otra subida concurrente registró ventas con los mismos UUID"""
+
+
+def _validar_item(item):
+    """Normaliza una venta del lote; lanza ValueError con el motivo si no es válida"""
+    if not isinstance(item, dict):
+        raise ValueError("Cada venta debe ser un objeto")
+    try:
+        datos = {
+            'uuid': uuid.UUID(str(item['uuid'])),
+            'cliente': int(item['cliente']),
+            'producto': int(item['producto']),
+            'tienda': int(item['tienda']),
+            'lugar_entrega': int(item['lugar_entrega']),
+            'cantidad': int(item['cantidad']),
+        }
+    except KeyError as e:
+        raise ValueError(f"Falta el campo {e.args[0]}")
+    except (TypeError, ValueError):
+        raise ValueError("Campos con formato incorrecto")
+    if datos['cantidad'] < 1:
+        raise ValueError("La cantidad debe ser al menos 1")
+
+    # Fecha real de la venta en la terminal (puede haberse hecho sin conexión)
+    fecha = item.get('fecha')
+    if fecha:
+        fecha = parse_datetime(str(fecha))
+        if fecha is None:
+            raise ValueError("Fecha con formato incorrecto")
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha)
+    datos['fecha'] = fecha or timezone.now()
+    return datos
+
+
+def registrar_lote(items, usuario):
+    """Registra un lote de ventas de una terminal en una sola transacción.
+
+    Devuelve un resultado por venta, en el mismo orden, con su estado:
+    ``creada``, ``duplicada`` (el UUID ya se registró, también si la venta
+    ya se archivó: reenviar es seguro), ``sin_stock`` o ``invalida``. El stock
+    disponible (sin las reservas activas) de todo el lote se lee con una
+    consulta y se asigna a las ventas en orden; las aceptadas se insertan con
+    bulk_create y el descuento se hace una vez por producto y tienda.
+
+    Puede lanzar ``StockInsuficiente`` si otra venta concurrente se adelanta o
+    ``LoteDuplicado`` si otra subida registró los mismos UUID; en ambos casos
+    no se guarda nada y se puede reintentar.
+    """
+    resultados = [None] * len(items)
+    validas = []
+    vistos = set()
+    for indice, item in enumerate(items):
+        try:
+            datos = _validar_item(item)
+        except ValueError as e:
+            resultados[indice] = {
+                'uuid': item.get('uuid') if isinstance(item, dict) else None,
+                'estado': INVALIDA,
+                'error': str(e),
+            }
+            continue
+        if datos['uuid'] in vistos:
+            resultados[indice] = {'uuid': str(datos['uuid']), 'estado': DUPLICADA}
+            continue
+        vistos.add(datos['uuid'])
+        validas.append((indice, datos))
+
+    def ids(campo):
+        return {datos[campo] for _, datos in validas}
+
+    with transaction.atomic():
+        # Bloqueo de escritura antes de leer stock y reservas (ver reservar_stock)
+        Producto.todos.filter(pk__in=ids('producto')).update(stock=F('stock'))
+
+        existentes = {}
+        if vistos:
+            for modelo in (VentaArchivada, Venta):
+                existentes.update(modelo.objects.filter(uuid__in=vistos).values_list('uuid', 'pk'))
+
+        productos = Producto.objects.select_related('categoria').in_bulk(ids('producto'))
+        clientes = Cliente.objects.in_bulk(ids('cliente'))
+        tiendas = Tienda.objects.in_bulk(ids('tienda'))
+        lugares = LugarEntrega.objects.in_bulk(ids('lugar_entrega'))
+
+        # Stock de todo el lote en una consulta: inventario por (producto, tienda);
+        # donde la tienda no lleva inventario se vende del stock central
+        inventario = {
+            (fila['producto'], fila['tienda']): fila['total']
+            for fila in Inventario.objects.filter(
+                producto__in=productos.keys(), tienda__in=tiendas.keys()
+            ).values('producto', 'tienda').annotate(total=Sum('cantidad'))
+        }
+        central = {pk: producto.stock for pk, producto in productos.items()}
+        reservado = {
+            (fila['producto'], fila['tienda']): fila['total']
+            for fila in ReservaStock.objects.filter(
+                producto__in=productos.keys(), tienda__in=tiendas.keys(), expira_en__gt=timezone.now()
+            ).values('producto', 'tienda').annotate(total=Sum('cantidad'))
+        }
+
+        nuevas = []
+        demanda = {}
+        for indice, datos in validas:
+            resultado = {'uuid': str(datos['uuid'])}
+            resultados[indice] = resultado
+            if datos['uuid'] in existentes:
+                resultado.update(estado=DUPLICADA, venta=existentes[datos['uuid']])
+                continue
+
+            producto = productos.get(datos['producto'])
+            relacionados = {
+                'cliente': clientes.get(datos['cliente']),
+                'producto': producto,
+                'tienda': tiendas.get(datos['tienda']),
+                'lugar_entrega': lugares.get(datos['lugar_entrega']),
+            }
+            faltantes = [campo for campo, objeto in relacionados.items() if objeto is None]
+            if faltantes:
+                resultado.update(estado=INVALIDA, error=f"No existe: {', '.join(faltantes)}")
+                continue
+
+            clave = (producto.pk, datos['tienda'])
+            stock, llave = (inventario, clave) if clave in inventario else (central, producto.pk)
+            # Las unidades reservadas en el formulario web no se pueden vender aquí
+            disponible = max(stock[llave] - reservado.get(clave, 0), 0)
+            if disponible < datos['cantidad']:
+                resultado.update(estado=SIN_STOCK, disponible=disponible)
+                continue
+            stock[llave] -= datos['cantidad']
+            demanda[clave] = demanda.get(clave, 0) + datos['cantidad']
+
+            # bulk_create no dispara las señales: total y snapshots se calculan aquí
+            venta = Venta(
+                uuid=datos['uuid'],
+                fecha=datos['fecha'],
+                cantidad=datos['cantidad'],
+                precio_unitario=producto.precio,
+                total=producto.precio * datos['cantidad'],
+                usuario=usuario,
+                **relacionados
+            )
+            venta.tomar_snapshots()
+            nuevas.append((resultado, venta))
+
+        if nuevas:
+            try:
+                with transaction.atomic():
+                    Venta.objects.bulk_create([venta for _, venta in nuevas])
+            except IntegrityError:
+                if Venta.objects.filter(uuid__in=[venta.uuid for _, venta in nuevas]).exists():
+                    raise LoteDuplicado()
+                raise
+            registrar_ventas([venta for _, venta in nuevas])
+            for (producto_id, tienda_id), cantidad in demanda.items():
+                descontar_stock(productos[producto_id], tiendas[tienda_id], cantidad)
+            for producto_id in {producto_id for producto_id, _ in demanda}:
+                registrar_cambio(Producto, producto_id, solo_stock=True)
+
+            ventas = [venta for _, venta in nuevas]
+            transaction.on_commit(invalidar_reportes)
+            transaction.on_commit(lambda: publicar_lote(ventas))
+
+        for resultado, venta in nuevas:
+            resultado.update(estado=CREADA, venta=venta.pk)
+
+    return resultados
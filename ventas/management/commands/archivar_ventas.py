@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from ventas.archivo import archivar_ventas, fecha_corte
+
+
+class Command(BaseCommand):
+    help = 'Mueve las ventas más antiguas que la retención a la base de datos de archivo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=None,
+            help='Días de retención en la tabla principal (por defecto RETENCION_VENTAS_DIAS)'
+        )
+        parser.add_argument('--lote', type=int, default=1000, help='Ventas movidas por lote')
+        parser.add_argument('--pausa', type=float, default=0.1, help='Segundos de espera entre lotes')
+
+    def handle(self, *args, **options):
+        corte = fecha_corte(options['dias'])
+        self.stdout.write(f'Archivando ventas anteriores a {corte:%Y-%m-%d %H:%M}')
+        archivadas = archivar_ventas(
+            corte,
+            lote=options['lote'],
+            pausa=options['pausa'],
+            progreso=lambda n: self.stdout.write(f'{n} ventas archivadas'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Archivado terminado: {archivadas} ventas'))
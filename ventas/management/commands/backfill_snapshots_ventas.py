@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ventas.models import Venta
+
+
+class Command(BaseCommand):
+    help = 'Rellena en lotes los snapshots de nombres de las ventas históricas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Ventas actualizadas por transacción')
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        pendientes = Venta.objects.filter(producto_nombre='').select_related(
+            'cliente', 'producto__categoria', 'tienda', 'lugar_entrega', 'usuario'
+        ).order_by('pk')
+
+        ultimo_id = 0
+        actualizadas = 0
+        while True:
+            ventas = list(pendientes.filter(pk__gt=ultimo_id)[:lote])
+            if not ventas:
+                break
+
+            for venta in ventas:
+                venta.tomar_snapshots()
+            with transaction.atomic():
+                Venta.objects.bulk_update(ventas, Venta.CAMPOS_SNAPSHOT)
+
+            ultimo_id = ventas[-1].pk
+            actualizadas += len(ventas)
+            self.stdout.write(f'{actualizadas} ventas actualizadas (hasta #{ultimo_id})')
+
+        self.stdout.write(self.style.SUCCESS(f'Snapshots completos: {actualizadas} ventas actualizadas'))
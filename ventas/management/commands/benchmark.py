@@ -0,0 +1,417 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from decimal import Decimal
+
+from turron_system.hll import HyperLogLog
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, update_last_login
+from django.contrib.auth.signals import user_logged_in
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.db.models.signals import post_save
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_databases, teardown_databases
+from django.urls import reverse
+from django.db.models.functions import TruncDate
+from django.db.models import Count, Max, Sum
+
+from ventas.accesos import volcar_accesos
+from ventas.archivo import agregar_ventas
+from ventas.fields import centavos_a_decimal
+from ventas.models import PerfilUsuario, ResumenDiario, Venta, VentaArchivada
+from ventas.reportes import resumen_ventas
+from ventas.reposicion import VENTANA_DIAS, calcular, calcular_reposicion
+from ventas.resumenes import ERROR_CLIENTES, clientes_distintos
+from ventas.signals import anotar_acceso
+
+
+def medir(funcion, repeticiones):
+    """Ejecuta ``funcion`` varias veces y devuelve (mediana en ms, último resultado)"""
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), resultado
+
+
+class Command(BaseCommand):
+    help = 'Mide el rendimiento de consultas clave (usar con sembrar_datos)'
+
+    casos = ['dinero', 'reportes', 'clientes', 'reposicion', 'login']
+
+    def add_arguments(self, parser):
+        parser.add_argument('caso', choices=self.casos, help='Caso a medir')
+        parser.add_argument('--filas', type=int, default=200000, help='Filas sintéticas en memoria')
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--usuarios', type=int, default=500, help='Usuarios que inician sesión (login)')
+        parser.add_argument('--hilos', type=int, default=4, help='Logins simultáneos (login)')
+        parser.add_argument(
+            '--hash-real', action='store_true',
+            help='Login con el hash de contraseñas configurado (por defecto uno trivial para medir el resto)'
+        )
+
+    def handle(self, *args, **options):
+        metodo = getattr(self, f"caso_{options['caso']}", None)
+        if metodo is None:
+            raise CommandError(f"Caso desconocido: {options['caso']}")
+        metodo(options)
+
+    def caso_dinero(self, options):
+        """Compara SUM sobre importes decimales (REAL) frente a enteros de centavos.
+
+        En SQLite ambas sumas cuestan lo mismo: lo que se gana es exactitud.
+        """
+        azar = random.Random(1)
+        filas = [
+            (azar.randrange(1, 36), azar.randrange(1, 50000))
+            for _ in range(options['filas'])
+        ]
+        esperado = sum(Decimal(centavos) for _, centavos in filas) / 100
+
+        conn = sqlite3.connect(':memory:')
+        # Mismas afinidades que generaba DecimalField (decimal) y MonedaField (bigint)
+        conn.execute('CREATE TABLE legado (mes INTEGER, total decimal)')
+        conn.execute('CREATE TABLE centavos (mes INTEGER, total bigint)')
+        conn.executemany('INSERT INTO legado VALUES (?, ?)', [(m, c / 100) for m, c in filas])
+        conn.executemany('INSERT INTO centavos VALUES (?, ?)', filas)
+
+        def suma_legado():
+            # SQLite suma en coma flotante: se conserva el valor tal cual para ver la deriva
+            return Decimal(str(conn.execute('SELECT SUM(total) FROM legado').fetchone()[0]))
+
+        def suma_centavos():
+            valor = conn.execute('SELECT SUM(total) FROM centavos').fetchone()[0]
+            return centavos_a_decimal(valor)
+
+        def por_mes_legado():
+            return [
+                (mes, Decimal(str(valor)))
+                for mes, valor in conn.execute('SELECT mes, SUM(total) FROM legado GROUP BY mes')
+            ]
+
+        def por_mes_centavos():
+            return [
+                (mes, centavos_a_decimal(valor))
+                for mes, valor in conn.execute('SELECT mes, SUM(total) FROM centavos GROUP BY mes')
+            ]
+
+        repeticiones = options['repeticiones']
+        self.stdout.write(f"{len(filas)} importes sintéticos, {repeticiones} repeticiones (mediana)")
+        self._comparar_sumas([
+            ('SUM decimal', suma_legado),
+            ('SUM centavos', suma_centavos),
+            ('SUM por mes decimal', por_mes_legado),
+            ('SUM por mes centavos', por_mes_centavos),
+        ], esperado, repeticiones)
+
+        # Las mismas sumas sobre las ventas de la base configurada
+        n = Venta.objects.count()
+        if not n:
+            self.stdout.write('Sin ventas en la base de datos: ejecute sembrar_datos para medir el ORM')
+            return
+        if connection.vendor != 'sqlite':
+            self.stdout.write('La comparación con importes decimales solo está disponible en SQLite')
+            return
+        tabla = Venta._meta.db_table
+        mes = "strftime('%Y-%m', fecha)"
+
+        def consultar(sql):
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+                return cursor.fetchall()
+
+        # Los importes como los guardaba DecimalField (afinidad decimal, REAL) en una
+        # tabla temporal de la conexión: no se escribe en la base de datos
+        consultar('DROP TABLE IF EXISTS temp.benchmark_decimal')
+        consultar('CREATE TEMP TABLE benchmark_decimal (fecha datetime, total decimal)')
+        try:
+            consultar(f'INSERT INTO temp.benchmark_decimal SELECT fecha, total / 100.0 FROM {tabla}')
+            self.stdout.write(f"Ventas de la base de datos ({n}):")
+            self._comparar_sumas([
+                ('SUM decimal', lambda: Decimal(str(
+                    consultar('SELECT SUM(total) FROM temp.benchmark_decimal')[0][0]
+                ))),
+                ('Sum(total) centavos', lambda: Venta.objects.aggregate(total=Sum('total'))['total']),
+                ('SUM por mes decimal', lambda: [
+                    (clave, Decimal(str(valor)))
+                    for clave, valor in consultar(
+                        f'SELECT {mes} AS mes, SUM(total) FROM temp.benchmark_decimal GROUP BY mes'
+                    )
+                ]),
+                ('SUM por mes centavos', lambda: [
+                    (clave, centavos_a_decimal(valor))
+                    for clave, valor in consultar(f'SELECT {mes} AS mes, SUM(total) FROM {tabla} GROUP BY mes')
+                ]),
+            ], Venta.objects.aggregate(total=Sum('total'))['total'], repeticiones)
+        finally:
+            consultar('DROP TABLE temp.benchmark_decimal')
+
+    def _comparar_sumas(self, casos, esperado, repeticiones):
+        """Tiempo de cada suma y su desviación respecto al total exacto ``esperado``"""
+        for nombre, funcion in casos:
+            ms, resultado = medir(funcion, repeticiones)
+            if isinstance(resultado, list):
+                resultado = sum(total for _, total in resultado)
+            exacto = 'exacto' if resultado == esperado else f'desviación {resultado - esperado}'
+            self.stdout.write(f"  {nombre:<22} {ms:9.2f} ms  {exacto}")
+
+    def caso_reportes(self, options):
+        """Resumen de ventas del reporte de ganancias: consulta única frente al pool tienda × meses"""
+        n = Venta.objects.count() + VentaArchivada.objects.count()
+        if not n:
+            raise CommandError('Sin ventas en la base de datos: ejecute sembrar_datos primero')
+        repeticiones = options['repeticiones']
+        self.stdout.write(
+            f"{n} ventas (activas y archivadas), {os.cpu_count()} núcleos, {repeticiones} repeticiones (mediana)"
+        )
+
+        ms, _ = medir(
+            lambda: agregar_ventas(
+                agrupar=['producto_id'],
+                nombre=Max('producto_nombre'),
+                total_vendido=Sum('cantidad'),
+                ingresos=Sum('total'),
+                suma_precios=Sum('precio_unitario'),
+                num_ventas=Count('pk')
+            ),
+            repeticiones
+        )
+        self.stdout.write(f"  {'ORM GROUP BY producto':<22} {ms:9.2f} ms")
+
+        serie, esperado = medir(lambda: resumen_ventas(procesos=1), repeticiones)
+        self.stdout.write(f"  {'Consulta, 1 proceso':<22} {serie:9.2f} ms")
+        for procesos in sorted({2, 4, os.cpu_count() or 1} - {1}):
+            # La primera llamada arranca el pool; no se cuenta
+            resumen_ventas(procesos=procesos)
+            ms, resultado = medir(lambda: resumen_ventas(procesos=procesos), repeticiones)
+            igual = 'igual' if resultado == esperado else 'DIFERENTE'
+            self.stdout.write(
+                f"  {f'Pool, {procesos} procesos':<22} {ms:9.2f} ms  x{serie / ms:.2f}  {igual}"
+            )
+
+    def caso_clientes(self, options):
+        """Clientes distintos: COUNT(DISTINCT) exacto frente a la fusión de sketches HyperLogLog"""
+        self.stdout.write(f"Error estándar teórico: {ERROR_CLIENTES:.2%}")
+        for cardinalidad in (100, 1000, 10000, options['filas']):
+            sketch = HyperLogLog()
+            for valor in range(cardinalidad):
+                sketch.agregar(valor)
+            error = (sketch.estimar() - cardinalidad) / cardinalidad
+            self.stdout.write(f"  {cardinalidad:>9} distintos sintéticos: estimado {sketch.estimar():>9} ({error:+.2%})")
+
+        if not ResumenDiario.objects.exists():
+            raise CommandError('Sin resúmenes diarios: ejecute reconstruir_resumenes primero')
+        repeticiones = options['repeticiones']
+
+        def exacto(desde=None, hasta=None, tiendas=None):
+            # Las ventas viven en dos bases de datos: la unión exacta se hace en Python
+            clientes = set()
+            for modelo in (Venta, VentaArchivada):
+                consulta = modelo.objects.annotate(dia=TruncDate('fecha'))
+                if desde:
+                    consulta = consulta.filter(dia__gte=desde)
+                if hasta:
+                    consulta = consulta.filter(dia__lte=hasta)
+                if tiendas:
+                    consulta = consulta.filter(tienda_id__in=tiendas)
+                clientes.update(consulta.values_list('cliente_id', flat=True).distinct().order_by())
+            return len(clientes)
+
+        ultimo = ResumenDiario.objects.order_by('-fecha').values_list('fecha', flat=True).first()
+        mes = ultimo.replace(day=1)
+        tienda = ResumenDiario.objects.values_list('tienda_id', flat=True).first()
+        rangos = [
+            ('Todo el historial', {}),
+            ('Último mes', {'desde': mes, 'hasta': ultimo}),
+            ('Último mes, 1 tienda', {'desde': mes, 'hasta': ultimo, 'tiendas': [tienda]}),
+            ('Último año, 1 tienda', {'desde': ultimo.replace(year=ultimo.year - 1), 'tiendas': [tienda]}),
+        ]
+        for nombre, filtros in rangos:
+            ms_exacto, real = medir(lambda: exacto(**filtros), repeticiones)
+            ms_sketch, grupos = medir(lambda: clientes_distintos(**filtros), repeticiones)
+            estimado = grupos[None][0] if grupos else 0
+            error = (estimado - real) / real if real else 0
+            self.stdout.write(
+                f"  {nombre:<22} exacto {real:>7} en {ms_exacto:8.2f} ms | "
+                f"sketch {estimado:>7} en {ms_sketch:8.2f} ms ({error:+.2%})"
+            )
+
+    def caso_reposicion(self, options):
+        """Motor de reposición: cálculo vectorizado sobre un catálogo sintético y sobre la base de datos"""
+        repeticiones = options['repeticiones']
+        productos = options['filas'] // 2
+        tiendas = 4
+        series = productos * tiendas
+        # Un día de cada tres con venta, en promedio, para cada serie
+        rng = random.Random(42)
+        serie, dia, cantidad = [], [], []
+        for indice in range(series):
+            for d in rng.sample(range(VENTANA_DIAS), rng.randint(0, VENTANA_DIAS // 3 * 2)):
+                serie.append(indice)
+                dia.append(d)
+                cantidad.append(rng.randint(1, 12))
+        stock = [rng.randint(0, 200) for _ in range(series)]
+        self.stdout.write(f"{productos} productos × {tiendas} tiendas = {series} series, {len(serie)} días con venta")
+
+        ms, resultado = medir(lambda: calcular(serie, dia, cantidad, stock), repeticiones)
+        self.stdout.write(
+            f"  {'Cálculo vectorizado':<22} {ms:9.2f} ms  ({int((resultado['sugerida'] > 0).sum())} a reponer)"
+        )
+
+        ms, guardadas = medir(calcular_reposicion, repeticiones)
+        self.stdout.write(f"  {'Base de datos completa':<22} {ms:9.2f} ms  ({guardadas} series guardadas)")
+
+    def caso_login(self, options):
+        """Inicio de turno: muchos usuarios inician sesión a la vez en Django y en Flask"""
+        usuarios = options['usuarios']
+        hilos = options['hilos']
+        contrasena = 'turno-benchmark'
+        self.stdout.write(f"{usuarios} usuarios, {hilos} logins simultáneos")
+
+        # El hash de contraseñas domina un login y no depende del resto del camino:
+        # se mide aparte y, salvo --hash-real, se usa uno trivial
+        codificado = make_password(contrasena)
+        ms, _ = medir(lambda: User(password=codificado).check_password(contrasena), 3)
+        self.stdout.write(f"  {'Hash Django':<34} {ms:9.2f} ms por login (tope {1000 / ms:7.1f} logins/s por núcleo)")
+        hashers = {} if options['hash_real'] else {
+            'PASSWORD_HASHERS': ['django.contrib.auth.hashers.MD5PasswordHasher']
+        }
+
+        def perfil_legado(sender, instance, **kwargs):
+            # Comportamiento anterior de guardar_perfil_usuario: consulta y guarda siempre
+            if hasattr(instance, 'perfilusuario'):
+                instance.perfilusuario.save()
+
+        configuraciones = [
+            ('BD + last_login por login + perfil', 'db', True),
+            ('BD + last_login por lotes', 'db', False),
+            ('cached_db + last_login por lotes', 'cached_db', False),
+            ('signed_cookies + last_login por lotes', 'signed_cookies', False),
+        ]
+        nombres = [f'benchmark_turno_{i}' for i in range(usuarios)]
+        # Usuarios, perfiles y sesiones van a una base de pruebas desechable: los
+        # logins llegan por varias conexiones, así que no basta una transacción
+        # que se deshaga al final
+        with tempfile.TemporaryDirectory() as directorio, self._base_desechable(directorio), \
+                override_settings(**hashers):
+            codificado = make_password(contrasena)
+            creados = User.objects.bulk_create([User(username=nombre, password=codificado) for nombre in nombres])
+            PerfilUsuario.objects.bulk_create([PerfilUsuario(usuario=usuario) for usuario in creados])
+
+            for nombre, motor, legado in configuraciones:
+                if legado:
+                    user_logged_in.disconnect(anotar_acceso)
+                    user_logged_in.connect(update_last_login, dispatch_uid='update_last_login')
+                    post_save.connect(perfil_legado, sender=User, dispatch_uid='benchmark_perfil_legado')
+                try:
+                    with override_settings(SESSION_ENGINE=f'django.contrib.sessions.backends.{motor}'):
+                        consultas, por_segundo = self._tormenta_django(nombres, contrasena, hilos)
+                finally:
+                    if legado:
+                        post_save.disconnect(sender=User, dispatch_uid='benchmark_perfil_legado')
+                        user_logged_in.disconnect(dispatch_uid='update_last_login')
+                        user_logged_in.connect(anotar_acceso)
+                self.stdout.write(
+                    f"  Django {nombre:<40} {por_segundo:8.1f} logins/s  {consultas:2} consultas por login"
+                )
+
+        self._tormenta_flask(usuarios, contrasena, hilos, options['hash_real'])
+
+    @contextmanager
+    def _base_desechable(self, directorio):
+        """Base de pruebas nueva y migrada en lugar de la configurada (SQLite en ``directorio``)"""
+        prueba = connection.settings_dict.setdefault('TEST', {})
+        nombre_prueba = prueba.get('NAME')
+        if connection.vendor == 'sqlite':
+            # En archivo y no en memoria: los logins llegan por varias conexiones
+            prueba['NAME'] = os.path.join(directorio, 'login.sqlite3')
+        antiguas = setup_databases(verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS})
+        try:
+            yield
+        finally:
+            teardown_databases(antiguas, verbosity=0)
+            prueba['NAME'] = nombre_prueba
+
+    def _tormenta_django(self, nombres, contrasena, hilos):
+        """Login y primera petición de cada usuario; devuelve (consultas por login, logins/s)"""
+        url_login = reverse('login')
+        url_inicio = reverse('api_mapa_calor')
+
+        def entrar(nombre):
+            cliente = Client(HTTP_HOST='localhost')
+            respuesta = cliente.post(url_login, {'username': nombre, 'password': contrasena})
+            if respuesta.status_code != 302:
+                raise CommandError(f'Login fallido para {nombre}: {respuesta.status_code}')
+            cliente.get(url_inicio)
+
+        # Consultas de un login suelto (el primero vuelca lo pendiente de la configuración anterior)
+        volcar_accesos()
+        with CaptureQueriesContext(connection) as capturadas:
+            Client(HTTP_HOST='localhost').post(url_login, {'username': nombres[0], 'password': contrasena})
+
+        def tanda(grupo):
+            try:
+                for nombre in grupo:
+                    entrar(nombre)
+            finally:
+                connection.close()
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(hilos) as pool:
+            list(pool.map(tanda, [nombres[i::hilos] for i in range(hilos)]))
+        volcar_accesos()
+        return len(capturadas), len(nombres) / (time.perf_counter() - inicio)
+
+    def _tormenta_flask(self, usuarios, contrasena, hilos, hash_real):
+        """Misma tormenta contra la ruta login de la aplicación Flask, en una base temporal"""
+        try:
+            import app as aplicacion_flask
+        except ImportError:
+            self.stdout.write('  Flask no está instalado: se omite la aplicación Flask')
+            return
+        from werkzeug.security import check_password_hash, generate_password_hash
+
+        codificado = generate_password_hash(contrasena)
+        ms, _ = medir(lambda: check_password_hash(codificado, contrasena), 3)
+        self.stdout.write(f"  {'Hash Flask':<34} {ms:9.2f} ms por login (tope {1000 / ms:7.1f} logins/s por núcleo)")
+        if not hash_real:
+            codificado = generate_password_hash(contrasena, method='pbkdf2:sha256:1')
+
+        base_original = aplicacion_flask.DATABASE
+        with tempfile.TemporaryDirectory() as directorio:
+            aplicacion_flask.DATABASE = os.path.join(directorio, 'login.db')
+            try:
+                aplicacion_flask.init_db()
+                conn = aplicacion_flask.get_db_connection()
+                conn.executemany(
+                    'INSERT INTO usuarios (nombre, email, password) VALUES (?, ?, ?)',
+                    [(f'Turno {i}', f'turno{i}@benchmark', codificado) for i in range(usuarios)]
+                )
+                conn.commit()
+                conn.close()
+
+                def tanda(indices):
+                    cliente = aplicacion_flask.app.test_client()
+                    for i in indices:
+                        respuesta = cliente.post(
+                            '/login', data={'email': f'turno{i}@benchmark', 'password': contrasena}
+                        )
+                        if respuesta.status_code != 302:
+                            raise CommandError(f'Login Flask fallido para turno{i}: {respuesta.status_code}')
+
+                inicio = time.perf_counter()
+                with ThreadPoolExecutor(hilos) as pool:
+                    list(pool.map(tanda, [range(i, usuarios, hilos) for i in range(hilos)]))
+                por_segundo = usuarios / (time.perf_counter() - inicio)
+            finally:
+                aplicacion_flask.DATABASE = base_original
+        self.stdout.write(f"  Flask {'login (sesión en cookie firmada)':<41} {por_segundo:8.1f} logins/s")
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ventas.reposicion import CICLO_DIAS, NIVEL_SERVICIO_Z, PLAZO_DIAS, VENTANA_DIAS, calcular_reposicion
+
+
+class Command(BaseCommand):
+    help = 'Calcula el punto de reorden y la reposición sugerida de cada producto y tienda'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ventana', type=int, default=VENTANA_DIAS, help='Días de historial de demanda')
+        parser.add_argument('--plazo', type=int, default=PLAZO_DIAS, help='Días de entrega del proveedor')
+        parser.add_argument('--ciclo', type=int, default=CICLO_DIAS, help='Días que cubre cada pedido')
+        parser.add_argument('--z', type=float, default=NIVEL_SERVICIO_Z, help='Factor del nivel de servicio')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        series = calcular_reposicion(options['ventana'], options['plazo'], options['ciclo'], options['z'])
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f'{series} series calculadas en {segundos:.1f} s'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from ventas.segmentos import calcular_segmentos
+
+
+class Command(BaseCommand):
+    help = 'Calcula los segmentos RFM de los clientes (solo los que tienen ventas nuevas, salvo --completo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Recalcular los agregados de todos los clientes (tras eliminar ventas)'
+        )
+
+    def handle(self, *args, **options):
+        recalculados, cambiados = calcular_segmentos(completo=options['completo'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{recalculados} clientes recalculados, {cambiados} con puntaje o segmento nuevo'
+        ))
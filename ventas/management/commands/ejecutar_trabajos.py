@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from turron_system.cola import ejecutar_pool
+from ventas.trabajos import cola, trabajador
+
+
+def _proceso_trabajador(espera):
+    """Punto de entrada de cada proceso del pool (se crea con spawn: hay que cargar Django)"""
+    import django
+    django.setup()
+
+    try:
+        trabajador(espera=espera).bucle()
+    except KeyboardInterrupt:
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta la cola de trabajos en segundo plano (exportaciones, eliminaciones, catálogo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=2, help='Procesos trabajadores en paralelo')
+        parser.add_argument('--espera', type=float, default=1.0, help='Segundos entre consultas con la cola vacía')
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Ejecutar en este proceso los trabajos pendientes y terminar'
+        )
+        parser.add_argument('--retencion', type=int, default=7, help='Días que se guardan los trabajos terminados')
+
+    def handle(self, *args, **options):
+        borrados = cola().limpiar(options['retencion'])
+        if borrados:
+            self.stdout.write(f'{borrados} trabajos antiguos eliminados')
+
+        if options['una_vez']:
+            actual = trabajador(espera=options['espera'])
+            ejecutados = 0
+            while actual.ejecutar_siguiente():
+                ejecutados += 1
+            self.stdout.write(self.style.SUCCESS(f'{ejecutados} trabajos ejecutados'))
+            return
+
+        self.stdout.write(f"Iniciando {options['procesos']} trabajadores (Ctrl+C para detener)")
+        ejecutar_pool(options['procesos'], _proceso_trabajador, options['espera'])
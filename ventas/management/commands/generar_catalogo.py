@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ventas.catalogo import generar_catalogo
+
+
+class Command(BaseCommand):
+    help = 'Genera el catálogo precompilado para las terminales (una vez o en bucle como proceso de fondo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forzar', action='store_true', help='Regenerar aunque la versión ya exista')
+        parser.add_argument('--conservar', type=int, default=3, help='Versiones anteriores que se mantienen')
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=0,
+            help='Segundos entre comprobaciones; 0 genera una sola vez'
+        )
+
+    def handle(self, *args, **options):
+        ultima = None
+        while True:
+            ruta = generar_catalogo(forzar=options['forzar'], conservar=options['conservar'])
+            if ruta != ultima:
+                self.stdout.write(f'Catálogo disponible: {ruta.name} ({ruta.stat().st_size} bytes)')
+                ultima = ruta
+            if not options['intervalo']:
+                return
+            time.sleep(options['intervalo'])
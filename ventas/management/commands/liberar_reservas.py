@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ventas.inventario import liberar_reservas_vencidas
+
+
+class Command(BaseCommand):
+    help = 'Libera las reservas de stock vencidas (una vez o en bucle como proceso de fondo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Reservas borradas por transacción')
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=0,
+            help='Segundos entre barridos; 0 ejecuta un único barrido'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            liberadas = liberar_reservas_vencidas(lote=options['lote'])
+            if liberadas or not options['intervalo']:
+                self.stdout.write(f'{liberadas} reservas vencidas liberadas')
+            if not options['intervalo']:
+                return
+            time.sleep(options['intervalo'])
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ventas.eliminacion import LOTE_ELIMINACION, eliminaciones_pendientes, ejecutar_eliminacion
+
+
+class Command(BaseCommand):
+    help = 'Termina las eliminaciones de clientes y productos pendientes (una vez o en bucle como proceso de fondo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=LOTE_ELIMINACION, help='Ventas borradas por transacción')
+        parser.add_argument('--pausa', type=float, default=0.1, help='Segundos de espera entre lotes')
+        parser.add_argument('--reintentar', action='store_true', help='Reintentar también las eliminaciones fallidas')
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=0,
+            help='Segundos entre comprobaciones; 0 procesa las pendientes una sola vez'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            for eliminacion in eliminaciones_pendientes(reintentar=options['reintentar']):
+                self.stdout.write(f'Eliminando {eliminacion.modelo} {eliminacion.descripcion}...')
+                try:
+                    eliminacion = ejecutar_eliminacion(
+                        eliminacion.pk, lote=options['lote'], pausa=options['pausa']
+                    )
+                except Exception as e:
+                    self.stderr.write(f'  Falló: {e}')
+                    continue
+                self.stdout.write(self.style.SUCCESS(f'  {eliminacion.borradas} ventas borradas'))
+            if not options['intervalo']:
+                return
+            time.sleep(options['intervalo'])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ventas.resumenes import reconstruir_resumenes
+
+
+class Command(BaseCommand):
+    help = (
+        'Rehace los resúmenes diarios (clientes distintos) y el mapa de calor de las tiendas desde las ventas; '
+        'necesario tras migrar una base con ventas'
+    )
+
+    def handle(self, *args, **options):
+        resumenes = reconstruir_resumenes()
+        self.stdout.write(self.style.SUCCESS(f'{resumenes} resúmenes diarios reconstruidos'))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ventas.replicacion import LOTE_REPLICACION, ReplicacionNoDisponible, replicar_flask
+
+
+class Command(BaseCommand):
+    help = (
+        'Copia a la base de Django los cambios de la base Flask desde la última pasada '
+        '(una vez o en bucle como proceso de fondo; un solo proceso a la vez)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base', default=None, help='Ruta de la base Flask (por defecto, FLASK_DATABASE)')
+        parser.add_argument('--lote', type=int, default=LOTE_REPLICACION, help='Filas por transacción')
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=0,
+            help='Segundos entre pasadas; 0 replica una sola vez'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            inicio = time.perf_counter()
+            try:
+                resultado, replicador = replicar_flask(options['base'], options['lote'])
+            except ReplicacionNoDisponible as e:
+                raise CommandError(str(e))
+            segundos = time.perf_counter() - inicio
+
+            cambios = {tabla: totales for tabla, totales in resultado.items() if any(totales)}
+            if cambios or not options['intervalo']:
+                self.stdout.write(f'Réplica hasta la secuencia {replicador.tope} en {segundos:.2f} s')
+            for tabla, (escritas, borradas, omitidas) in cambios.items():
+                linea = f'  {tabla:<20} {escritas:>8} escritas {borradas:>6} borradas'
+                if omitidas:
+                    linea += f' {omitidas:>6} omitidas (referencias sin copiar, se reintentan)'
+                self.stdout.write(linea)
+
+            if not options['intervalo']:
+                return
+            time.sleep(options['intervalo'])
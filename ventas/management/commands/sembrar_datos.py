@@ -0,0 +1,100 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from ventas.models import Categoria, Cliente, LugarEntrega, PrecioHistorico, Producto, Tienda, Venta
+
+
+class Command(BaseCommand):
+    help = 'Genera un conjunto de datos sintético para benchmarks (no usar en producción)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ventas', type=int, default=100000, help='Número de ventas a generar')
+        parser.add_argument('--productos', type=int, default=200)
+        parser.add_argument('--clientes', type=int, default=5000)
+        parser.add_argument('--tiendas', type=int, default=8)
+        parser.add_argument('--meses', type=int, default=36, help='Meses de historia hacia atrás')
+        parser.add_argument('--lote', type=int, default=5000, help='Ventas insertadas por transacción')
+        parser.add_argument('--semilla', type=int, default=2024)
+
+    def handle(self, *args, **options):
+        azar = random.Random(options['semilla'])
+
+        usuario, _ = User.objects.get_or_create(username='benchmark', defaults={'is_active': False})
+        categorias = [
+            Categoria.objects.get_or_create(nombre_categoria=nombre)[0]
+            for nombre in ['Turrones', 'Dulces', 'Chocolates', 'Mazapanes', 'Polvorones']
+        ]
+        lugares = [
+            LugarEntrega.objects.get_or_create(nombre_lugar=nombre, defaults={'direccion': nombre})[0]
+            for nombre in ['Domicilio', 'Punto de Recogida']
+        ]
+        tiendas = Tienda.objects.bulk_create([
+            Tienda(nombre_tienda=f'Tienda {i + 1}', ubicacion=f'Zona {i + 1}')
+            for i in range(options['tiendas'])
+        ])
+        productos = Producto.objects.bulk_create([
+            Producto(
+                nombre=f'Producto {i + 1}',
+                precio=Decimal(azar.randrange(99, 5000)) / 100,
+                stock=azar.randrange(0, 500),
+                categoria=azar.choice(categorias),
+            )
+            for i in range(options['productos'])
+        ])
+        clientes = Cliente.objects.bulk_create([
+            Cliente(nombre=f'Cliente {i + 1}', apellido=f'Apellido {i % 97}')
+            for i in range(options['clientes'])
+        ])
+
+        ahora = timezone.now()
+        segundos_historia = options['meses'] * 30 * 24 * 3600
+        # Las ventas generadas son anteriores a la creación: el precio rige desde el inicio
+        PrecioHistorico.objects.bulk_create([
+            PrecioHistorico(
+                producto=producto, precio=producto.precio, vigente_desde=ahora - timedelta(seconds=segundos_historia)
+            )
+            for producto in productos
+        ])
+        creadas = 0
+        while creadas < options['ventas']:
+            n = min(options['lote'], options['ventas'] - creadas)
+            ventas = []
+            for _ in range(n):
+                producto = azar.choice(productos)
+                cliente = azar.choice(clientes)
+                tienda = azar.choice(tiendas)
+                lugar = azar.choice(lugares)
+                cantidad = azar.randrange(1, 6)
+                # bulk_create no dispara señales: total y snapshots se calculan aquí
+                ventas.append(Venta(
+                    fecha=ahora - timedelta(seconds=azar.randrange(segundos_historia)),
+                    cantidad=cantidad,
+                    precio_unitario=producto.precio,
+                    total=producto.precio * cantidad,
+                    cliente=cliente,
+                    producto=producto,
+                    tienda=tienda,
+                    lugar_entrega=lugar,
+                    usuario=usuario,
+                    cliente_nombre=cliente.nombre_completo,
+                    producto_nombre=producto.nombre,
+                    categoria_nombre=producto.categoria.nombre_categoria,
+                    tienda_nombre=tienda.nombre_tienda,
+                    lugar_entrega_nombre=lugar.nombre_lugar,
+                    usuario_nombre=usuario.username,
+                ))
+            with transaction.atomic():
+                Venta.objects.bulk_create(ventas)
+            creadas += n
+            self.stdout.write(f'{creadas} ventas generadas')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Datos de benchmark listos: {len(productos)} productos, {len(clientes)} clientes, '
+            f'{len(tiendas)} tiendas, {creadas} ventas'
+        ))
@@ -0,0 +1,135 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Lo que hace un worker antes de atender su primera petición
+ARRANQUES = {
+    'django': (
+        'import turron_system.wsgi\n'
+        'from django.urls import get_resolver\n'
+        'get_resolver().url_patterns\n'
+    ),
+    'flask': (
+        'import app\n'
+        'app.init_db()\n'
+    ),
+}
+
+
+def parsear_importtime(salida):
+    """Filas ``(modulo, propio_us, acumulado_us)`` de la salida de ``-X importtime``"""
+    filas = []
+    for linea in salida.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea:
+            continue
+        propio, acumulado, modulo = linea[len('import time:'):].split('|')
+        filas.append((modulo.strip(), int(propio), int(acumulado)))
+    return filas
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el arranque en frío de los workers de Django y Flask con python -X importtime '
+        'y lo guarda en un historial para comparar entre versiones'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--app', choices=[*ARRANQUES, 'ambas'], default='ambas')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Arranques medidos (mediana)')
+        parser.add_argument('--top', type=int, default=10, help='Paquetes y módulos más lentos que se muestran')
+        parser.add_argument('--etiqueta', default='', help='Versión del registro (por defecto, git describe)')
+        parser.add_argument('--no-guardar', action='store_true', help='No agregar la medición al historial')
+
+    def handle(self, *args, **options):
+        apps = list(ARRANQUES) if options['app'] == 'ambas' else [options['app']]
+        etiqueta = options['etiqueta'] or self._version()
+        for nombre in apps:
+            registro = self._medir(nombre, options['repeticiones'])
+            registro.update(app=nombre, etiqueta=etiqueta, fecha=datetime.now().isoformat(timespec='seconds'))
+            anterior = self._anterior(nombre)
+            self._mostrar(registro, anterior, options['top'])
+            if not options['no_guardar']:
+                historial = settings.ARRANQUE_HISTORIAL
+                os.makedirs(os.path.dirname(historial), exist_ok=True)
+                with open(historial, 'a', encoding='utf-8') as archivo:
+                    archivo.write(json.dumps(registro) + '\n')
+
+    def _ejecutar(self, codigo, *opciones):
+        inicio = time.perf_counter()
+        proceso = subprocess.run(
+            [sys.executable, *opciones, '-c', codigo],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        ms = (time.perf_counter() - inicio) * 1000
+        if proceso.returncode:
+            raise CommandError(f'El arranque falló:\n{proceso.stderr[-2000:]}')
+        return ms, proceso.stderr
+
+    def _medir(self, nombre, repeticiones):
+        """Mediana del arranque sin instrumentar y desglose de una pasada con -X importtime"""
+        codigo = ARRANQUES[nombre]
+        # La primera pasada calienta los .pyc y la caché de disco; no se cuenta
+        self._ejecutar(codigo)
+        ms = statistics.median(self._ejecutar(codigo)[0] for _ in range(repeticiones))
+        base = statistics.median(self._ejecutar('pass')[0] for _ in range(repeticiones))
+
+        filas = parsear_importtime(self._ejecutar(codigo, '-X', 'importtime')[1])
+        paquetes = {}
+        for modulo, propio, _ in filas:
+            paquete = modulo.split('.')[0]
+            paquetes[paquete] = paquetes.get(paquete, 0) + propio
+        return {
+            'ms': round(ms, 1),
+            'interprete_ms': round(base, 1),
+            'importaciones_ms': round(sum(propio for _, propio, _ in filas) / 1000, 1),
+            'modulos': len(filas),
+            'paquetes': {paquete: round(us / 1000, 1) for paquete, us in paquetes.items()},
+            'lentos': [(modulo, round(propio / 1000, 1)) for modulo, propio, _ in sorted(filas, key=lambda f: -f[1])[:50]],
+        }
+
+    def _anterior(self, nombre):
+        """Última medición guardada de ``nombre``, o None"""
+        try:
+            with open(settings.ARRANQUE_HISTORIAL, encoding='utf-8') as archivo:
+                registros = [json.loads(linea) for linea in archivo if linea.strip()]
+        except FileNotFoundError:
+            return None
+        return next((r for r in reversed(registros) if r['app'] == nombre), None)
+
+    def _mostrar(self, registro, anterior, top):
+        linea = (
+            f"{registro['app']}: {registro['ms']:.1f} ms hasta la primera petición "
+            f"(intérprete {registro['interprete_ms']:.1f} ms, {registro['modulos']} módulos, "
+            f"{registro['importaciones_ms']:.1f} ms importando)"
+        )
+        if anterior:
+            linea += f"; antes {anterior['ms']:.1f} ms ({anterior['etiqueta'] or anterior['fecha']})"
+        self.stdout.write(linea)
+
+        self.stdout.write('  Paquetes (tiempo de importación propio):')
+        paquetes = sorted(registro['paquetes'].items(), key=lambda p: -p[1])[:top]
+        for paquete, ms in paquetes:
+            cambio = ''
+            if anterior:
+                cambio = f"  {ms - anterior['paquetes'].get(paquete, 0):+8.1f} ms"
+            self.stdout.write(f'    {paquete:<30} {ms:8.1f} ms{cambio}')
+        self.stdout.write('  Módulos más lentos:')
+        for modulo, ms in registro['lentos'][:top]:
+            self.stdout.write(f'    {modulo:<50} {ms:8.1f} ms')
+
+    def _version(self):
+        try:
+            return subprocess.run(
+                ['git', 'describe', '--always', '--dirty'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ''
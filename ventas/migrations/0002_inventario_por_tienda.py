@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Inventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField(default=0, verbose_name='Sub-contador')),
+                ('cantidad', models.PositiveIntegerField(default=0, verbose_name='Cantidad')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventarios', to='ventas.producto', verbose_name='Producto')),
+                ('tienda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventarios', to='ventas.tienda', verbose_name='Tienda')),
+            ],
+            options={
+                'verbose_name': 'Inventario',
+                'verbose_name_plural': 'Inventarios',
+                'ordering': ['producto', 'tienda', 'shard'],
+                'indexes': [models.Index(fields=['tienda', 'producto'], name='inventario_tienda_producto')],
+                'constraints': [models.UniqueConstraint(fields=('producto', 'tienda', 'shard'), name='inventario_producto_tienda_shard_unico')],
+            },
+        ),
+    ]
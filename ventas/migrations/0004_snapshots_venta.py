@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0003_reservas_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='categoria_nombre',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Categoría del producto'),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='cliente_nombre',
+            field=models.CharField(blank=True, default='', max_length=201, verbose_name='Nombre del cliente'),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='lugar_entrega_nombre',
+            field=models.CharField(blank=True, default='', max_length=200, verbose_name='Nombre del lugar de entrega'),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='producto_nombre',
+            field=models.CharField(blank=True, default='', max_length=200, verbose_name='Nombre del producto'),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='tienda_nombre',
+            field=models.CharField(blank=True, default='', max_length=200, verbose_name='Nombre de la tienda'),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='usuario_nombre',
+            field=models.CharField(blank=True, default='', max_length=150, verbose_name='Usuario'),
+        ),
+    ]
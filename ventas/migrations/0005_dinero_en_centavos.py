@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:48
+
+import django.core.validators
+import ventas.fields
+from decimal import Decimal
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0004_snapshots_venta'),
+    ]
+
+    operations = [
+        # Los importes existentes pasan de unidades a centavos antes de cambiar
+        # el tipo de columna; al revertir se dividen después de restaurarlo.
+        migrations.RunSQL(
+            sql=[
+                'UPDATE ventas_producto SET precio = CAST(ROUND(precio * 100) AS INTEGER)',
+                'UPDATE ventas_venta SET precio_unitario = CAST(ROUND(precio_unitario * 100) AS INTEGER), '
+                'total = CAST(ROUND(total * 100) AS INTEGER)',
+            ],
+            reverse_sql=[
+                'UPDATE ventas_producto SET precio = precio / 100.0',
+                'UPDATE ventas_venta SET precio_unitario = precio_unitario / 100.0, total = total / 100.0',
+            ],
+        ),
+        migrations.AlterField(
+            model_name='producto',
+            name='precio',
+            field=ventas.fields.MonedaField(validators=[django.core.validators.MinValueValidator(Decimal('0.01'))], verbose_name='Precio'),
+        ),
+        migrations.AlterField(
+            model_name='venta',
+            name='precio_unitario',
+            field=ventas.fields.MonedaField(validators=[django.core.validators.MinValueValidator(Decimal('0.01'))], verbose_name='Precio unitario'),
+        ),
+        migrations.AlterField(
+            model_name='venta',
+            name='total',
+            field=ventas.fields.MonedaField(validators=[django.core.validators.MinValueValidator(Decimal('0.01'))], verbose_name='Total'),
+        ),
+    ]
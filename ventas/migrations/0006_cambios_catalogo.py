@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:54
+
+from django.db import migrations, models
+
+
+MODELOS = [
+    ('categoria', 'Categoria'),
+    ('tienda', 'Tienda'),
+    ('lugar_entrega', 'LugarEntrega'),
+    ('cliente', 'Cliente'),
+    ('producto', 'Producto'),
+]
+
+
+def poblar_feed(apps, schema_editor):
+    """Registra el catálogo existente para que una sincronización desde 0 lo reciba completo"""
+    CambioCatalogo = apps.get_model('ventas', 'CambioCatalogo')
+    for nombre, modelo in MODELOS:
+        ids = apps.get_model('ventas', modelo).objects.order_by('pk').values_list('pk', flat=True)
+        CambioCatalogo.objects.bulk_create(
+            [CambioCatalogo(modelo=nombre, objeto_id=pk, operacion='guardar') for pk in ids.iterator()],
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0005_dinero_en_centavos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioCatalogo',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False, verbose_name='Secuencia')),
+                ('modelo', models.CharField(max_length=30, verbose_name='Modelo')),
+                ('objeto_id', models.BigIntegerField(verbose_name='ID del objeto')),
+                ('operacion', models.CharField(choices=[('guardar', 'Guardar'), ('eliminar', 'Eliminar')], max_length=10, verbose_name='Operación')),
+                ('fecha', models.DateTimeField(auto_now=True, verbose_name='Fecha del cambio')),
+            ],
+            options={
+                'verbose_name': 'Cambio de catálogo',
+                'verbose_name_plural': 'Cambios de catálogo',
+                'ordering': ['seq'],
+                'constraints': [models.UniqueConstraint(fields=('modelo', 'objeto_id'), name='cambio_modelo_objeto_unico')],
+            },
+        ),
+        migrations.RunPython(poblar_feed, migrations.RunPython.noop),
+    ]
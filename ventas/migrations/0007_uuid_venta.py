@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0006_cambios_catalogo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='uuid',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True, verbose_name='UUID de la terminal'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:58
+
+import ventas.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0007_uuid_venta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha', models.DateTimeField(db_index=True, verbose_name='Fecha de venta')),
+                ('cantidad', models.PositiveIntegerField(verbose_name='Cantidad')),
+                ('precio_unitario', ventas.fields.MonedaField(verbose_name='Precio unitario')),
+                ('total', ventas.fields.MonedaField(verbose_name='Total')),
+                ('cliente_id', models.BigIntegerField(verbose_name='ID del cliente')),
+                ('producto_id', models.BigIntegerField(verbose_name='ID del producto')),
+                ('tienda_id', models.BigIntegerField(verbose_name='ID de la tienda')),
+                ('lugar_entrega_id', models.BigIntegerField(verbose_name='ID del lugar de entrega')),
+                ('usuario_id', models.BigIntegerField(verbose_name='ID del usuario')),
+                ('cliente_nombre', models.CharField(blank=True, default='', max_length=201, verbose_name='Nombre del cliente')),
+                ('producto_nombre', models.CharField(blank=True, default='', max_length=200, verbose_name='Nombre del producto')),
+                ('categoria_nombre', models.CharField(blank=True, default='', max_length=100, verbose_name='Categoría del producto')),
+                ('tienda_nombre', models.CharField(blank=True, default='', max_length=200, verbose_name='Nombre de la tienda')),
+                ('lugar_entrega_nombre', models.CharField(blank=True, default='', max_length=200, verbose_name='Nombre del lugar de entrega')),
+                ('usuario_nombre', models.CharField(blank=True, default='', max_length=150, verbose_name='Usuario')),
+                ('uuid', models.UUIDField(blank=True, null=True, verbose_name='UUID de la terminal')),
+            ],
+            options={
+                'verbose_name': 'Venta archivada',
+                'verbose_name_plural': 'Ventas archivadas',
+                'ordering': ['-fecha'],
+            },
+        ),
+    ]
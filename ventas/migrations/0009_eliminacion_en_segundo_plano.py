@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0008_ventas_archivadas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='eliminado',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Eliminado'),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='eliminado',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Eliminado'),
+        ),
+        migrations.CreateModel(
+            name='Eliminacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=30, verbose_name='Modelo')),
+                ('objeto_id', models.BigIntegerField(verbose_name='ID del objeto')),
+                ('descripcion', models.CharField(max_length=201, verbose_name='Descripción')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('completada', 'Completada'), ('fallida', 'Fallida')], default='pendiente', max_length=10, verbose_name='Estado')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Ventas a borrar')),
+                ('borradas', models.PositiveIntegerField(default=0, verbose_name='Ventas borradas')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('fecha_inicio', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de inicio')),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de fin')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Usuario que elimina')),
+            ],
+            options={
+                'verbose_name': 'Eliminación',
+                'verbose_name_plural': 'Eliminaciones',
+                'ordering': ['-fecha_inicio'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0009_eliminacion_en_segundo_plano'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['tienda', 'fecha'], name='venta_tienda_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['tienda_id', 'fecha'], name='ventaarchivada_tienda_fecha'),
+        ),
+    ]
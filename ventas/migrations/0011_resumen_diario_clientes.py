@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0010_indices_particiones_reportes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('ventas', models.PositiveIntegerField(default=0, verbose_name='Ventas')),
+                ('clientes', models.BinaryField(default=bytes, verbose_name='Sketch de clientes')),
+                ('tienda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes', to='ventas.tienda', verbose_name='Tienda')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario',
+                'verbose_name_plural': 'Resúmenes diarios',
+                'ordering': ['-fecha'],
+                'constraints': [models.UniqueConstraint(fields=('tienda', 'fecha'), name='resumen_tienda_fecha_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0011_resumen_diario_clientes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SugerenciaReposicion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('demanda_diaria', models.FloatField(verbose_name='Demanda diaria')),
+                ('desviacion', models.FloatField(verbose_name='Desviación de la demanda')),
+                ('stock', models.IntegerField(verbose_name='Stock')),
+                ('dias_cobertura', models.FloatField(blank=True, null=True, verbose_name='Días de cobertura')),
+                ('punto_reorden', models.PositiveIntegerField(verbose_name='Punto de reorden')),
+                ('cantidad_sugerida', models.PositiveIntegerField(verbose_name='Cantidad sugerida')),
+                ('fecha_calculo', models.DateTimeField(verbose_name='Fecha de cálculo')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sugerencias', to='ventas.producto', verbose_name='Producto')),
+                ('tienda', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sugerencias', to='ventas.tienda', verbose_name='Tienda')),
+            ],
+            options={
+                'verbose_name': 'Sugerencia de reposición',
+                'verbose_name_plural': 'Sugerencias de reposición',
+                'ordering': ['dias_cobertura'],
+                'indexes': [models.Index(fields=['cantidad_sugerida', 'dias_cobertura'], name='sugerencia_urgencia')],
+            },
+        ),
+    ]
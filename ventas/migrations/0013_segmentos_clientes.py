@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:20
+
+import django.db.models.deletion
+import ventas.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0012_sugerencias_reposicion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SegmentoCliente',
+            fields=[
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rfm', serialize=False, to='ventas.cliente', verbose_name='Cliente')),
+                ('ultima_compra', models.DateTimeField(verbose_name='Última compra')),
+                ('compras', models.PositiveIntegerField(verbose_name='Compras')),
+                ('monto', ventas.fields.MonedaField(verbose_name='Monto total')),
+                ('puntaje_r', models.PositiveSmallIntegerField(default=0, verbose_name='Puntaje de recencia')),
+                ('puntaje_f', models.PositiveSmallIntegerField(default=0, verbose_name='Puntaje de frecuencia')),
+                ('puntaje_m', models.PositiveSmallIntegerField(default=0, verbose_name='Puntaje de monto')),
+                ('segmento', models.CharField(blank=True, choices=[('campeones', 'Campeones'), ('leales', 'Leales'), ('nuevos', 'Nuevos'), ('potenciales', 'Potenciales'), ('necesitan_atencion', 'Necesitan atención'), ('en_riesgo', 'En riesgo'), ('hibernando', 'Hibernando'), ('perdidos', 'Perdidos')], max_length=20, verbose_name='Segmento')),
+                ('fecha_calculo', models.DateTimeField(verbose_name='Fecha de cálculo')),
+            ],
+            options={
+                'verbose_name': 'Segmento de cliente',
+                'verbose_name_plural': 'Segmentos de clientes',
+                'indexes': [models.Index(fields=['segmento', '-monto'], name='segmento_cliente_monto')],
+            },
+        ),
+    ]
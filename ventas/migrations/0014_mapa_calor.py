@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:21
+
+import django.db.models.deletion
+import ventas.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0013_segmentos_clientes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MapaCalor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.PositiveSmallIntegerField(verbose_name='Día de la semana (0 = lunes)')),
+                ('hora', models.PositiveSmallIntegerField(verbose_name='Hora')),
+                ('ventas', models.PositiveIntegerField(default=0, verbose_name='Ventas')),
+                ('unidades', models.PositiveIntegerField(default=0, verbose_name='Unidades')),
+                ('total', ventas.fields.MonedaField(default=0, verbose_name='Total')),
+                ('tienda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mapa_calor', to='ventas.tienda', verbose_name='Tienda')),
+            ],
+            options={
+                'verbose_name': 'Celda del mapa de calor',
+                'verbose_name_plural': 'Mapa de calor de ventas',
+                'constraints': [models.UniqueConstraint(fields=('tienda', 'dia_semana', 'hora'), name='mapa_calor_celda_unica')],
+            },
+        ),
+    ]
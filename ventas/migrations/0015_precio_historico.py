@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:23
+
+import django.db.models.deletion
+import django.utils.timezone
+import ventas.fields
+from django.db import migrations, models
+
+
+def poblar_historial(apps, schema_editor):
+    """El precio actual de cada producto es el único conocido: vigente desde su creación"""
+    Producto = apps.get_model('ventas', 'Producto')
+    PrecioHistorico = apps.get_model('ventas', 'PrecioHistorico')
+    filas = Producto.objects.order_by('pk').values_list('pk', 'precio', 'fecha_creacion')
+    PrecioHistorico.objects.bulk_create(
+        [
+            PrecioHistorico(producto_id=pk, precio=precio, vigente_desde=fecha_creacion)
+            for pk, precio, fecha_creacion in filas.iterator()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0014_mapa_calor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecioHistorico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio', ventas.fields.MonedaField(verbose_name='Precio')),
+                ('vigente_desde', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Vigente desde')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='precios', to='ventas.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Precio histórico',
+                'verbose_name_plural': 'Precios históricos',
+                'ordering': ['producto', '-vigente_desde'],
+                'indexes': [models.Index(fields=['producto', 'vigente_desde'], name='precio_producto_vigencia')],
+            },
+        ),
+        migrations.RunPython(poblar_historial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:31
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0015_precio_historico'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(django.db.models.functions.comparison.Collate('nombre', 'NOCASE'), name='cliente_nombre_nocase'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(django.db.models.functions.comparison.Collate('apellido', 'NOCASE'), name='cliente_apellido_nocase'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(django.db.models.functions.comparison.Collate('telefono', 'NOCASE'), name='cliente_telefono_nocase'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(django.db.models.functions.comparison.Collate('nombre', 'NOCASE'), name='producto_nombre_nocase'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['fecha'], name='venta_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['usuario', 'fecha'], name='venta_usuario_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['lugar_entrega', 'fecha'], name='venta_lugar_fecha'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0016_indices_admin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaReplicacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tabla', models.CharField(max_length=50, unique=True, verbose_name='Tabla de Flask')),
+                ('seq', models.BigIntegerField(default=0, verbose_name='Última secuencia copiada')),
+                ('fecha', models.DateTimeField(auto_now=True, verbose_name='Última réplica')),
+            ],
+            options={
+                'verbose_name': 'Marca de réplica',
+                'verbose_name_plural': 'Marcas de réplica',
+                'ordering': ['tabla'],
+            },
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='id_flask',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True, verbose_name='ID en Flask'),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='id_flask',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True, verbose_name='ID en Flask'),
+        ),
+        migrations.AddField(
+            model_name='lugarentrega',
+            name='id_flask',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True, verbose_name='ID en Flask'),
+        ),
+        migrations.AddField(
+            model_name='preciohistorico',
+            name='id_flask',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True, verbose_name='ID en Flask'),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='id_flask',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True, verbose_name='ID en Flask'),
+        ),
+        migrations.AddField(
+            model_name='tienda',
+            name='id_flask',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True, verbose_name='ID en Flask'),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='id_flask',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True, verbose_name='ID en Flask'),
+        ),
+    ]
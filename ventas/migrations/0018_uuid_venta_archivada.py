@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0017_replicacion_flask'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ventaarchivada',
+            name='uuid',
+            field=models.UUIDField(blank=True, db_index=True, null=True, verbose_name='UUID de la terminal'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0018_uuid_venta_archivada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cambiocatalogo',
+            name='solo_stock',
+            field=models.BooleanField(default=False, verbose_name='Solo stock'),
+        ),
+        migrations.AddIndex(
+            model_name='cambiocatalogo',
+            index=models.Index(fields=['solo_stock', 'seq'], name='cambio_solo_stock_seq'),
+        ),
+    ]
@@ -1,13 +1,26 @@
+import uuid
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Collate
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 
+from .fields import MonedaField
+
+
+# Umbral a partir del cual un producto se considera con stock bajo
+STOCK_BAJO = 10
+
 
 class Categoria(models.Model):
     """Modelo para categorías de productos"""
     nombre_categoria = models.CharField(max_length=100, unique=True, verbose_name="Nombre de la categoría")
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    # Fila de origen en la base de la aplicación Flask (ver ventas.replicacion)
+    id_flask = models.BigIntegerField(null=True, blank=True, unique=True, editable=False, verbose_name="ID en Flask")
     
     class Meta:
         verbose_name = "Categoría"
@@ -18,6 +31,13 @@ class Categoria(models.Model):
         return self.nombre_categoria
 
 
+class VisiblesManager(models.Manager):
+    """Manager por defecto que oculta los registros en espera de borrado"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(eliminado=False)
+
+
 class Cliente(models.Model):
     """Modelo para clientes"""
     nombre = models.CharField(max_length=100, verbose_name="Nombre")
@@ -25,11 +45,24 @@ class Cliente(models.Model):
     telefono = models.CharField(max_length=20, blank=True, null=True, verbose_name="Teléfono")
     direccion = models.TextField(blank=True, null=True, verbose_name="Dirección")
     fecha_registro = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de registro")
+    # Oculto mientras se borran sus ventas en segundo plano (ver ventas.eliminacion)
+    eliminado = models.BooleanField(default=False, editable=False, verbose_name="Eliminado")
+    id_flask = models.BigIntegerField(null=True, blank=True, unique=True, editable=False, verbose_name="ID en Flask")
+    
+    objects = VisiblesManager()
+    todos = models.Manager()
     
     class Meta:
         verbose_name = "Cliente"
         verbose_name_plural = "Clientes"
         ordering = ['nombre', 'apellido']
+        indexes = [
+            # Búsqueda por prefijo del admin (autocompletar): el LIKE de SQLite no
+            # distingue mayúsculas y solo usa índices con collation NOCASE
+            models.Index(Collate('nombre', 'NOCASE'), name='cliente_nombre_nocase'),
+            models.Index(Collate('apellido', 'NOCASE'), name='cliente_apellido_nocase'),
+            models.Index(Collate('telefono', 'NOCASE'), name='cliente_telefono_nocase'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} {self.apellido}"
@@ -44,6 +77,7 @@ class Tienda(models.Model):
     nombre_tienda = models.CharField(max_length=200, verbose_name="Nombre de la tienda")
     ubicacion = models.TextField(blank=True, null=True, verbose_name="Ubicación")
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    id_flask = models.BigIntegerField(null=True, blank=True, unique=True, editable=False, verbose_name="ID en Flask")
     
     class Meta:
         verbose_name = "Tienda"
@@ -59,6 +93,7 @@ class LugarEntrega(models.Model):
     nombre_lugar = models.CharField(max_length=200, verbose_name="Nombre del lugar")
     direccion = models.TextField(verbose_name="Dirección")
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    id_flask = models.BigIntegerField(null=True, blank=True, unique=True, editable=False, verbose_name="ID en Flask")
     
     class Meta:
         verbose_name = "Lugar de entrega"
@@ -69,14 +104,29 @@ class LugarEntrega(models.Model):
         return self.nombre_lugar
 
 
+class ProductoQuerySet(models.QuerySet):
+    """QuerySet de productos con agregados de inventario"""
+
+    def con_stock_total(self):
+        """Anota stock_total: stock central más el inventario de todas las tiendas"""
+        inventario = Inventario.objects.filter(
+            producto=OuterRef('pk')
+        ).values('producto').annotate(total=Sum('cantidad')).values('total')
+        return self.annotate(
+            stock_total=F('stock') + Coalesce(Subquery(inventario), 0)
+        )
+
+    def stock_bajo(self, umbral=STOCK_BAJO):
+        """Productos cuyo stock total (todas las tiendas) está por debajo del umbral"""
+        return self.con_stock_total().filter(stock_total__lt=umbral)
+
+
 class Producto(models.Model):
     """Modelo para productos"""
     nombre = models.CharField(max_length=200, verbose_name="Nombre del producto")
     descripcion = models.TextField(blank=True, null=True, verbose_name="Descripción")
-    precio = models.DecimalField(
-        max_digits=10, 
-        decimal_places=2, 
-        validators=[MinValueValidator(0.01)],
+    precio = MonedaField(
+        validators=[MinValueValidator(Decimal('0.01'))],
         verbose_name="Precio"
     )
     stock = models.PositiveIntegerField(default=0, verbose_name="Stock disponible")
@@ -88,11 +138,21 @@ class Producto(models.Model):
         verbose_name="Categoría"
     )
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    # Oculto mientras se borran sus ventas en segundo plano (ver ventas.eliminacion)
+    eliminado = models.BooleanField(default=False, editable=False, verbose_name="Eliminado")
+    id_flask = models.BigIntegerField(null=True, blank=True, unique=True, editable=False, verbose_name="ID en Flask")
+    
+    objects = VisiblesManager.from_queryset(ProductoQuerySet)()
+    todos = ProductoQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ['nombre']
+        indexes = [
+            # Búsqueda por prefijo del admin (ver Cliente)
+            models.Index(Collate('nombre', 'NOCASE'), name='producto_nombre_nocase'),
+        ]
     
     def __str__(self):
         return self.nombre
@@ -100,7 +160,8 @@ class Producto(models.Model):
     @property
     def stock_bajo(self):
         """Indica si el producto tiene stock bajo (menos de 10 unidades)"""
-        return self.stock < 10
+        # Si la consulta anotó stock_total se usa el agregado de todas las tiendas
+        return getattr(self, 'stock_total', self.stock) < STOCK_BAJO
     
     @property
     def precio_formateado(self):
@@ -108,20 +169,127 @@ class Producto(models.Model):
         return f"${self.precio:,.2f}"
 
 
+class PrecioHistorico(models.Model):
+    """Modelo para el historial de precios de un producto.
+
+    Cada cambio de precio agrega una fila; el precio vigente en un momento es
+    el de la última fila con ``vigente_desde`` anterior o igual (ver ventas.precios).
+    """
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name='precios',
+        verbose_name="Producto"
+    )
+    precio = MonedaField(verbose_name="Precio")
+    vigente_desde = models.DateTimeField(default=timezone.now, verbose_name="Vigente desde")
+    id_flask = models.BigIntegerField(null=True, blank=True, unique=True, editable=False, verbose_name="ID en Flask")
+    
+    class Meta:
+        verbose_name = "Precio histórico"
+        verbose_name_plural = "Precios históricos"
+        ordering = ['producto', '-vigente_desde']
+        indexes = [
+            # Precio vigente: búsqueda por índice del último cambio antes de un momento
+            models.Index(fields=['producto', 'vigente_desde'], name='precio_producto_vigencia'),
+        ]
+    
+    def __str__(self):
+        return f"{self.producto} - ${self.precio:,.2f} desde {self.vigente_desde:%Y-%m-%d %H:%M}"
+
+
+class Inventario(models.Model):
+    """Modelo para el stock de un producto en una tienda.
+
+    Cada par (producto, tienda) puede repartirse en varios sub-contadores
+    (shards) para que las ventas concurrentes de un producto muy vendido no
+    compitan por la misma fila. El stock de la tienda es la suma de sus shards.
+    """
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name='inventarios',
+        verbose_name="Producto"
+    )
+    tienda = models.ForeignKey(
+        Tienda,
+        on_delete=models.CASCADE,
+        related_name='inventarios',
+        verbose_name="Tienda"
+    )
+    shard = models.PositiveSmallIntegerField(default=0, verbose_name="Sub-contador")
+    cantidad = models.PositiveIntegerField(default=0, verbose_name="Cantidad")
+    
+    class Meta:
+        verbose_name = "Inventario"
+        verbose_name_plural = "Inventarios"
+        ordering = ['producto', 'tienda', 'shard']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['producto', 'tienda', 'shard'],
+                name='inventario_producto_tienda_shard_unico'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['tienda', 'producto'], name='inventario_tienda_producto'),
+        ]
+    
+    def __str__(self):
+        return f"{self.producto.nombre} en {self.tienda.nombre_tienda} (#{self.shard}): {self.cantidad}"
+
+
+class ReservaStock(models.Model):
+    """Modelo para reservas temporales de stock durante una venta en curso.
+
+    Mientras un cajero arma una venta, las unidades quedan apartadas hasta
+    ``expira_en``; las reservas vencidas no cuentan y un proceso las borra.
+    """
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False, verbose_name="Token")
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name='reservas',
+        verbose_name="Producto"
+    )
+    tienda = models.ForeignKey(
+        Tienda,
+        on_delete=models.CASCADE,
+        related_name='reservas',
+        verbose_name="Tienda"
+    )
+    cantidad = models.PositiveIntegerField(validators=[MinValueValidator(1)], verbose_name="Cantidad")
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Usuario que reserva"
+    )
+    expira_en = models.DateTimeField(verbose_name="Expira en")
+    
+    class Meta:
+        verbose_name = "Reserva de stock"
+        verbose_name_plural = "Reservas de stock"
+        ordering = ['expira_en']
+        indexes = [
+            # Suma de reservas activas de un producto en una tienda
+            models.Index(fields=['producto', 'tienda', 'expira_en'], name='reserva_producto_tienda_exp'),
+            # Barrido de reservas vencidas
+            models.Index(fields=['expira_en'], name='reserva_expira_en'),
+        ]
+    
+    def __str__(self):
+        return f"Reserva de {self.cantidad} x {self.producto.nombre} hasta {self.expira_en:%H:%M:%S}"
+
+
 class Venta(models.Model):
     """Modelo para ventas"""
     fecha = models.DateTimeField(default=timezone.now, verbose_name="Fecha de venta")
     cantidad = models.PositiveIntegerField(validators=[MinValueValidator(1)], verbose_name="Cantidad")
-    precio_unitario = models.DecimalField(
-        max_digits=10, 
-        decimal_places=2,
-        validators=[MinValueValidator(0.01)],
+    precio_unitario = MonedaField(
+        validators=[MinValueValidator(Decimal('0.01'))],
         verbose_name="Precio unitario"
     )
-    total = models.DecimalField(
-        max_digits=12, 
-        decimal_places=2,
-        validators=[MinValueValidator(0.01)],
+    total = MonedaField(
+        validators=[MinValueValidator(Decimal('0.01'))],
         verbose_name="Total"
     )
     cliente = models.ForeignKey(
@@ -150,13 +318,51 @@ class Venta(models.Model):
         verbose_name="Usuario que registró la venta"
     )
     
+    # Copias inmutables de los nombres en el momento de la venta, para que
+    # listados, exportaciones y reportes no necesiten joins
+    cliente_nombre = models.CharField(max_length=201, blank=True, default='', verbose_name="Nombre del cliente")
+    producto_nombre = models.CharField(max_length=200, blank=True, default='', verbose_name="Nombre del producto")
+    categoria_nombre = models.CharField(max_length=100, blank=True, default='', verbose_name="Categoría del producto")
+    tienda_nombre = models.CharField(max_length=200, blank=True, default='', verbose_name="Nombre de la tienda")
+    lugar_entrega_nombre = models.CharField(max_length=200, blank=True, default='', verbose_name="Nombre del lugar de entrega")
+    usuario_nombre = models.CharField(max_length=150, blank=True, default='', verbose_name="Usuario")
+    
+    # Identificador generado por la terminal; hace idempotente la subida de ventas en lote
+    uuid = models.UUIDField(null=True, blank=True, unique=True, editable=False, verbose_name="UUID de la terminal")
+    # Venta de origen en la base de la aplicación Flask (ver ventas.replicacion)
+    id_flask = models.BigIntegerField(null=True, blank=True, unique=True, editable=False, verbose_name="ID en Flask")
+    
+    # Campos de snapshot, en el orden en que los rellena tomar_snapshots()
+    CAMPOS_SNAPSHOT = [
+        'cliente_nombre', 'producto_nombre', 'categoria_nombre',
+        'tienda_nombre', 'lugar_entrega_nombre', 'usuario_nombre',
+    ]
+    
     class Meta:
         verbose_name = "Venta"
         verbose_name_plural = "Ventas"
         ordering = ['-fecha']
+        indexes = [
+            # Particiones tienda × mes de los reportes (ver ventas.reportes)
+            models.Index(fields=['tienda', 'fecha'], name='venta_tienda_fecha'),
+            # Listado del admin: orden por fecha, solo o con el filtro de cada columna
+            models.Index(fields=['fecha'], name='venta_fecha'),
+            models.Index(fields=['usuario', 'fecha'], name='venta_usuario_fecha'),
+            models.Index(fields=['lugar_entrega', 'fecha'], name='venta_lugar_fecha'),
+        ]
     
     def __str__(self):
-        return f"Venta #{self.id} - {self.producto.nombre} - {self.cliente.nombre_completo}"
+        return f"Venta #{self.id} - {self.producto_nombre} - {self.cliente_nombre}"
+    
+    def tomar_snapshots(self):
+        """Copia los nombres de cliente, producto, categoría, tienda, lugar y usuario"""
+        categoria = self.producto.categoria
+        self.cliente_nombre = self.cliente.nombre_completo
+        self.producto_nombre = self.producto.nombre
+        self.categoria_nombre = categoria.nombre_categoria if categoria else ''
+        self.tienda_nombre = self.tienda.nombre_tienda
+        self.lugar_entrega_nombre = self.lugar_entrega.nombre_lugar
+        self.usuario_nombre = self.usuario.get_username()
     
     def save(self, *args, **kwargs):
         """Sobrescribir save para calcular el total automáticamente"""
@@ -169,6 +375,189 @@ class Venta(models.Model):
         return f"${self.total:,.2f}"
 
 
+class VentaArchivada(models.Model):
+    """Modelo para ventas antiguas movidas a la base de datos de archivo.
+
+    Vive en otra base de datos (ver ``ventas.routers``), así que las
+    relaciones se guardan como ids sin clave foránea; los nombres ya vienen
+    en los snapshots. Conserva el id original de la venta.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    fecha = models.DateTimeField(db_index=True, verbose_name="Fecha de venta")
+    cantidad = models.PositiveIntegerField(verbose_name="Cantidad")
+    precio_unitario = MonedaField(verbose_name="Precio unitario")
+    total = MonedaField(verbose_name="Total")
+    cliente_id = models.BigIntegerField(verbose_name="ID del cliente")
+    producto_id = models.BigIntegerField(verbose_name="ID del producto")
+    tienda_id = models.BigIntegerField(verbose_name="ID de la tienda")
+    lugar_entrega_id = models.BigIntegerField(verbose_name="ID del lugar de entrega")
+    usuario_id = models.BigIntegerField(verbose_name="ID del usuario")
+    cliente_nombre = models.CharField(max_length=201, blank=True, default='', verbose_name="Nombre del cliente")
+    producto_nombre = models.CharField(max_length=200, blank=True, default='', verbose_name="Nombre del producto")
+    categoria_nombre = models.CharField(max_length=100, blank=True, default='', verbose_name="Categoría del producto")
+    tienda_nombre = models.CharField(max_length=200, blank=True, default='', verbose_name="Nombre de la tienda")
+    lugar_entrega_nombre = models.CharField(max_length=200, blank=True, default='', verbose_name="Nombre del lugar de entrega")
+    usuario_nombre = models.CharField(max_length=150, blank=True, default='', verbose_name="Usuario")
+    # Indexado: la subida en lote reconoce también las ventas ya archivadas
+    uuid = models.UUIDField(null=True, blank=True, db_index=True, verbose_name="UUID de la terminal")
+    
+    class Meta:
+        verbose_name = "Venta archivada"
+        verbose_name_plural = "Ventas archivadas"
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['tienda_id', 'fecha'], name='ventaarchivada_tienda_fecha'),
+        ]
+    
+    def __str__(self):
+        return f"Venta archivada #{self.id} - {self.producto_nombre} - {self.cliente_nombre}"
+
+
+class ResumenDiario(models.Model):
+    """Resumen de las ventas de una tienda en un día (fecha local).
+
+    ``clientes`` es un sketch HyperLogLog de los clientes que compraron (ver
+    ``turron_system.hll``): los sketches de varios días o tiendas se fusionan
+    para estimar clientes distintos en cualquier rango sin recorrer las ventas.
+    Cubre las ventas activas y las archivadas.
+    """
+    tienda = models.ForeignKey(Tienda, on_delete=models.CASCADE, related_name='resumenes', verbose_name="Tienda")
+    fecha = models.DateField(verbose_name="Fecha")
+    ventas = models.PositiveIntegerField(default=0, verbose_name="Ventas")
+    clientes = models.BinaryField(default=bytes, verbose_name="Sketch de clientes")
+    
+    class Meta:
+        verbose_name = "Resumen diario"
+        verbose_name_plural = "Resúmenes diarios"
+        ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['tienda', 'fecha'], name='resumen_tienda_fecha_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.tienda} - {self.fecha}"
+
+
+class MapaCalor(models.Model):
+    """Modelo para una celda del mapa de calor de ventas de una tienda.
+
+    Cada tienda tiene 7 × 24 celdas (día de la semana y hora local) con los
+    contadores de sus ventas; se actualizan con cada venta (ver
+    ``ventas.resumenes``), así que el mapa se lee sin recorrer las ventas.
+    """
+    DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+    
+    tienda = models.ForeignKey(Tienda, on_delete=models.CASCADE, related_name='mapa_calor', verbose_name="Tienda")
+    dia_semana = models.PositiveSmallIntegerField(verbose_name="Día de la semana (0 = lunes)")
+    hora = models.PositiveSmallIntegerField(verbose_name="Hora")
+    ventas = models.PositiveIntegerField(default=0, verbose_name="Ventas")
+    unidades = models.PositiveIntegerField(default=0, verbose_name="Unidades")
+    total = MonedaField(default=0, verbose_name="Total")
+    
+    class Meta:
+        verbose_name = "Celda del mapa de calor"
+        verbose_name_plural = "Mapa de calor de ventas"
+        constraints = [
+            models.UniqueConstraint(fields=['tienda', 'dia_semana', 'hora'], name='mapa_calor_celda_unica'),
+        ]
+    
+    def __str__(self):
+        return f"{self.tienda} - {self.DIAS_SEMANA[self.dia_semana]} {self.hora:02d}h: {self.ventas}"
+
+
+class SugerenciaReposicion(models.Model):
+    """Modelo para el punto de reorden y la reposición sugerida de un producto.
+
+    La calcula en lote ``ventas.reposicion`` a partir de la demanda diaria
+    reciente. ``tienda`` vacía es el stock central, que surte a las tiendas
+    sin inventario propio del producto.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='sugerencias', verbose_name="Producto")
+    tienda = models.ForeignKey(
+        Tienda,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='sugerencias',
+        verbose_name="Tienda"
+    )
+    demanda_diaria = models.FloatField(verbose_name="Demanda diaria")
+    desviacion = models.FloatField(verbose_name="Desviación de la demanda")
+    stock = models.IntegerField(verbose_name="Stock")
+    dias_cobertura = models.FloatField(null=True, blank=True, verbose_name="Días de cobertura")
+    punto_reorden = models.PositiveIntegerField(verbose_name="Punto de reorden")
+    cantidad_sugerida = models.PositiveIntegerField(verbose_name="Cantidad sugerida")
+    fecha_calculo = models.DateTimeField(verbose_name="Fecha de cálculo")
+    
+    class Meta:
+        verbose_name = "Sugerencia de reposición"
+        verbose_name_plural = "Sugerencias de reposición"
+        ordering = ['dias_cobertura']
+        indexes = [
+            models.Index(fields=['cantidad_sugerida', 'dias_cobertura'], name='sugerencia_urgencia'),
+        ]
+    
+    def __str__(self):
+        return f"{self.producto} - {self.tienda or 'Central'}: {self.cantidad_sugerida}"
+
+
+class SegmentoCliente(models.Model):
+    """Modelo para el segmento RFM de un cliente (recencia, frecuencia y monto de sus compras).
+
+    Lo calcula en lote ``ventas.segmentos``; cada puntaje es el quintil del
+    cliente (1 a 5) entre todos los clientes con compras.
+    """
+    CAMPEONES = 'campeones'
+    LEALES = 'leales'
+    NUEVOS = 'nuevos'
+    POTENCIALES = 'potenciales'
+    NECESITAN_ATENCION = 'necesitan_atencion'
+    EN_RIESGO = 'en_riesgo'
+    HIBERNANDO = 'hibernando'
+    PERDIDOS = 'perdidos'
+    SEGMENTOS = [
+        (CAMPEONES, 'Campeones'),
+        (LEALES, 'Leales'),
+        (NUEVOS, 'Nuevos'),
+        (POTENCIALES, 'Potenciales'),
+        (NECESITAN_ATENCION, 'Necesitan atención'),
+        (EN_RIESGO, 'En riesgo'),
+        (HIBERNANDO, 'Hibernando'),
+        (PERDIDOS, 'Perdidos'),
+    ]
+    
+    cliente = models.OneToOneField(
+        Cliente,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rfm',
+        verbose_name="Cliente"
+    )
+    ultima_compra = models.DateTimeField(verbose_name="Última compra")
+    compras = models.PositiveIntegerField(verbose_name="Compras")
+    monto = MonedaField(verbose_name="Monto total")
+    puntaje_r = models.PositiveSmallIntegerField(default=0, verbose_name="Puntaje de recencia")
+    puntaje_f = models.PositiveSmallIntegerField(default=0, verbose_name="Puntaje de frecuencia")
+    puntaje_m = models.PositiveSmallIntegerField(default=0, verbose_name="Puntaje de monto")
+    segmento = models.CharField(max_length=20, choices=SEGMENTOS, blank=True, verbose_name="Segmento")
+    fecha_calculo = models.DateTimeField(verbose_name="Fecha de cálculo")
+    
+    class Meta:
+        verbose_name = "Segmento de cliente"
+        verbose_name_plural = "Segmentos de clientes"
+        indexes = [
+            # Filtro por segmento en la lista de clientes, ordenado por monto
+            models.Index(fields=['segmento', '-monto'], name='segmento_cliente_monto'),
+        ]
+    
+    def __str__(self):
+        return f"{self.cliente} - {self.get_segmento_display()}"
+    
+    @property
+    def rfm(self):
+        return f"{self.puntaje_r}{self.puntaje_f}{self.puntaje_m}"
+
+
 class PerfilUsuario(models.Model):
     """Modelo para extender la información del usuario"""
     usuario = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name="Usuario")
@@ -186,4 +575,116 @@ class PerfilUsuario(models.Model):
         verbose_name_plural = "Perfiles de usuarios"
     
     def __str__(self):
-        return f"Perfil de {self.usuario.username}"
\ No newline at end of file
+        return f"Perfil de {self.usuario.username}"
+
+
+class CambioCatalogo(models.Model):
+    """Modelo para el feed de cambios del catálogo.
+
+    Cada escritura de un producto, cliente, categoría, tienda o lugar de
+    entrega reemplaza la entrada del objeto por una nueva con una secuencia
+    mayor, así que la tabla tiene como mucho una fila por objeto y un cliente
+    que sincroniza desde ``seq`` recibe solo el estado más reciente. Las
+    eliminaciones quedan como lápidas (``operacion='eliminar'``).
+    """
+    GUARDAR = 'guardar'
+    ELIMINAR = 'eliminar'
+    OPERACIONES = [
+        (GUARDAR, 'Guardar'),
+        (ELIMINAR, 'Eliminar'),
+    ]
+    
+    # AUTOINCREMENT en SQLite: la secuencia nunca reutiliza valores
+    seq = models.BigAutoField(primary_key=True, verbose_name="Secuencia")
+    modelo = models.CharField(max_length=30, verbose_name="Modelo")
+    objeto_id = models.BigIntegerField(verbose_name="ID del objeto")
+    operacion = models.CharField(max_length=10, choices=OPERACIONES, verbose_name="Operación")
+    # Solo cambió el stock (ventas, entradas de mercancía): no regenera el catálogo precompilado
+    solo_stock = models.BooleanField(default=False, verbose_name="Solo stock")
+    fecha = models.DateTimeField(auto_now=True, verbose_name="Fecha del cambio")
+    
+    class Meta:
+        verbose_name = "Cambio de catálogo"
+        verbose_name_plural = "Cambios de catálogo"
+        ordering = ['seq']
+        constraints = [
+            models.UniqueConstraint(fields=['modelo', 'objeto_id'], name='cambio_modelo_objeto_unico'),
+        ]
+        indexes = [
+            # Versión del catálogo: última secuencia que no sea solo de stock
+            models.Index(fields=['solo_stock', 'seq'], name='cambio_solo_stock_seq'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.seq} {self.operacion} {self.modelo} {self.objeto_id}"
+
+
+class Eliminacion(models.Model):
+    """Modelo para el borrado en segundo plano de un cliente o un producto.
+
+    El objeto se oculta al instante y sus ventas (activas y archivadas) se
+    borran después por lotes; el registro guarda el progreso para mostrarlo.
+    """
+    PENDIENTE = 'pendiente'
+    EN_CURSO = 'en_curso'
+    COMPLETADA = 'completada'
+    FALLIDA = 'fallida'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_CURSO, 'En curso'),
+        (COMPLETADA, 'Completada'),
+        (FALLIDA, 'Fallida'),
+    ]
+    
+    modelo = models.CharField(max_length=30, verbose_name="Modelo")
+    objeto_id = models.BigIntegerField(verbose_name="ID del objeto")
+    descripcion = models.CharField(max_length=201, verbose_name="Descripción")
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=PENDIENTE, verbose_name="Estado")
+    total = models.PositiveIntegerField(default=0, verbose_name="Ventas a borrar")
+    borradas = models.PositiveIntegerField(default=0, verbose_name="Ventas borradas")
+    error = models.TextField(blank=True, default='', verbose_name="Error")
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Usuario que elimina"
+    )
+    fecha_inicio = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de inicio")
+    fecha_fin = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de fin")
+    
+    class Meta:
+        verbose_name = "Eliminación"
+        verbose_name_plural = "Eliminaciones"
+        ordering = ['-fecha_inicio']
+    
+    def __str__(self):
+        return f"Eliminación de {self.modelo} {self.descripcion} ({self.get_estado_display()})"
+    
+    @property
+    def porcentaje(self):
+        """Avance del borrado de ventas, de 0 a 100"""
+        if self.estado == self.COMPLETADA:
+            return 100
+        if not self.total:
+            return 0
+        return min(100, self.borradas * 100 // self.total)
+
+
+class MarcaReplicacion(models.Model):
+    """Modelo para el avance de la réplica de una tabla de la base Flask.
+
+    ``seq`` es la última entrada del registro de cambios de Flask ya copiada;
+    se guarda en la misma transacción que los datos (ver ventas.replicacion).
+    """
+    tabla = models.CharField(max_length=50, unique=True, verbose_name="Tabla de Flask")
+    seq = models.BigIntegerField(default=0, verbose_name="Última secuencia copiada")
+    fecha = models.DateTimeField(auto_now=True, verbose_name="Última réplica")
+    
+    class Meta:
+        verbose_name = "Marca de réplica"
+        verbose_name_plural = "Marcas de réplica"
+        ordering = ['tabla']
+    
+    def __str__(self):
+        return f"{self.tabla} hasta #{self.seq}"
@@ -0,0 +1,34 @@
+"""
+Paginación de tablas grandes sin COUNT(*) completo.
+
+Contar millones de ventas en cada página del listado recorre la tabla
+entera. El total sin filtros se estima con el rango de ids (dos búsquedas en
+el índice de la clave primaria) y un listado filtrado se cuenta solo hasta
+LIMITE_CONTEO filas: más allá no hay páginas, hay que filtrar más.
+"""
+
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+
+# Filas que se cuentan como máximo en un listado filtrado
+LIMITE_CONTEO = 10000
+
+
+class PaginadorEstimado(Paginator):
+    """Paginator con total estimado (sin filtros) o acotado a LIMITE_CONTEO (con filtros)"""
+
+    @cached_property
+    def count(self):
+        consulta = self.object_list.order_by()
+        if not consulta.query.has_filters():
+            # Por separado: MIN y MAX en la misma consulta no usan el índice en SQLite
+            primero = consulta.order_by('pk').values_list('pk', flat=True).first()
+            if primero is None:
+                return 0
+            ultimo = consulta.order_by('-pk').values_list('pk', flat=True).first()
+            # Cuenta de más los huecos de ventas borradas: la última página puede quedar corta
+            estimado = ultimo - primero + 1
+            if estimado > LIMITE_CONTEO:
+                return estimado
+        return min(consulta[:LIMITE_CONTEO + 1].count(), LIMITE_CONTEO)
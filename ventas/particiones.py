@@ -0,0 +1,76 @@
+"""
+Agregación de una partición (tienda × meses consecutivos) de una tabla de ventas.
+
+Se ejecuta en los procesos del pool de reportes (ver ventas.reportes), así
+que no importa Django: cada proceso abre conexiones SQLite de solo lectura
+directamente sobre el archivo de la base de datos y las reutiliza entre
+particiones.
+"""
+
+import sqlite3
+
+
+_conexiones = {}
+
+
+def _mes(limites, desde, hasta, parametros):
+    """Índice del mes de ``fecha`` entre los meses ``desde`` y ``hasta - 1``.
+
+    Es un árbol de CASE: log2(meses) comparaciones por fila, no una por mes.
+    """
+    if hasta - desde == 1:
+        return str(desde)
+    medio = (desde + hasta) // 2
+    parametros.append(limites[medio])
+    return (
+        f'CASE WHEN fecha < ? THEN {_mes(limites, desde, medio, parametros)} '
+        f'ELSE {_mes(limites, medio, hasta, parametros)} END'
+    )
+
+
+def consulta_particion(tabla, tienda_id, limites):
+    """SQL y parámetros de los totales por mes y producto de una partición.
+
+    ``limites`` son los inicios de cada mes y el fin del último, en el formato
+    en que guarda Django las fechas; el mes de cada fila es su índice. Sin
+    ``tienda_id`` se agrega la tabla entera sin filtrar: todas sus filas caen
+    en el rango y recorrerla es más rápido que pasar por el índice de fecha.
+    """
+    parametros = []
+    mes = _mes(limites, 0, len(limites) - 1, parametros)
+    filtro = ''
+    if tienda_id is not None:
+        filtro = 'WHERE tienda_id = ? AND fecha >= ? AND fecha < ?'
+        parametros += [tienda_id, limites[0], limites[-1]]
+    sql = f'''
+        SELECT {mes} AS mes, producto_id, MAX(producto_nombre), SUM(cantidad),
+               SUM(total), SUM(precio_unitario), COUNT(*)
+        FROM {tabla}
+        {filtro}
+        GROUP BY mes, producto_id
+    '''
+    return sql, parametros
+
+
+def _conexion_lectura(ruta):
+    conn = _conexiones.get(ruta)
+    if conn is None:
+        # mode=ro: el proceso no puede escribir ni tomar el bloqueo de escritura
+        conn = sqlite3.connect(f'file:{ruta}?mode=ro', uri=True, check_same_thread=False)
+        conn.execute('PRAGMA query_only = 1')
+        _conexiones[ruta] = conn
+    return conn
+
+
+def agregar_particion(particion):
+    """Totales por producto de una partición.
+
+    ``particion`` es ``(meses, ruta, tabla, tienda_id, limites)`` con los
+    límites ya en el formato en que guarda Django las fechas; se devuelve
+    ``(meses, filas)`` con una fila ``(mes, producto_id, nombre, cantidad,
+    total, suma_precios, ventas)`` por mes y producto, donde ``mes`` es el
+    índice en ``meses`` (importes en centavos).
+    """
+    meses, ruta, tabla, tienda_id, limites = particion
+    filas = _conexion_lectura(ruta).execute(*consulta_particion(tabla, tienda_id, limites)).fetchall()
+    return meses, filas
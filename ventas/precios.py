@@ -0,0 +1,65 @@
+"""
+Precios vigentes a partir del historial de precios (PrecioHistorico).
+
+Cada consulta "precio de un producto en el momento T" es una búsqueda en el
+índice (producto, vigente_desde): la última fila con ``vigente_desde <= T``.
+Los precios de todos los productos, o el precio de lista de cada venta, se
+resuelven con la misma búsqueda como subconsulta correlacionada, una por
+fila y sin recorrer el historial completo.
+"""
+
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .fields import MonedaField
+from .models import PrecioHistorico, Producto, Venta
+
+
+def _precio_vigente(producto, momento):
+    """Subconsulta del precio de ``producto`` vigente en ``momento`` (valores o expresiones)"""
+    return Subquery(
+        PrecioHistorico.objects.filter(
+            producto=producto, vigente_desde__lte=momento
+        ).order_by('-vigente_desde').values('precio')[:1]
+    )
+
+
+def precio_en(producto, momento=None):
+    """Precio de ``producto`` (instancia o id) vigente en ``momento``; None si aún no existía"""
+    return PrecioHistorico.objects.filter(
+        producto=producto, vigente_desde__lte=momento or timezone.now()
+    ).order_by('-vigente_desde').values_list('precio', flat=True).first()
+
+
+def precios_en(momento=None, productos=None):
+    """``{producto_id: precio}`` vigentes en ``momento`` para ``productos`` (ids) o todos"""
+    consulta = Producto.objects.all()
+    if productos is not None:
+        consulta = consulta.filter(pk__in=productos)
+    filas = consulta.annotate(
+        precio_vigente=_precio_vigente(OuterRef('pk'), momento or timezone.now())
+    ).values_list('pk', 'precio_vigente').order_by()
+    return {producto_id: precio for producto_id, precio in filas if precio is not None}
+
+
+def con_precio_lista(ventas):
+    """Anota ``precio_lista`` en un queryset de Venta: el precio vigente al momento de cada venta"""
+    return ventas.annotate(precio_lista=_precio_vigente(OuterRef('producto_id'), OuterRef('fecha')))
+
+
+def margen_lista(desde=None, hasta=None):
+    """Ingresos reales frente a ingresos a precio de lista por producto (ventas activas).
+
+    Devuelve ``{producto_id: (ingresos, ingresos_lista)}``; la diferencia es
+    el descuento (o sobreprecio) aplicado respecto al precio vigente en cada venta.
+    """
+    ventas = Venta.objects.all()
+    if desde:
+        ventas = ventas.filter(fecha__gte=desde)
+    if hasta:
+        ventas = ventas.filter(fecha__lt=hasta)
+    filas = con_precio_lista(ventas).filter(precio_lista__isnull=False).values('producto_id').annotate(
+        ingresos=Sum('total'),
+        ingresos_lista=Sum(F('cantidad') * F('precio_lista'), output_field=MonedaField()),
+    ).order_by()
+    return {fila['producto_id']: (fila['ingresos'], fila['ingresos_lista']) for fila in filas}
@@ -0,0 +1,369 @@
+"""
+Réplica incremental de la base de la aplicación Flask en los modelos de Django.
+
+Los triggers de la base Flask (migración 3 de app.py) anotan en la tabla
+``replicacion`` el id de cada fila insertada, modificada o borrada, con una
+secuencia creciente. Cada pasada, tabla por tabla y en orden de dependencias:
+
+1. lee las entradas posteriores a la marca de la tabla (MarcaReplicacion),
+2. relee esas filas en su estado actual y las escribe con un upsert en
+   bloque por ``id_flask``; las que ya no existen se borran,
+3. avanza la marca en la misma transacción que los datos.
+
+Repetir una pasada (o retomarla tras un fallo) no duplica nada, y el costo
+depende de los cambios, no del tamaño de las tablas. La primera pasada de
+una tabla, sin marca, la copia entera por rangos de id. Las ventas nuevas,
+editadas o borradas se suman, ajustan o restan en los resúmenes lote a lote.
+Las filas que apuntan a un padre que aún no está en Django se vuelven a
+anotar en el registro para la pasada siguiente.
+
+Todas las tablas se copian hasta la misma secuencia, leída al empezar: una
+venta solo se copia después de su cliente, producto, tienda y lugar. Las
+claves foráneas se traducen de ids Flask a ids Django con ``id_flask``.
+"""
+
+import sqlite3
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .cache import invalidar_reportes
+from .cambios import NOMBRE_MODELO, registrar_cambios
+from .fields import centavos_a_decimal
+from .models import (
+    CambioCatalogo, Categoria, Cliente, LugarEntrega, MarcaReplicacion, PrecioHistorico, Producto, Tienda, Venta,
+)
+from .resumenes import actualizar_ventas, registrar_ventas
+
+
+# Filas de Flask leídas y escritas por transacción
+LOTE_REPLICACION = 2000
+
+# Campos de una venta que cuentan en los resúmenes
+CAMPOS_RESUMEN = ['tienda_id', 'fecha', 'cliente_id', 'cantidad', 'total']
+
+
+class ReplicacionNoDisponible(Exception):
+    """La base Flask no existe o aún no tiene el registro de cambios"""
+
+
+def _fecha(valor):
+    """Fecha de SQLite (CURRENT_TIMESTAMP, en UTC) como datetime con zona"""
+    if not valor:
+        return None
+    return datetime.fromisoformat(valor).replace(tzinfo=dt_timezone.utc)
+
+
+def _categoria(fila, ids):
+    return {'nombre_categoria': fila['nombre_categoria']}
+
+
+def _tienda(fila, ids):
+    return {'nombre_tienda': fila['nombre_tienda'], 'ubicacion': fila['ubicacion']}
+
+
+def _lugar_entrega(fila, ids):
+    return {'nombre_lugar': fila['nombre_lugar'], 'direccion': fila['direccion']}
+
+
+def _cliente(fila, ids):
+    return {
+        'nombre': fila['nombre'],
+        'apellido': fila['apellido'],
+        'telefono': fila['telefono'],
+        'direccion': fila['direccion'],
+        'eliminado': bool(fila['eliminado']),
+    }
+
+
+def _producto(fila, ids):
+    return {
+        'nombre': fila['nombre'],
+        'descripcion': fila['descripcion'],
+        'precio': centavos_a_decimal(fila['precio']),
+        'stock': max(fila['stock'], 0),
+        'categoria_id': ids['categorias'].get(fila['id_categoria']),
+        'eliminado': bool(fila['eliminado']),
+    }
+
+
+def _precio(fila, ids):
+    producto = ids['productos'].get(fila['id_producto'])
+    if producto is None:
+        return None
+    return {
+        'producto_id': producto,
+        'precio': centavos_a_decimal(fila['precio']),
+        'vigente_desde': _fecha(fila['vigente_desde']),
+    }
+
+
+def _venta(fila, ids):
+    claves = {
+        'cliente_id': ids['clientes'].get(fila['id_cliente']),
+        'producto_id': ids['productos'].get(fila['id_producto']),
+        'tienda_id': ids['tiendas'].get(fila['id_tienda']),
+        'lugar_entrega_id': ids['lugares_entrega'].get(fila['id_lugar']),
+    }
+    if None in claves.values():
+        # En Django las cuatro son obligatorias
+        return None
+    nombre = ' '.join(parte for parte in (fila['cliente_nombre'], fila['cliente_apellido']) if parte)
+    return {
+        **claves,
+        'fecha': _fecha(fila['fecha']),
+        'cantidad': fila['cantidad'],
+        'precio_unitario': centavos_a_decimal(fila['precio_unitario']),
+        'total': centavos_a_decimal(fila['total']),
+        'usuario_id': ids['usuario'],
+        'cliente_nombre': nombre,
+        'producto_nombre': fila['producto_nombre'] or '',
+        'categoria_nombre': fila['nombre_categoria'] or '',
+        'tienda_nombre': fila['nombre_tienda'] or '',
+        'lugar_entrega_nombre': fila['nombre_lugar'] or '',
+        'usuario_nombre': settings.REPLICACION_USUARIO,
+    }
+
+
+# Tabla Flask, clave, modelo, conversión de una fila y tablas a las que
+# apuntan sus claves foráneas; los padres antes que los hijos
+TABLAS = [
+    ('categorias', 'id_categoria', Categoria, _categoria, {}),
+    ('tiendas', 'id_tienda', Tienda, _tienda, {}),
+    ('lugares_entrega', 'id_lugar', LugarEntrega, _lugar_entrega, {}),
+    ('clientes', 'id_cliente', Cliente, _cliente, {}),
+    ('productos', 'id_producto', Producto, _producto, {'id_categoria': 'categorias'}),
+    ('precios_historicos', 'id_precio', PrecioHistorico, _precio, {'id_producto': 'productos'}),
+    ('ventas', 'id_venta', Venta, _venta, {
+        'id_cliente': 'clientes', 'id_producto': 'productos',
+        'id_tienda': 'tiendas', 'id_lugar': 'lugares_entrega',
+    }),
+]
+
+MODELOS = {tabla: modelo for tabla, _, modelo, _, _ in TABLAS}
+CLAVES = {tabla: clave for tabla, clave, _, _, _ in TABLAS}
+
+
+def conectar_flask(ruta=None):
+    """Conexión a la base Flask; ReplicacionNoDisponible si no tiene el registro de cambios"""
+    ruta = str(ruta or settings.FLASK_DATABASE)
+    try:
+        conn = sqlite3.connect(f'file:{ruta}?mode=rw', uri=True, timeout=30)
+    except sqlite3.OperationalError as e:
+        raise ReplicacionNoDisponible(f'No se puede abrir {ruta}: {e}')
+    conn.row_factory = sqlite3.Row
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'replicacion'").fetchone():
+        conn.close()
+        raise ReplicacionNoDisponible(f'{ruta} no tiene registro de cambios: ejecute flask --app app migrar')
+    return conn
+
+
+class Replicador:
+    """Una pasada de réplica sobre una conexión a la base Flask"""
+
+    def __init__(self, conn, lote=LOTE_REPLICACION):
+        self.conn = conn
+        self.lote = lote
+        self.usuario = self._usuario_replicacion()
+        # Todas las tablas se copian hasta el mismo punto del registro
+        # (sqlite_sequence conserva la última secuencia aunque el registro se haya podado)
+        self.tope = conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'replicacion'"
+        ).fetchone()[0]
+        # Ventas editadas o borradas en la pasada: el cubo no las resuelve anexando
+        self.ventas_modificadas = False
+
+    def _usuario_replicacion(self):
+        usuario, creado = User.objects.get_or_create(
+            username=settings.REPLICACION_USUARIO, defaults={'is_active': False}
+        )
+        if creado:
+            usuario.set_unusable_password()
+            usuario.save(update_fields=['password'])
+        return usuario.pk
+
+    def replicar(self):
+        """Copia los cambios de todas las tablas; devuelve ``{tabla: (escritas, borradas, omitidas)}``"""
+        resultado = {}
+        for tabla, clave, modelo, convertir, referencias in TABLAS:
+            marca = MarcaReplicacion.objects.filter(tabla=tabla).values_list('seq', flat=True).first()
+            if marca is None:
+                resultado[tabla] = self._copiar_tabla(tabla, clave, modelo, convertir, referencias)
+            else:
+                resultado[tabla] = self._copiar_cambios(tabla, clave, modelo, convertir, referencias, marca)
+
+        if any(escritas or borradas for escritas, borradas, _ in resultado.values()):
+            invalidar_reportes(modificadas=self.ventas_modificadas)
+        self._podar_registro()
+        return resultado
+
+    def _copiar_tabla(self, tabla, clave, modelo, convertir, referencias):
+        """Primera pasada: toda la tabla por rangos de id; la marca queda en el tope"""
+        # Hasta el último id de ahora: lo que llegue después entra por el registro en la siguiente pasada
+        maximo = self.conn.execute(f'SELECT COALESCE(MAX({clave}), 0) FROM {tabla}').fetchone()[0]
+        totales = [0, 0, 0]
+        ultimo = 0
+        while True:
+            filas = self.conn.execute(
+                f'SELECT * FROM {tabla} WHERE {clave} > ? AND {clave} <= ? ORDER BY {clave} LIMIT ?',
+                (ultimo, maximo, self.lote)
+            ).fetchall()
+            if not filas:
+                break
+            ultimo = filas[-1][clave]
+            with transaction.atomic():
+                escritas, omitidas = self._escribir(clave, modelo, convertir, referencias, filas)
+                self._reintentar(tabla, clave, referencias, omitidas)
+            totales[0] += escritas
+            totales[2] += len(omitidas)
+        MarcaReplicacion.objects.update_or_create(tabla=tabla, defaults={'seq': self.tope})
+        return tuple(totales)
+
+    def _copiar_cambios(self, tabla, clave, modelo, convertir, referencias, marca):
+        """Entradas del registro entre la marca y el tope, por lotes"""
+        totales = [0, 0, 0]
+        while marca < self.tope:
+            entradas = self.conn.execute(
+                'SELECT seq, id_fila FROM replicacion WHERE tabla = ? AND seq > ? AND seq <= ? ORDER BY seq LIMIT ?',
+                (tabla, marca, self.tope, self.lote)
+            ).fetchall()
+            if not entradas:
+                break
+            ids = {entrada['id_fila'] for entrada in entradas}
+            filas = self.conn.execute(
+                f'SELECT * FROM {tabla} WHERE {clave} IN ({", ".join("?" * len(ids))})', list(ids)
+            ).fetchall()
+            borradas = ids - {fila[clave] for fila in filas}
+            marca = entradas[-1]['seq']
+            with transaction.atomic():
+                escritas, omitidas = self._escribir(clave, modelo, convertir, referencias, filas)
+                if borradas:
+                    totales[1] += self._borrar(modelo, borradas)
+                # Antes de avanzar la marca: si la transacción falla, la fila solo se relee dos veces
+                self._reintentar(tabla, clave, referencias, omitidas)
+                MarcaReplicacion.objects.update_or_create(tabla=tabla, defaults={'seq': marca})
+            totales[0] += escritas
+            totales[2] += len(omitidas)
+        # Sin cambios de esta tabla hasta el tope: la marca lo alcanza igual
+        MarcaReplicacion.objects.filter(tabla=tabla, seq__lt=self.tope).update(seq=self.tope)
+        return tuple(totales)
+
+    def _ids_django(self, referencias, filas):
+        """``{tabla: {id_flask: id}}`` de las filas a las que apuntan ``filas``"""
+        ids = {'usuario': self.usuario}
+        for columna, tabla in referencias.items():
+            valores = {fila[columna] for fila in filas if fila[columna] is not None}
+            ids[tabla] = dict(
+                MODELOS[tabla]._base_manager.filter(id_flask__in=valores).values_list('id_flask', 'pk')
+            ) if valores else {}
+        return ids
+
+    def _escribir(self, clave, modelo, convertir, referencias, filas):
+        """Upsert en bloque por id_flask; devuelve (escritas, filas omitidas por claves foráneas sin copiar)"""
+        ids = self._ids_django(referencias, filas)
+        objetos = []
+        omitidas = []
+        for fila in filas:
+            campos = convertir(fila, ids)
+            if campos is not None:
+                objetos.append(modelo(id_flask=fila[clave], **campos))
+                actualizar = list(campos)
+            else:
+                omitidas.append(fila)
+        if not objetos:
+            return 0, omitidas
+        ids_flask = [objeto.id_flask for objeto in objetos]
+
+        if modelo is Categoria:
+            self._adoptar_categorias(objetos)
+        anteriores = {}
+        if modelo is Venta:
+            anteriores = Venta.objects.only('id_flask', *CAMPOS_RESUMEN).in_bulk(ids_flask, field_name='id_flask')
+
+        modelo._base_manager.bulk_create(
+            objetos,
+            update_conflicts=True,
+            unique_fields=['id_flask'],
+            update_fields=actualizar,
+        )
+        if modelo in NOMBRE_MODELO:
+            # bulk_create no dispara señales: el feed de cambios del catálogo se anota aquí
+            escritos = modelo._base_manager.filter(id_flask__in=ids_flask)
+            if hasattr(modelo, 'todos'):
+                # Borrado lógico en Flask: lápida en el feed, como ventas.eliminacion
+                registrar_cambios(escritos.filter(eliminado=False))
+                registrar_cambios(escritos.filter(eliminado=True), CambioCatalogo.ELIMINAR)
+            else:
+                registrar_cambios(escritos)
+        if modelo is Venta:
+            # Ni los resúmenes: las nuevas se suman y las editadas se ajustan
+            registrar_ventas([objeto for objeto in objetos if objeto.id_flask not in anteriores])
+            editadas = [
+                (anteriores[objeto.id_flask], objeto) for objeto in objetos
+                if objeto.id_flask in anteriores and any(
+                    getattr(anteriores[objeto.id_flask], campo) != getattr(objeto, campo) for campo in CAMPOS_RESUMEN
+                )
+            ]
+            if editadas:
+                actualizar_ventas([anterior for anterior, _ in editadas], [actual for _, actual in editadas])
+                self.ventas_modificadas = True
+        return len(objetos), omitidas
+
+    def _reintentar(self, tabla, clave, referencias, omitidas):
+        """Vuelve a anotar en el registro las filas omitidas para releerlas en la pasada siguiente.
+
+        Solo las que apuntan a padres que existen en Flask (copiados después
+        de la fila, p. ej. entre las primeras pasadas de dos tablas): con una
+        clave foránea vacía o rota nunca podrán copiarse.
+        """
+        for columna, padre in referencias.items():
+            valores = list({fila[columna] for fila in omitidas if fila[columna] is not None})
+            existentes = {
+                fila[0] for fila in self.conn.execute(
+                    f'SELECT {CLAVES[padre]} FROM {padre} WHERE {CLAVES[padre]} IN ({", ".join("?" * len(valores))})',
+                    valores
+                )
+            } if valores else set()
+            omitidas = [fila for fila in omitidas if fila[columna] in existentes]
+        if omitidas:
+            self.conn.executemany(
+                'INSERT INTO replicacion (tabla, id_fila) VALUES (?, ?)', [(tabla, fila[clave]) for fila in omitidas]
+            )
+            self.conn.commit()
+
+    def _adoptar_categorias(self, objetos):
+        """Enlaza por nombre las categorías que ya existían en Django (el nombre es único)"""
+        por_nombre = {objeto.nombre_categoria: objeto.id_flask for objeto in objetos}
+        sueltas = list(Categoria.objects.filter(id_flask__isnull=True, nombre_categoria__in=por_nombre))
+        enlazadas = set(Categoria.objects.filter(id_flask__in=por_nombre.values()).values_list('id_flask', flat=True))
+        for categoria in sueltas:
+            if por_nombre[categoria.nombre_categoria] not in enlazadas:
+                categoria.id_flask = por_nombre[categoria.nombre_categoria]
+        Categoria.objects.bulk_update([c for c in sueltas if c.id_flask is not None], ['id_flask'])
+
+    def _borrar(self, modelo, ids_flask):
+        """Borra las filas que ya no existen en Flask (con señales: feed de cambios, reportes, resúmenes)"""
+        borradas, por_modelo = modelo._base_manager.filter(id_flask__in=ids_flask).delete()
+        # También las ventas borradas en cascada (de un cliente o producto)
+        if por_modelo.get(Venta._meta.label):
+            self.ventas_modificadas = True
+        return borradas
+
+    def _podar_registro(self):
+        """Borra del registro de Flask las entradas que ya copiaron todas las tablas"""
+        marcas = list(MarcaReplicacion.objects.filter(tabla__in=MODELOS).values_list('seq', flat=True))
+        if len(marcas) == len(MODELOS) and min(marcas):
+            self.conn.execute('DELETE FROM replicacion WHERE seq <= ?', (min(marcas),))
+            self.conn.commit()
+
+
+def replicar_flask(ruta=None, lote=LOTE_REPLICACION):
+    """Una pasada de réplica de la base Flask; ver Replicador.replicar"""
+    conn = conectar_flask(ruta)
+    try:
+        replicador = Replicador(conn, lote)
+        return replicador.replicar(), replicador
+    finally:
+        conn.close()
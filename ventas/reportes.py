@@ -0,0 +1,189 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from .cache import DURACION_REPORTES, guardar_reporte, reporte_guardado, version_ventas
+from .fields import centavos_a_decimal
+from .models import Venta, VentaArchivada
+from .particiones import agregar_particion, consulta_particion
+from .trabajos import encolar
+
+
+# Particiones por proceso del pool: pocas y grandes para que el envío de
+# parciales entre procesos no domine, pero varias para repartir la carga
+PARTICIONES_POR_PROCESO = 2
+
+# Pool de procesos del trabajador de la cola (tarea resumen_ventas), creado al
+# primer resumen en paralelo y reutilizado; los workers web no lo crean
+_pool = None
+_procesos_pool = None
+
+
+def procesos_reportes():
+    """Procesos del pool de reportes (REPORTES_PROCESOS o uno por núcleo)"""
+    return getattr(settings, 'REPORTES_PROCESOS', None) or os.cpu_count() or 1
+
+
+def _obtener_pool(procesos):
+    global _pool, _procesos_pool
+    if _pool is None or _procesos_pool != procesos:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        # spawn: los hijos no heredan conexiones ni hilos del servidor
+        _pool = ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn'))
+        _procesos_pool = procesos
+    return _pool
+
+
+def _meses(desde, hasta):
+    """Pares (inicio, fin) de los meses en hora local que cubren [desde, hasta]"""
+    mes = timezone.localtime(desde).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while mes <= hasta:
+        siguiente = (mes + timedelta(days=32)).replace(day=1)
+        yield mes, siguiente
+        mes = siguiente
+
+
+def _particion(conexion, modelo, tienda_id, meses):
+    """Partición ``(meses, ruta, tabla, tienda_id, limites)`` de los pares (inicio, fin) de ``meses``"""
+    limites = [inicio for inicio, _ in meses] + [meses[-1][1]]
+    return (
+        limites[:-1], str(conexion.settings_dict['NAME']), modelo._meta.db_table, tienda_id,
+        [conexion.ops.adapt_datetimefield_value(limite) for limite in limites],
+    )
+
+
+def _particiones(modelo, procesos):
+    """Particiones tienda × meses consecutivos de la tabla de ``modelo``.
+
+    Se buscan unas ``PARTICIONES_POR_PROCESO`` por proceso en total; cada
+    tienda recibe tramos en proporción a sus ventas, solo dentro de su rango.
+    """
+    conexion = connections[router.db_for_read(modelo)]
+    # Índice (tienda, fecha): el rango de cada tienda sale sin leer la tabla
+    rangos = list(modelo.objects.values('tienda_id').annotate(
+        desde=Min('fecha'), hasta=Max('fecha'), ventas=Count('pk')
+    ).order_by())
+    total = sum(rango['ventas'] for rango in rangos)
+    for rango in rangos:
+        meses = list(_meses(rango['desde'], rango['hasta']))
+        tramos = min(len(meses), max(1, round(procesos * PARTICIONES_POR_PROCESO * rango['ventas'] / total)))
+        for tramo in range(tramos):
+            parte = meses[tramo * len(meses) // tramos:(tramo + 1) * len(meses) // tramos]
+            yield _particion(conexion, modelo, rango['tienda_id'], parte)
+
+
+def _agregar_en_proceso(modelo, particion):
+    """Misma agregación que el pool, con la conexión de Django (otras bases de datos)"""
+    meses, _, tabla, tienda_id, limites = particion
+    sql, parametros = consulta_particion(tabla, tienda_id, limites)
+    with connections[router.db_for_read(modelo)].cursor() as cursor:
+        cursor.execute(sql.replace('?', '%s'), parametros)
+        return meses, cursor.fetchall()
+
+
+def _agregar_consulta(modelo):
+    """Parciales de toda la tabla de ``modelo`` con un solo GROUP BY mes × producto"""
+    conexion = connections[router.db_for_read(modelo)]
+    rango = modelo.objects.aggregate(desde=Min('fecha'), hasta=Max('fecha'))
+    if rango['desde'] is None:
+        return []
+    meses = list(_meses(rango['desde'], rango['hasta']))
+    return [_agregar_en_proceso(modelo, _particion(conexion, modelo, None, meses))]
+
+
+def _admite_pool(modelo):
+    """Los procesos del pool leen el archivo SQLite directamente"""
+    conexion = connections[router.db_for_read(modelo)]
+    return conexion.vendor == 'sqlite' and not conexion.is_in_memory_db()
+
+
+def resumen_ventas(procesos=1):
+    """Totales de todas las ventas (activas y archivadas) por mes y por producto.
+
+    Con un proceso cada tabla se agrega con un solo GROUP BY. Con más (la
+    tarea resumen_ventas), el historial se parte en particiones tienda ×
+    meses que se agregan en un pool de procesos con conexiones de solo
+    lectura; los parciales se combinan aquí. Devuelve ``{'total', 'por_mes',
+    'productos'}`` con los importes como Decimal; ``por_mes`` va de inicio
+    de mes a total y ``productos`` de producto_id a sus totales.
+    """
+    # Un proceso daemon no puede crear hijos
+    if multiprocessing.current_process().daemon:
+        procesos = 1
+
+    parciales = []
+    if procesos == 1:
+        for modelo in (Venta, VentaArchivada):
+            parciales.extend(_agregar_consulta(modelo))
+    else:
+        para_pool = []
+        for modelo in (Venta, VentaArchivada):
+            if _admite_pool(modelo):
+                para_pool.extend(_particiones(modelo, procesos))
+            else:
+                parciales.extend(
+                    _agregar_en_proceso(modelo, particion) for particion in _particiones(modelo, procesos)
+                )
+        if len(para_pool) > 1:
+            parciales.extend(_obtener_pool(procesos).map(agregar_particion, para_pool))
+        else:
+            parciales.extend(map(agregar_particion, para_pool))
+
+    por_mes = {}
+    productos = {}
+    for meses, filas in parciales:
+        for indice, producto_id, nombre, cantidad, total, suma_precios, ventas in filas:
+            mes = meses[indice]
+            por_mes[mes] = por_mes.get(mes, 0) + total
+            acumulado = productos.get(producto_id)
+            if acumulado is None:
+                productos[producto_id] = [nombre, cantidad, total, suma_precios, ventas]
+            else:
+                acumulado[0] = max(acumulado[0], nombre)
+                acumulado[1] += cantidad
+                acumulado[2] += total
+                acumulado[3] += suma_precios
+                acumulado[4] += ventas
+
+    return {
+        'total': centavos_a_decimal(sum(por_mes.values())),
+        'por_mes': {mes: centavos_a_decimal(total) for mes, total in por_mes.items()},
+        'productos': {
+            producto_id: {
+                'nombre': nombre,
+                'total_vendido': cantidad,
+                'ingresos': centavos_a_decimal(total),
+                'suma_precios': centavos_a_decimal(suma_precios),
+                'num_ventas': ventas,
+            }
+            for producto_id, (nombre, cantidad, total, suma_precios, ventas) in productos.items()
+        },
+    }
+
+
+def resumen_reportes():
+    """Resumen de ventas de las vistas de reportes, agregado por la tarea resumen_ventas.
+
+    Si las ventas cambiaron desde el último resumen se encola la tarea (una
+    vez por versión) y se sirve el anterior hasta que termine; solo si no hay
+    ninguno se calcula en la petición con un proceso.
+    """
+    version = version_ventas()
+    resumen, al_dia = reporte_guardado('resumen', version)
+    if al_dia:
+        return resumen
+    if resumen is None:
+        resumen = resumen_ventas()
+        guardar_reporte('resumen', resumen, version)
+        return resumen
+    if cache.add(f'reporte:resumen:encolado:{version}', True, DURACION_REPORTES):
+        encolar('resumen_ventas', unico=True)
+    return resumen
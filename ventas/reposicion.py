@@ -0,0 +1,187 @@
+"""
+Motor de reposición: punto de reorden y cantidad sugerida por producto y ubicación.
+
+Las ventas diarias de la ventana se cargan como tres arreglos paralelos
+(serie, día, cantidad) y todas las series se calculan a la vez con NumPy:
+
+- demanda: media móvil exponencial de la venta diaria (los días sin venta cuentan como 0)
+- stock de seguridad: ``z · σ · √plazo``
+- punto de reorden: ``demanda · plazo + seguridad``
+- stock objetivo: ``demanda · (plazo + ciclo) + seguridad``; al llegar al punto de
+  reorden se sugiere pedir la diferencia entre el objetivo y el stock
+
+Cada serie es un par (producto, tienda) con inventario propio, o el stock
+central del producto para las ventas de las tiendas que no lo tienen. Hay
+una serie por cada fila de inventario y por cada producto aunque no hayan
+vendido en la ventana (demanda 0).
+"""
+
+from array import array
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Inventario, Producto, SugerenciaReposicion, Venta
+
+
+# Días de historial usados para estimar la demanda
+VENTANA_DIAS = 28
+# Días entre pedir la mercancía y tenerla en la tienda
+PLAZO_DIAS = 7
+# Días que debe cubrir cada pedido
+CICLO_DIAS = 14
+# Factor z del nivel de servicio (1.65 ≈ 95 % sin quiebre durante el plazo)
+NIVEL_SERVICIO_Z = 1.65
+
+# Momento del último cálculo; pasada la vigencia el dashboard pide recalcular
+CLAVE_REPOSICION = 'reposicion:calculada'
+VIGENCIA_SUGERENCIAS = timedelta(days=1)
+
+
+def calcular(serie, dia, cantidad, stock, ventana=VENTANA_DIAS, plazo=PLAZO_DIAS,
+             ciclo=CICLO_DIAS, z=NIVEL_SERVICIO_Z):
+    """Cálculo vectorizado sobre todas las series.
+
+    ``serie``, ``dia`` (0..ventana-1) y ``cantidad`` tienen una entrada por
+    serie y día con ventas; ``stock`` tiene una por serie. Devuelve un dict
+    de arreglos por serie: demanda, desviacion, cobertura (inf sin demanda),
+    punto_reorden y sugerida.
+    """
+    # NumPy solo se necesita en el cálculo en lote, no al importar la app
+    import numpy as np
+
+    serie = np.asarray(serie, dtype=np.int64)
+    dia = np.asarray(dia, dtype=np.int64)
+    cantidad = np.asarray(cantidad, dtype=np.float64)
+    stock = np.asarray(stock, dtype=np.float64)
+    n = len(stock)
+
+    suma = np.bincount(serie, weights=cantidad, minlength=n)
+    suma_cuadrados = np.bincount(serie, weights=cantidad * cantidad, minlength=n)
+    media = suma / ventana
+    desviacion = np.sqrt(np.maximum(suma_cuadrados / ventana - media * media, 0))
+
+    # Media móvil exponencial con semivida de una semana: la demanda reciente pesa más
+    pesos = 0.5 ** ((ventana - 1 - np.arange(ventana)) / 7)
+    demanda = np.bincount(serie, weights=cantidad * pesos[dia], minlength=n) / pesos.sum()
+
+    seguridad = z * desviacion * np.sqrt(plazo)
+    punto_reorden = np.ceil(demanda * plazo + seguridad)
+    objetivo = np.ceil(demanda * (plazo + ciclo) + seguridad)
+    sugerida = np.where(stock <= punto_reorden, np.maximum(objetivo - stock, 0), 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cobertura = np.where(demanda > 0, np.maximum(stock, 0) / demanda, np.inf)
+
+    return {
+        'demanda': demanda,
+        'desviacion': desviacion,
+        'cobertura': cobertura,
+        'punto_reorden': punto_reorden.astype(np.int64),
+        'sugerida': sugerida.astype(np.int64),
+    }
+
+
+def _cargar_series(ventana, hoy):
+    """Arreglos (serie, dia, cantidad) de la ventana y las claves y el stock de cada serie"""
+    inicio = hoy - timedelta(days=ventana)
+    desde = timezone.make_aware(datetime.combine(inicio, time.min))
+    hasta = timezone.make_aware(datetime.combine(hoy, time.min))
+
+    propios = {
+        (producto_id, tienda_id): total
+        for producto_id, tienda_id, total in Inventario.objects.values_list(
+            'producto_id', 'tienda_id'
+        ).annotate(total=Sum('cantidad')).order_by()
+    }
+    centrales = dict(Producto.objects.values_list('id', 'stock'))
+
+    # Todas las series desde el principio, también las que no vendieron en la ventana
+    claves = {}
+    for producto_id, tienda_id in propios:
+        if producto_id in centrales:
+            claves[producto_id, tienda_id] = len(claves)
+    for producto_id in centrales:
+        claves[producto_id, None] = len(claves)
+
+    serie, dia, cantidad = array('q'), array('q'), array('q')
+    filas = Venta.objects.filter(fecha__gte=desde, fecha__lt=hasta).annotate(
+        fecha_dia=TruncDate('fecha')
+    ).values_list('producto_id', 'tienda_id', 'fecha_dia').annotate(
+        vendidas=Sum('cantidad')
+    ).order_by()
+    for producto_id, tienda_id, fecha_dia, vendidas in filas.iterator(chunk_size=5000):
+        if producto_id not in centrales:
+            # Producto ocultado por una eliminación en curso
+            continue
+        clave = (producto_id, tienda_id if (producto_id, tienda_id) in propios else None)
+        serie.append(claves[clave])
+        dia.append((fecha_dia - inicio).days)
+        cantidad.append(vendidas)
+
+    stock = [
+        propios[clave] if clave[1] is not None else centrales[clave[0]]
+        for clave in claves
+    ]
+    return list(claves), serie, dia, cantidad, stock
+
+
+def calcular_reposicion(ventana=VENTANA_DIAS, plazo=PLAZO_DIAS, ciclo=CICLO_DIAS, z=NIVEL_SERVICIO_Z):
+    """Recalcula y guarda las sugerencias de todas las series"""
+    ahora = timezone.now()
+    claves, serie, dia, cantidad, stock = _cargar_series(ventana, timezone.localdate(ahora))
+    resultado = calcular(serie, dia, cantidad, stock, ventana, plazo, ciclo, z)
+
+    sugerencias = [
+        SugerenciaReposicion(
+            producto_id=producto_id,
+            tienda_id=tienda_id,
+            demanda_diaria=demanda,
+            desviacion=desviacion,
+            stock=stock_serie,
+            dias_cobertura=cobertura if cobertura != float('inf') else None,
+            punto_reorden=punto_reorden,
+            cantidad_sugerida=sugerida,
+            fecha_calculo=ahora,
+        )
+        for (producto_id, tienda_id), stock_serie, demanda, desviacion, cobertura, punto_reorden, sugerida in zip(
+            claves,
+            stock,
+            resultado['demanda'].tolist(),
+            resultado['desviacion'].tolist(),
+            resultado['cobertura'].tolist(),
+            resultado['punto_reorden'].tolist(),
+            resultado['sugerida'].tolist(),
+        )
+    ]
+    with transaction.atomic():
+        SugerenciaReposicion.objects.all().delete()
+        SugerenciaReposicion.objects.bulk_create(sugerencias, batch_size=2000)
+    cache.set(CLAVE_REPOSICION, ahora, timeout=None)
+    return len(sugerencias)
+
+
+def sugerencias_urgentes(limite=5):
+    """Sugerencias con algo que pedir, menos días de cobertura primero.
+
+    Anotan ``stock_actual``, el stock de la serie en este momento: ``stock``
+    es el del último cálculo.
+    """
+    inventario = Inventario.objects.filter(
+        producto=OuterRef('producto'), tienda=OuterRef('tienda')
+    ).values('producto').annotate(total=Sum('cantidad')).values('total')
+    return SugerenciaReposicion.objects.filter(cantidad_sugerida__gt=0).annotate(
+        stock_actual=Case(
+            When(tienda__isnull=True, then=F('producto__stock')),
+            default=Coalesce(Subquery(inventario), 0),
+        )
+    ).select_related('producto', 'tienda').order_by('dias_cobertura')[:limite]
+
+
+def sugerencias_vigentes():
+    """Indica si hay un cálculo de reposición de menos de VIGENCIA_SUGERENCIAS"""
+    ultima = cache.get(CLAVE_REPOSICION)
+    return ultima is not None and timezone.now() - ultima < VIGENCIA_SUGERENCIAS
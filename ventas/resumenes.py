@@ -0,0 +1,232 @@
+"""
+Resúmenes de ventas por tienda que se mantienen con cada venta.
+
+- Resumen diario con un sketch HyperLogLog de clientes: los clientes
+  distintos de cualquier rango de fechas y conjunto de tiendas se estiman
+  fusionando los sketches de esos días, con el error de ``error_estandar``.
+- Mapa de calor: contadores por día de la semana y hora local.
+
+Los sketches no permiten restar: al borrar o editar ventas (eliminaciones,
+réplica de Flask) se ajustan los contadores y se rehacen solo los sketches
+de los días afectados. El comando reconstruir_resumenes rehace todo en una
+sola pasada.
+"""
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, TruncDate
+from django.utils import timezone
+
+from turron_system.hll import HyperLogLog, error_estandar
+
+from .fields import decimal_a_centavos
+from .models import MapaCalor, ResumenDiario, Tienda, Venta, VentaArchivada
+
+
+# Error estándar relativo de las estimaciones de clientes distintos
+ERROR_CLIENTES = error_estandar()
+
+
+def _celdas_vacias(tienda_id):
+    return [
+        MapaCalor(tienda_id=tienda_id, dia_semana=dia_semana, hora=hora)
+        for dia_semana in range(7)
+        for hora in range(24)
+    ]
+
+
+def _acumular_celdas(ventas, signo=1, por_celda=None):
+    """``{(tienda, día de la semana, hora): [ventas, unidades, centavos]}`` de ``ventas`` por ``signo``"""
+    por_celda = {} if por_celda is None else por_celda
+    for venta in ventas:
+        local = timezone.localtime(venta.fecha)
+        celda = por_celda.setdefault((venta.tienda_id, local.weekday(), local.hour), [0, 0, 0])
+        celda[0] += signo
+        celda[1] += signo * venta.cantidad
+        celda[2] += signo * decimal_a_centavos(venta.total)
+    return por_celda
+
+
+def _sumar_celdas(por_celda):
+    for (tienda_id, dia_semana, hora), (ventas_celda, unidades, centavos) in por_celda.items():
+        if not (ventas_celda or unidades or centavos):
+            continue
+        celda = MapaCalor.objects.filter(tienda_id=tienda_id, dia_semana=dia_semana, hora=hora)
+        # Incremento en SQL (el total en centavos): sin leer la fila, sin carreras
+        cambios = {
+            'ventas': F('ventas') + ventas_celda,
+            'unidades': F('unidades') + unidades,
+            'total': F('total') + centavos,
+        }
+        if not celda.update(**cambios) and ventas_celda > 0:
+            # Primera venta de la tienda: se crean sus 168 celdas a la vez
+            MapaCalor.objects.bulk_create(_celdas_vacias(tienda_id), ignore_conflicts=True)
+            celda.update(**cambios)
+
+
+def registrar_ventas(ventas):
+    """Suma las ventas a los resúmenes de su tienda y día y a su celda del mapa de calor"""
+    por_dia = {}
+    for venta in ventas:
+        clave = (venta.tienda_id, timezone.localdate(venta.fecha))
+        por_dia.setdefault(clave, []).append(venta.cliente_id)
+
+    with transaction.atomic():
+        _sumar_celdas(_acumular_celdas(ventas))
+
+        for (tienda_id, fecha), clientes in por_dia.items():
+            ResumenDiario.objects.get_or_create(tienda_id=tienda_id, fecha=fecha)
+            resumen = ResumenDiario.objects.filter(tienda_id=tienda_id, fecha=fecha)
+            # El UPDATE toma el bloqueo de escritura antes de leer el sketch: otra venta
+            # del mismo día espera y no se pierde ningún cliente
+            resumen.update(ventas=F('ventas') + len(clientes))
+            sketch = HyperLogLog.desde_bytes(
+                resumen.select_for_update().values_list('clientes', flat=True).get()
+            )
+            for cliente_id in clientes:
+                sketch.agregar(cliente_id)
+            resumen.update(clientes=sketch.a_bytes())
+
+
+def _rehacer_dia(tienda_id, fecha):
+    """Rehace el resumen de un día de una tienda con las ventas que quedan"""
+    sketch = HyperLogLog()
+    ventas = 0
+    for modelo in (VentaArchivada, Venta):
+        filas = modelo.objects.filter(tienda_id=tienda_id, fecha__date=fecha).values_list('cliente_id', flat=True)
+        for cliente_id in filas.iterator(chunk_size=5000):
+            sketch.agregar(cliente_id)
+            ventas += 1
+    resumen = ResumenDiario.objects.filter(tienda_id=tienda_id, fecha=fecha)
+    if not ventas:
+        resumen.delete()
+    elif not resumen.update(ventas=ventas, clientes=sketch.a_bytes()):
+        ResumenDiario.objects.create(tienda_id=tienda_id, fecha=fecha, ventas=ventas, clientes=sketch.a_bytes())
+
+
+def _rehacer_dias(ventas):
+    """Rehace los resúmenes de los días de ``ventas``"""
+    dias = {(venta.tienda_id, timezone.localdate(venta.fecha)) for venta in ventas}
+    # Las ventas archivadas pueden ser de una tienda que ya no existe
+    tiendas = set(Tienda.objects.filter(pk__in={tienda_id for tienda_id, _ in dias}).values_list('pk', flat=True))
+    for tienda_id, fecha in dias:
+        if tienda_id in tiendas:
+            _rehacer_dia(tienda_id, fecha)
+
+
+def descontar_ventas(ventas):
+    """Resta ventas ya borradas de su celda del mapa de calor y rehace los resúmenes de sus días"""
+    with transaction.atomic():
+        _sumar_celdas(_acumular_celdas(ventas, -1))
+        _rehacer_dias(ventas)
+
+
+def actualizar_ventas(anteriores, actuales):
+    """Pasa ventas editadas de sus valores ``anteriores`` a los ``actuales`` (ya guardados)"""
+    with transaction.atomic():
+        _sumar_celdas(_acumular_celdas(actuales, 1, _acumular_celdas(anteriores, -1)))
+        _rehacer_dias([*anteriores, *actuales])
+
+
+def reconstruir_resumenes():
+    """Rehace todos los resúmenes a partir de las ventas activas y archivadas"""
+    tiendas = set(Tienda.objects.values_list('pk', flat=True))
+    sketches = {}
+    conteos = {}
+    celdas = {}
+    for modelo in (VentaArchivada, Venta):
+        filas = modelo.objects.annotate(
+            dia=TruncDate('fecha'), dia_semana=ExtractIsoWeekDay('fecha'), hora=ExtractHour('fecha')
+        ).values_list('tienda_id', 'dia', 'dia_semana', 'hora', 'cliente_id', 'cantidad', 'total').order_by()
+        for tienda_id, dia, dia_semana, hora, cliente_id, cantidad, total in filas.iterator(chunk_size=5000):
+            if tienda_id not in tiendas:
+                # Ventas archivadas de una tienda que ya no existe
+                continue
+            clave = (tienda_id, dia)
+            sketch = sketches.get(clave)
+            if sketch is None:
+                sketch = sketches[clave] = HyperLogLog()
+                conteos[clave] = 0
+            sketch.agregar(cliente_id)
+            conteos[clave] += 1
+
+            # ISO: 1 = lunes
+            celda = celdas.get((tienda_id, dia_semana - 1, hora))
+            if celda is None:
+                celda = celdas[tienda_id, dia_semana - 1, hora] = [0, 0, 0]
+            celda[0] += 1
+            celda[1] += cantidad
+            celda[2] += total
+
+    mapa = []
+    for tienda_id in {tienda_id for tienda_id, _ in sketches}:
+        for celda in _celdas_vacias(tienda_id):
+            celda.ventas, celda.unidades, celda.total = celdas.get(
+                (tienda_id, celda.dia_semana, celda.hora), (0, 0, 0)
+            )
+            mapa.append(celda)
+
+    with transaction.atomic():
+        MapaCalor.objects.all().delete()
+        MapaCalor.objects.bulk_create(mapa, batch_size=1000)
+        ResumenDiario.objects.all().delete()
+        ResumenDiario.objects.bulk_create(
+            [
+                ResumenDiario(
+                    tienda_id=tienda_id, fecha=dia, ventas=conteos[tienda_id, dia], clientes=sketch.a_bytes()
+                )
+                for (tienda_id, dia), sketch in sketches.items()
+            ],
+            batch_size=1000
+        )
+    return len(sketches)
+
+
+def clientes_distintos(desde=None, hasta=None, tiendas=None, por=None):
+    """Clientes distintos estimados entre ``desde`` y ``hasta`` (fechas, ambas incluidas).
+
+    ``tiendas`` limita a esos ids. ``por`` agrupa el resultado: ``None`` (un
+    solo grupo con clave None), ``'tienda'`` (id de tienda) o ``'mes'``
+    (primer día del mes). Devuelve ``{clave: (clientes, ventas)}``.
+    """
+    resumenes = ResumenDiario.objects.all()
+    if desde:
+        resumenes = resumenes.filter(fecha__gte=desde)
+    if hasta:
+        resumenes = resumenes.filter(fecha__lte=hasta)
+    if tiendas:
+        resumenes = resumenes.filter(tienda_id__in=tiendas)
+
+    sketches = {}
+    ventas = {}
+    filas = resumenes.values_list('tienda_id', 'fecha', 'ventas', 'clientes').order_by()
+    for tienda_id, fecha, num_ventas, datos in filas.iterator(chunk_size=2000):
+        clave = {'tienda': tienda_id, 'mes': fecha.replace(day=1)}.get(por)
+        sketch = sketches.get(clave)
+        if sketch is None:
+            sketch = sketches[clave] = HyperLogLog()
+            ventas[clave] = 0
+        sketch.fusionar(datos)
+        ventas[clave] += num_ventas
+    return {clave: (sketch.estimar(), ventas[clave]) for clave, sketch in sketches.items()}
+
+
+def mapa_calor(tiendas=None):
+    """Matrices 7 × 24 (día de la semana × hora) de ventas, unidades y total.
+
+    Con ``tiendas`` se combinan solo esas tiendas; si no, todas. Lee a lo sumo
+    168 filas agregadas, sin importar cuántas ventas haya.
+    """
+    celdas = MapaCalor.objects.all()
+    if tiendas:
+        celdas = celdas.filter(tienda_id__in=tiendas)
+    matrices = {nombre: [[0] * 24 for _ in range(7)] for nombre in ('ventas', 'unidades', 'total')}
+    filas = celdas.values('dia_semana', 'hora').annotate(
+        suma_ventas=Sum('ventas'), suma_unidades=Sum('unidades'), suma_total=Sum('total')
+    ).order_by()
+    for fila in filas:
+        dia_semana, hora = fila['dia_semana'], fila['hora']
+        matrices['ventas'][dia_semana][hora] = fila['suma_ventas']
+        matrices['unidades'][dia_semana][hora] = fila['suma_unidades']
+        matrices['total'][dia_semana][hora] = fila['suma_total']
+    return matrices
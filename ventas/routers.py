@@ -0,0 +1,23 @@
+class ArchivoRouter:
+    """Envía las ventas archivadas a la base de datos ``archivo``.
+
+    El resto de modelos sigue en ``default`` y no se crea ninguna otra tabla
+    en el archivo.
+    """
+    modelos_archivo = {'ventaarchivada'}
+
+    def _es_archivo(self, model):
+        return model._meta.app_label == 'ventas' and model._meta.model_name in self.modelos_archivo
+
+    def db_for_read(self, model, **hints):
+        return 'archivo' if self._es_archivo(model) else None
+
+    def db_for_write(self, model, **hints):
+        return 'archivo' if self._es_archivo(model) else None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == 'ventas' and model_name in self.modelos_archivo:
+            return db == 'archivo'
+        if db == 'archivo':
+            return False
+        return None
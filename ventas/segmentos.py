@@ -0,0 +1,162 @@
+"""
+Segmentación RFM de clientes (recencia, frecuencia y monto).
+
+Los agregados de cada cliente (última compra, número de compras y monto)
+salen de un GROUP BY por cliente sobre las ventas activas y archivadas. En
+los cálculos siguientes solo se recalculan los clientes con ventas nuevas
+desde el último id procesado. Los puntajes sí se recalculan para todos en
+cada pasada, porque la recencia avanza cada día y los quintiles son
+globales; con NumPy es una sola operación vectorizada, y solo se escriben
+las filas cuyo puntaje o segmento cambió.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .models import Cliente, SegmentoCliente, Venta, VentaArchivada
+
+
+# Último id de venta incorporado a los agregados; sin él se recalcula todo
+CLAVE_SEGMENTOS = 'segmentos:ultima_venta'
+
+# Clientes por consulta al leer sus agregados
+LOTE_CLIENTES = 500
+
+
+def _agregados(clientes=None):
+    """{cliente_id: [ultima_compra, compras, monto]} de las ventas activas y archivadas"""
+    agregados = {}
+    for modelo in (Venta, VentaArchivada):
+        consulta = modelo.objects.values('cliente_id').annotate(
+            ultima=Max('fecha'), compras=Count('id'), monto=Sum('total')
+        ).order_by()
+        if clientes is None:
+            lotes = [consulta]
+        else:
+            lotes = (
+                consulta.filter(cliente_id__in=clientes[i:i + LOTE_CLIENTES])
+                for i in range(0, len(clientes), LOTE_CLIENTES)
+            )
+        for lote in lotes:
+            for fila in lote.iterator(chunk_size=5000):
+                actual = agregados.get(fila['cliente_id'])
+                if actual is None:
+                    agregados[fila['cliente_id']] = [fila['ultima'], fila['compras'], fila['monto']]
+                else:
+                    actual[0] = max(actual[0], fila['ultima'])
+                    actual[1] += fila['compras']
+                    actual[2] += fila['monto']
+    return agregados
+
+
+def _guardar_agregados(agregados, ahora):
+    existentes = SegmentoCliente.objects.in_bulk(list(agregados))
+    # Las ventas archivadas pueden ser de clientes que ya no existen
+    validos = set(Cliente.todos.values_list('pk', flat=True))
+    nuevos = []
+    for cliente_id, (ultima, compras, monto) in agregados.items():
+        segmento = existentes.get(cliente_id)
+        if segmento is None:
+            if cliente_id in validos:
+                nuevos.append(SegmentoCliente(
+                    cliente_id=cliente_id, ultima_compra=ultima, compras=compras, monto=monto, fecha_calculo=ahora
+                ))
+        else:
+            segmento.ultima_compra, segmento.compras, segmento.monto = ultima, compras, monto
+    SegmentoCliente.objects.bulk_update(
+        existentes.values(), ['ultima_compra', 'compras', 'monto'], batch_size=1000
+    )
+    SegmentoCliente.objects.bulk_create(nuevos, batch_size=1000)
+
+
+def puntuar(recencia, compras, monto):
+    """Puntajes R, F y M (quintiles 1 a 5) y segmento de cada cliente, vectorizado"""
+    import numpy as np
+
+    def quintil(valores):
+        cortes = np.quantile(valores, [0.2, 0.4, 0.6, 0.8])
+        return np.searchsorted(cortes, valores, side='left') + 1
+
+    # Menos días desde la última compra es mejor
+    r = 6 - quintil(np.asarray(recencia, dtype=np.float64))
+    f = quintil(np.asarray(compras, dtype=np.float64))
+    m = quintil(np.asarray(monto, dtype=np.float64))
+    segmentos = np.select(
+        [
+            (r >= 4) & (f >= 4) & (m >= 4),
+            (r >= 3) & (f >= 4),
+            (r >= 4) & (f <= 1),
+            r >= 4,
+            (r <= 2) & (f >= 3),
+            (r == 1) & (f <= 2),
+            (r == 2) & (f <= 2),
+        ],
+        [
+            SegmentoCliente.CAMPEONES,
+            SegmentoCliente.LEALES,
+            SegmentoCliente.NUEVOS,
+            SegmentoCliente.POTENCIALES,
+            SegmentoCliente.EN_RIESGO,
+            SegmentoCliente.PERDIDOS,
+            SegmentoCliente.HIBERNANDO,
+        ],
+        default=SegmentoCliente.NECESITAN_ATENCION,
+    )
+    return r, f, m, segmentos
+
+
+def segmentos_pendientes():
+    """Indica si hay ventas posteriores al último cálculo de segmentos"""
+    marca = cache.get(CLAVE_SEGMENTOS)
+    return marca is None or Venta.objects.filter(id__gt=marca).exists()
+
+
+def calcular_segmentos(completo=False):
+    """Actualiza los segmentos; devuelve (clientes recalculados, filas con segmento nuevo)"""
+    ahora = timezone.now()
+    marca = None if completo else cache.get(CLAVE_SEGMENTOS)
+    ultimo_id = Venta.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+
+    if marca is None:
+        agregados = _agregados()
+        with transaction.atomic():
+            # Clientes que ya no tienen compras (p. ej. tras eliminar productos)
+            sobrantes = [
+                cliente_id for cliente_id in SegmentoCliente.objects.values_list('cliente_id', flat=True)
+                if cliente_id not in agregados
+            ]
+            for i in range(0, len(sobrantes), LOTE_CLIENTES):
+                SegmentoCliente.objects.filter(cliente_id__in=sobrantes[i:i + LOTE_CLIENTES]).delete()
+            _guardar_agregados(agregados, ahora)
+    else:
+        clientes = list(
+            Venta.objects.filter(id__gt=marca, id__lte=ultimo_id).values_list('cliente_id', flat=True).distinct()
+        )
+        agregados = _agregados(clientes)
+        with transaction.atomic():
+            _guardar_agregados(agregados, ahora)
+
+    filas = list(SegmentoCliente.objects.values_list(
+        'cliente_id', 'ultima_compra', 'compras', 'monto', 'puntaje_r', 'puntaje_f', 'puntaje_m', 'segmento'
+    ))
+    cambiados = []
+    if filas:
+        r, f, m, segmentos = puntuar(
+            [(ahora - fila[1]).days for fila in filas],
+            [fila[2] for fila in filas],
+            [float(fila[3]) for fila in filas],
+        )
+        for fila, nuevo in zip(filas, zip(r.tolist(), f.tolist(), m.tolist(), segmentos.tolist())):
+            if tuple(fila[4:]) != nuevo:
+                cambiados.append(SegmentoCliente(
+                    cliente_id=fila[0], puntaje_r=nuevo[0], puntaje_f=nuevo[1], puntaje_m=nuevo[2],
+                    segmento=nuevo[3], fecha_calculo=ahora,
+                ))
+        SegmentoCliente.objects.bulk_update(
+            cambiados, ['puntaje_r', 'puntaje_f', 'puntaje_m', 'segmento', 'fecha_calculo'], batch_size=1000
+        )
+
+    cache.set(CLAVE_SEGMENTOS, ultimo_id, timeout=None)
+    return len(agregados), len(cambiados)
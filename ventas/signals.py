@@ -1,7 +1,16 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.db import transaction
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import PerfilUsuario, Venta, Producto
+from django.contrib.auth.signals import user_logged_in
+from django.core.signals import request_finished
+from .accesos import registrar_acceso, volcar_si_vence
+from .models import CambioCatalogo, PerfilUsuario, PrecioHistorico, Venta, Producto
+from .inventario import descontar_stock
+from .cache import invalidar_reportes
+from .eventos import publicar_stock, publicar_venta
+from .cambios import MODELOS_CATALOGO, registrar_cambio
+from .resumenes import descontar_ventas, registrar_ventas
 
 
 @receiver(post_save, sender=User)
@@ -12,25 +21,127 @@ def crear_perfil_usuario(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=User)
-def guardar_perfil_usuario(sender, instance, **kwargs):
-    """Guardar el perfil de usuario cuando se guarda el usuario"""
-    if hasattr(instance, 'perfilusuario'):
+def guardar_perfil_usuario(sender, instance, update_fields=None, **kwargs):
+    """Guardar el perfil de usuario cuando se guarda el usuario completo.
+
+    Solo si el perfil ya está cargado (quizá se editó junto con el usuario):
+    consultarlo para guardarlo sin cambios son dos consultas de más en cada
+    guardado parcial, como el de last_login.
+    """
+    if update_fields is None and User.perfilusuario.related.is_cached(instance):
         instance.perfilusuario.save()
 
 
+# last_login se escribe por lotes (ver ventas.accesos) en lugar de un UPDATE por login
+user_logged_in.disconnect(dispatch_uid='update_last_login')
+
+
+@receiver(user_logged_in)
+def anotar_acceso(sender, user, **kwargs):
+    """Anotar el inicio de sesión para el próximo volcado de last_login"""
+    registrar_acceso(user)
+
+
+@receiver(request_finished)
+def volcar_accesos_pendientes(sender, **kwargs):
+    """Escribir los last_login que ya esperaron demasiado en memoria"""
+    volcar_si_vence()
+
+
 @receiver(pre_save, sender=Venta)
 def actualizar_stock_producto(sender, instance, **kwargs):
-    """Actualizar el stock del producto cuando se registra una venta"""
+    """Actualizar el stock de la tienda (o el central) cuando se registra una venta"""
     if instance.pk is None:  # Nueva venta
-        producto = instance.producto
-        if producto.stock >= instance.cantidad:
-            producto.stock -= instance.cantidad
-            producto.save()
-        else:
-            raise ValueError(f"Stock insuficiente. Stock disponible: {producto.stock}")
+        descontar_stock(instance.producto, instance.tienda, instance.cantidad)
+
+
+@receiver(pre_save, sender=Venta)
+def guardar_snapshots_venta(sender, instance, **kwargs):
+    """Copiar los nombres relacionados una sola vez, al registrar la venta"""
+    if instance.pk is None and not instance.producto_nombre:
+        instance.tomar_snapshots()
 
 
 @receiver(pre_save, sender=Venta)
 def calcular_total_venta(sender, instance, **kwargs):
     """Calcular el total de la venta automáticamente"""
     instance.total = instance.cantidad * instance.precio_unitario
+
+
+@receiver(post_save, sender=Venta)
+@receiver(post_delete, sender=Venta)
+def invalidar_reportes_venta(sender, created=False, **kwargs):
+    """Los reportes cacheados dejan de ser válidos al cambiar cualquier venta"""
+    # Editar o borrar (post_delete no trae ``created``) no se resuelve anexando al cubo
+    invalidar_reportes(modificadas=not created)
+
+
+@receiver(post_save, sender=Venta)
+def resumir_venta(sender, instance, created, **kwargs):
+    """Sumar la venta al resumen diario de su tienda (clientes distintos)"""
+    if created:
+        registrar_ventas([instance])
+
+
+@receiver(post_delete, sender=Venta)
+def descontar_venta(sender, instance, **kwargs):
+    """Restar la venta borrada del mapa de calor y del resumen de su día"""
+    descontar_ventas([instance])
+
+
+@receiver(post_save, sender=Venta)
+def difundir_venta(sender, instance, created, **kwargs):
+    """Publicar la venta en el feed en vivo una vez confirmada la transacción"""
+    if created:
+        transaction.on_commit(lambda: publicar_venta(instance))
+
+
+@receiver(pre_save, sender=Producto)
+def recordar_stock_producto(sender, instance, **kwargs):
+    """Guardar el stock y el precio previos para detectar cambios al editar el producto"""
+    if instance.pk is None:
+        instance._stock_anterior, instance._precio_anterior = 0, None
+    else:
+        instance._stock_anterior, instance._precio_anterior = Producto.objects.filter(
+            pk=instance.pk
+        ).values_list('stock', 'precio').first() or (0, None)
+
+
+@receiver(post_save, sender=Producto)
+def difundir_stock_producto(sender, instance, **kwargs):
+    """Publicar el nuevo stock si la edición lo cambió"""
+    cambio = instance.stock - getattr(instance, '_stock_anterior', instance.stock)
+    if cambio:
+        transaction.on_commit(lambda: publicar_stock(instance.pk, cambio))
+
+
+@receiver(post_save, sender=Producto)
+def registrar_precio_producto(sender, instance, created, **kwargs):
+    """Agregar el nuevo precio al historial al crear el producto o cambiar su precio"""
+    precio = Producto._meta.get_field('precio').to_python(instance.precio)
+    if created or precio != getattr(instance, '_precio_anterior', precio):
+        PrecioHistorico.objects.create(producto=instance, precio=precio)
+        # Los reportes de margen comparan contra el precio de lista vigente
+        invalidar_reportes()
+
+
+def registrar_guardado_catalogo(sender, instance, **kwargs):
+    """Añadir el objeto guardado al feed de cambios del catálogo"""
+    registrar_cambio(sender, instance.pk)
+
+
+def registrar_eliminacion_catalogo(sender, instance, **kwargs):
+    """Dejar una lápida en el feed de cambios al eliminar el objeto"""
+    registrar_cambio(sender, instance.pk, CambioCatalogo.ELIMINAR)
+
+
+for modelo, _ in MODELOS_CATALOGO.values():
+    post_save.connect(registrar_guardado_catalogo, sender=modelo, dispatch_uid=f'cambios_guardar_{modelo.__name__}')
+    post_delete.connect(registrar_eliminacion_catalogo, sender=modelo, dispatch_uid=f'cambios_eliminar_{modelo.__name__}')
+
+
+@receiver(post_save, sender=Venta)
+def registrar_stock_vendido(sender, instance, created, **kwargs):
+    """El stock del producto cambió con la venta: se publica en el feed de cambios"""
+    if created:
+        registrar_cambio(Producto, instance.producto_id, solo_stock=True)
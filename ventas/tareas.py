@@ -0,0 +1,93 @@
+"""Tareas que se ejecutan en la cola de trabajos (comando ejecutar_trabajos)"""
+
+import csv
+from datetime import datetime
+
+from django.utils import timezone
+
+from .archivo import querysets_ventas
+from .cache import guardar_reporte, version_ventas
+from .catalogo import generar_catalogo
+from .eliminacion import ejecutar_eliminacion
+from .reportes import procesos_reportes, resumen_ventas
+from .reposicion import calcular_reposicion
+from .segmentos import calcular_segmentos
+from .trabajos import tarea
+
+
+# Columnas del CSV de ventas (todas vienen de los snapshots, sin joins)
+COLUMNAS_EXPORTACION = [
+    'id', 'fecha', 'cliente_nombre', 'producto_nombre', 'categoria_nombre',
+    'cantidad', 'precio_unitario', 'total', 'tienda_nombre',
+    'lugar_entrega_nombre', 'usuario_nombre',
+]
+
+
+def parsear_fecha(valor):
+    """Fecha ``AAAA-MM-DD`` como datetime al inicio del día, o None"""
+    try:
+        fecha = datetime.strptime(valor, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+    return timezone.make_aware(fecha)
+
+
+@tarea('exportar_ventas')
+def exportar_ventas(trabajo, desde=None, hasta=None):
+    """Escribe las ventas del rango en un CSV (``hasta`` es exclusivo)"""
+    querysets = querysets_ventas(parsear_fecha(desde), parsear_fecha(hasta))
+    total = sum(queryset.count() for queryset in querysets)
+    escritas = 0
+    with open(trabajo.ruta_resultado('ventas.csv'), 'w', newline='', encoding='utf-8') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(COLUMNAS_EXPORTACION)
+        # Primero las recientes y después las archivadas, más antiguas
+        for queryset in querysets:
+            filas = queryset.order_by('-fecha').values_list(*COLUMNAS_EXPORTACION)
+            for fila in filas.iterator(chunk_size=2000):
+                escritor.writerow(fila)
+                escritas += 1
+                if escritas % 5000 == 0:
+                    trabajo.progreso(escritas * 100 // total, f'{escritas} de {total} ventas')
+    return {'ventas': escritas}
+
+
+@tarea('eliminar')
+def eliminar(trabajo, eliminacion_id):
+    """Borrado por lotes de un cliente o producto ya ocultado (ver ventas.eliminacion)"""
+    eliminacion = ejecutar_eliminacion(
+        eliminacion_id,
+        progreso=lambda borradas, total: trabajo.progreso(
+            borradas * 100 // total if total else 0, f'{borradas} de {total} ventas borradas'
+        ),
+    )
+    return {'borradas': eliminacion.borradas}
+
+
+@tarea('generar_catalogo')
+def generar(trabajo, forzar=False):
+    """Reconstruye el catálogo precompilado de las terminales"""
+    ruta = generar_catalogo(forzar=forzar)
+    return {'catalogo': ruta.name, 'bytes': ruta.stat().st_size}
+
+
+@tarea('resumen_ventas')
+def resumen(trabajo):
+    """Agrega el resumen de los reportes con el pool de procesos y lo deja en caché"""
+    version = version_ventas()
+    procesos = procesos_reportes()
+    guardar_reporte('resumen', resumen_ventas(procesos), version)
+    return {'procesos': procesos}
+
+
+@tarea('calcular_reposicion')
+def reposicion(trabajo):
+    """Recalcula puntos de reorden y sugerencias de reposición de todo el catálogo"""
+    return {'series': calcular_reposicion()}
+
+
+@tarea('calcular_segmentos')
+def segmentos(trabajo, completo=False):
+    """Segmentos RFM de los clientes con ventas nuevas (o de todos con ``completo``)"""
+    recalculados, cambiados = calcular_segmentos(completo=completo)
+    return {'recalculados': recalculados, 'cambiados': cambiados}
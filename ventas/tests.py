@@ -1,3 +1,1215 @@
-from django.test import TestCase
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections, router
+from django.db.models import Count, Max, Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+
+from turron_system.cache_sqlite import AlmacenCache
+from turron_system.hll import HyperLogLog, error_estandar
+from turron_system.cola import COMPLETADO, EN_CURSO, FALLIDO, PENDIENTE, ColaTrabajos, Trabajador
+from turron_system.migraciones import Migracion, migrar, version_esquema
+
+import app as aplicacion_flask
+
+from .accesos import registrar_acceso, volcar_accesos
+from .ajustes import FIJAR, PORCENTAJE, SUMA, ajustar_productos
+from .archivo import CAMPOS_ARCHIVO, agregar_ventas, archivar_ventas
+from .cache import CLAVE_VERSION_VENTAS, invalidar_reportes, reporte_cacheado, ventas_modificadas, version_ventas
+from .catalogo import generar_catalogo, parsear_rango, version_actual
+from .cubo import CuboVentas
+from .eliminacion import ejecutar_eliminacion, iniciar_eliminacion
+from .eventos import bus
+from .fields import centavos_a_decimal, decimal_a_centavos
+from .inventario import (
+    StockInsuficiente, descontar_stock, repartir_inventario, reservar_stock, stock_disponible, stock_tienda,
+)
+from .management.commands.tiempo_arranque import parsear_importtime
+from .lotes import CREADA, DUPLICADA, SIN_STOCK, LoteDuplicado, registrar_lote
+from .replicacion import replicar_flask
+from .reportes import PARTICIONES_POR_PROCESO, _particiones, resumen_reportes, resumen_ventas
+from .reposicion import calcular_reposicion
+from .resumenes import clientes_distintos, mapa_calor, reconstruir_resumenes
+from .models import (
+    CambioCatalogo, Categoria, Cliente, Inventario, LugarEntrega, MapaCalor, PrecioHistorico, Producto, ResumenDiario,
+    SugerenciaReposicion, Tienda, Venta, VentaArchivada,
+)
+from .trabajos import TAREAS, cola
+from .views import VentaListView, _calcular_ganancias
+
+
+class PruebaVentas(TestCase):
+    """TestCase con caché, catálogo y cola de trabajos en un directorio temporal"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temporal = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.temporal.cleanup)
+        ajustes = override_settings(
+            CACHES={
+                'default': {
+                    'BACKEND': 'turron_system.cache.SQLiteCache',
+                    'LOCATION': os.path.join(cls.temporal.name, 'cache.sqlite3'),
+                    'TIMEOUT': 300,
+                }
+            },
+            CATALOGO_DIR=os.path.join(cls.temporal.name, 'catalogo'),
+            TRABAJOS_DB=os.path.join(cls.temporal.name, 'trabajos.sqlite3'),
+            TRABAJOS_DIR=os.path.join(cls.temporal.name, 'trabajos'),
+            FLASK_DATABASE=os.path.join(cls.temporal.name, 'sistema_ventas.db'),
+        )
+        ajustes.enable()
+        cls.addClassCleanup(ajustes.disable)
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        # Los last_login de force_login() se escriben ahora, no al salir con la base real
+        volcar_accesos()
+
+    def crear_datos(self):
+        """Usuario, categoría, producto con 10 unidades, tienda, lugar y cliente"""
+        self.usuario = User.objects.create_user('cajero', password='x')
+        self.categoria = Categoria.objects.create(nombre_categoria='Turrones')
+        self.producto = Producto.objects.create(
+            nombre='Turrón de almendra', precio=Decimal('12.50'), stock=10, categoria=self.categoria
+        )
+        self.tienda = Tienda.objects.create(nombre_tienda='Centro')
+        self.lugar = LugarEntrega.objects.create(nombre_lugar='Mostrador', direccion='Calle 1')
+        self.cliente = Cliente.objects.create(nombre='Ana', apellido='Ruiz')
+
+    def crear_venta(self, cantidad=1, **campos):
+        """Venta por la vía normal (con señales: stock, resúmenes, feed)"""
+        datos = {
+            'cliente': self.cliente, 'producto': self.producto, 'tienda': self.tienda,
+            'lugar_entrega': self.lugar, 'usuario': self.usuario, 'cantidad': cantidad,
+            'precio_unitario': self.producto.precio,
+        }
+        datos.update(campos)
+        return Venta.objects.create(**datos)
+
+
+class AccesosTests(PruebaVentas):
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+        volcar_accesos()
+
+    def test_el_login_no_escribe_last_login(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post(reverse('login'), {'username': 'cajero', 'password': 'x'})
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertFalse([c for c in consultas if c['sql'].startswith('UPDATE "auth_user"')])
+        self.assertIsNone(User.objects.get(pk=self.usuario.pk).last_login)
+        self.assertEqual(volcar_accesos(), 1)
+        self.assertIsNotNone(User.objects.get(pk=self.usuario.pk).last_login)
+
+    def test_volcado_en_un_solo_update(self):
+        otros = [User.objects.create_user(f'turno{i}') for i in range(3)]
+        for usuario in [self.usuario, *otros]:
+            registrar_acceso(usuario)
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(volcar_accesos(), 4)
+        self.assertEqual(len([c for c in consultas if c['sql'].startswith('UPDATE')]), 1)
+
+    def test_un_volcado_fallido_se_reintenta_sin_pisar_accesos_nuevos(self):
+        registrar_acceso(self.usuario)
+
+        def bloqueada(*args, **kwargs):
+            # Otro login del mismo usuario mientras se intentaba escribir
+            registrar_acceso(self.usuario)
+            raise DatabaseError('database is locked')
+
+        with mock.patch.object(User.objects, 'bulk_update', side_effect=bloqueada):
+            self.assertEqual(volcar_accesos(), 0)
+        self.assertEqual(volcar_accesos(), 1)
+        self.assertEqual(User.objects.get(pk=self.usuario.pk).last_login, self.usuario.last_login)
+
+
+class CacheSQLiteTests(PruebaVentas):
+
+    def test_clave_caduca_tras_su_timeout(self):
+        cache.set('efimera', 'valor', timeout=1)
+        self.assertEqual(cache.get('efimera'), 'valor')
+        time.sleep(1.2)
+        self.assertIsNone(cache.get('efimera'))
+
+    def test_timeout_por_defecto_es_relativo(self):
+        cache.set('normal', 'valor')
+        expira = cache._almacen._conexion().execute(
+            'SELECT expira FROM cache WHERE clave = ?', (cache.make_key('normal'),)
+        ).fetchone()[0]
+        self.assertAlmostEqual(expira - time.time(), 300, delta=5)
+
+    def test_timeout_cero_borra_la_clave(self):
+        cache.set('borrar', 'valor')
+        cache.set('borrar', 'otro', timeout=0)
+        self.assertFalse(cache.has_key('borrar'))
+
+    def test_touch_renueva_y_cero_borra(self):
+        cache.set('tocar', 'valor', timeout=1)
+        self.assertTrue(cache.touch('tocar', timeout=60))
+        time.sleep(1.2)
+        self.assertEqual(cache.get('tocar'), 'valor')
+        cache.touch('tocar', timeout=0)
+        self.assertIsNone(cache.get('tocar'))
+
+    def test_purga_no_borra_entradas_sin_caducidad(self):
+        almacen = AlmacenCache(os.path.join(self.temporal.name, 'purga.sqlite3'), max_entradas=10, purga_cada=1)
+        almacen.set('version:ventas', 7, timeout=None)
+        for i in range(30):
+            almacen.set(f'reporte:{i}', i, timeout=60)
+        self.assertEqual(almacen.get('version:ventas'), 7)
+        self.assertLessEqual(almacen._conexion().execute('SELECT COUNT(*) FROM cache').fetchone()[0], 11)
+
+    def test_purga_cuenta_solo_cada_n_escrituras(self):
+        almacen = AlmacenCache(os.path.join(self.temporal.name, 'cada.sqlite3'), max_entradas=5, purga_cada=10)
+        for i in range(9):
+            almacen.set(f'clave:{i}', i, timeout=60)
+        # Nueve escrituras: aún no se ha comprobado el límite
+        self.assertEqual(almacen._conexion().execute('SELECT COUNT(*) FROM cache').fetchone()[0], 9)
+        almacen.set('clave:9', 9, timeout=60)
+        self.assertLessEqual(almacen._conexion().execute('SELECT COUNT(*) FROM cache').fetchone()[0], 5)
+
+    def test_version_ventas_solo_escribe_la_primera_vez(self):
+        self.assertEqual(version_ventas(), 1)
+        invalidar_reportes()
+        with mock.patch.object(cache, 'add') as add:
+            self.assertEqual(version_ventas(), 2)
+        add.assert_not_called()
+        self.assertEqual(cache.get(CLAVE_VERSION_VENTAS), 2)
+
+
+class ReservasTests(PruebaVentas):
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+
+    def test_reserva_descuenta_del_disponible(self):
+        reservar_stock(self.producto, self.tienda, 4, self.usuario)
+        self.assertEqual(stock_disponible(self.producto, self.tienda), 6)
+        with self.assertRaises(StockInsuficiente):
+            reservar_stock(self.producto, self.tienda, 7, self.usuario)
+
+    def test_renovar_reserva_propia_no_la_cuenta_dos_veces(self):
+        reserva = reservar_stock(self.producto, self.tienda, 8, self.usuario)
+        renovada = reservar_stock(self.producto, self.tienda, 10, self.usuario, token=reserva.token)
+        self.assertEqual(renovada.pk, reserva.pk)
+        self.assertEqual(stock_disponible(self.producto, self.tienda), 0)
+
+    def test_token_ajeno_no_libera_su_reserva(self):
+        otro = User.objects.create_user('otro', password='x')
+        ajena = reservar_stock(self.producto, self.tienda, 8, otro)
+        with self.assertRaises(StockInsuficiente):
+            reservar_stock(self.producto, self.tienda, 5, self.usuario, token=ajena.token)
+
+    def test_toma_el_bloqueo_antes_de_leer_el_stock(self):
+        with CaptureQueriesContext(connection) as consultas:
+            reservar_stock(self.producto, self.tienda, 1, self.usuario)
+        sentencias = [q['sql'].lstrip().split()[0] for q in consultas if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertEqual(sentencias[0], 'UPDATE')
+
+
+class LoteVentasTests(PruebaVentas):
+    databases = {'default', 'archivo'}
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+
+    def item(self, cantidad=1, id_venta=None):
+        return {
+            'uuid': str(id_venta or uuid.uuid4()), 'cliente': self.cliente.pk, 'producto': self.producto.pk,
+            'tienda': self.tienda.pk, 'lugar_entrega': self.lugar.pk, 'cantidad': cantidad,
+        }
+
+    def test_reenviar_el_lote_no_duplica(self):
+        items = [self.item(2), self.item(3)]
+        self.assertEqual([r['estado'] for r in registrar_lote(items, self.usuario)], [CREADA, CREADA])
+        self.assertEqual([r['estado'] for r in registrar_lote(items, self.usuario)], [DUPLICADA, DUPLICADA])
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 5)
+        self.assertEqual(Venta.objects.get(uuid=items[0]['uuid']).total, Decimal('25.00'))
+
+    def test_respeta_las_reservas_activas(self):
+        reservar_stock(self.producto, self.tienda, 8, self.usuario)
+        resultado = registrar_lote([self.item(3)], self.usuario)[0]
+        self.assertEqual(resultado['estado'], SIN_STOCK)
+        self.assertEqual(resultado['disponible'], 2)
+
+    def test_uuid_archivado_es_duplicado(self):
+        venta = self.crear_venta()
+        id_venta = uuid.uuid4()
+        VentaArchivada.objects.create(
+            id=venta.pk + 1000, fecha=venta.fecha, cantidad=1, precio_unitario=venta.precio_unitario,
+            total=venta.total, cliente_id=self.cliente.pk, producto_id=self.producto.pk,
+            tienda_id=self.tienda.pk, lugar_entrega_id=self.lugar.pk, usuario_id=self.usuario.pk, uuid=id_venta,
+        )
+        resultado = registrar_lote([self.item(id_venta=id_venta)], self.usuario)[0]
+        self.assertEqual(resultado['estado'], DUPLICADA)
+        self.assertEqual(resultado['venta'], venta.pk + 1000)
+
+    def test_uuid_registrado_a_la_vez_lanza_lote_duplicado(self):
+        item = self.item()
+        # Otra subida registra la venta después de que este lote buscó los UUID existentes
+        self.crear_venta(uuid=item['uuid'])
+        buscar = Venta.objects.filter
+        llamadas = []
+
+        def filtrar(*args, **kwargs):
+            llamadas.append(kwargs)
+            return Venta.objects.none() if len(llamadas) == 1 else buscar(*args, **kwargs)
+
+        with mock.patch.object(Venta.objects, 'filter', side_effect=filtrar):
+            with self.assertRaises(LoteDuplicado):
+                registrar_lote([item], self.usuario)
+
+
+class CatalogoTests(PruebaVentas):
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+        self.client.force_login(self.usuario)
+
+    def test_parsear_rango(self):
+        self.assertEqual(parsear_rango('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parsear_rango('bytes=90-', 100), (90, 99))
+        self.assertEqual(parsear_rango('bytes=-10', 100), (90, 99))
+        self.assertIsNone(parsear_rango('bytes=100-', 100))
+        for cabecera in ('bytes=a-5', 'bytes=5-a', 'bytes=-', 'bytes=²-5', 'bytes=1-2,4-5', 'items=0-1'):
+            self.assertIs(parsear_rango(cabecera, 100), False, cabecera)
+
+    def test_rango_mal_formado_sirve_el_catalogo_completo(self):
+        ruta = generar_catalogo()
+        respuesta = self.client.get(reverse('api_catalogo'), HTTP_RANGE='bytes=a-5')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotIn('Content-Range', respuesta)
+        self.assertEqual(respuesta.content, ruta.read_bytes())
+
+    def test_las_ventas_no_cambian_la_version_ni_el_etag(self):
+        version = version_actual()
+        generar_catalogo()
+        etag = self.client.get(reverse('api_catalogo'))['ETag']
+        self.crear_venta(2)
+        self.assertEqual(version_actual(), version)
+        respuesta = self.client.get(reverse('api_catalogo'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_editar_el_producto_cambia_la_version(self):
+        version = version_actual()
+        self.crear_venta()
+        self.producto.nombre = 'Turrón blando'
+        self.producto.save()
+        self.assertGreater(version_actual(), version)
+
+    def test_formulario_de_venta_usa_el_catalogo_local(self):
+        otro = Producto.objects.create(nombre='Mazapán', precio=Decimal('3.00'), stock=5)
+        respuesta = self.client.get(reverse('venta_crear'))
+        self.assertContains(respuesta, 'data-catalogo-url="%s"' % reverse('api_catalogo'))
+        self.assertNotContains(respuesta, f'<option value="{otro.pk}"')
+        self.assertContains(respuesta, 'type="hidden" name="producto"')
+
+
+class EliminacionTests(PruebaVentas):
+
+    databases = {'default', 'archivo'}
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+        self.otro = Cliente.objects.create(nombre='Luis', apellido='Gil')
+        self.crear_venta(cantidad=2)
+        self.crear_venta(cantidad=3, cliente=self.otro)
+
+    def eliminar(self, objeto):
+        with mock.patch('ventas.eliminacion.encolar') as encolar:
+            with self.captureOnCommitCallbacks(execute=True):
+                eliminacion = iniciar_eliminacion(objeto)
+            with self.captureOnCommitCallbacks(execute=True):
+                ejecutar_eliminacion(eliminacion.pk, lote=1)
+        return encolar
+
+    def test_descuenta_mapa_de_calor_y_resumen_diario(self):
+        self.eliminar(self.otro)
+        self.assertEqual(sum(MapaCalor.objects.values_list('ventas', flat=True)), 1)
+        self.assertEqual(sum(MapaCalor.objects.values_list('unidades', flat=True)), 2)
+        self.assertEqual(sum(MapaCalor.objects.values_list('total', flat=True)), Decimal('25.00'))
+        resumen = ResumenDiario.objects.get()
+        self.assertEqual(resumen.ventas, 1)
+
+    def test_sin_ventas_el_dia_desaparece_su_resumen(self):
+        self.eliminar(self.producto)
+        self.assertFalse(ResumenDiario.objects.exists())
+        self.assertEqual(sum(MapaCalor.objects.values_list('ventas', flat=True)), 0)
+
+    def test_al_terminar_encola_segmentos_completos(self):
+        encolar = self.eliminar(self.otro)
+        encolar.assert_any_call('calcular_segmentos', unico=True, completo=True)
+
+
+class ColaTrabajosTests(PruebaVentas):
+
+    def setUp(self):
+        super().setUp()
+        self.cola = ColaTrabajos(
+            os.path.join(self.temporal.name, f'{self._testMethodName}.sqlite3'), arriendo=0, espera_reintento=10
+        )
+        self.addCleanup(self.cola.cerrar)
+        self.id = self.cola.encolar('tarea', {'n': 1}, max_intentos=2)
+
+    def test_trabajador_con_arriendo_vencido_no_completa(self):
+        self.cola.reclamar('lento', ['tarea'])
+        # Vence el plazo y otro trabajador lo reclama
+        self.assertEqual(self.cola.recuperar_vencidos(), 1)
+        self.cola.reclamar('rapido', ['tarea'])
+        self.assertFalse(self.cola.completar(self.id, 'lento', {'ok': 'lento'}))
+        self.assertFalse(self.cola.fallar(self.id, 'lento', 'error'))
+        trabajo = self.cola.obtener(self.id)
+        self.assertEqual((trabajo['estado'], trabajo['trabajador']), (EN_CURSO, 'rapido'))
+        self.assertTrue(self.cola.completar(self.id, 'rapido', {'ok': 'rapido'}))
+        trabajo = self.cola.obtener(self.id)
+        self.assertEqual((trabajo['estado'], trabajo['resultado']), (COMPLETADO, {'ok': 'rapido'}))
+
+    def test_fallar_reintenta_con_espera_y_despues_falla(self):
+        self.cola.reclamar('uno', ['tarea'])
+        antes = time.time()
+        self.assertTrue(self.cola.fallar(self.id, 'uno', 'primer error'))
+        trabajo = self.cola.obtener(self.id)
+        self.assertEqual(trabajo['estado'], PENDIENTE)
+        self.assertGreaterEqual(trabajo['disponible'], antes + 10)
+        self.cola._conexion().execute('UPDATE trabajos SET disponible = 0 WHERE id = ?', (self.id,))
+        self.cola.reclamar('uno', ['tarea'])
+        self.assertTrue(self.cola.fallar(self.id, 'uno', 'segundo error'))
+        trabajo = self.cola.obtener(self.id)
+        self.assertEqual((trabajo['estado'], trabajo['error']), (FALLIDO, 'segundo error'))
+
+    def test_fallar_un_trabajo_borrado_no_lanza(self):
+        self.cola.reclamar('uno', ['tarea'])
+        self.cola._conexion().execute('DELETE FROM trabajos WHERE id = ?', (self.id,))
+        self.assertFalse(self.cola.fallar(self.id, 'uno', 'error'))
+
+    def test_el_latido_mantiene_el_arriendo_de_una_tarea_sin_progreso(self):
+        self.cola.arriendo = 0.3
+        vista = {}
+
+        def lenta(trabajo, n):
+            # Más que el plazo sin llamar a progreso(): otro trabajador no debe recuperarla
+            time.sleep(0.6)
+            vista['recuperados'] = self.cola.recuperar_vencidos()
+            return {'n': n}
+
+        trabajador = Trabajador(self.cola, {'tarea': lenta}, nombre='lento', latido=0.05)
+        self.assertTrue(trabajador.ejecutar_siguiente())
+        self.assertEqual(vista['recuperados'], 0)
+        trabajo = self.cola.obtener(self.id)
+        self.assertEqual((trabajo['estado'], trabajo['intentos'], trabajo['resultado']), (COMPLETADO, 1, {'n': 1}))
+        self.assertFalse([hilo for hilo in threading.enumerate() if hilo.name.startswith('latido-')])
+
+
+class ExportarVentasTests(PruebaVentas):
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+        self.client.force_login(self.usuario)
+
+    def test_fechas_invalidas_devuelven_400(self):
+        for datos in ({'desde': 'ayer'}, {'desde': '2025-02-30'}, {'desde': '2025-03-01', 'hasta': '2025-01-01'}):
+            with self.subTest(datos=datos), mock.patch('ventas.views.encolar') as encolar:
+                respuesta = self.client.post(reverse('venta_exportar'), datos)
+                self.assertEqual(respuesta.status_code, 400)
+                encolar.assert_not_called()
+
+    def test_encola_las_fechas_normalizadas(self):
+        respuesta = self.client.post(reverse('venta_exportar'), {'desde': '2025-01-01', 'hasta': '2025-02-01'})
+        self.assertEqual(respuesta.status_code, 202)
+        trabajo = cola().obtener(respuesta.json()['id'])
+        self.assertEqual(trabajo['parametros'], {'desde': '2025-01-01', 'hasta': '2025-02-01'})
+
+
+class SnapshotsTests(PruebaVentas):
+    databases = {'default', 'archivo'}
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+        self.venta = self.crear_venta(2)
+        # Renombrar después de vender: la venta conserva los nombres de entonces
+        Producto.objects.filter(pk=self.producto.pk).update(nombre='Turrón renombrado')
+        Cliente.objects.filter(pk=self.cliente.pk).update(nombre='Otra')
+
+    def consultas_con_join(self, contexto):
+        return [consulta['sql'] for consulta in contexto.captured_queries if ' JOIN ' in consulta['sql']]
+
+    def test_los_snapshots_se_rellenan_al_guardar(self):
+        venta = Venta.objects.get(pk=self.venta.pk)
+        self.assertEqual(
+            (venta.cliente_nombre, venta.producto_nombre, venta.categoria_nombre,
+             venta.tienda_nombre, venta.lugar_entrega_nombre, venta.usuario_nombre),
+            ('Ana Ruiz', 'Turrón de almendra', 'Turrones', 'Centro', 'Mostrador', 'cajero'),
+        )
+
+    def test_listado_y_dashboard_usan_los_snapshots_sin_joins(self):
+        self.client.force_login(self.usuario)
+        with CaptureQueriesContext(connection) as contexto:
+            ventas = list(VentaListView().get_queryset())
+            respuesta = self.client.get(reverse('dashboard'))
+        self.assertEqual([venta.producto_nombre for venta in ventas], ['Turrón de almendra'])
+        self.assertContains(respuesta, 'Turrón de almendra')
+        self.assertContains(respuesta, 'Ana Ruiz')
+        ventas_sql = [sql for sql in self.consultas_con_join(contexto) if 'ventas_venta' in sql]
+        self.assertEqual(ventas_sql, [])
+
+    def test_la_exportacion_lee_los_snapshots_sin_joins(self):
+        trabajo = mock.Mock()
+        trabajo.ruta_resultado.side_effect = lambda nombre: os.path.join(self.temporal.name, nombre)
+        with CaptureQueriesContext(connection) as contexto:
+            TAREAS['exportar_ventas'](trabajo)
+        self.assertEqual(self.consultas_con_join(contexto), [])
+        with open(os.path.join(self.temporal.name, 'ventas.csv'), encoding='utf-8') as archivo:
+            filas = archivo.read().splitlines()
+        self.assertIn('Ana Ruiz,Turrón de almendra,Turrones,2,12.50,25.00,Centro,Mostrador,cajero', filas[1])
+
+
+class AdminVentasTests(PruebaVentas):
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+        for _ in range(3):
+            self.crear_venta()
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+
+    def conteos_de_ventas(self, contexto):
+        return [
+            consulta['sql'] for consulta in contexto.captured_queries
+            if 'COUNT(' in consulta['sql'] and 'ventas_venta' in consulta['sql']
+        ]
+
+    def test_el_listado_no_cuenta_la_tabla_completa(self):
+        with mock.patch('ventas.paginacion.LIMITE_CONTEO', 2), CaptureQueriesContext(connection) as contexto:
+            respuesta = self.client.get(reverse('admin:ventas_venta_changelist'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'Turrón de almendra')
+        # Sin filtros el total sale del rango de ids
+        self.assertEqual(respuesta.context['cl'].result_count, 3)
+        self.assertEqual(self.conteos_de_ventas(contexto), [])
+
+    def test_un_listado_filtrado_se_cuenta_hasta_el_limite(self):
+        # Con una sola tienda el admin no muestra (ni aplica) el filtro
+        Tienda.objects.create(nombre_tienda='Norte')
+        url = reverse('admin:ventas_venta_changelist') + f'?tienda__id__exact={self.tienda.pk}'
+        with mock.patch('ventas.paginacion.LIMITE_CONTEO', 2), CaptureQueriesContext(connection) as contexto:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['cl'].result_count, 2)
+        conteos = self.conteos_de_ventas(contexto)
+        self.assertTrue(conteos)
+        for sql in conteos:
+            self.assertIn('LIMIT', sql)
+
+
+class ResumenVentasTests(PruebaVentas):
+    databases = {'default', 'archivo'}
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+        self.client.force_login(self.usuario)
+        self.crear_venta(cantidad=2)
+        self.crear_venta(cantidad=1)
+        anterior = self.crear_venta(cantidad=3)
+        Venta.objects.filter(pk=anterior.pk).update(fecha=timezone.now() - timedelta(days=40))
+
+    def test_un_proceso_hace_un_solo_group_by(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resumen = resumen_ventas(procesos=1)
+        # El rango de fechas y el GROUP BY mes × producto
+        self.assertEqual(len(consultas), 2)
+        self.assertIn('GROUP BY mes, producto_id', consultas[1]['sql'])
+        self.assertEqual(resumen['total'], Decimal('75.00'))
+        self.assertEqual(resumen['productos'][self.producto.pk]['total_vendido'], 6)
+
+    def test_mismo_resultado_que_las_particiones(self):
+        self.assertEqual(resumen_ventas(procesos=1), resumen_ventas(procesos=2))
+
+    def test_las_vistas_no_crean_el_pool(self):
+        # Las plantillas de reportes no se prueban aquí: solo los datos que calculan
+        with override_settings(REPORTES_PROCESOS=4), \
+                mock.patch('ventas.reportes._admite_pool', return_value=True), \
+                mock.patch('ventas.reportes._obtener_pool') as pool:
+            datos = _calcular_ganancias()
+        self.assertEqual(datos['total_ganancias'], Decimal('75.00'))
+        pool.assert_not_called()
+
+    def test_la_tarea_deja_el_resumen_en_cache(self):
+        TAREAS['resumen_ventas'](mock.Mock())
+        calcular = mock.Mock()
+        self.assertEqual(reporte_cacheado('resumen', calcular), resumen_ventas())
+        calcular.assert_not_called()
+
+    def test_particiones_pocas_y_que_cubren_todas_las_ventas(self):
+        otra = Tienda.objects.create(nombre_tienda='Norte')
+        self.crear_venta(cantidad=4, tienda=otra)
+        particiones = list(_particiones(Venta, procesos=2))
+        self.assertLessEqual(len(particiones), 2 * PARTICIONES_POR_PROCESO)
+        self.assertEqual({particion[3] for particion in particiones}, {self.tienda.pk, otra.pk})
+        self.assertEqual(resumen_ventas(procesos=2), resumen_ventas())
+
+    def test_las_vistas_sirven_el_ultimo_resumen_y_encolan_la_tarea(self):
+        resumen_reportes()
+        self.crear_venta(cantidad=4)
+        with mock.patch('ventas.reportes.encolar') as encolar, \
+                mock.patch('ventas.reportes.resumen_ventas') as calcular:
+            self.assertEqual(resumen_reportes()['total'], Decimal('75.00'))
+            resumen_reportes()
+        calcular.assert_not_called()
+        encolar.assert_called_once_with('resumen_ventas', unico=True)
+
+        TAREAS['resumen_ventas'](mock.Mock())
+        self.assertEqual(resumen_reportes()['total'], Decimal('125.00'))
+
+
+class CuboVentasTests(PruebaVentas):
+    databases = {'default', 'archivo'}
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+        self.venta = self.crear_venta(cantidad=2)
+        self.cubo = CuboVentas()
+        self.cubo.refrescar()
+
+    def por_tienda(self):
+        return {valores[0][0]: (cantidad, total) for valores, cantidad, total, _ in self.cubo.consultar(por=['tienda'])}
+
+    def test_venta_nueva_se_anexa_sin_reconstruir(self):
+        self.crear_venta(cantidad=1)
+        with mock.patch.object(self.cubo, '_reconstruir') as reconstruir:
+            self.cubo.refrescar()
+        reconstruir.assert_not_called()
+        self.assertEqual(self.por_tienda(), {self.tienda.pk: (3, 3750)})
+
+    def test_editar_una_venta_reconstruye(self):
+        self.venta.cantidad = 5
+        self.venta.save()
+        self.cubo.refrescar()
+        self.assertEqual(self.por_tienda(), {self.tienda.pk: (5, 6250)})
+
+    def test_cambiar_de_tienda_con_la_misma_cantidad_reconstruye(self):
+        otra = Tienda.objects.create(nombre_tienda='Norte')
+        self.venta.tienda = otra
+        self.venta.save()
+        self.cubo.refrescar()
+        self.assertEqual(self.por_tienda(), {otra.pk: (2, 2500)})
+
+    def test_borrar_una_venta_reconstruye(self):
+        self.crear_venta(cantidad=1)
+        self.venta.delete()
+        self.cubo.refrescar()
+        self.assertEqual(self.por_tienda(), {self.tienda.pk: (1, 1250)})
+
+    def test_anexar_solo_lee_las_ventas_nuevas(self):
+        self.crear_venta(cantidad=1)
+        with CaptureQueriesContext(connection) as consultas, \
+                CaptureQueriesContext(connections['archivo']) as archivo:
+            self.cubo.refrescar()
+        self.assertFalse([consulta for consulta in consultas if 'COUNT(' in consulta['sql']])
+        self.assertTrue(all('"ventas_venta"."id" >' in consulta['sql'] for consulta in consultas))
+        self.assertEqual(len(archivo), 0)
+
+    def test_archivar_reconstruye_con_los_mismos_totales(self):
+        nueva = self.crear_venta(cantidad=1)
+        Venta.objects.filter(pk=nueva.pk).update(fecha=timezone.now() - timedelta(days=800))
+        archivar_ventas(timezone.now() - timedelta(days=730))
+        with mock.patch.object(self.cubo, '_reconstruir', wraps=self.cubo._reconstruir) as reconstruir:
+            self.cubo.refrescar()
+        reconstruir.assert_called_once()
+        self.assertEqual(self.por_tienda(), {self.tienda.pk: (3, 3750)})
+
+
+class ReposicionTests(PruebaVentas):
+    databases = {'default', 'archivo'}
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+        self.client.force_login(self.usuario)
+        venta = self.crear_venta(cantidad=8)
+        Venta.objects.filter(pk=venta.pk).update(fecha=timezone.now() - timedelta(days=3))
+        # Sin ventas en la ventana y por debajo del umbral
+        self.quieto = Producto.objects.create(nombre='Polvorón', precio=Decimal('1.00'), stock=3)
+        Inventario.objects.create(producto=self.quieto, tienda=self.tienda, cantidad=0)
+
+    def test_hay_series_para_productos_e_inventarios_sin_ventas(self):
+        calcular_reposicion()
+        series = set(SugerenciaReposicion.objects.values_list('producto_id', 'tienda_id'))
+        self.assertEqual(series, {(self.producto.pk, None), (self.quieto.pk, None), (self.quieto.pk, self.tienda.pk)})
+        quieta = SugerenciaReposicion.objects.get(producto=self.quieto, tienda=None)
+        self.assertEqual((quieta.demanda_diaria, quieta.stock), (0, 3))
+
+    def test_el_dashboard_muestra_el_stock_actual_y_el_umbral(self):
+        calcular_reposicion()
+        Producto.objects.filter(pk=self.producto.pk).update(stock=50)
+        respuesta = self.client.get(reverse('dashboard'))
+        sugerencia, = respuesta.context['sugerencias_reposicion']
+        self.assertEqual((sugerencia.stock, sugerencia.stock_actual), (2, 50))
+        # El umbral sigue junto a las sugerencias para lo que no tiene demanda
+        self.assertEqual([producto.pk for producto in respuesta.context['productos_stock_bajo']], [self.quieto.pk])
+
+
+class PreciosTests(PruebaVentas):
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+        self.client.force_login(self.usuario)
+
+    def test_momento_invalido_devuelve_400(self):
+        for momento in ('ayer', '2025-02-30T10:00'):
+            with self.subTest(momento=momento):
+                respuesta = self.client.get(reverse('api_precios'), {'momento': momento})
+                self.assertEqual(respuesta.status_code, 400)
+
+    def test_precio_vigente(self):
+        respuesta = self.client.get(reverse('api_precios'), {'producto': self.producto.pk})
+        self.assertEqual(respuesta.json()['precios'], {str(self.producto.pk): '12.50'})
+
+
+class ReplicacionTests(PruebaVentas):
+    databases = {'default', 'archivo'}
+
+    def setUp(self):
+        super().setUp()
+        self.ruta = os.path.join(self.temporal.name, f'{self._testMethodName}.db')
+        self.flask = sqlite3.connect(self.ruta)
+        self.flask.row_factory = sqlite3.Row
+        self.addCleanup(os.remove, self.ruta)
+        self.addCleanup(self.flask.close)
+        # Esquema de la app Flask con sus tiendas, lugares y categorías de ejemplo
+        migrar(self.flask, aplicacion_flask.MIGRACIONES)
+        self.flask.execute("INSERT INTO clientes (nombre, apellido) VALUES ('Ana', 'Ruiz')")
+        self.flask.execute("INSERT INTO productos (nombre, precio, stock, id_categoria) VALUES ('Turrón', 1250, 50, 1)")
+        self.vender(2)
+        self.vender(1)
+        self.replicar()
+
+    def vender(self, cantidad, id_cliente=1):
+        self.flask.execute(
+            'INSERT INTO ventas (fecha, cantidad, precio_unitario, total, id_cliente, id_producto, id_tienda, id_lugar) '
+            "VALUES ('2025-03-04 10:00:00', ?, 1250, ?, ?, 1, 1, 1)",
+            (cantidad, 1250 * cantidad, id_cliente)
+        )
+        self.flask.commit()
+
+    def replicar(self):
+        resultado, _ = replicar_flask(self.ruta, lote=1)
+        return resultado
+
+    def mapa(self):
+        return tuple(sum(MapaCalor.objects.values_list(campo, flat=True)) for campo in ('ventas', 'unidades', 'total'))
+
+    def test_primera_pasada_suma_las_ventas_a_los_resumenes(self):
+        self.assertEqual(Venta.objects.count(), 2)
+        self.assertEqual(self.mapa(), (2, 3, Decimal('37.50')))
+        self.assertEqual(ResumenDiario.objects.get().ventas, 2)
+
+    def test_venta_editada_ajusta_el_mapa_y_el_cubo(self):
+        modificadas = ventas_modificadas()
+        self.flask.execute('UPDATE ventas SET cantidad = 5, total = 6250 WHERE id_venta = 1')
+        self.flask.commit()
+        self.replicar()
+        self.assertEqual(self.mapa(), (2, 6, Decimal('75.00')))
+        self.assertEqual(ResumenDiario.objects.get().ventas, 2)
+        self.assertGreater(ventas_modificadas(), modificadas)
+
+    def test_venta_borrada_se_descuenta(self):
+        self.flask.execute('DELETE FROM ventas WHERE id_venta = 2')
+        self.flask.commit()
+        self.replicar()
+        self.assertEqual(self.mapa(), (1, 2, Decimal('25.00')))
+        self.assertEqual(ResumenDiario.objects.get().ventas, 1)
+
+    def test_venta_con_cliente_sin_copiar_se_reintenta(self):
+        # Un cliente que el registro no anotó: la venta llega antes que él
+        self.flask.execute("INSERT INTO clientes (nombre, apellido) VALUES ('Luis', 'Gil')")
+        self.flask.execute("DELETE FROM replicacion WHERE tabla = 'clientes'")
+        self.vender(4, id_cliente=2)
+        self.assertEqual(self.replicar()['ventas'], (0, 0, 1))
+        self.assertEqual(Venta.objects.count(), 2)
+
+        self.flask.execute("UPDATE clientes SET telefono = '555' WHERE id_cliente = 2")
+        self.flask.commit()
+        self.replicar()
+        self.assertEqual(Venta.objects.count(), 3)
+        self.assertEqual(self.mapa(), (3, 7, Decimal('87.50')))
+
+    def test_venta_sin_cliente_no_se_reintenta(self):
+        self.vender(1, id_cliente=None)
+        self.replicar()
+        self.assertFalse(self.flask.execute(
+            "SELECT 1 FROM replicacion WHERE tabla = 'ventas' AND id_fila = 3"
+        ).fetchone())
+
+
+class InventarioTests(PruebaVentas):
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+        Inventario.objects.create(producto=self.producto, tienda=self.tienda, cantidad=10)
+        repartir_inventario(self.producto, self.tienda, 4)
+
+    def shards(self):
+        return list(Inventario.objects.filter(producto=self.producto, tienda=self.tienda).values_list('cantidad', flat=True))
+
+    def test_repartir_equilibra_los_sub_contadores(self):
+        self.assertEqual(sorted(self.shards()), [2, 2, 3, 3])
+
+    def test_descuento_que_cabe_en_un_sub_contador_toca_solo_ese(self):
+        descontar_stock(self.producto, self.tienda, 2)
+        self.assertEqual(stock_tienda(self.producto, self.tienda), 8)
+        self.assertEqual(sum(1 for cantidad, antes in zip(self.shards(), [3, 3, 2, 2]) if cantidad != antes), 1)
+
+    def test_descuento_mayor_que_cualquier_sub_contador_drena_varios(self):
+        descontar_stock(self.producto, self.tienda, 7)
+        self.assertEqual(stock_tienda(self.producto, self.tienda), 3)
+        self.assertTrue(all(cantidad >= 0 for cantidad in self.shards()))
+
+    def test_sin_stock_suficiente_no_descuenta_nada(self):
+        with self.assertRaises(StockInsuficiente) as error:
+            descontar_stock(self.producto, self.tienda, 11)
+        self.assertEqual(error.exception.disponible, 10)
+        self.assertEqual(stock_tienda(self.producto, self.tienda), 10)
+
+    def test_tienda_sin_inventario_vende_del_stock_central(self):
+        otra = Tienda.objects.create(nombre_tienda='Norte')
+        self.crear_venta(cantidad=4, tienda=otra)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 6)
+        self.assertEqual(stock_tienda(self.producto, self.tienda), 10)
+
+
+class CentavosTests(PruebaVentas):
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+
+    def test_conversiones_redondean_al_centavo(self):
+        self.assertEqual(decimal_a_centavos(Decimal('12.50')), 1250)
+        self.assertEqual(decimal_a_centavos('0.005'), 1)
+        self.assertEqual(decimal_a_centavos(0.1), 10)
+        self.assertEqual(centavos_a_decimal(1250), Decimal('12.50'))
+        # AVG devuelve float
+        self.assertEqual(centavos_a_decimal(2.5), Decimal('0.03'))
+
+    def test_la_columna_guarda_enteros_de_centavos(self):
+        venta = self.crear_venta(cantidad=2)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT precio_unitario, total FROM {Venta._meta.db_table} WHERE id = %s', [venta.pk])
+            self.assertEqual(cursor.fetchone(), (1250, 2500))
+        venta.refresh_from_db()
+        self.assertEqual(venta.total, Decimal('25.00'))
+
+    def test_las_sumas_son_exactas(self):
+        self.producto.precio = Decimal('0.10')
+        self.producto.save()
+        for _ in range(3):
+            self.crear_venta(cantidad=1, precio_unitario=Decimal('0.10'))
+        total = Venta.objects.aggregate(total=Sum('total'))['total']
+        self.assertEqual(total, Decimal('0.30'))
+        self.assertIsInstance(total, Decimal)
+
+
+class ArchivoTests(PruebaVentas):
+    databases = {'default', 'archivo'}
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+        self.antigua = self.crear_venta(cantidad=2)
+        self.reciente = self.crear_venta(cantidad=1)
+        Venta.objects.filter(pk=self.antigua.pk).update(fecha=timezone.now() - timedelta(days=800))
+
+    def test_las_archivadas_van_a_la_base_archivo(self):
+        self.assertEqual(router.db_for_write(VentaArchivada), 'archivo')
+        self.assertEqual(router.db_for_read(Venta), 'default')
+        self.assertFalse(router.allow_migrate('archivo', 'ventas', model_name='venta'))
+        self.assertTrue(router.allow_migrate('archivo', 'ventas', model_name='ventaarchivada'))
+
+    def test_archivar_mueve_las_ventas_antiguas_sin_senales(self):
+        with mock.patch('ventas.signals.invalidar_reportes') as invalidar:
+            archivadas = archivar_ventas(timezone.now() - timedelta(days=730))
+        self.assertEqual(archivadas, 1)
+        invalidar.assert_not_called()
+        self.assertEqual(list(Venta.objects.values_list('pk', flat=True)), [self.reciente.pk])
+        with connections['archivo'].cursor() as cursor:
+            cursor.execute(f'SELECT id FROM {VentaArchivada._meta.db_table}')
+            self.assertEqual(cursor.fetchall(), [(self.antigua.pk,)])
+
+    def test_reintentar_un_lote_copiado_no_duplica(self):
+        # Interrumpido entre la copia y el borrado
+        VentaArchivada.objects.create(**Venta.objects.filter(pk=self.antigua.pk).values(*CAMPOS_ARCHIVO).get())
+        archivar_ventas(timezone.now() - timedelta(days=730))
+        self.assertEqual(VentaArchivada.objects.count(), 1)
+        self.assertEqual(Venta.objects.count(), 1)
+
+    def test_los_agregados_combinan_ambas_bases(self):
+        archivar_ventas(timezone.now() - timedelta(days=730))
+        totales = agregar_ventas(ventas=Count('pk'), total=Sum('total'), ultima=Max('fecha'))
+        self.assertEqual(totales['ventas'], 2)
+        self.assertEqual(totales['total'], Decimal('37.50'))
+        self.assertEqual(totales['ultima'], Venta.objects.get().fecha)
+
+
+class MigracionesTests(SimpleTestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.addCleanup(self.conn.close)
+        self.migraciones = [
+            Migracion('tabla', lambda conn: conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, x INTEGER)')),
+            Migracion('columna', lambda conn: conn.execute('ALTER TABLE t ADD COLUMN y INTEGER')),
+        ]
+
+    def test_aplica_las_pendientes_en_orden_una_sola_vez(self):
+        aplicadas = []
+        self.assertEqual(migrar(self.conn, self.migraciones, progreso=lambda n, nombre, s: aplicadas.append(nombre)), 2)
+        self.assertEqual(aplicadas, ['tabla', 'columna'])
+        self.assertEqual(version_esquema(self.conn), 2)
+        self.assertEqual(migrar(self.conn, self.migraciones), 0)
+
+    def test_una_migracion_fallida_no_deja_nada_a_medias(self):
+        def rota(conn):
+            conn.execute('CREATE TABLE otra (id INTEGER)')
+            raise sqlite3.OperationalError('falla')
+
+        migrar(self.conn, self.migraciones[:1])
+        with self.assertRaises(sqlite3.OperationalError):
+            migrar(self.conn, self.migraciones[:1] + [Migracion('rota', rota)])
+        self.assertEqual(version_esquema(self.conn), 1)
+        tablas = {fila[0] for fila in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertEqual(tablas, {'t'})
+
+    def test_por_lotes_repite_hasta_que_no_queda_nada(self):
+        migrar(self.conn, self.migraciones)
+        self.conn.executemany('INSERT INTO t (x) VALUES (?)', [(i,) for i in range(5)])
+        self.conn.commit()
+        llamadas = []
+
+        def rellenar(conn):
+            llamadas.append(1)
+            return conn.execute(
+                'UPDATE t SET y = x * 2 WHERE id IN (SELECT id FROM t WHERE y IS NULL LIMIT 2)'
+            ).rowcount
+
+        self.migraciones.append(Migracion('rellenar', rellenar, por_lotes=True))
+        self.assertEqual(migrar(self.conn, self.migraciones, pausa=0), 1)
+        self.assertEqual(len(llamadas), 4)
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM t WHERE y IS NULL').fetchone()[0], 0)
+        self.assertEqual(version_esquema(self.conn), 3)
+
+
+class RutasFlaskTests(SimpleTestCase):
+
+    def test_flask_comparte_base_cache_y_cola_con_django(self):
+        # Rutas absolutas: no dependen del directorio desde el que arranca Flask
+        self.assertEqual(aplicacion_flask.DATABASE, str(settings.FLASK_DATABASE))
+        self.assertEqual(aplicacion_flask.cache.ruta, str(settings.CACHES['default']['LOCATION']))
+        self.assertEqual(aplicacion_flask.cola.ruta, str(settings.TRABAJOS_DB))
+        self.assertEqual(str(aplicacion_flask.cola.directorio_resultados), str(settings.TRABAJOS_DIR))
+
+
+class ArranqueTests(SimpleTestCase):
+
+    def test_parsear_importtime(self):
+        salida = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   _io\n'
+            'import time:      2300 |       5100 | django.db\n'
+        )
+        self.assertEqual(parsear_importtime(salida), [('_io', 120, 120), ('django.db', 2300, 5100)])
+
+    def test_mide_el_arranque_de_django_y_lo_compara_con_el_anterior(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            historial = os.path.join(directorio, 'arranque.jsonl')
+            with override_settings(ARRANQUE_HISTORIAL=historial):
+                for etiqueta in ('v1', 'v2'):
+                    salida = io.StringIO()
+                    call_command('tiempo_arranque', app='django', repeticiones=1, etiqueta=etiqueta, stdout=salida)
+            with open(historial, encoding='utf-8') as archivo:
+                registros = [json.loads(linea) for linea in archivo]
+        self.assertEqual([registro['etiqueta'] for registro in registros], ['v1', 'v2'])
+        self.assertIn('antes', salida.getvalue())
+        self.assertIn('(v1)', salida.getvalue())
+        # El cubo importa NumPy en la primera consulta, no al arrancar el worker
+        self.assertIn('django', registros[-1]['paquetes'])
+        self.assertNotIn('numpy', registros[-1]['paquetes'])
+
+
+class ClientesDistintosTests(PruebaVentas):
+
+    def test_estimacion_dentro_del_error_en_un_conjunto_conocido(self):
+        sketch = HyperLogLog()
+        for valor in range(20000):
+            sketch.agregar(valor)
+        # Hash determinista: el error queda fijo y dentro de tres errores estándar
+        self.assertLess(abs(sketch.estimar() - 20000) / 20000, 3 * error_estandar())
+
+    def test_fusionar_da_el_sketch_de_la_union(self):
+        a, b, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        for valor in range(15000):
+            a.agregar(valor)
+            union.agregar(valor)
+        for valor in range(10000, 25000):
+            b.agregar(valor)
+            union.agregar(valor)
+        pocos = HyperLogLog()
+        pocos.agregar(99999)
+        union.agregar(99999)
+        fusion = HyperLogLog.desde_bytes(a.a_bytes())
+        fusion.fusionar(b)
+        # Forma dispersa (pocos registros ocupados) y densa
+        fusion.fusionar(pocos.a_bytes())
+        self.assertEqual(fusion.registros, union.registros)
+        self.assertLess(abs(fusion.estimar() - 25001) / 25001, 3 * error_estandar())
+
+    def test_resumenes_se_fusionan_por_dia_tienda_y_mes(self):
+        self.crear_datos()
+        otra = Tienda.objects.create(nombre_tienda='Norte')
+        b, c = (Cliente.objects.create(nombre=nombre, apellido='X') for nombre in ('Beto', 'Carla'))
+        enero = timezone.make_aware(datetime(2026, 1, 15, 12))
+        febrero = timezone.make_aware(datetime(2026, 2, 15, 12))
+        for cliente, tienda, fecha in [
+            (self.cliente, self.tienda, enero), (b, self.tienda, enero), (b, otra, enero),
+            (self.cliente, self.tienda, febrero), (c, self.tienda, febrero),
+        ]:
+            self.crear_venta(cliente=cliente, tienda=tienda, fecha=fecha)
+
+        self.assertEqual(clientes_distintos(), {None: (3, 5)})
+        self.assertEqual(clientes_distintos(por='tienda'), {self.tienda.pk: (3, 4), otra.pk: (1, 1)})
+        self.assertEqual(
+            clientes_distintos(por='mes'), {enero.date().replace(day=1): (2, 3), febrero.date().replace(day=1): (2, 2)}
+        )
+        self.assertEqual(clientes_distintos(desde=febrero.date(), tiendas=[self.tienda.pk]), {None: (2, 2)})
+
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('api_clientes_distintos'), {'tienda': f'{self.tienda.pk},{otra.pk}'})
+        grupo = respuesta.json()['grupos'][0]
+        self.assertEqual((grupo['clientes'], grupo['ventas']), (3, 5))
+        self.assertLessEqual(grupo['minimo'], 3)
+        self.assertGreaterEqual(grupo['maximo'], 3)
+
+
+class MapaCalorTests(PruebaVentas):
+    databases = {'default', 'archivo'}
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+        # Martes 23:30 en la hora local (ya es miércoles en UTC)
+        self.fecha = timezone.make_aware(datetime(2026, 1, 13, 23, 30))
+        self.venta = self.crear_venta(cantidad=2, fecha=self.fecha)
+
+    def test_la_venta_cae_en_su_celda_en_hora_local(self):
+        matrices = mapa_calor()
+        self.assertEqual((matrices['ventas'][1][23], matrices['unidades'][1][23]), (1, 2))
+        self.assertEqual(matrices['total'][1][23], Decimal('25.00'))
+        self.assertEqual(sum(map(sum, matrices['ventas'])), 1)
+
+        self.client.force_login(self.usuario)
+        datos = self.client.get(reverse('api_mapa_calor'), {'tienda': self.tienda.pk}).json()
+        self.assertEqual((datos['ventas'][1][23], datos['total'][1][23]), (1, '25.00'))
+
+    def test_borrar_la_venta_la_resta(self):
+        self.crear_venta(cantidad=1, fecha=self.fecha)
+        self.venta.delete()
+        matrices = mapa_calor()
+        self.assertEqual((matrices['ventas'][1][23], matrices['unidades'][1][23]), (1, 1))
+        self.assertEqual(matrices['total'][1][23], Decimal('12.50'))
+
+    def test_archivar_conserva_el_mapa_que_incluye_el_archivo(self):
+        Venta.objects.filter(pk=self.venta.pk).update(fecha=timezone.now() - timedelta(days=800))
+        reconstruir_resumenes()
+        antes = mapa_calor()
+        archivar_ventas(timezone.now() - timedelta(days=730))
+        self.assertEqual(mapa_calor(), antes)
+        reconstruir_resumenes()
+        self.assertEqual(mapa_calor(), antes)
+
+
+class AjustesTests(PruebaVentas):
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+        self.baratos = [
+            Producto.objects.create(nombre=nombre, precio=Decimal(precio), stock=stock, categoria=self.categoria)
+            for nombre, precio, stock in [('Caramelo', '0.15', 0), ('Chicle', '0.01', 5)]
+        ]
+        self.productos = Producto.objects.filter(categoria=self.categoria)
+
+    def estado(self):
+        return {p.nombre: (p.precio, p.stock) for p in self.productos}
+
+    def ajustar(self, **ajustes):
+        self.inicial = list(PrecioHistorico.objects.values_list('pk', flat=True))
+        self.feed_inicial = CambioCatalogo.objects.aggregate(seq=Max('seq'))['seq']
+        return ajustar_productos(self.productos, **ajustes)
+
+    def nuevos_en_feed(self):
+        return set(
+            CambioCatalogo.objects.filter(seq__gt=self.feed_inicial, modelo='producto')
+            .values_list('objeto_id', flat=True)
+        )
+
+    def test_porcentaje_redondea_al_centavo_sin_bajar_de_uno(self):
+        self.assertEqual(self.ajustar(precio=(PORCENTAJE, Decimal('-10'))), 3)
+        # 12.50 -> 11.25; 0.15 -> 0.135 -> 0.14 (mitad hacia arriba); 0.01 no baja a 0
+        self.assertEqual(self.estado(), {
+            'Turrón de almendra': (Decimal('11.25'), 10),
+            'Caramelo': (Decimal('0.14'), 0),
+            'Chicle': (Decimal('0.01'), 5),
+        })
+        nuevos = PrecioHistorico.objects.exclude(pk__in=self.inicial)
+        self.assertEqual(
+            sorted(nuevos.values_list('producto__nombre', 'precio')),
+            [('Caramelo', Decimal('0.14')), ('Turrón de almendra', Decimal('11.25'))],
+        )
+        self.assertEqual(self.nuevos_en_feed(), {self.producto.pk, self.baratos[0].pk})
+
+    def test_rebaja_extrema_deja_el_precio_minimo(self):
+        self.ajustar(precio=(PORCENTAJE, Decimal('-99.99')))
+        self.assertEqual({precio for precio, _ in self.estado().values()}, {Decimal('0.01')})
+
+    def test_suma_negativa_que_dejaria_un_precio_bajo_el_minimo_no_cambia_nada(self):
+        with self.assertRaises(ValueError):
+            self.ajustar(precio=(SUMA, Decimal('-0.10')))
+        self.assertEqual(self.estado()['Caramelo'], (Decimal('0.15'), 0))
+        self.assertFalse(PrecioHistorico.objects.exclude(pk__in=self.inicial).exists())
+        self.assertEqual(self.nuevos_en_feed(), set())
+
+    def test_fijar_solo_registra_los_que_cambian(self):
+        self.ajustar(precio=(FIJAR, Decimal('12.50')))
+        self.assertEqual({precio for precio, _ in self.estado().values()}, {Decimal('12.50')})
+        nuevos = PrecioHistorico.objects.exclude(pk__in=self.inicial)
+        self.assertEqual(set(nuevos.values_list('producto_id', flat=True)), {p.pk for p in self.baratos})
+        self.assertEqual(self.nuevos_en_feed(), {p.pk for p in self.baratos})
+
+    def test_stock_no_baja_de_cero_y_el_feed_solo_lleva_los_cambiados(self):
+        self.ajustar(stock=(SUMA, -5))
+        self.assertEqual({nombre: stock for nombre, (_, stock) in self.estado().items()}, {
+            'Turrón de almendra': 5, 'Caramelo': 0, 'Chicle': 0,
+        })
+        self.assertFalse(PrecioHistorico.objects.exclude(pk__in=self.inicial).exists())
+        self.assertEqual(self.nuevos_en_feed(), {self.producto.pk, self.baratos[1].pk})
+        self.assertTrue(all(
+            CambioCatalogo.objects.filter(seq__gt=self.feed_inicial).values_list('solo_stock', flat=True)
+        ))
+
+
+class EventosTests(PruebaVentas):
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+        self.desde = bus.ultimo_id
+
+    def eventos(self, mensajes):
+        """``[(tipo, datos)]`` de un bloque de mensajes SSE"""
+        eventos = []
+        for mensaje in mensajes.decode().split('\n\n'):
+            campos = dict(linea.split(': ', 1) for linea in mensaje.splitlines() if ': ' in linea)
+            if 'event' in campos:
+                eventos.append((campos['event'], json.loads(campos['data'])))
+        return eventos
+
+    def test_una_venta_publica_la_venta_y_el_stock_al_confirmarse(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            venta = self.crear_venta(cantidad=2)
+            self.assertEqual(bus.ultimo_id, self.desde)
+        suscripcion = bus.suscribir(self.desde, keepalive=0, duracion=5)
+        self.assertEqual(next(suscripcion), b'retry: 3000\n\n')
+        eventos = self.eventos(next(suscripcion))
+        self.assertEqual([tipo for tipo, _ in eventos], ['venta', 'stock', 'stock_bajo'])
+        self.assertEqual(eventos[0][1]['id'], venta.pk)
+        self.assertEqual(eventos[1][1], {'producto': self.producto.pk, 'nombre': self.producto.nombre, 'stock': 8})
+
+    def test_el_endpoint_reenvia_los_eventos_perdidos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crear_venta(cantidad=1)
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('api_eventos'), headers={'Last-Event-ID': str(self.desde)})
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        contenido = iter(respuesta.streaming_content)
+        next(contenido)
+        eventos = self.eventos(next(contenido))
+        respuesta.close()
+        self.assertEqual(eventos[1], ('stock', {'producto': self.producto.pk, 'nombre': self.producto.nombre, 'stock': 9}))
+
+
+class CambiosTests(PruebaVentas):
+
+    def setUp(self):
+        super().setUp()
+        self.crear_datos()
+        self.client.force_login(self.usuario)
+        self.desde = CambioCatalogo.objects.aggregate(seq=Max('seq'))['seq']
+
+    def pagina(self, since, limit=100):
+        respuesta = self.client.get(reverse('api_cambios'), {'since': since, 'limit': limit})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_cambios_y_lapidas_en_orden_con_cursor(self):
+        nuevo = Producto.objects.create(nombre='Mazapán', precio=Decimal('3.00'), stock=4, categoria=self.categoria)
+        temporal = Cliente.objects.create(nombre='Temporal', apellido='X')
+        self.cliente.telefono = '555'
+        self.cliente.save()
+        temporal_id = temporal.pk
+        temporal.delete()
+
+        datos = self.pagina(self.desde, limit=2)
+        self.assertTrue(datos['hay_mas'])
+        self.assertEqual(
+            [(c['modelo'], c['id'], c['operacion']) for c in datos['cambios']],
+            [('producto', nuevo.pk, 'guardar'), ('cliente', self.cliente.pk, 'guardar')],
+        )
+        self.assertEqual(datos['cambios'][1]['datos']['telefono'], '555')
+        self.assertEqual(datos['cursor'], datos['cambios'][-1]['seq'])
+
+        resto = self.pagina(datos['cursor'])
+        self.assertFalse(resto['hay_mas'])
+        # El alta del cliente borrado se sustituye por su lápida, sin datos
+        self.assertEqual(
+            [(c['modelo'], c['id'], c['operacion'], c['datos']) for c in resto['cambios']],
+            [('cliente', temporal_id, 'eliminar', None)],
+        )
+        secuencias = [c['seq'] for c in datos['cambios'] + resto['cambios']]
+        self.assertEqual(secuencias, sorted(secuencias))
+        self.assertEqual(self.pagina(resto['cursor']), {'cambios': [], 'cursor': resto['cursor'], 'hay_mas': False})
+
+    def test_since_no_numerico_es_400(self):
+        self.assertEqual(self.client.get(reverse('api_cambios'), {'since': 'x'}).status_code, 400)
@@ -0,0 +1,53 @@
+from django.conf import settings
+
+from turron_system.cola import ColaTrabajos, Trabajador
+
+
+# Tareas ejecutables en segundo plano: nombre -> función(trabajo, **parametros).
+# Se registran con @tarea en ventas.tareas, que se importa al arrancar la app.
+TAREAS = {}
+
+_cola = None
+
+
+def tarea(nombre):
+    """Registra una función como tarea de la cola de trabajos"""
+    def registrar(funcion):
+        TAREAS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def cola():
+    global _cola
+    if _cola is None:
+        _cola = ColaTrabajos(settings.TRABAJOS_DB, settings.TRABAJOS_DIR)
+    return _cola
+
+
+def encolar(nombre, usuario=None, prioridad=0, max_intentos=3, unico=False, **parametros):
+    """Encola la tarea ``nombre`` con ``parametros`` (serializables a JSON); devuelve el id del trabajo"""
+    if nombre not in TAREAS:
+        raise ValueError(f"Tarea desconocida: {nombre}")
+    return cola().encolar(
+        nombre,
+        parametros,
+        prioridad=prioridad,
+        max_intentos=max_intentos,
+        unico=unico,
+        propietario=usuario.pk if usuario is not None else None,
+    )
+
+
+def obtener_trabajo(id_trabajo, usuario):
+    """El trabajo, si existe y el usuario lo encoló (o es staff); si no, None"""
+    trabajo = cola().obtener(id_trabajo)
+    if trabajo is None:
+        return None
+    if not usuario.is_staff and trabajo['propietario'] != str(usuario.pk):
+        return None
+    return trabajo
+
+
+def trabajador(espera=1.0):
+    return Trabajador(cola(), TAREAS, espera=espera)
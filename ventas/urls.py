@@ -41,9 +41,24 @@ urlpatterns = [
     # Ventas
     path('ventas/', views.VentaListView.as_view(), name='venta_lista'),
     path('ventas/crear/', views.VentaCreateView.as_view(), name='venta_crear'),
+    path('ventas/exportar/', views.exportar_ventas, name='venta_exportar'),
+    path('api/ventas/lote/', views.api_ventas_lote, name='api_ventas_lote'),
     
     # API
     path('api/producto/<int:producto_id>/', views.api_producto_info, name='api_producto_info'),
+    path('api/reservas/', views.api_reservar_stock, name='api_reservar_stock'),
+    path('api/reservas/<uuid:token>/liberar/', views.api_liberar_reserva, name='api_liberar_reserva'),
+    path('api/eventos/', views.api_eventos, name='api_eventos'),
+    path('api/cambios/', views.api_cambios, name='api_cambios'),
+    path('api/catalogo/', views.api_catalogo, name='api_catalogo'),
+    path('api/eliminaciones/<int:pk>/', views.api_eliminacion, name='api_eliminacion'),
+    path('api/trabajos/<int:pk>/', views.api_trabajo, name='api_trabajo'),
+    path('trabajos/<int:pk>/descargar/', views.trabajo_descargar, name='trabajo_descargar'),
+    path('api/cubo/', views.api_cubo, name='api_cubo'),
+    path('api/clientes-distintos/', views.api_clientes_distintos, name='api_clientes_distintos'),
+    path('api/mapa-calor/', views.api_mapa_calor, name='api_mapa_calor'),
+    path('api/precios/', views.api_precios, name='api_precios'),
+    path('api/productos/ajuste/', views.api_ajuste_productos, name='api_ajuste_productos'),
     
     # Reportes
     path('reportes/ganancias/', views.reportes_ganancias, name='reportes_ganancias'),
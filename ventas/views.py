@@ -1,18 +1,45 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
-from django.urls import reverse_lazy
-from django.http import JsonResponse
-from django.db.models import Sum, Count, Q
-from django.db.models.functions import TruncMonth
+from django.urls import reverse, reverse_lazy
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from django.db.models import F, Sum, Q
+from django.db import IntegrityError
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import parse_etags
 from datetime import datetime, timedelta
-from .models import Cliente, Producto, Categoria, Tienda, LugarEntrega, Venta
-from .forms import ClienteForm, ProductoForm, CategoriaForm, TiendaForm, LugarEntregaForm, VentaForm
+from decimal import Decimal
+import json
+import os
+import uuid
+from .models import (
+    Cliente, Producto, Categoria, Tienda, LugarEntrega, Venta, Eliminacion, SegmentoCliente,
+    MapaCalor
+)
+from .cache import reporte_cacheado
+from .eventos import bus
+from .cambios import LIMITE_CAMBIOS, cambios_desde
+from .lotes import CREADA, MAX_VENTAS_LOTE, LoteDuplicado, registrar_lote
+from .catalogo import parsear_rango, ultimo_artefacto, version_actual, version_artefacto
+from .archivo import resumen_archivo
+from .reportes import resumen_reportes
+from .cubo import DIMENSIONES, obtener_cubo
+from .resumenes import ERROR_CLIENTES, clientes_distintos, mapa_calor
+from .reposicion import sugerencias_urgentes, sugerencias_vigentes
+from .segmentos import segmentos_pendientes
+from .precios import margen_lista, precios_en
+from .ajustes import ajustar_productos
+from .eliminacion import iniciar_eliminacion
+from .trabajos import cola, encolar, obtener_trabajo
+from .fields import centavos_a_decimal
+from .forms import AjusteProductosForm, ClienteForm, ProductoForm, CategoriaForm, TiendaForm, LugarEntregaForm, VentaForm
+from .inventario import StockInsuficiente, stock_disponible, reservar_stock, liberar_reserva
 
 
 # Vista de inicio y dashboard
@@ -22,16 +49,25 @@ def dashboard(request):
     # Estadísticas generales
     total_productos = Producto.objects.count()
     total_clientes = Cliente.objects.count()
-    total_ventas = Venta.objects.count()
-    ingresos_totales = Venta.objects.aggregate(total=Sum('total'))['total'] or 0
+    # La tabla principal solo guarda las ventas recientes; el archivo aporta un resumen cacheado
+    archivo = resumen_archivo()
+    total_ventas = Venta.objects.count() + archivo['ventas']
+    ingresos_totales = (
+        (Venta.objects.aggregate(total=Sum('total'))['total'] or 0) + (archivo['total'] or 0)
+    )
     
-    # Productos con stock bajo
-    productos_stock_bajo = Producto.objects.filter(stock__lt=10).order_by('stock')[:5]
+    # Reposición urgente según la demanda de cada producto (menos días de cobertura primero)
+    if not sugerencias_vigentes():
+        encolar('calcular_reposicion', unico=True)
+    sugerencias_reposicion = list(sugerencias_urgentes())
+    # Umbral fijo sobre el stock total de todas las tiendas, junto a las sugerencias:
+    # cubre los productos sin demanda reciente y los que aún no tienen cálculo
+    productos_stock_bajo = Producto.objects.stock_bajo().exclude(
+        pk__in=[sugerencia.producto_id for sugerencia in sugerencias_reposicion]
+    ).order_by('stock_total')[:5]
     
-    # Ventas recientes
-    ventas_recientes = Venta.objects.select_related(
-        'cliente', 'producto', 'tienda', 'lugar_entrega'
-    ).order_by('-fecha')[:5]
+    # Ventas recientes (los nombres vienen de los snapshots, sin joins)
+    ventas_recientes = Venta.objects.order_by('-fecha')[:5]
     
     context = {
         'total_productos': total_productos,
@@ -39,6 +75,7 @@ def dashboard(request):
         'total_ventas': total_ventas,
         'ingresos_totales': ingresos_totales,
         'productos_stock_bajo': productos_stock_bajo,
+        'sugerencias_reposicion': sugerencias_reposicion,
         'ventas_recientes': ventas_recientes,
     }
     
@@ -67,8 +104,16 @@ class ClienteListView(LoginRequiredMixin, ListView):
     context_object_name = 'clientes'
     paginate_by = 20
     
+    # Orden de la lista: ?orden=<clave> (los de monto y segmento usan los índices de SegmentoCliente)
+    ORDENES = {
+        'nombre': ['nombre', 'apellido'],
+        'monto': [F('rfm__monto').desc(nulls_last=True)],
+        'recencia': [F('rfm__ultima_compra').desc(nulls_last=True)],
+        'segmento': ['rfm__segmento', F('rfm__monto').desc(nulls_last=True)],
+    }
+    
     def get_queryset(self):
-        queryset = Cliente.objects.all()
+        queryset = Cliente.objects.select_related('rfm')
         search = self.request.GET.get('search')
         if search:
             queryset = queryset.filter(
@@ -76,7 +121,19 @@ class ClienteListView(LoginRequiredMixin, ListView):
                 Q(apellido__icontains=search) |
                 Q(telefono__icontains=search)
             )
-        return queryset.order_by('nombre', 'apellido')
+        segmento = self.request.GET.get('segmento')
+        if segmento in dict(SegmentoCliente.SEGMENTOS):
+            queryset = queryset.filter(rfm__segmento=segmento)
+        orden = self.ORDENES.get(self.request.GET.get('orden'), self.ORDENES['nombre'])
+        return queryset.order_by(*orden)
+    
+    def get_context_data(self, **kwargs):
+        # Los segmentos se ponen al día en la cola solo con los clientes que compraron desde el último cálculo
+        if segmentos_pendientes():
+            encolar('calcular_segmentos', unico=True)
+        context = super().get_context_data(**kwargs)
+        context['segmentos'] = SegmentoCliente.SEGMENTOS
+        return context
 
 
 class ClienteCreateView(LoginRequiredMixin, CreateView):
@@ -106,9 +163,11 @@ class ClienteDeleteView(LoginRequiredMixin, DeleteView):
     template_name = 'ventas/clientes/eliminar.html'
     success_url = reverse_lazy('cliente_lista')
     
-    def delete(self, request, *args, **kwargs):
-        messages.success(request, 'Cliente eliminado exitosamente!')
-        return super().delete(request, *args, **kwargs)
+    def form_valid(self, form):
+        # Se oculta al instante; sus ventas se borran por lotes en segundo plano
+        iniciar_eliminacion(self.object, self.request.user)
+        messages.success(self.request, 'Cliente eliminado exitosamente! Sus ventas se borrarán en segundo plano.')
+        return redirect(self.get_success_url())
 
 
 # Vistas de Productos
@@ -167,9 +226,11 @@ class ProductoDeleteView(LoginRequiredMixin, DeleteView):
     template_name = 'ventas/productos/eliminar.html'
     success_url = reverse_lazy('producto_lista')
     
-    def delete(self, request, *args, **kwargs):
-        messages.success(request, 'Producto eliminado exitosamente!')
-        return super().delete(request, *args, **kwargs)
+    def form_valid(self, form):
+        # Se oculta al instante; sus ventas se borran por lotes en segundo plano
+        iniciar_eliminacion(self.object, self.request.user)
+        messages.success(self.request, 'Producto eliminado exitosamente! Sus ventas se borrarán en segundo plano.')
+        return redirect(self.get_success_url())
 
 
 # Vistas de Categorías
@@ -273,9 +334,32 @@ class VentaListView(LoginRequiredMixin, ListView):
     paginate_by = 20
     
     def get_queryset(self):
-        return Venta.objects.select_related(
-            'cliente', 'producto', 'tienda', 'lugar_entrega', 'usuario'
-        ).order_by('-fecha')
+        # Los snapshots de nombres evitan los joins con las cinco tablas relacionadas
+        return Venta.objects.order_by('-fecha')
+
+
+@login_required
+@require_POST
+def exportar_ventas(request):
+    """Encola la exportación de ventas a CSV y devuelve el trabajo para seguir su progreso.
+
+    Admite ``desde=AAAA-MM-DD`` y ``hasta=AAAA-MM-DD`` (exclusivo). Con el
+    historial completo la exportación tarda; se hace en la cola de trabajos.
+    """
+    try:
+        desde = _parsear_dia(request.POST.get('desde'))
+        hasta = _parsear_dia(request.POST.get('hasta'))
+    except ValueError:
+        return JsonResponse({'error': 'desde y hasta deben tener el formato AAAA-MM-DD'}, status=400)
+    if desde and hasta and desde >= hasta:
+        return JsonResponse({'error': 'hasta debe ser posterior a desde'}, status=400)
+    id_trabajo = encolar(
+        'exportar_ventas',
+        usuario=request.user,
+        desde=desde.isoformat() if desde else None,
+        hasta=hasta.isoformat() if hasta else None,
+    )
+    return JsonResponse(_datos_trabajo(cola().obtener(id_trabajo)), status=202)
 
 
 class VentaCreateView(LoginRequiredMixin, CreateView):
@@ -288,17 +372,29 @@ class VentaCreateView(LoginRequiredMixin, CreateView):
         form.instance.usuario = self.request.user
         form.instance.precio_unitario = form.instance.producto.precio
         
-        # Verificar stock
+        # Verificar stock de la tienda que vende (sin contar la reserva propia)
         producto = form.instance.producto
-        if producto.stock < form.instance.cantidad:
+        reserva = form.cleaned_data.get('reserva')
+        disponible = stock_disponible(producto, form.instance.tienda, excluir_reserva=reserva)
+        if disponible < form.instance.cantidad:
             messages.error(
                 self.request, 
-                f'Stock insuficiente. Stock disponible: {producto.stock}'
+                f'Stock insuficiente. Stock disponible: {disponible}'
             )
             return self.form_invalid(form)
         
+        # El descuento real es atómico: otra venta pudo llevarse las unidades
+        try:
+            response = super().form_valid(form)
+        except StockInsuficiente as e:
+            messages.error(self.request, str(e))
+            return self.form_invalid(form)
+        
+        # Las unidades ya se descontaron: la reserva deja de hacer falta
+        liberar_reserva(reserva, self.request.user)
+        
         messages.success(self.request, 'Venta registrada exitosamente!')
-        return super().form_valid(form)
+        return response
 
 
 # API Views
@@ -307,57 +403,470 @@ def api_producto_info(request, producto_id):
     """API para obtener información del producto"""
     try:
         producto = Producto.objects.get(id=producto_id)
+        tienda_id = request.GET.get('tienda')
+        tienda = Tienda.objects.filter(pk=tienda_id).first() if tienda_id and tienda_id.isdigit() else None
+        reserva = _token_reserva(request.GET.get('reserva'))
         return JsonResponse({
             'precio': float(producto.precio),
-            'stock': producto.stock,
+            'stock': stock_disponible(producto, tienda, excluir_reserva=reserva),
             'nombre': producto.nombre
         })
     except Producto.DoesNotExist:
         return JsonResponse({'error': 'Producto no encontrado'}, status=404)
 
 
+def _token_reserva(valor):
+    """Convierte el token de reserva recibido del cliente en UUID (o None si no es válido)"""
+    try:
+        return uuid.UUID(valor) if valor else None
+    except ValueError:
+        return None
+
+
+@login_required
+@require_POST
+def api_reservar_stock(request):
+    """API para apartar stock mientras se arma una venta"""
+    try:
+        producto = Producto.objects.get(id=request.POST.get('producto'))
+        tienda = Tienda.objects.get(id=request.POST.get('tienda'))
+        cantidad = int(request.POST.get('cantidad', ''))
+    except (Producto.DoesNotExist, Tienda.DoesNotExist, ValueError):
+        return JsonResponse({'error': 'Datos de reserva no válidos'}, status=400)
+    
+    if cantidad < 1:
+        return JsonResponse({'error': 'La cantidad debe ser mayor que cero'}, status=400)
+    
+    token = _token_reserva(request.POST.get('reserva'))
+    try:
+        reserva = reservar_stock(producto, tienda, cantidad, request.user, token=token)
+    except StockInsuficiente as e:
+        return JsonResponse({'error': str(e), 'stock': e.disponible}, status=409)
+    
+    return JsonResponse({
+        'reserva': str(reserva.token),
+        'expira_en': reserva.expira_en.isoformat(),
+        'stock': stock_disponible(producto, tienda, excluir_reserva=reserva.token),
+    })
+
+
+@login_required
+@require_POST
+def api_liberar_reserva(request, token):
+    """API para liberar una reserva al cancelar o cambiar la venta"""
+    liberadas = liberar_reserva(token, request.user)
+    return JsonResponse({'liberadas': liberadas})
+
+
+@login_required
+def api_eventos(request):
+    """Feed en vivo (Server-Sent Events) de ventas y cambios de stock"""
+    ultimo_id = request.headers.get('Last-Event-ID', '')
+    response = StreamingHttpResponse(
+        bus.suscribir(int(ultimo_id) if ultimo_id.isdigit() else None),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Evita que nginx acumule el stream en su buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+def api_cambios(request):
+    """Feed incremental del catálogo: cambios posteriores a ``since``, en páginas acotadas"""
+    since = request.GET.get('since', '0')
+    limit = request.GET.get('limit', str(LIMITE_CAMBIOS))
+    if not since.isdigit() or not limit.isdigit():
+        return JsonResponse({'error': 'since y limit deben ser enteros no negativos'}, status=400)
+    
+    cambios, cursor, hay_mas = cambios_desde(int(since), int(limit))
+    return JsonResponse({
+        'cambios': cambios,
+        'cursor': cursor,
+        'hay_mas': hay_mas,
+    })
+
+
+@login_required
+@require_POST
+def api_ventas_lote(request):
+    """API para subir en bloque las ventas que una terminal registró sin conexión.
+
+    Cada venta lleva un ``uuid`` generado por la terminal; reenviar el mismo
+    lote tras una desconexión no duplica ventas.
+    """
+    try:
+        ventas = json.loads(request.body).get('ventas')
+    except (ValueError, AttributeError):
+        ventas = None
+    if not isinstance(ventas, list):
+        return JsonResponse({'error': 'Se esperaba un objeto JSON con la lista "ventas"'}, status=400)
+    if len(ventas) > MAX_VENTAS_LOTE:
+        return JsonResponse({'error': f'Máximo {MAX_VENTAS_LOTE} ventas por lote'}, status=400)
+    
+    try:
+        resultados = registrar_lote(ventas, request.user)
+    except LoteDuplicado:
+        # Otra subida del mismo lote terminó antes; al reenviarlo se verán como duplicadas
+        return JsonResponse({'error': 'Otra subida registró estas ventas a la vez, reenvíe el lote'}, status=409)
+    except (StockInsuficiente, IntegrityError):
+        # Otra venta se adelantó durante la subida; no se guardó nada del lote
+        return JsonResponse({'error': 'El stock cambió durante la subida, reintente el lote'}, status=409)
+    
+    return JsonResponse({
+        'resultados': resultados,
+        'creadas': sum(1 for resultado in resultados if resultado['estado'] == CREADA),
+    })
+
+
+@login_required
+def api_catalogo(request):
+    """Catálogo de venta precompilado (JSON columnar comprimido con gzip).
+
+    Lo genera en segundo plano la cola de trabajos (o el comando
+    ``generar_catalogo``); mientras no exista uno más nuevo se sirve el
+    último, y la terminal completa lo que falte con
+    ``/api/cambios/?since=<version>``.
+    """
+    ruta, etag = ultimo_artefacto()
+    if ruta is None or version_artefacto(ruta) < version_actual():
+        # La reconstrucción va a la cola; mientras tanto se sirve el último catálogo
+        encolar('generar_catalogo', unico=True)
+    if ruta is None:
+        return JsonResponse({'error': 'El catálogo aún no se ha generado'}, status=503)
+    
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+    
+    datos = ruta.read_bytes()
+    rango = False
+    # If-Range: el rango solo vale si la terminal tiene esta misma versión
+    if 'Range' in request.headers and request.headers.get('If-Range', etag) == etag:
+        rango = parsear_rango(request.headers['Range'], len(datos))
+    
+    if rango is None:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{len(datos)}'
+        return response
+    if rango:
+        inicio, fin = rango
+        response = HttpResponse(datos[inicio:fin + 1], status=206, content_type='application/gzip')
+        response['Content-Range'] = f'bytes {inicio}-{fin}/{len(datos)}'
+    else:
+        response = HttpResponse(datos, content_type='application/gzip')
+    
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    # Siempre se revalida con If-None-Match, que cuesta un 304 sin cuerpo
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+def api_eliminacion(request, pk):
+    """API con el progreso del borrado en segundo plano de un cliente o producto"""
+    eliminacion = get_object_or_404(Eliminacion, pk=pk)
+    return JsonResponse({
+        'id': eliminacion.pk,
+        'modelo': eliminacion.modelo,
+        'objeto_id': eliminacion.objeto_id,
+        'descripcion': eliminacion.descripcion,
+        'estado': eliminacion.estado,
+        'total': eliminacion.total,
+        'borradas': eliminacion.borradas,
+        'porcentaje': eliminacion.porcentaje,
+        'error': eliminacion.error,
+    })
+
+
+def _datos_trabajo(trabajo):
+    datos = {
+        'id': trabajo['id'],
+        'tarea': trabajo['tarea'],
+        'estado': trabajo['estado'],
+        'progreso': trabajo['progreso'],
+        'mensaje': trabajo['mensaje'],
+        'intentos': trabajo['intentos'],
+        'resultado': trabajo['resultado'],
+        'error': trabajo['error'] if trabajo['estado'] == 'fallido' else None,
+        'estado_url': reverse('api_trabajo', args=[trabajo['id']]),
+    }
+    if trabajo['archivo'] and trabajo['estado'] == 'completado':
+        datos['descarga_url'] = reverse('trabajo_descargar', args=[trabajo['id']])
+    return datos
+
+
+@login_required
+def api_trabajo(request, pk):
+    """API con el estado y el progreso de un trabajo en segundo plano"""
+    trabajo = obtener_trabajo(pk, request.user)
+    if trabajo is None:
+        return JsonResponse({'error': 'Trabajo no encontrado'}, status=404)
+    return JsonResponse(_datos_trabajo(trabajo))
+
+
+@login_required
+def trabajo_descargar(request, pk):
+    """Descarga el archivo de resultado de un trabajo completado"""
+    trabajo = obtener_trabajo(pk, request.user)
+    if trabajo is None or trabajo['estado'] != 'completado' or not trabajo['archivo']:
+        raise Http404("El resultado no está disponible")
+    try:
+        archivo = open(trabajo['archivo'], 'rb')
+    except FileNotFoundError:
+        raise Http404("El resultado ya no está disponible")
+    # El archivo se guarda como <id>-<nombre>; se descarga con su nombre original
+    nombre = os.path.basename(trabajo['archivo']).split('-', 1)[1]
+    return FileResponse(archivo, as_attachment=True, filename=nombre)
+
+
+@login_required
+def api_cubo(request):
+    """API del cubo de ventas: totales agrupados por ``por`` y filtrados por dimensión.
+
+    Ejemplo: ``?por=tienda,categoria&mes=2025-01,2025-02&tienda=3``
+    """
+    por = [dimension for dimension in request.GET.get('por', 'mes').split(',') if dimension]
+    if any(dimension not in DIMENSIONES for dimension in por) or len(set(por)) != len(por):
+        return JsonResponse({'error': f"por debe ser una lista de {', '.join(DIMENSIONES)}"}, status=400)
+    filtros = {}
+    for dimension in DIMENSIONES:
+        if dimension not in request.GET:
+            continue
+        valores = request.GET[dimension].split(',')
+        if dimension in ('tienda', 'producto'):
+            if not all(valor.isdigit() for valor in valores):
+                return JsonResponse({'error': f'{dimension} debe ser una lista de ids'}, status=400)
+            valores = [int(valor) for valor in valores]
+        filtros[dimension] = valores
+    limite = request.GET.get('limite', '')
+    if limite and not limite.isdigit():
+        return JsonResponse({'error': 'limite debe ser un entero'}, status=400)
+    
+    cubo = obtener_cubo()
+    grupos = cubo.consultar(por, filtros)
+    # La serie temporal va en orden cronológico; el resto, de mayor a menor total
+    if por and por[0] == 'mes':
+        grupos.sort(key=lambda grupo: [valor for valor, _ in grupo[0]])
+    else:
+        grupos.sort(key=lambda grupo: grupo[2], reverse=True)
+    if limite:
+        grupos = grupos[:int(limite)]
+    
+    filas = []
+    for valores, cantidad, total, ventas in grupos:
+        fila = {}
+        for dimension, (valor, nombre) in zip(por, valores):
+            fila[dimension] = valor
+            fila[f'{dimension}_nombre'] = nombre
+        fila.update({'cantidad': cantidad, 'total': str(centavos_a_decimal(total)), 'ventas': ventas})
+        filas.append(fila)
+    return JsonResponse({
+        'por': por,
+        'filtros': filtros,
+        'filas': filas,
+        'ventas_cubo': cubo.filas,
+        'motor': cubo.motor,
+    })
+
+
+def _parsear_dia(valor):
+    """Fecha ``AAAA-MM-DD`` opcional; ValueError si no es válida"""
+    if not valor:
+        return None
+    fecha = parse_date(valor)
+    if fecha is None:
+        raise ValueError(valor)
+    return fecha
+
+
+@login_required
+def api_clientes_distintos(request):
+    """API de clientes distintos estimados (HyperLogLog) por rango de fechas y tiendas.
+
+    Ejemplo: ``?desde=2025-01-01&hasta=2025-03-31&tienda=1,2&por=mes``. El
+    intervalo ``minimo``–``maximo`` cubre dos errores estándar (~95 %).
+    """
+    try:
+        desde = _parsear_dia(request.GET.get('desde'))
+        hasta = _parsear_dia(request.GET.get('hasta'))
+    except ValueError:
+        return JsonResponse({'error': 'desde y hasta deben tener el formato AAAA-MM-DD'}, status=400)
+    tiendas = [valor for valor in request.GET.get('tienda', '').split(',') if valor]
+    if not all(valor.isdigit() for valor in tiendas):
+        return JsonResponse({'error': 'tienda debe ser una lista de ids'}, status=400)
+    por = request.GET.get('por') or None
+    if por not in (None, 'tienda', 'mes'):
+        return JsonResponse({'error': 'por debe ser tienda o mes'}, status=400)
+    
+    grupos = []
+    for clave, (clientes, ventas) in sorted(
+        clientes_distintos(desde, hasta, [int(valor) for valor in tiendas], por).items(),
+        key=lambda item: item[0] or 0
+    ):
+        margen = round(2 * ERROR_CLIENTES * clientes)
+        grupo = {
+            'clientes': clientes,
+            'minimo': max(0, clientes - margen),
+            'maximo': clientes + margen,
+            'ventas': ventas,
+        }
+        if por:
+            grupo[por] = clave.strftime('%Y-%m') if por == 'mes' else clave
+        grupos.append(grupo)
+    return JsonResponse({'grupos': grupos, 'error_relativo': round(ERROR_CLIENTES, 4)})
+
+
+@login_required
+def api_mapa_calor(request):
+    """API del mapa de calor de ventas (día de la semana × hora) de una o varias tiendas.
+
+    ``?tienda=3`` o ``?tienda=1,2`` combina esas tiendas; sin ``tienda``, todas.
+    """
+    tiendas = [valor for valor in request.GET.get('tienda', '').split(',') if valor]
+    if not all(valor.isdigit() for valor in tiendas):
+        return JsonResponse({'error': 'tienda debe ser una lista de ids'}, status=400)
+    
+    matrices = mapa_calor([int(valor) for valor in tiendas])
+    return JsonResponse({
+        'tiendas': [int(valor) for valor in tiendas],
+        'dias': MapaCalor.DIAS_SEMANA,
+        'horas': list(range(24)),
+        'ventas': matrices['ventas'],
+        'unidades': matrices['unidades'],
+        'total': [[str(total) for total in dia] for dia in matrices['total']],
+    })
+
+
+@login_required
+def api_precios(request):
+    """API de precios de lista vigentes en un momento, según el historial de precios.
+
+    ``?momento=2025-03-01T12:00`` (hora local si no trae zona; por omisión,
+    ahora) y ``?producto=1,2`` para limitar a esos ids.
+    """
+    momento = timezone.now()
+    if request.GET.get('momento'):
+        try:
+            momento = parse_datetime(request.GET['momento'])
+        except ValueError:
+            # Bien formada pero imposible, p. ej. 2025-02-30T10:00
+            momento = None
+        if momento is None:
+            return JsonResponse({'error': 'momento debe ser una fecha y hora ISO'}, status=400)
+        if timezone.is_naive(momento):
+            momento = timezone.make_aware(momento)
+    productos = [valor for valor in request.GET.get('producto', '').split(',') if valor]
+    if not all(valor.isdigit() for valor in productos):
+        return JsonResponse({'error': 'producto debe ser una lista de ids'}, status=400)
+    
+    precios = precios_en(momento, [int(valor) for valor in productos] if productos else None)
+    return JsonResponse({
+        'momento': momento.isoformat(),
+        'precios': {str(producto_id): str(precio) for producto_id, precio in precios.items()},
+    })
+
+
+@login_required
+@permission_required('ventas.change_producto', raise_exception=True)
+@require_POST
+def api_ajuste_productos(request):
+    """API para ajustar en bloque el precio o el stock de un conjunto de productos.
+
+    Ejemplo: ``{"categoria": 3, "precio": {"modo": "porcentaje", "valor": "5"}}``.
+    El conjunto se elige con ``categoria`` y/o ``productos`` (lista de ids);
+    los modos son ``porcentaje``, ``suma`` y ``fijar``.
+    """
+    try:
+        datos = json.loads(request.body)
+        filtros = {}
+        if datos.get('categoria') is not None:
+            filtros['categoria_id'] = int(datos['categoria'])
+        if datos.get('productos') is not None:
+            filtros['pk__in'] = [int(producto_id) for producto_id in datos['productos']]
+        form = AjusteProductosForm({
+            f'{clave}_{campo}': (datos.get(campo) or {}).get(clave)
+            for campo in ('precio', 'stock')
+            for clave in ('modo', 'valor')
+        })
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'error': 'JSON no válido'}, status=400)
+    if not filtros:
+        return JsonResponse({'error': 'Indique "categoria" o "productos"'}, status=400)
+    if not form.is_valid():
+        return JsonResponse({'error': form.errors.get_json_data()}, status=400)
+    
+    try:
+        actualizados = ajustar_productos(Producto.objects.filter(**filtros), **form.ajustes())
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'actualizados': actualizados})
+
+
 # Vistas de Reportes
 @login_required
 def reportes_ganancias(request):
     """Vista de reportes de ganancias"""
-    # Ganancias por mes
-    ganancias_mes = Venta.objects.annotate(
-        mes=TruncMonth('fecha')
-    ).values('mes').annotate(
-        total_mes=Sum('total')
-    ).order_by('-mes')[:12]
-    
-    # Ganancias totales
-    total_ganancias = Venta.objects.aggregate(total=Sum('total'))['total'] or 0
-    
-    # Productos más vendidos
-    productos_vendidos = Venta.objects.values(
-        'producto__nombre'
-    ).annotate(
-        total_vendido=Sum('cantidad'),
-        ingresos=Sum('total')
-    ).order_by('-total_vendido')[:10]
+    context = _calcular_ganancias()
+    return render(request, 'ventas/reportes/ganancias.html', context)
+
+
+def _calcular_ganancias():
+    """Datos del reporte de ganancias, derivados del resumen de ventas cacheado"""
+    resumen = resumen_reportes()
     
-    context = {
+    # Ganancias por mes (últimos 12 meses)
+    ganancias_mes = [
+        {'mes': mes, 'total_mes': total}
+        for mes, total in sorted(resumen['por_mes'].items(), reverse=True)[:12]
+    ]
+    
+    # Productos más vendidos (el nombre sale del snapshot, sin join con productos)
+    productos_vendidos = sorted(
+        (
+            {'producto_id': producto_id, 'nombre': fila['nombre'],
+             'total_vendido': fila['total_vendido'], 'ingresos': fila['ingresos']}
+            for producto_id, fila in resumen['productos'].items()
+        ),
+        key=lambda fila: fila['total_vendido'],
+        reverse=True
+    )[:10]
+    
+    return {
         'ganancias_mes': ganancias_mes,
-        'total_ganancias': total_ganancias,
+        'total_ganancias': resumen['total'],
         'productos_vendidos': productos_vendidos,
     }
-    
-    return render(request, 'ventas/reportes/ganancias.html', context)
 
 
 @login_required
 def reportes_productos(request):
     """Vista de reportes por producto"""
-    productos_reporte = Venta.objects.values(
-        'producto__nombre',
-        'producto__precio'
-    ).annotate(
-        total_vendido=Sum('cantidad'),
-        ingresos_totales=Sum('total'),
-        precio_promedio=Sum('precio_unitario') / Count('id')
-    ).order_by('-ingresos_totales')
+    # Totales por producto de ventas activas y archivadas, agregados en paralelo y cacheados
+    filas = resumen_reportes()['productos']
+    # Ventas activas frente al precio de lista vigente en cada venta (historial de precios)
+    margenes = reporte_cacheado('margen_lista', margen_lista)
+    productos = Producto.objects.in_bulk(filas.keys())
+    
+    productos_reporte = []
+    for producto_id, fila in filas.items():
+        producto = productos.get(producto_id)
+        if producto is None:
+            continue
+        ingresos_activos, ingresos_lista = margenes.get(producto_id, (None, None))
+        productos_reporte.append({
+            'producto__nombre': producto.nombre,
+            'producto__precio': producto.precio,
+            'total_vendido': fila['total_vendido'],
+            'ingresos_totales': fila['ingresos'],
+            'precio_promedio': (fila['suma_precios'] / fila['num_ventas']).quantize(Decimal('0.01')),
+            'ingresos_lista': ingresos_lista,
+            'diferencia_lista': ingresos_activos - ingresos_lista if ingresos_lista is not None else None,
+        })
+    productos_reporte.sort(key=lambda fila: fila['ingresos_totales'], reverse=True)
     
     context = {
         'productos_reporte': productos_reporte,